@@ -128,6 +128,15 @@ def run(
     debug: bool = typer.Option(
         False, "--debug/", help="Print more messages (including full tracebacks)."
     ),
+    chunked: bool = typer.Option(
+        False, "--chunked/", help=(
+            "Open, pair and save one time interval (analysis.time_interval) at a time, "
+            "then stitch the saved chunks together for plotting and statistics."
+        )
+    ),
+    resume: bool = typer.Option(
+        True, help="With --chunked, skip the time chunks that were already paired by a previous run."
+    ),
 ):
     """Run MELODIES MONET as described in the control file CONTROL."""
 
@@ -158,19 +167,31 @@ def run(
             )
             an.debug = True
 
-    with _timer("Opening model(s)"):
-        an.open_models()
+    if chunked:
+        if an.time_intervals is None:
+            typer.echo("Error: --chunked requires analysis.time_interval in the control file")
+            raise typer.Exit(2)
 
-    # Note: currently MM expects having at least model and at least one obs
-    # but in the future, model-to-model only might be an option
-    with _timer("Opening observations(s)"):
-        an.open_obs()
+        with _timer(f"Pairing in {len(an.time_intervals)} time chunks"):
+            an.pair_time_chunks(resume=resume)
 
-    with _timer("Pairing"):
-        if an.read is not None:
-            an.read_analysis()
-        else:
-            an.pair_data()
+        with _timer("Concatenating the paired time chunks"):
+            an.concat_pairs()
+
+    else:
+        with _timer("Opening model(s)"):
+            an.open_models()
+
+        # Note: currently MM expects having at least model and at least one obs
+        # but in the future, model-to-model only might be an option
+        with _timer("Opening observations(s)"):
+            an.open_obs()
+
+        with _timer("Pairing"):
+            if an.read is not None:
+                an.read_analysis()
+            else:
+                an.pair_data()
 
     if an.save is not None:
         with _timer("Saving paired datasets"):
@@ -4,7 +4,7 @@
 Drive the entire analysis package via the :class:`analysis` class.
 """
 import monetio as mio
-import monet as m
+import monet  # noqa: F401
 import os
 import xarray as xr
 import pandas as pd
@@ -125,6 +125,7 @@ class observation:
         self.resample = None
         self.time_var = None
         self.regrid_method = None
+        self.prune_variables = True
 
     def __repr__(self):
         return (
@@ -143,14 +144,78 @@ class observation:
             ")"
         )
 
-    def open_obs(self, time_interval=None, control_dict=None):
+    def required_variables(self, control_dict):
+        """Names, as in the observation files, of the variables needed by the analysis:
+        the variables paired in the model ``mapping`` entries of this observation,
+        the ``variables`` and ``variable_summing`` entries, and the ``filter_dict`` columns.
+
+        Parameters
+        ----------
+        control_dict : dict
+            Contents of the input yaml file.
+
+        Returns
+        -------
+        set of str
+            Variable names, or None if no model is mapped to this observation.
+        """
+        names = set()
+        for mod in control_dict.get('model', {}).values():
+            names.update((mod.get('mapping') or {}).get(self.label, {}).values())
+        if not names:
+            return None
+
+        if self.variable_summing is not None:
+            names.update(self.variable_summing)
+            for info in self.variable_summing.values():
+                names.update(info['vars'])
+        if self.data_proc is not None and 'filter_dict' in self.data_proc:
+            names.update(self.data_proc['filter_dict'])
+        if self.variable_dict is not None:
+            # keys are the names in the files, before any rename
+            names.update(self.variable_dict)
+        return names
+
+    def _drop_variables(self, fn, control_dict):
+        """Time-dependent data variables of file fn not needed by the analysis
+        (see :meth:`required_variables`), for surface point observations.
+
+        Parameters
+        ----------
+        fn : str
+            Observation file, representative of all the files.
+        control_dict : dict
+            Contents of the input yaml file.
+
+        Returns
+        -------
+        list of str
+        """
+        # the other obs types use more variables in pairing (e.g. pressure_obs)
+        if not self.prune_variables or control_dict is None or self.obs_type != 'pt_sfc':
+            return []
+        names = self.required_variables(control_dict)
+        if names is None:
+            return []
+        names = names | {'time_local', 'siteid', 'latitude', 'longitude'}
+        with xr.open_dataset(fn, decode_times=False) as ds:
+            return [v for v in ds.data_vars if v not in names and 'time' in ds[v].dims]
+
+    def open_obs(self, time_interval=None, control_dict=None, closed='both'):
         """Open the observational data, store data in observation pair,
         and apply mask and scaling.
 
+        For surface point observations, only the variables needed by the analysis
+        (see :meth:`required_variables`) and the site and coordinate variables
+        are read from netCDF files (unless :attr:`prune_variables` is False).
+
         Parameters
         ----------
         time_interval (optional, default None) : [pandas.Timestamp, pandas.Timestamp]
             If not None, restrict obs to datetime range spanned by time interval [start, end].
+        closed (optional, default 'both') : str
+            'both' to include the end of time_interval, 'left' to exclude it
+            (so that adjacent intervals do not share their boundary times).
 
         Returns
         -------
@@ -172,10 +237,11 @@ class observation:
         _, extension = os.path.splitext(files[0])
         try:
             if self.obs not in {'noaa_gml'} and extension in {'.nc', '.ncf', '.netcdf', '.nc4'}:
+                drop_variables = self._drop_variables(files[0], control_dict)
                 if len(files) > 1:
-                    self.obj = xr.open_mfdataset(files)
+                    self.obj = xr.open_mfdataset(files, drop_variables=drop_variables)
                 else:
-                    self.obj = xr.open_dataset(files[0])
+                    self.obj = xr.open_dataset(files[0], drop_variables=drop_variables)
             elif extension in ['.ict', '.icartt']:
                 assert len(files) == 1, "monetio.icartt.add_data can only read one file"
                 self.obj = mio.icartt.add_data(files[0])
@@ -197,6 +263,11 @@ class observation:
         except Exception as e:
             print('something happened opening file:', e)
             return
+
+        # restrict obs to the time interval, if using
+        if (time_interval is not None and isinstance(self.obj, xr.Dataset) and 'time' in self.obj.dims
+                and self.obj.indexes['time'].is_monotonic_increasing):
+            self.obj = _select_time_interval(self.obj, time_interval, closed)
         
         self.add_coordinates_ground() # If ground site then add coordinates based on yaml if necessary
         self.mask_and_scale()  # mask and scale values from the control values
@@ -242,7 +313,7 @@ class observation:
                         self.obj = self.obj.rename({v:d['rename']})
                         self.variable_dict[d['rename']] = self.variable_dict.pop(v)
 
-    def open_sat_obs(self, time_interval=None, control_dict=None):
+    def open_sat_obs(self, time_interval=None, control_dict=None, closed='both'):
         """Methods to opens satellite data observations. 
         Uses in-house python code to open and load observations.
         Alternatively may use the satpy reader.
@@ -253,6 +324,8 @@ class observation:
         ----------
         time_interval (optional, default None) : [pandas.Timestamp, pandas.Timestamp]
             If not None, restrict obs to datetime range spanned by time interval [start, end].
+        closed (optional, default 'both') : str
+            'both' to include the end of time_interval, 'left' to exclude it.
 
         Returns
         -------
@@ -279,7 +352,7 @@ class observation:
                 # restrict observation data to time_interval if using
                 # additional development to deal with files crossing intervals needed (eg situations where orbit start at 23hrs, ends next day).
                 if time_interval is not None:
-                    self.obj = self.obj.sel(time=slice(time_interval[0],time_interval[-1]))
+                    self.obj = _select_time_interval(self.obj, time_interval, closed)
 
             elif self.sat_type == 'mopitt_l3':
                 print('Reading MOPITT')
@@ -311,10 +384,14 @@ class observation:
                 print('Reading TROPOMI L2 NO2')
                 self.obj = mio.sat._tropomi_l2_no2_mm.read_trpdataset(
                     self.file, self.variable_dict, debug=self.debug)
+                if time_interval is not None:
+                    self.obj = _select_swaths(self.obj, time_interval, closed)
             elif "tempo_l2" in self.sat_type:
                 print('Reading TEMPO L2')
                 self.obj = mio.sat._tempo_l2_no2_mm.open_dataset(
                     self.file, self.variable_dict, debug=self.debug)
+                if time_interval is not None:
+                    self.obj = _select_swaths(self.obj, time_interval, closed)
             else:
                 print('file reader not implemented for {} observation'.format(self.sat_type))
                 raise ValueError
@@ -331,28 +408,8 @@ class observation:
         """ 
         if self.data_proc is not None:
             if 'filter_dict' in self.data_proc:
-                filter_dict = self.data_proc['filter_dict']
-                for column in filter_dict.keys():
-                    filter_vals = filter_dict[column]['value']
-                    filter_op = filter_dict[column]['oper']
-                    if filter_op == 'isin':
-                        self.obj = self.obj.where(self.obj[column].isin(filter_vals),drop=True)
-                    elif filter_op == 'isnotin':
-                        self.obj = self.obj.where(~self.obj[column].isin(filter_vals),drop=True)
-                    elif filter_op == '==':
-                        self.obj = self.obj.where(self.obj[column] == filter_vals,drop=True)
-                    elif filter_op == '>':
-                        self.obj = self.obj.where(self.obj[column] > filter_vals,drop=True)
-                    elif filter_op == '<':
-                        self.obj = self.obj.where(self.obj[column] < filter_vals,drop=True)
-                    elif filter_op == '>=':
-                        self.obj = self.obj.where(self.obj[column] >= filter_vals,drop=True)
-                    elif filter_op == '<=':
-                        self.obj = self.obj.where(self.obj[column] <= filter_vals,drop=True)
-                    elif filter_op == '!=':
-                        self.obj = self.obj.where(self.obj[column] != filter_vals,drop=True)
-                    else:
-                        raise ValueError(f'Filter operation {filter_op!r} is not supported')
+                # all the clauses are combined and applied at once
+                self.obj = tools.filter_dataset(self.obj, self.data_proc['filter_dict'])
         
     def mask_and_scale(self):
         """Mask and scale observations, including unit conversions and setting
@@ -362,37 +419,12 @@ class observation:
         -------
         None
         """
-        vars = self.obj.data_vars
         if self.variable_dict is not None:
-            for v in vars:
+            for v in list(self.obj.data_vars):
                 if v in self.variable_dict:
-                    d = self.variable_dict[v]
-                    # Apply removal of min, max, and nan on the units in the obs file first.
-                    if 'obs_min' in d:
-                        self.obj[v].data = self.obj[v].where(self.obj[v] >= d['obs_min'])
-                    if 'obs_max' in d:
-                        self.obj[v].data = self.obj[v].where(self.obj[v] <= d['obs_max'])
-                    if 'nan_value' in d:
-                        self.obj[v].data = self.obj[v].where(self.obj[v] != d['nan_value'])
-                    
-                    # Then apply a correction if needed for the units.
-                    if 'unit_scale' in d:
-                        scale = d['unit_scale']
-                    else:
-                        scale = 1
-                    if 'unit_scale_method' in d:
-                        if d['unit_scale_method'] == '*':
-                            self.obj[v].data *= scale
-                        elif d['unit_scale_method'] == '/':
-                            self.obj[v].data /= scale
-                        elif d['unit_scale_method'] == '+':
-                            self.obj[v].data += scale
-                        elif d['unit_scale_method'] == '-':
-                            self.obj[v].data += -1 * scale
-                    
-                    # Then replace LLOD_value with LLOD_setvalue (after unit conversion)
-                    if 'LLOD_value' in d:
-                        self.obj[v].data = self.obj[v].where(self.obj[v] != d['LLOD_value'],d['LLOD_setvalue'])
+                    # removal of min, max, and nan on the units in the obs file first,
+                    # then unit scaling, then LLOD_value replaced with LLOD_setvalue
+                    self.obj[v] = tools.mask_and_scale(self.obj[v], self.variable_dict[v])
     
     def sum_variables(self):
         """Sum any variables noted that should be summed to create new variables.
@@ -465,6 +497,7 @@ class model:
         self.files_surf = None
         self.file_pm25_str = None
         self.files_pm25 = None
+        self.file_time_index = True
         self.label = None
         self.obj = None
         self.mapping = None
@@ -473,6 +506,7 @@ class model:
         self.preprocessing = None
         self.plot_kwargs = None
         self.proj = None
+        self.site_index = None
 
     def __repr__(self):
         return (
@@ -523,6 +557,31 @@ class model:
         if self.file_pm25_str is not None:
             self.files_pm25 = sort(glob(self.file_pm25_str))
 
+    def subset_files(self, time_interval):
+        """Restrict the model files (:attr:`files` and the vertical, surface
+        and PM2.5 files) to the ones needed for a time interval,
+        using the time coverage of each file cached in a file time index
+        (see :func:`melodies_monet.util.time_interval_subset.file_time_index`).
+
+        Parameters
+        ----------
+        time_interval : [pandas.Timestamp, pandas.Timestamp]
+            Start and end of the time interval.
+
+        Returns
+        -------
+        None
+        """
+        from .util import time_interval_subset as tsub
+
+        n_files = len(self.files)
+        self.files = tsub.subset_files_by_time(self.files, time_interval)
+        print('{} of {} model files in {} to {}'.format(
+            len(self.files), n_files, time_interval[0], time_interval[-1]))
+        for attr in ('files_vert', 'files_surf', 'files_pm25'):
+            if getattr(self, attr) is not None:
+                setattr(self, attr, tsub.subset_files_by_time(getattr(self, attr), time_interval))
+
     def open_model_files(self, time_interval=None, control_dict=None):
         """Open the model files, store data in :class:`model` instance attributes,
         and apply mask and scaling.
@@ -536,6 +595,8 @@ class model:
         ----------
         time_interval (optional, default None) : [pandas.Timestamp, pandas.Timestamp]
             If not None, restrict models to datetime range spanned by time interval [start, end].
+            Otherwise, the analysis ``start_time`` and ``end_time`` are used if provided
+            to restrict the files opened (when :attr:`file_time_index` is True).
 
         Returns
         -------
@@ -546,6 +607,14 @@ class model:
         print(self.model.lower())
 
         self.glob_files()
+        if self.file_time_index:
+            if time_interval is None and control_dict is not None:
+                analysis_dict = control_dict.get('analysis', {})
+                if analysis_dict.get('start_time') is not None and analysis_dict.get('end_time') is not None:
+                    time_interval = [pd.Timestamp(analysis_dict['start_time']),
+                                     pd.Timestamp(analysis_dict['end_time'])]
+            if time_interval is not None:
+                self.subset_files(time_interval)
         # Calculate species to input into MONET, so works for all mechanisms in wrfchem
         # I want to expand this for the other models too when add aircraft data.
         # First make a list of variables not in mapping but from variable_summing, if provided
@@ -686,24 +755,13 @@ class model:
         -------
         None
         """
-        vars = self.obj.data_vars
         if self.variable_dict is not None:
-            for v in vars:
+            for v in list(self.obj.data_vars):
                 if v in self.variable_dict:
                     d = self.variable_dict[v]
-                    if 'unit_scale' in d:
-                        scale = d['unit_scale']
-                    else:
-                        scale = 1
-                    if 'unit_scale_method' in d:
-                        if d['unit_scale_method'] == '*':
-                            self.obj[v].data *= scale
-                        elif d['unit_scale_method'] == '/':
-                            self.obj[v].data /= scale
-                        elif d['unit_scale_method'] == '+':
-                            self.obj[v].data += scale
-                        elif d['unit_scale_method'] == '-':
-                            self.obj[v].data += -1 * scale
+                    # only unit scaling for models
+                    rules = {k: d[k] for k in ('unit_scale', 'unit_scale_method') if k in d}
+                    self.obj[v] = tools.mask_and_scale(self.obj[v], rules)
     
     def sum_variables(self):
         """Sum any variables noted that should be summed to create new variables.
@@ -732,6 +790,142 @@ class model:
         except ValueError as e:
             raise Exception("Something happened when using variable_summing:") from e
 
+    def get_site_index(self, cache_dir=None):
+        """Get the nearest-neighbour index of the model grid, used to pair point observations.
+        It is built once per unique grid (and shared with other models on the same grid).
+
+        Parameters
+        ----------
+        cache_dir : str, optional
+            Directory where the index is also saved to, and read from by later runs.
+
+        Returns
+        -------
+        melodies_monet.util.point_pairing.SiteIndex
+        """
+        from .util.point_pairing import SiteIndex
+
+        lon = self.obj['longitude'].values
+        lat = self.obj['latitude'].values
+        if self.site_index is None or self.site_index.key != SiteIndex.grid_key(lon, lat):
+            self.site_index = SiteIndex.from_grid(lon, lat, cache_dir=cache_dir)
+        return self.site_index
+
+
+def _select_time_interval(obj, time_interval, closed='both'):
+    """Select the times of obj in time_interval [start, end], or [start, end)
+    if closed is 'left'."""
+    obj = obj.sel(time=slice(time_interval[0], time_interval[-1]))
+    if closed == 'left':
+        obj = obj.isel(time=obj.indexes['time'] < pd.Timestamp(time_interval[-1]))
+    elif closed != 'both':
+        raise ValueError(f"closed must be 'both' or 'left', not {closed!r}")
+    return obj
+
+
+def _select_swaths(swaths, time_interval, closed='both'):
+    """Select the swaths of a dict keyed by their time string (e.g., TROPOMI days
+    or TEMPO granules) that start in time_interval (see :func:`_select_time_interval`)."""
+    start, end = pd.Timestamp(time_interval[0]), pd.Timestamp(time_interval[-1])
+    selected = type(swaths)()
+    for key, swath in swaths.items():
+        swath_time = pd.Timestamp(key)
+        if swath_time.tzinfo is not None:
+            swath_time = swath_time.tz_convert(None)
+        if start <= swath_time and (swath_time < end if closed == 'left' else swath_time <= end):
+            selected[key] = swath
+    return selected
+
+
+def _pair_task_group(an, tasks, time_interval=None, closed='both'):
+    """Run a group of pairings on an analysis subset in a worker
+    (see :meth:`analysis.pair_data`).
+
+    Parameters
+    ----------
+    an : analysis
+        Analysis subset from :meth:`analysis._pairing_subset`.
+    tasks : list of (str, str)
+        (model label, obs label) pairings, run in order.
+    time_interval, closed
+        See :meth:`analysis.pair_data`.
+
+    Returns
+    -------
+    tuple of dict
+        The paired dict, model objects replaced during pairing
+        and obs objects replaced during pairing (e.g., converted to a DataFrame).
+    """
+    if an.regrid_weights_cache:
+        # workers that are not forked do not inherit the cache settings
+        from .util import regrid_util
+        regrid_util.set_weights_cache(**an.regrid_weights_cache)
+    obs_in = {obs_label: an.obs[obs_label].obj for obs_label in an.obs}
+    for model_label, obs_to_pair in tasks:
+        an._pair_model_obs(model_label, obs_to_pair, time_interval=time_interval, closed=closed)
+    model_objs = {model_label: an.models[model_label].obj for model_label in an.models
+                  if an.models[model_label].data_proc is not None
+                  and 'average' in an.models[model_label].data_proc}
+    obs_objs = {obs_label: an.obs[obs_label].obj for obs_label in an.obs
+                if an.obs[obs_label].obj is not obs_in[obs_label]}
+    return an.paired, model_objs, obs_objs
+
+
+_PLOT_ANALYSIS = None
+"""analysis : Set by :meth:`analysis.plotting` for its forked plotting workers."""
+
+
+def _numba_threads_started():
+    """Whether the TEMPO pairing has run its parallel numba kernel in this process,
+    after which forking can hang the process at exit."""
+    import sys
+
+    tempo = sys.modules.get('melodies_monet.util.sat_l2_swath_utility_tempo')
+    return tempo is not None and tempo._NUMBA_THREADS_STARTED
+
+
+def _init_plot_worker():
+    """Initialize a forked plotting worker (see :meth:`analysis.plotting`).
+
+    The threads of the parent's dask scheduler do not exist in the worker,
+    so the lazy data still needed by the plots are computed in the worker's own thread.
+    """
+    try:
+        import dask
+    except ImportError:
+        return
+    dask.config.set(scheduler='synchronous')
+
+
+def _plot_task_worker(task):
+    """Run one plotting task in a forked worker (see :meth:`analysis.plotting`).
+
+    The analysis (including the paired data) is inherited from the parent
+    process through :data:`_PLOT_ANALYSIS`, so only the task labels are pickled.
+
+    Parameters
+    ----------
+    task : tuple
+        (plotting group, obs variable, domain index).
+
+    Returns
+    -------
+    tuple
+        The task, the elapsed time in seconds and the formatted traceback
+        if the task failed (otherwise None).
+    """
+    import time
+    import traceback
+
+    t0 = time.perf_counter()
+    try:
+        _PLOT_ANALYSIS._plot_task(*task)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    return task, time.perf_counter() - t0, error
+
+
 class analysis:
     """The analysis class.
     
@@ -774,6 +968,11 @@ class analysis:
         self.add_logo = True
         """bool, default=True : Add the MELODIES MONET logo to the plots."""
         self.pairing_kwargs = {}
+        self.plotting_kwargs = {}
+        self.region_mask_cache_dir = None
+        self.site_index_cache_dir = None
+        self.regrid_weights_cache = {}
+        self.chunk_dir = None
 
 
     def __repr__(self):
@@ -798,7 +997,7 @@ class analysis:
             ")"
         )
 
-    def read_control(self, control=None):
+    def read_control(self, control=None, control_dict=None):
         """Read the input yaml file,
         updating various :class:`analysis` instance attributes.
 
@@ -807,6 +1006,9 @@ class analysis:
         control : str
             Input yaml file path.
             If provided, :attr:`control` will be set to this value.
+        control_dict : dict
+            Contents of an input yaml file already parsed.
+            If provided, it is used instead of reading :attr:`control`.
 
         Returns
         -------
@@ -818,8 +1020,11 @@ class analysis:
         if control is not None:
             self.control = control
 
-        with open(self.control, 'r') as stream:
-            self.control_dict = yaml.safe_load(stream)
+        if control_dict is not None:
+            self.control_dict = control_dict
+        else:
+            with open(self.control, 'r') as stream:
+                self.control_dict = yaml.safe_load(stream)
 
         # set analysis time
         if 'start_time' in self.control_dict['analysis'].keys():
@@ -870,9 +1075,39 @@ class analysis:
                 = [[time_stamps[n], time_stamps[n+1]]
                     for n in range(len(time_stamps)-1)]
         
+        # directory for the paired data of each time chunk (see pair_time_chunks)
+        if 'chunk_dir' in self.control_dict['analysis'].keys():
+            self.chunk_dir = os.path.expandvars(self.control_dict['analysis']['chunk_dir'])
+        else:
+            self.chunk_dir = os.path.join(self.output_dir_save, 'chunks')
+
         # specific arguments for pairing options
         if 'pairing_kwargs' in self.control_dict['analysis'].keys():
             self.pairing_kwargs = self.control_dict['analysis']['pairing_kwargs']
+
+        # directory to cache the region masks used by plotting and stats
+        if 'region_mask_cache_dir' in self.control_dict['analysis'].keys():
+            self.region_mask_cache_dir = os.path.expandvars(
+                self.control_dict['analysis']['region_mask_cache_dir'])
+
+        # directory to cache the nearest-neighbour index of the model grids
+        if 'site_index_cache_dir' in self.control_dict['analysis'].keys():
+            self.site_index_cache_dir = os.path.expandvars(
+                self.control_dict['analysis']['site_index_cache_dir'])
+
+        # directory to cache the xESMF regridding weights
+        if 'regrid_weights_cache' in self.control_dict['analysis'].keys():
+            from .util import regrid_util
+            weights_cache = self.control_dict['analysis']['regrid_weights_cache']
+            self.regrid_weights_cache = {
+                'cache_dir': os.path.expandvars(weights_cache['dir']),
+                'max_size_mb': weights_cache.get('max_size_mb', 2048),
+            }
+            regrid_util.set_weights_cache(**self.regrid_weights_cache)
+
+        # options for running the plotting
+        if 'plotting_kwargs' in self.control_dict['analysis'].keys():
+            self.plotting_kwargs = self.control_dict['analysis']['plotting_kwargs']
             
         # Enable Dask progress bars? (default: false)
         enable_dask_progress_bars = self.control_dict["analysis"].get(
@@ -902,20 +1137,35 @@ class analysis:
 
                 elif self.save[attr]['method']=='netcdf':
                     from .util.write_util import write_analysis_ncf
+                    save_kwargs = {k: self.save[attr][k] for k in ('codec', 'complevel', 'shuffle', 'n_workers', 'chunks')
+                                   if k in self.save[attr]}
                     # save either all groups or selected groups
                     if self.save[attr]['data']=='all':
                         if 'prefix' in self.save[attr]:
                             write_analysis_ncf(obj=getattr(self,attr), output_dir=self.output_dir_save,
-                                               fn_prefix=self.save[attr]['prefix'])
+                                               fn_prefix=self.save[attr]['prefix'], **save_kwargs)
                         else:
-                            write_analysis_ncf(obj=getattr(self,attr), output_dir=self.output_dir_save)
+                            write_analysis_ncf(obj=getattr(self,attr), output_dir=self.output_dir_save, **save_kwargs)
                     else:
                         if 'prefix' in self.save[attr]:
                             write_analysis_ncf(obj=getattr(self,attr), output_dir=self.output_dir_save, 
-                                               fn_prefix=self.save[attr]['prefix'], keep_groups=self.save[attr]['data'])
+                                               fn_prefix=self.save[attr]['prefix'], keep_groups=self.save[attr]['data'],
+                                               **save_kwargs)
                         else:
                             write_analysis_ncf(obj=getattr(self,attr), output_dir=self.output_dir_save, 
-                                               keep_groups=self.save[attr]['data'])
+                                               keep_groups=self.save[attr]['data'], **save_kwargs)
+
+                elif self.save[attr]['method'] in ('zarr', 'parquet'):
+                    from .util.write_util import write_analysis_zarr, write_analysis_parquet
+                    save_kwargs = dict(obj=getattr(self,attr), output_dir=self.output_dir_save,
+                                       fn_prefix=self.save[attr].get('prefix'))
+                    if self.save[attr].get('data', 'all') != 'all':
+                        save_kwargs['keep_groups'] = self.save[attr]['data']
+                    if self.save[attr]['method'] == 'zarr':
+                        write_analysis_zarr(append_dim=self.save[attr].get('append_dim'),
+                                            chunks=self.save[attr].get('chunks'), **save_kwargs)
+                    else:
+                        write_analysis_parquet(**save_kwargs)
         
     def read_analysis(self):
         """Read all previously saved analysis attributes listed in analysis section of input yaml file.
@@ -931,7 +1181,12 @@ class analysis:
                 if self.read[attr]['method']=='pkl':
                     read_saved_data(analysis=self,filenames=self.read[attr]['filenames'], method='pkl', attr=attr)
                 elif self.read[attr]['method']=='netcdf':
-                    read_saved_data(analysis=self,filenames=self.read[attr]['filenames'], method='netcdf', attr=attr)
+                    read_saved_data(analysis=self,filenames=self.read[attr]['filenames'], method='netcdf', attr=attr,
+                                    parallel=self.read[attr].get('parallel', False))
+                elif self.read[attr]['method'] in ('zarr', 'parquet'):
+                    read_saved_data(analysis=self,filenames=self.read[attr]['filenames'], method=self.read[attr]['method'],
+                                    attr=attr, variables=self.read[attr].get('variables'),
+                                    time_range=self.read[attr].get('time_range'))
                 if attr == 'paired':
                     # initialize model/obs attributes, since needed for plotting and stats
                     if not self.models:
@@ -995,6 +1250,8 @@ class analysis:
                 if 'files_surf' in self.control_dict['model'][mod].keys():
                     m.file_surf_str = os.path.expandvars(
                         self.control_dict['model'][mod]['files_surf'])
+                if 'file_time_index' in self.control_dict['model'][mod].keys():
+                    m.file_time_index = self.control_dict['model'][mod]['file_time_index']
                 if 'files_pm25' in self.control_dict['model'][mod].keys():
                     m.file_pm25_str = os.path.expandvars(
                         self.control_dict['model'][mod]['files_pm25'])
@@ -1047,7 +1304,7 @@ class analysis:
                     m.open_model_files(time_interval=time_interval, control_dict=self.control_dict)
                 self.models[m.label] = m
 
-    def open_obs(self, time_interval=None, load_files=True):
+    def open_obs(self, time_interval=None, load_files=True, closed='both'):
         """Open all observations listed in the input yaml file and create an 
         :class:`observation` instance for each of them,
         populating the :attr:`obs` dict.
@@ -1058,6 +1315,9 @@ class analysis:
             If not None, restrict obs to datetime range spanned by time interval [start, end].
         load_files (optional, default True): boolean
             If False, only populate :attr: dict with yaml file parameters and do not open obs files. 
+        closed (optional, default 'both') : str
+            'both' to include the end of time_interval, 'left' to exclude it
+            (see :meth:`pair_time_chunks`).
             
         Returns
         -------
@@ -1089,12 +1349,16 @@ class analysis:
                     o.site_dict = self.control_dict['obs'][obs]['site_dict']
                 if 'sat_type' in self.control_dict['obs'][obs].keys():
                     o.sat_type = self.control_dict['obs'][obs]['sat_type']
+                if 'prune_variables' in self.control_dict['obs'][obs].keys():
+                    o.prune_variables = self.control_dict['obs'][obs]['prune_variables']
                 if load_files:
                     if o.obs_type in ['sat_swath_sfc', 'sat_swath_clm', 'sat_grid_sfc',\
                                         'sat_grid_clm', 'sat_swath_prof']:
-                        o.open_sat_obs(time_interval=time_interval, control_dict=self.control_dict)
+                        o.open_sat_obs(time_interval=time_interval, control_dict=self.control_dict,
+                                       closed=closed)
                     else:
-                        o.open_obs(time_interval=time_interval, control_dict=self.control_dict)
+                        o.open_obs(time_interval=time_interval, control_dict=self.control_dict,
+                                   closed=closed)
                 self.obs[o.label] = o
 
     def setup_obs_grid(self):
@@ -1178,423 +1442,737 @@ class analysis:
                 self.obs_gridded_dataset[key + '_data'] = da_data
                 self.obs_gridded_dataset[key + '_count'] = da_count
 
-    def pair_data(self, time_interval=None):
+    def pair_data(self, time_interval=None, closed='both'):
         """Pair all observations and models in the analysis class
         (i.e., those listed in the input yaml file) together,
         populating the :attr:`paired` dict.
 
+        Each (model, obs) pairing is independent, so they can be run
+        concurrently by setting ``engine`` (``'serial'``, ``'process'`` or
+        ``'dask'``) and optionally ``n_workers`` in
+        ``analysis.pairing_kwargs``. The resulting :attr:`paired` dict
+        has the same contents and label ordering for every engine.
+
         Parameters
         ----------
         time_interval (optional, default None) : [pandas.Timestamp, pandas.Timestamp]
-            If not None, restrict pairing to datetime range spanned by time interval [start, end].
-
+            If not None, restrict pairing to datetime range spanned by time interval [start, end],
+            instead of the analysis window.
+        closed (optional, default 'both') : str
+            'both' to include the end of time_interval, 'left' to exclude it.
 
         Returns
         -------
         None
         """
         print('1, in pair data')
+        # group the (model, obs) pairings into independent tasks. Models that are
+        # averaged in place (data_proc average) are kept together in one task,
+        # since each of their pairings sees the result of the previous one.
+        task_groups = []
         for model_label in self.models:
             mod = self.models[model_label]
-            # Now we have the models we need to loop through the mapping table for each network and pair the data
-            # each paired dataset will be output to a netcdf file with 'model_label_network.nc'
-            for obs_to_pair in mod.mapping.keys():
-                # get the variables to pair from the model data (ie don't pair all data)
-                keys = [key for key in mod.mapping[obs_to_pair].keys()]
-                obs_vars = [mod.mapping[obs_to_pair][key] for key in keys]
-
-                if mod.variable_dict is not None:
-                    mod_vars = [key for key in mod.variable_dict.keys()]
-                else:
-                    mod_vars = []
+            tasks = [(model_label, obs_to_pair) for obs_to_pair in mod.mapping.keys()]
+            if mod.data_proc is not None and 'average' in mod.data_proc:
+                task_groups.append(tasks)
+            else:
+                task_groups.extend([task] for task in tasks)
+
+        engine = self.pairing_kwargs.get('engine', 'serial')
+        if engine == 'serial' or len(task_groups) < 2:
+            for tasks in task_groups:
+                for model_label, obs_to_pair in tasks:
+                    self._pair_model_obs(model_label, obs_to_pair, time_interval=time_interval, closed=closed)
+            return
+
+        n_workers = self.pairing_kwargs.get('n_workers', None)
+        if n_workers is None:
+            n_workers = os.cpu_count()
+        n_workers = max(1, min(int(n_workers), len(task_groups)))
+        subsets = [self._pairing_subset(tasks) for tasks in task_groups]
+        print(f'Pairing {len(task_groups)} tasks with engine={engine!r}, n_workers={n_workers}')
+
+        if engine == 'process':
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                futures = [executor.submit(_pair_task_group, sub, tasks, time_interval, closed)
+                           for sub, tasks in zip(subsets, task_groups)]
+                results = [future.result() for future in futures]
+        elif engine == 'dask':
+            try:
+                from dask.distributed import Client, LocalCluster
+            except ImportError as e:
+                raise ImportError("pairing_kwargs engine 'dask' requires dask.distributed") from e
+
+            try:
+                client = Client.current()
+                cluster = None
+            except ValueError:
+                cluster = LocalCluster(n_workers=n_workers, threads_per_worker=1)
+                client = Client(cluster)
+            try:
+                futures = [client.submit(_pair_task_group, sub, tasks, time_interval, closed, pure=False)
+                           for sub, tasks in zip(subsets, task_groups)]
+                results = client.gather(futures)
+            finally:
+                if cluster is not None:
+                    client.close()
+                    cluster.close()
+        else:
+            raise ValueError(f"pairing_kwargs engine must be 'serial', 'process' or 'dask', got {engine!r}")
+
+        # collect in task order so the paired labels keep the serial ordering
+        for paired, model_objs, obs_objs in results:
+            self.paired.update(paired)
+            for model_label, obj in model_objs.items():
+                self.models[model_label].obj = obj
+            for obs_label, obj in obs_objs.items():
+                self.obs[obs_label].obj = obj
+
+    def _pairing_subset(self, tasks):
+        """Shallow copy of the analysis holding only what ``tasks`` need,
+        to be shipped to a pairing worker.
+
+        Parameters
+        ----------
+        tasks : list of (str, str)
+            (model label, obs label) pairings.
+
+        Returns
+        -------
+        analysis
+        """
+        import copy
+
+        sub = copy.copy(self)
+        sub.models = {model_label: self.models[model_label] for model_label, _ in tasks}
+        sub.obs = {obs_label: self.obs[obs_label] for _, obs_label in tasks}
+        sub.paired = {}
+        sub.obs_regridders = None
+        sub.model_regridders = None
+        return sub
+
+    def _combine_da_to_points(self, mod, model_obj, new_ds_obs):
+        """Nearest neighbor model data at the points of the observations,
+        found with the cached index of the model grid (see :meth:`model.get_site_index`).
+
+        Parameters
+        ----------
+        mod : model
+            Model instance.
+        model_obj : xarray.Dataset
+            Model data to sample, on the grid of the model instance.
+        new_ds_obs : xarray.Dataset
+            Observation points, with ``latitude`` and ``longitude`` coordinates.
+
+        Returns
+        -------
+        xarray.Dataset
+            Model data at the observation points, with the observation coordinates.
+        """
+        from .util.point_pairing import combine_da_to_points
+
+        # monet combine_da_to_da, used before for these pairings, did not pass the model
+        # radius_of_influence (tuned for surface sites), so keep its default
+        return combine_da_to_points(model_obj, new_ds_obs,
+                                    site_index=mod.get_site_index(self.site_index_cache_dir),
+                                    radius_of_influence=1e6)
+
+    def _pair_model_obs(self, model_label, obs_to_pair, time_interval=None, closed='both'):
+        """Pair a single model with a single observation,
+        adding the result to the :attr:`paired` dict.
+
+        Parameters
+        ----------
+        model_label : str
+            Label of the model in :attr:`models`.
+        obs_to_pair : str
+            Label of the observation in :attr:`obs` (a key of the model mapping).
+        time_interval, closed
+            See :meth:`pair_data`.
+
+        Returns
+        -------
+        None
+        """
+        mod = self.models[model_label]
+        # the satellite pairings are restricted to the analysis window,
+        # or to the time chunk being paired (see pair_time_chunks)
+        if time_interval is None:
+            start_time, end_time = self.start_time, self.end_time
+        else:
+            start_time, end_time = pd.Timestamp(time_interval[0]), pd.Timestamp(time_interval[-1])
+        # Now we have the models we need to loop through the mapping table for each network and pair the data
+        # each paired dataset will be output to a netcdf file with 'model_label_network.nc'
+        # get the variables to pair from the model data (ie don't pair all data)
+        keys = [key for key in mod.mapping[obs_to_pair].keys()]
+        obs_vars = [mod.mapping[obs_to_pair][key] for key in keys]
+
+        if mod.variable_dict is not None:
+            mod_vars = [key for key in mod.variable_dict.keys()]
+        else:
+            mod_vars = []
+        
+        # unstructured grid check - lon/lat variables should be explicitly added 
+        # in addition to comparison variables
+        if mod.obj.attrs.get("mio_scrip_file", False):
+            lonlat_list = [ 'lon', 'lat', 'longitude', 'latitude', 'Longitude', 'Latitude' ]
+            for ll in lonlat_list:
+                if ll in mod.obj.data_vars:
+                    keys += [ll]
+
+        if mod.variable_dict is not None:
+            model_obj = mod.obj[keys+mod_vars]
+        else:
+            model_obj = mod.obj[keys]
+
+        ## TODO:  add in ability for simple addition of variables from
+
+        # simplify the objs object with the correct mapping variables
+        obs = self.obs[obs_to_pair]
+
+        # process model data if required
+        if self.models[model_label].data_proc is not None and 'average' in self.models[model_label].data_proc:
+            if self.models[model_label].data_proc['average']['start_hour'] == 'obs':
+                start_hour = obs.obj.time
+            else:
+                start_hour = self.models[model_label].data_proc['average']['start_hour']
+            model_obj = tools.average_between_hours(
+                model_obj,
+                start_hour,
+                self.models[model_label].data_proc['average']['nhours']
+            )
+            self.models[model_label].obj = model_obj
+
+        # pair the data
+        # if pt_sfc (surface point network or monitor)
+        if obs.obs_type.lower() == 'pt_sfc' or obs.obs_type.lower() == 'pandora':
+            # keep the obs in their (time, x) layout and pair with xarray only if requested
+            pairing_kws = self.pairing_kwargs.get(obs.obs_type.lower(), {})
+            use_xarray = pairing_kws.get('method', 'monet') == 'xarray' and isinstance(obs.obj, xr.Dataset)
+            if use_xarray:
+                from .util.point_pairing import pair_point_xarray
+                paired_data = pair_point_xarray(model_obj, obs.obj, radius_of_influence=mod.radius_of_influence,
+                                                site_index=mod.get_site_index(self.site_index_cache_dir))
+            else:
+                # convert this to pandas dataframe unless already done because second time paired this obs
+                if not isinstance(obs.obj, pd.DataFrame):
+                    obs.obs_to_df()
+                #Check if z dim is larger than 1. If so select, the first level as all models read through 
+                #MONETIO will be reordered such that the first level is the level nearest to the surface.
+                try:
+                    if model_obj.sizes['z'] > 1:
+                        # Select only the surface values to pair with obs.
+                        model_obj = model_obj.isel(z=0).expand_dims('z',axis=1)
+                except KeyError as e:
+                    raise Exception("MONET requires an altitude dimension named 'z'") from e
+                # now combine obs with the model at the nearest grid cell of each site
+                from .util.point_pairing import combine_point
+                paired_data = combine_point(model_obj, obs.obj, radius_of_influence=mod.radius_of_influence,
+                                            suffix=mod.label, site_index=mod.get_site_index(self.site_index_cache_dir))
+            if self.debug:
+                print('After pairing: ', paired_data)
+            # combine_point outputs a pandas dataframe.  Convert this to xarray obj
+            p = pair()
+            print('saving pair')
+            p.obs = obs.label
+            p.model = mod.label
+            p.model_vars = keys
+            p.obs_vars = obs_vars
+            p.filename = '{}_{}.nc'.format(p.obs, p.model)
+            label = "{}_{}".format(p.obs, p.model)
+            self.paired[label] = p
+            if use_xarray:
+                p.obj = paired_data
+            else:
+                p.obj = paired_data.monet._df_to_da()
+                p.obj = p.fix_paired_xarray(dset=p.obj)
+            # write_util.write_ncf(p.obj,p.filename) # write out to file
+            
+        # if aircraft (aircraft observation)
+        elif obs.obs_type.lower() == 'aircraft':
+            from .util.tools import vert_interp
+            # convert this to pandas dataframe unless already done because second time paired this obs
+            if not isinstance(obs.obj, pd.DataFrame):
+                obs.obj = obs.obj.to_dataframe()
+            
+            #drop any variables where coords NaN
+            obs.obj = obs.obj.reset_index().dropna(subset=['pressure_obs','latitude','longitude']).set_index('time')
+            
+            # do the facy trick to convert to get something useful for MONET
+            # this converts to dimensions of x and y
+            # you may want to make pressure / msl a coordinate too
+            new_ds_obs = obs.obj.rename_axis('time_obs').reset_index().monet._df_to_da().set_coords(['time_obs','pressure_obs'])
+            
+            #Nearest neighbor approach to find closest grid cell to each point.
+            ds_model = self._combine_da_to_points(mod, model_obj, new_ds_obs)
+            #Interpolate based on time in the observations
+            ds_model = ds_model.interp(time=ds_model.time_obs.squeeze())
+
+            # Debugging: Print the variables in ds_model to verify 'pressure_model' is included  ##qzr++
+            #print("Variables in ds_model after combine_da_to_da and interp:", ds_model.variables)
+            
+            # Ensure 'pressure_model' is included in ds_model (checked it exists)
+            #if 'pressure_model' not in ds_model:
+             #   raise KeyError("'pressure_model' is missing in the model dataset")   #qzr++
+            
+            paired_data = vert_interp(ds_model,obs.obj,keys+mod_vars)
+            print('After pairing: ', paired_data)
+
+            # Ensure 'pressure_model' is included in the DataFrame (pairdf) #qzr++
+            #if 'pressure_model' not in paired_data.columns:
+               # raise KeyError("'pressure_model' is missing in the paired_data")   #qzr++
+
+              
+            
+            # this outputs as a pandas dataframe.  Convert this to xarray obj
+            p = pair()
+            p.type = 'aircraft'
+            p.radius_of_influence = None
+            p.obs = obs.label
+            p.model = mod.label
+            p.model_vars = keys
+            p.obs_vars = obs_vars
+            p.filename = '{}_{}.nc'.format(p.obs, p.model)
+            p.obj = paired_data.set_index('time').to_xarray().expand_dims('x').transpose('time','x')
+            label = "{}_{}".format(p.obs, p.model)
+            self.paired[label] = p
+            # write_util.write_ncf(p.obj,p.filename) # write out to file
+
+        elif obs.obs_type.lower() == 'sonde':
+            from .util.tools import vert_interp
+            # convert this to pandas dataframe unless already done because second time paired this obs
+            if not isinstance(obs.obj, pd.DataFrame):
+                obs.obj = obs.obj.to_dataframe()
+            #drop any variables where coords NaN
+            obs.obj = obs.obj.reset_index().dropna(subset=['pressure_obs','latitude','longitude']).set_index('time')
+ 
+            import datetime 
+            plot_dict_sonde = self.control_dict['plots']
+            for grp_sonde, grp_dict_sonde in plot_dict_sonde.items():
+                plot_type_sonde = grp_dict_sonde['type']
+                plot_sonde_type_list_all = ['vertical_single_date','vertical_boxplot_os','density_scatter_plot_os']
+                if plot_type_sonde in plot_sonde_type_list_all:
+                   station_name_sonde = grp_dict_sonde['station_name']
+                   cds_sonde = grp_dict_sonde['compare_date_single']
+                   obs.obj=obs.obj.loc[obs.obj['station']==station_name_sonde[0]]
+                   obs.obj=obs.obj.loc[datetime.datetime(
+                       cds_sonde[0],cds_sonde[1],cds_sonde[2],cds_sonde[3],cds_sonde[4],cds_sonde[5])]
+                   break
+           
+            # do the facy trick to convert to get something useful for MONET
+            # this converts to dimensions of x and y
+            # you may want to make pressure / msl a coordinate too
+            new_ds_obs = obs.obj.rename_axis('time_obs').reset_index().monet._df_to_da().set_coords(['time_obs','pressure_obs'])
+            #Nearest neighbor approach to find closest grid cell to each point.
+            ds_model = self._combine_da_to_points(mod, model_obj, new_ds_obs)
+            #Interpolate based on time in the observations
+            ds_model = ds_model.interp(time=ds_model.time_obs.squeeze())
+            paired_data = vert_interp(ds_model,obs.obj,keys+mod_vars)
+            print('In pair function, After pairing: ', paired_data)
+            # this outputs as a pandas dataframe.  Convert this to xarray obj
+            p = pair()
+            p.type = 'sonde'
+            p.radius_of_influence = None
+            p.obs = obs.label
+            p.model = mod.label
+            p.model_vars = keys
+            p.obs_vars = obs_vars
+            p.filename = '{}_{}.nc'.format(p.obs, p.model)
+            p.obj = paired_data.set_index('time').to_xarray().expand_dims('x').transpose('time','x')
+            label = "{}_{}".format(p.obs, p.model)
+            self.paired[label] = p
+
+            # write_util.write_ncf(p.obj,p.filename) # write out to file 
+        # If mobile surface data or single ground site surface data
+        elif obs.obs_type.lower() == 'mobile' or obs.obs_type.lower() == 'ground':
+            from .util.tools import mobile_and_ground_pair
+            # convert this to pandas dataframe unless already done because second time paired this obs
+            if not isinstance(obs.obj, pd.DataFrame):
+                obs.obj = obs.obj.to_dataframe()
+            
+            #drop any variables where coords NaN
+            obs.obj = obs.obj.reset_index().dropna(subset=['latitude','longitude']).set_index('time')
+            
+            # do the facy trick to convert to get something useful for MONET
+            # this converts to dimensions of x and y
+            # you may want to make pressure / msl a coordinate too
+            new_ds_obs = obs.obj.rename_axis('time_obs').reset_index().monet._df_to_da().set_coords(['time_obs'])
+            
+            #Nearest neighbor approach to find closest grid cell to each point.
+            ds_model = self._combine_da_to_points(mod, model_obj, new_ds_obs)
+            #Interpolate based on time in the observations
+            ds_model = ds_model.interp(time=ds_model.time_obs.squeeze())
+            
+            paired_data = mobile_and_ground_pair(ds_model,obs.obj,keys+mod_vars)
+            print('After pairing: ', paired_data)
+            # this outputs as a pandas dataframe.  Convert this to xarray obj
+            p = pair()
+            if obs.obs_type.lower() == 'mobile':
+                p.type = 'mobile'
+            elif obs.obs_type.lower() == 'ground':
+                p.type = 'ground'
+            p.radius_of_influence = None
+            p.obs = obs.label
+            p.model = mod.label
+            p.model_vars = keys
+            p.obs_vars = obs_vars
+            p.filename = '{}_{}.nc'.format(p.obs, p.model)
+            p.obj = paired_data.set_index('time').to_xarray().expand_dims('x').transpose('time','x')
+            label = "{}_{}".format(p.obs, p.model)
+            self.paired[label] = p
+        
+        # TODO: add other network types / data types where (ie flight, satellite etc)
+        # if sat_swath_clm (satellite l2 column products)
+        elif obs.obs_type.lower() == 'sat_swath_clm':
+            # grab kwargs for pairing. Use default if not specified
+            pairing_kws = {'apply_ak':True,'mod_to_overpass':False}
+            for key in self.pairing_kwargs.get(obs.obs_type.lower(), {}):
+                pairing_kws[key] = self.pairing_kwargs[obs.obs_type.lower()][key]
+            if 'apply_ak' not in self.pairing_kwargs.get(obs.obs_type.lower(), {}):
+                print('WARNING: The satellite pairing option apply_ak is being set to True because it was not specified in the YAML. Pairing will fail if there is no AK available.')
+            
+            if obs.sat_type == 'omps_nm':
+                
+                from .util import satellite_utilities as sutil
                 
-                # unstructured grid check - lon/lat variables should be explicitly added 
-                # in addition to comparison variables
-                if mod.obj.attrs.get("mio_scrip_file", False):
-                    lonlat_list = [ 'lon', 'lat', 'longitude', 'latitude', 'Longitude', 'Latitude' ]
-                    for ll in lonlat_list:
-                        if ll in mod.obj.data_vars:
-                            keys += [ll]
-
-                if mod.variable_dict is not None:
-                    model_obj = mod.obj[keys+mod_vars]
+                # necessary observation index things 
+                ## the along track coordinate dim sometimes needs to be time and other times an unassigned 'x'
+                if 'time' in obs.obj.dims:
+                    obs.obj = _select_time_interval(obs.obj, [start_time, end_time], closed)
+                    obs.obj = obs.obj.swap_dims({'time':'x'})
+                if pairing_kws['apply_ak'] is True:
+                    model_obj = mod.obj[keys+['pres_pa_mid','surfpres_pa']]
+                    
+                    paired_data = sutil.omps_nm_pairing_apriori(model_obj,obs.obj,keys)
+                else:
+                    model_obj = mod.obj[keys+['dp_pa']]
+                    paired_data = sutil.omps_nm_pairing(model_obj,obs.obj,keys)
+
+                paired_data = paired_data.where(paired_data.ozone_column.notnull())
+                p = pair()
+                p.type = obs.obs_type
+                p.obs = obs.label
+                p.model = mod.label
+                p.model_vars = keys
+                p.obs_vars = obs_vars
+                p.obj = paired_data 
+                label = '{}_{}'.format(p.obs,p.model)
+                self.paired[label] = p
+
+            if obs.sat_type == 'tropomi_l2_no2':
+                from .util import sat_l2_swath_utility as no2util
+                from .util import satellite_utilities as sutil
+
+                # calculate model no2 trop. columns. M.Li
+                # to fix the "time" duplicate error
+                model_obj = mod.obj
+                i_no2_varname = [i for i,x in enumerate(obs_vars) if x == 'nitrogendioxide_tropospheric_column']
+                if len(i_no2_varname) > 1:
+                    print('The TROPOMI NO2 variable is matched to more than one model variable.')
+                    print('Pairing is being done for model variable: '+keys[i_no2_varname[0]])
+                no2_varname = keys[i_no2_varname[0]]
+
+                if pairing_kws['mod_to_overpass']:
+                    print('sampling model to 13:30 local overpass time')
+                    overpass_datetime = pd.date_range(start_time.replace(hour=13,minute=30),
+                                                      end_time.replace(hour=13,minute=30),freq='D')
+                    if closed == 'left':
+                        # the last day is paired in the next time chunk
+                        overpass_datetime = overpass_datetime[:-1]
+                    model_obj = sutil.mod_to_overpasstime(model_obj,overpass_datetime,partial_col=no2_varname)
+                    # enforce dimension order is time, z, y, x
+                    model_obj = model_obj.transpose('time','z','y','x',...)
                 else:
-                    model_obj = mod.obj[keys]
+                    print('Warning: The pairing_kwarg mod_to_overpass is False.')
+                    print('Pairing will proceed assuming that the model data is already at overpass time.')
+                    from .util.tools import calc_partialcolumn
+                    model_obj[f'{no2_varname}_col'] = calc_partialcolumn(model_obj,var=no2_varname)
+                gridding_method = pairing_kws.get('gridding_method', 'bilinear')
+                if pairing_kws['apply_ak'] is True:
+                    paired_data = no2util.trp_interp_swatogrd_ak(obs.obj, model_obj,no2varname=no2_varname,method=gridding_method)
+                else:
+                    paired_data = no2util.trp_interp_swatogrd(obs.obj, model_obj, no2varname=no2_varname,method=gridding_method)
 
-                ## TODO:  add in ability for simple addition of variables from
 
-                # simplify the objs object with the correct mapping variables
-                obs = self.obs[obs_to_pair]
+                p = pair()
 
-                # process model data if required
-                if self.models[model_label].data_proc is not None and 'average' in self.models[model_label].data_proc:
-                    if self.models[model_label].data_proc['average']['start_hour'] == 'obs':
-                        start_hour = obs.obj.time
-                    else:
-                        start_hour = self.models[model_label].data_proc['average']['start_hour']
-                    model_obj = tools.average_between_hours(
-                        model_obj,
-                        start_hour,
-                        self.models[model_label].data_proc['average']['nhours']
-                    )
-                    self.models[model_label].obj = model_obj
-
-                # pair the data
-                # if pt_sfc (surface point network or monitor)
-                if obs.obs_type.lower() == 'pt_sfc' or obs.obs_type.lower() == 'pandora':
-                    # convert this to pandas dataframe unless already done because second time paired this obs
-                    if not isinstance(obs.obj, pd.DataFrame):
-                        obs.obs_to_df()
-                    #Check if z dim is larger than 1. If so select, the first level as all models read through 
-                    #MONETIO will be reordered such that the first level is the level nearest to the surface.
-                    try:
-                        if model_obj.sizes['z'] > 1:
-                            # Select only the surface values to pair with obs.
-                            model_obj = model_obj.isel(z=0).expand_dims('z',axis=1)
-                    except KeyError as e:
-                        raise Exception("MONET requires an altitude dimension named 'z'") from e
-                    # now combine obs with
-                    paired_data = model_obj.monet.combine_point(obs.obj, radius_of_influence=mod.radius_of_influence, suffix=mod.label)
-                    if self.debug:
-                        print('After pairing: ', paired_data)
-                    # this outputs as a pandas dataframe.  Convert this to xarray obj
-                    p = pair()
-                    print('saving pair')
-                    p.obs = obs.label
-                    p.model = mod.label
-                    p.model_vars = keys
-                    p.obs_vars = obs_vars
-                    p.filename = '{}_{}.nc'.format(p.obs, p.model)
-                    p.obj = paired_data.monet._df_to_da()
-                    label = "{}_{}".format(p.obs, p.model)
-                    self.paired[label] = p
-                    p.obj = p.fix_paired_xarray(dset=p.obj)
-                    # write_util.write_ncf(p.obj,p.filename) # write out to file
-                    
-                # if aircraft (aircraft observation)
-                elif obs.obs_type.lower() == 'aircraft':
-                    from .util.tools import vert_interp
-                    # convert this to pandas dataframe unless already done because second time paired this obs
-                    if not isinstance(obs.obj, pd.DataFrame):
-                        obs.obj = obs.obj.to_dataframe()
-                    
-                    #drop any variables where coords NaN
-                    obs.obj = obs.obj.reset_index().dropna(subset=['pressure_obs','latitude','longitude']).set_index('time')
-                    
-                    # do the facy trick to convert to get something useful for MONET
-                    # this converts to dimensions of x and y
-                    # you may want to make pressure / msl a coordinate too
-                    new_ds_obs = obs.obj.rename_axis('time_obs').reset_index().monet._df_to_da().set_coords(['time_obs','pressure_obs'])
-                    
-                    #Nearest neighbor approach to find closest grid cell to each point.
-                    ds_model = m.util.combinetool.combine_da_to_da(model_obj,new_ds_obs,merge=False)
-                    #Interpolate based on time in the observations
-                    ds_model = ds_model.interp(time=ds_model.time_obs.squeeze())
+                paired_data_cp = _select_time_interval(paired_data, [start_time.date(), end_time.date()], closed).copy()
 
-                    # Debugging: Print the variables in ds_model to verify 'pressure_model' is included  ##qzr++
-                    #print("Variables in ds_model after combine_da_to_da and interp:", ds_model.variables)
-                    
-                    # Ensure 'pressure_model' is included in ds_model (checked it exists)
-                    #if 'pressure_model' not in ds_model:
-                     #   raise KeyError("'pressure_model' is missing in the model dataset")   #qzr++
-                    
-                    paired_data = vert_interp(ds_model,obs.obj,keys+mod_vars)
-                    print('After pairing: ', paired_data)
+                p.type = obs.obs_type
+                p.obs = obs.label
+                p.model = mod.label
+                p.model_vars = keys
+                p.obs_vars = obs_vars
+                p.obj = paired_data_cp 
+                label = '{}_{}'.format(p.obs,p.model)
 
-                    # Ensure 'pressure_model' is included in the DataFrame (pairdf) #qzr++
-                    #if 'pressure_model' not in paired_data.columns:
-                       # raise KeyError("'pressure_model' is missing in the paired_data")   #qzr++
+                self.paired[label] = p
 
-                      
-                    
-                    # this outputs as a pandas dataframe.  Convert this to xarray obj
-                    p = pair()
-                    p.type = 'aircraft'
-                    p.radius_of_influence = None
-                    p.obs = obs.label
-                    p.model = mod.label
-                    p.model_vars = keys
-                    p.obs_vars = obs_vars
-                    p.filename = '{}_{}.nc'.format(p.obs, p.model)
-                    p.obj = paired_data.set_index('time').to_xarray().expand_dims('x').transpose('time','x')
-                    label = "{}_{}".format(p.obs, p.model)
-                    self.paired[label] = p
-                    # write_util.write_ncf(p.obj,p.filename) # write out to file
-
-                elif obs.obs_type.lower() == 'sonde':
-                    from .util.tools import vert_interp
-                    # convert this to pandas dataframe unless already done because second time paired this obs
-                    if not isinstance(obs.obj, pd.DataFrame):
-                        obs.obj = obs.obj.to_dataframe()
-                    #drop any variables where coords NaN
-                    obs.obj = obs.obj.reset_index().dropna(subset=['pressure_obs','latitude','longitude']).set_index('time')
- 
-                    import datetime 
-                    plot_dict_sonde = self.control_dict['plots']
-                    for grp_sonde, grp_dict_sonde in plot_dict_sonde.items():
-                        plot_type_sonde = grp_dict_sonde['type']
-                        plot_sonde_type_list_all = ['vertical_single_date','vertical_boxplot_os','density_scatter_plot_os']
-                        if plot_type_sonde in plot_sonde_type_list_all:
-                           station_name_sonde = grp_dict_sonde['station_name']
-                           cds_sonde = grp_dict_sonde['compare_date_single']
-                           obs.obj=obs.obj.loc[obs.obj['station']==station_name_sonde[0]]
-                           obs.obj=obs.obj.loc[datetime.datetime(
-                               cds_sonde[0],cds_sonde[1],cds_sonde[2],cds_sonde[3],cds_sonde[4],cds_sonde[5])]
-                           break
-                   
-                    # do the facy trick to convert to get something useful for MONET
-                    # this converts to dimensions of x and y
-                    # you may want to make pressure / msl a coordinate too
-                    new_ds_obs = obs.obj.rename_axis('time_obs').reset_index().monet._df_to_da().set_coords(['time_obs','pressure_obs'])
-                    #Nearest neighbor approach to find closest grid cell to each point.
-                    ds_model = m.util.combinetool.combine_da_to_da(model_obj,new_ds_obs,merge=False)
-                    #Interpolate based on time in the observations
-                    ds_model = ds_model.interp(time=ds_model.time_obs.squeeze())
-                    paired_data = vert_interp(ds_model,obs.obj,keys+mod_vars)
-                    print('In pair function, After pairing: ', paired_data)
-                    # this outputs as a pandas dataframe.  Convert this to xarray obj
-                    p = pair()
-                    p.type = 'sonde'
-                    p.radius_of_influence = None
-                    p.obs = obs.label
-                    p.model = mod.label
-                    p.model_vars = keys
-                    p.obs_vars = obs_vars
-                    p.filename = '{}_{}.nc'.format(p.obs, p.model)
-                    p.obj = paired_data.set_index('time').to_xarray().expand_dims('x').transpose('time','x')
-                    label = "{}_{}".format(p.obs, p.model)
-                    self.paired[label] = p
+            if 'tempo_l2' in obs.sat_type:
+                from .util import sat_l2_swath_utility_tempo as sutil
 
-                    # write_util.write_ncf(p.obj,p.filename) # write out to file 
-                # If mobile surface data or single ground site surface data
-                elif obs.obs_type.lower() == 'mobile' or obs.obs_type.lower() == 'ground':
-                    from .util.tools import mobile_and_ground_pair
-                    # convert this to pandas dataframe unless already done because second time paired this obs
-                    if not isinstance(obs.obj, pd.DataFrame):
-                        obs.obj = obs.obj.to_dataframe()
-                    
-                    #drop any variables where coords NaN
-                    obs.obj = obs.obj.reset_index().dropna(subset=['latitude','longitude']).set_index('time')
-                    
-                    # do the facy trick to convert to get something useful for MONET
-                    # this converts to dimensions of x and y
-                    # you may want to make pressure / msl a coordinate too
-                    new_ds_obs = obs.obj.rename_axis('time_obs').reset_index().monet._df_to_da().set_coords(['time_obs'])
-                    
-                    #Nearest neighbor approach to find closest grid cell to each point.
-                    ds_model = m.util.combinetool.combine_da_to_da(model_obj,new_ds_obs,merge=False)
-                    #Interpolate based on time in the observations
-                    ds_model = ds_model.interp(time=ds_model.time_obs.squeeze())
+                if obs.sat_type == 'tempo_l2_no2':
+                    sat_sp = 'NO2'
+                    sp = 'vertical_column_troposphere'
+                    key = "tempo_l2_no2"
+                elif obs.sat_type == 'tempo_l2_hcho':
+                    sat_sp = 'HCHO'
+                    sp = 'vertical_column'
+                    key = "tempo_l2_hcho"
+                else:
+                    raise KeyError(f" You asked for {obs.sat_type}. "
+                                   + "Only NO2 and HCHO L2 data have been implemented")
+                mod_sp = [
+                    k_sp for k_sp, v in mod.mapping[key].items() if v == sp
+                ]
+
+                regrid_method = obs.regrid_method if obs.regrid_method is not None else "bilinear"
+                paired_data_atswath = sutil.regrid_and_apply_weights(
+                    obs.obj, mod.obj, species=mod_sp, method=regrid_method, tempo_sp=sat_sp,
+                    n_workers=pairing_kws.get('granule_workers', 1)
+                )
+                paired_data_atgrid = sutil.back_to_modgrid_multiscan(
+                    paired_data_atswath, model_obj,
+                    method=pairing_kws.get('gridding_method', regrid_method)
+                )
+
+                p = pair()
+
+                paired_data = _select_time_interval(paired_data_atgrid, [start_time, end_time], closed)
+
+                p.type = obs.obs_type
+                p.obs = obs.label
+                p.model = mod.label
+                p.model_vars = keys
+                p.obs_vars = obs_vars
+                p.obj = paired_data
+                label = "{}_{}".format(p.obs,p.model)
+                p.filename = "{}.nc".format(label)
+
+                self.paired[label] = p
+                
+        # if sat_grid_clm (satellite l3 column products)
+        elif obs.obs_type.lower() == 'sat_grid_clm':
+            # grab kwargs for pairing. Use default if not specified
+            pairing_kws = {'apply_ak':True,'mod_to_overpass':False}
+            for key in self.pairing_kwargs.get(obs.obs_type.lower(), {}):
+                pairing_kws[key] = self.pairing_kwargs[obs.obs_type.lower()][key]
+            if 'apply_ak' not in self.pairing_kwargs[obs.obs_type.lower()]:
+                print('WARNING: The satellite pairing option apply_ak is being set to True because it was not specified in the YAML. Pairing will fail if there is no AK available.')
+            if len(keys) > 1: 
+                print('Caution: More than 1 variable is included in mapping keys.')
+                print('Pairing code is calculating a column for {}'.format(keys[0])) 
+            if obs.sat_type == 'omps_l3':
+                from .util import satellite_utilities as sutil
+                # trim obs array to only data within analysis window
+                obs_dat = _select_time_interval(obs.obj, [start_time.date(), end_time.date()], closed)#.copy()
+                mod_dat = _select_time_interval(mod.obj, [start_time.date(), end_time.date()], closed)
+                paired_obsgrid = sutil.omps_l3_daily_o3_pairing(mod_dat,obs_dat,keys[0])
+               
+                p = pair()
+                p.type = obs.obs_type
+                p.obs = obs.label
+                p.model = mod.label
+                p.model_vars = keys
+                p.obs_vars = obs_vars
+                p.obj = paired_obsgrid
+                label = '{}_{}'.format(p.obs,p.model)
+                self.paired[label] = p
+
+            elif obs.sat_type == 'mopitt_l3':
+                from .util import satellite_utilities as sutil
+                
+                if pairing_kws['apply_ak']: 
+                    model_obj = mod.obj[keys+['pres_pa_mid']]
                     
-                    paired_data = mobile_and_ground_pair(ds_model,obs.obj,keys+mod_vars)
-                    print('After pairing: ', paired_data)
-                    # this outputs as a pandas dataframe.  Convert this to xarray obj
+                    # Sample model to observation overpass time
+                    if pairing_kws['mod_to_overpass']:
+                        print('sampling model to 10:30 local overpass time')
+                        overpass_datetime = pd.date_range(start_time.replace(hour=10,minute=30),
+                                                          end_time.replace(hour=10,minute=30),freq='D')
+                        if closed == 'left':
+                            overpass_datetime = overpass_datetime[:-1]
+                        model_obj = sutil.mod_to_overpasstime(model_obj,overpass_datetime)
+                    # trim to only data within analysis window, as averaging kernels can't be applied outside it
+                    obs_dat = _select_time_interval(obs.obj, [start_time.date(), end_time.date()], closed)
+                    model_obj = _select_time_interval(model_obj, [start_time.date(), end_time.date()], closed)
+                    # interpolate model to observation, calculate column with averaging kernels applied
+                    paired = sutil.mopitt_l3_pairing(model_obj,obs_dat,keys[0],global_model=mod.is_global)
                     p = pair()
-                    if obs.obs_type.lower() == 'mobile':
-                        p.type = 'mobile'
-                    elif obs.obs_type.lower() == 'ground':
-                        p.type = 'ground'
-                    p.radius_of_influence = None
+                    p.type = obs.obs_type
                     p.obs = obs.label
                     p.model = mod.label
                     p.model_vars = keys
+                    p.model_vars[0] += '_column_model'
                     p.obs_vars = obs_vars
-                    p.filename = '{}_{}.nc'.format(p.obs, p.model)
-                    p.obj = paired_data.set_index('time').to_xarray().expand_dims('x').transpose('time','x')
-                    label = "{}_{}".format(p.obs, p.model)
+                    p.obj = paired
+                    label ='{}_{}'.format(p.obs,p.model)
                     self.paired[label] = p
-                
-                # TODO: add other network types / data types where (ie flight, satellite etc)
-                # if sat_swath_clm (satellite l2 column products)
-                elif obs.obs_type.lower() == 'sat_swath_clm':
-                    # grab kwargs for pairing. Use default if not specified
-                    pairing_kws = {'apply_ak':True,'mod_to_overpass':False}
-                    for key in self.pairing_kwargs.get(obs.obs_type.lower(), {}):
-                        pairing_kws[key] = self.pairing_kwargs[obs.obs_type.lower()][key]
-                    if 'apply_ak' not in self.pairing_kwargs.get(obs.obs_type.lower(), {}):
-                        print('WARNING: The satellite pairing option apply_ak is being set to True because it was not specified in the YAML. Pairing will fail if there is no AK available.')
-                    
-                    if obs.sat_type == 'omps_nm':
-                        
-                        from .util import satellite_utilities as sutil
-                        
-                        # necessary observation index things 
-                        ## the along track coordinate dim sometimes needs to be time and other times an unassigned 'x'
-                        if 'time' in obs.obj.dims:
-                            obs.obj = obs.obj.sel(time=slice(self.start_time,self.end_time))
-                            obs.obj = obs.obj.swap_dims({'time':'x'})
-                        if pairing_kws['apply_ak'] is True:
-                            model_obj = mod.obj[keys+['pres_pa_mid','surfpres_pa']]
-                            
-                            paired_data = sutil.omps_nm_pairing_apriori(model_obj,obs.obj,keys)
-                        else:
-                            model_obj = mod.obj[keys+['dp_pa']]
-                            paired_data = sutil.omps_nm_pairing(model_obj,obs.obj,keys)
-
-                        paired_data = paired_data.where(paired_data.ozone_column.notnull())
-                        p = pair()
-                        p.type = obs.obs_type
-                        p.obs = obs.label
-                        p.model = mod.label
-                        p.model_vars = keys
-                        p.obs_vars = obs_vars
-                        p.obj = paired_data 
-                        label = '{}_{}'.format(p.obs,p.model)
-                        self.paired[label] = p
-
-                    if obs.sat_type == 'tropomi_l2_no2':
-                        from .util import sat_l2_swath_utility as no2util
-                        from .util import satellite_utilities as sutil
-
-                        # calculate model no2 trop. columns. M.Li
-                        # to fix the "time" duplicate error
-                        model_obj = mod.obj
-                        i_no2_varname = [i for i,x in enumerate(obs_vars) if x == 'nitrogendioxide_tropospheric_column']
-                        if len(i_no2_varname) > 1:
-                            print('The TROPOMI NO2 variable is matched to more than one model variable.')
-                            print('Pairing is being done for model variable: '+keys[i_no2_varname[0]])
-                        no2_varname = keys[i_no2_varname[0]]
-
-                        if pairing_kws['mod_to_overpass']:
-                            print('sampling model to 13:30 local overpass time')
-                            overpass_datetime = pd.date_range(self.start_time.replace(hour=13,minute=30),
-                                                              self.end_time.replace(hour=13,minute=30),freq='D')
-                            model_obj = sutil.mod_to_overpasstime(model_obj,overpass_datetime,partial_col=no2_varname)
-                            # enforce dimension order is time, z, y, x
-                            model_obj = model_obj.transpose('time','z','y','x',...)
-                        else:
-                            print('Warning: The pairing_kwarg mod_to_overpass is False.')
-                            print('Pairing will proceed assuming that the model data is already at overpass time.')
-                            from .util.tools import calc_partialcolumn
-                            model_obj[f'{no2_varname}_col'] = calc_partialcolumn(model_obj,var=no2_varname)
-                        if pairing_kws['apply_ak'] is True:
-                            paired_data = no2util.trp_interp_swatogrd_ak(obs.obj, model_obj,no2varname=no2_varname)
-                        else:
-                            paired_data = no2util.trp_interp_swatogrd(obs.obj, model_obj, no2varname=no2_varname)
+                else:
+                    print("Pairing without averaging kernel has not been enabled for this dataset")
+
+    def _chunk_manifest_name(self, time_interval):
+        """Path of the manifest of one time chunk (see :meth:`pair_time_chunks`).
+
+        Parameters
+        ----------
+        time_interval : [pandas.Timestamp, pandas.Timestamp]
+            Time interval [start, end] of the chunk.
 
+        Returns
+        -------
+        str
+        """
+        return os.path.join(
+            self.chunk_dir, 'manifest_{}_{}.json'.format(
+                time_interval[0].strftime('%Y%m%d%H%M'), time_interval[1].strftime('%Y%m%d%H%M')))
 
-                        p = pair()
+    def _chunk_config_hash(self):
+        """Hash of the parts of the control file that the paired data depends on
+        (the model sections with their mapping, the obs sections and the pairing kwargs),
+        stored in the chunk manifests so that chunks paired with another configuration are redone.
 
-                        paired_data_cp = paired_data.sel(time=slice(self.start_time.date(),self.end_time.date())).copy()
+        Returns
+        -------
+        str
+        """
+        import hashlib
+        import json
 
-                        p.type = obs.obs_type
-                        p.obs = obs.label
-                        p.model = mod.label
-                        p.model_vars = keys
-                        p.obs_vars = obs_vars
-                        p.obj = paired_data_cp 
-                        label = '{}_{}'.format(p.obs,p.model)
+        config = {
+            'model': self.control_dict.get('model'),
+            'obs': self.control_dict.get('obs'),
+            'pairing_kwargs': self.control_dict['analysis'].get('pairing_kwargs'),
+        }
+        return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
 
-                        self.paired[label] = p
+    def _read_chunk_manifest(self, time_interval):
+        """Manifest of a finished time chunk (see :meth:`pair_time_chunks`).
 
-                    if 'tempo_l2' in obs.sat_type:
-                        from .util import sat_l2_swath_utility_tempo as sutil
+        Parameters
+        ----------
+        time_interval : [pandas.Timestamp, pandas.Timestamp]
+            Time interval [start, end] of the chunk.
 
-                        if obs.sat_type == 'tempo_l2_no2':
-                            sat_sp = 'NO2'
-                            sp = 'vertical_column_troposphere'
-                            key = "tempo_l2_no2"
-                        elif obs.sat_type == 'tempo_l2_hcho':
-                            sat_sp = 'HCHO'
-                            sp = 'vertical_column'
-                            key = "tempo_l2_hcho"
-                        else:
-                            raise KeyError(f" You asked for {obs.sat_type}. "
-                                           + "Only NO2 and HCHO L2 data have been implemented")
-                        mod_sp = [
-                            k_sp for k_sp, v in mod.mapping[key].items() if v == sp
-                        ]
-
-                        regrid_method = obs.regrid_method if obs.regrid_method is not None else "bilinear"
-                        paired_data_atswath = sutil.regrid_and_apply_weights(
-                            obs.obj, mod.obj, species=mod_sp, method=regrid_method, tempo_sp=sat_sp
-                        )
-                        paired_data_atgrid = sutil.back_to_modgrid_multiscan(
-                            paired_data_atswath, model_obj, method=regrid_method
-                        )
-
-                        p = pair()
-
-                        paired_data = paired_data_atgrid.sel(time=slice(self.start_time, self.end_time))
-
-                        p.type = obs.obs_type
-                        p.obs = obs.label
-                        p.model = mod.label
-                        p.model_vars = keys
-                        p.obs_vars = obs_vars
-                        p.obj = paired_data
-                        label = "{}_{}".format(p.obs,p.model)
-                        p.filename = "{}.nc".format(label)
-
-                        self.paired[label] = p
-                        
-                # if sat_grid_clm (satellite l3 column products)
-                elif obs.obs_type.lower() == 'sat_grid_clm':
-                    # grab kwargs for pairing. Use default if not specified
-                    pairing_kws = {'apply_ak':True,'mod_to_overpass':False}
-                    for key in self.pairing_kwargs.get(obs.obs_type.lower(), {}):
-                        pairing_kws[key] = self.pairing_kwargs[obs.obs_type.lower()][key]
-                    if 'apply_ak' not in self.pairing_kwargs[obs.obs_type.lower()]:
-                        print('WARNING: The satellite pairing option apply_ak is being set to True because it was not specified in the YAML. Pairing will fail if there is no AK available.')
-                    if len(keys) > 1: 
-                        print('Caution: More than 1 variable is included in mapping keys.')
-                        print('Pairing code is calculating a column for {}'.format(keys[0])) 
-                    if obs.sat_type == 'omps_l3':
-                        from .util import satellite_utilities as sutil
-                        # trim obs array to only data within analysis window
-                        obs_dat = obs.obj.sel(time=slice(self.start_time.date(),self.end_time.date()))#.copy()
-                        mod_dat = mod.obj.sel(time=slice(self.start_time.date(),self.end_time.date()))
-                        paired_obsgrid = sutil.omps_l3_daily_o3_pairing(mod_dat,obs_dat,keys[0])
-                       
-                        p = pair()
-                        p.type = obs.obs_type
-                        p.obs = obs.label
-                        p.model = mod.label
-                        p.model_vars = keys
-                        p.obs_vars = obs_vars
-                        p.obj = paired_obsgrid
-                        label = '{}_{}'.format(p.obs,p.model)
-                        self.paired[label] = p
-
-                    elif obs.sat_type == 'mopitt_l3':
-                        from .util import satellite_utilities as sutil
-                        
-                        if pairing_kws['apply_ak']: 
-                            model_obj = mod.obj[keys+['pres_pa_mid']]
-                            
-                            # Sample model to observation overpass time
-                            if pairing_kws['mod_to_overpass']:
-                                print('sampling model to 10:30 local overpass time')
-                                overpass_datetime = pd.date_range(self.start_time.replace(hour=10,minute=30),
-                                                                  self.end_time.replace(hour=10,minute=30),freq='D')
-                                model_obj = sutil.mod_to_overpasstime(model_obj,overpass_datetime)
-                            # trim to only data within analysis window, as averaging kernels can't be applied outside it
-                            obs_dat = obs.obj.sel(time=slice(self.start_time.date(),self.end_time.date()))
-                            model_obj = model_obj.sel(time=slice(self.start_time.date(),self.end_time.date()))
-                            # interpolate model to observation, calculate column with averaging kernels applied
-                            paired = sutil.mopitt_l3_pairing(model_obj,obs_dat,keys[0],global_model=mod.is_global)
-                            p = pair()
-                            p.type = obs.obs_type
-                            p.obs = obs.label
-                            p.model = mod.label
-                            p.model_vars = keys
-                            p.model_vars[0] += '_column_model'
-                            p.obs_vars = obs_vars
-                            p.obj = paired
-                            label ='{}_{}'.format(p.obs,p.model)
-                            self.paired[label] = p
-                        else:
-                            print("Pairing without averaging kernel has not been enabled for this dataset")
+        Returns
+        -------
+        dict or None
+            None if the chunk has not been paired, or was paired with another configuration.
+        """
+        import json
+
+        manifest_name = self._chunk_manifest_name(time_interval)
+        if not os.path.isfile(manifest_name):
+            return None
+        with open(manifest_name) as f:
+            manifest = json.load(f)
+        if manifest.get('config') != self._chunk_config_hash():
+            print('Time chunk {} - {} was paired with another model/obs configuration'.format(*time_interval))
+            return None
+        return manifest
+
+    def pair_time_chunks(self, resume=True):
+        """Open, pair, save and release the models and observations
+        one time interval (:attr:`time_intervals`) at a time,
+        so that only one interval is held in memory.
+
+        The paired data of each interval is written to netCDF files in
+        :attr:`chunk_dir`, followed by a JSON manifest listing them.
+        Intervals with a manifest are complete and are skipped when resuming,
+        so an interrupted run continues from the last finished interval.
+        The manifest records a hash of the model and obs sections of the control file,
+        and intervals paired with other sections are paired again.
+        Adjacent intervals share their boundary, which is only paired in the later
+        interval (the end of the last interval is included), so the chunks do not overlap.
+        Use :meth:`concat_pairs` to stitch the chunks together afterwards.
+
+        Parameters
+        ----------
+        resume (optional, default True) : bool
+            If False, pair all the intervals even if they have a manifest.
+
+        Returns
+        -------
+        None
+        """
+        import gc
+        import json
+        import time
+        from .util.write_util import write_analysis_ncf
+
+        if self.time_intervals is None:
+            raise Exception('Pairing in time chunks requires analysis.time_interval in the control file.')
+        os.makedirs(self.chunk_dir, exist_ok=True)
+
+        for n, time_interval in enumerate(self.time_intervals):
+            manifest_name = self._chunk_manifest_name(time_interval)
+            if resume and self._read_chunk_manifest(time_interval) is not None:
+                print('Time chunk {}/{} {} - {} already done, skipping'.format(
+                    n+1, len(self.time_intervals), *time_interval))
+                continue
+            print('Time chunk {}/{} {} - {}'.format(n+1, len(self.time_intervals), *time_interval))
+            t0 = time.perf_counter()
+
+            self.open_models(time_interval=time_interval)
+            # half-open intervals, except the last one
+            closed = 'both' if n == len(self.time_intervals) - 1 else 'left'
+            self.open_obs(time_interval=time_interval, closed=closed)
+            self.pair_data(time_interval=time_interval, closed=closed)
+
+            prefix = 'paired_{}_{}'.format(
+                time_interval[0].strftime('%Y%m%d%H%M'), time_interval[1].strftime('%Y%m%d%H%M'))
+            write_analysis_ncf(obj=self.paired, output_dir=self.chunk_dir, fn_prefix=prefix)
+            manifest = {
+                'start': time_interval[0].isoformat(),
+                'end': time_interval[1].isoformat(),
+                'config': self._chunk_config_hash(),
+                'files': {label: '{}_{}.nc4'.format(prefix, label) for label in self.paired},
+                'elapsed': time.perf_counter() - t0,
+            }
+            # write to a temporary file first, so a manifest only exists for finished chunks
+            with open(manifest_name + '.tmp', 'w') as f:
+                json.dump(manifest, f, indent=1)
+            os.replace(manifest_name + '.tmp', manifest_name)
+
+            # release the chunk before opening the next one
+            self.models = {}
+            self.obs = {}
+            self.paired = {}
+            gc.collect()
 
     def concat_pairs(self):
         """Read and concatenate all observation and model time interval pair data,
         populating the :attr:`paired` dict.
 
+        The chunks listed in the manifests written by :meth:`pair_time_chunks`
+        are opened lazily (backed by dask) and merged in time order.
+
         Returns
         -------
         None
         """
-        pass
+        from .util.read_util import read_analysis_ncf, xarray_to_class
+
+        files = {}
+        for time_interval in self.time_intervals:
+            manifest = self._read_chunk_manifest(time_interval)
+            if manifest is None:
+                print('WARNING: time chunk {} - {} has not been paired, skipping'.format(*time_interval))
+                continue
+            for label, filename in manifest['files'].items():
+                files.setdefault(label, []).append(os.path.join(self.chunk_dir, filename))
+
+        group_ds = {label: read_analysis_ncf(filenames, xr_kws={'chunks': {}})
+                    for label, filenames in files.items()}
+        self.paired = xarray_to_class(class_type='pair', group_ds=group_ds)
+
+        # initialize model/obs attributes, since needed for plotting and stats
+        if not self.models:
+            self.open_models(load_files=False)
+        if not self.obs:
+            self.open_obs(load_files=False)
    
     ### TODO: Create the plotting driver (most complicated one)
     # def plotting(self):
@@ -1607,6 +2185,13 @@ class analysis:
         for all the variables specified in the mapping dictionary listed in 
         :attr:`paired`.
 
+        Each (plotting group, obs variable, domain) combination is an independent
+        task (see :meth:`_plot_task`). If ``n_workers`` in ``analysis.plotting_kwargs``
+        is larger than 1, the tasks are rendered by a pool of forked worker processes,
+        which share the paired data with this process instead of receiving pickled copies.
+        The paired data are loaded in memory before forking.
+        A timing report for each task is printed at the end.
+
         Creates plots stored in the file location specified by output_dir
         in the analysis section of the yaml file.
 
@@ -1614,18 +2199,10 @@ class analysis:
         -------
         None
         """
-        
-        from .util.tools import resample_stratify
-        from .util.region_select import select_region
+        import multiprocessing
+        import time
         import matplotlib.pyplot as plt
-        pair_keys = list(self.paired.keys())
-        if self.paired[pair_keys[0]].type.lower() in ['sat_grid_clm','sat_swath_clm']:
-            from .plots import satplots as splots,savefig
-        else: 
-            from .plots import surfplots as splots, savefig
-            from .plots import aircraftplots as airplots
-            from .plots import sonde_plots as sondeplots
-        from .plots import xarray_plots as xrplots
+        from .plots import savefig
         if not self.add_logo:
             savefig.keywords.update(decorate=False)
 
@@ -1635,1293 +2212,1376 @@ class analysis:
 
         # first get the plotting dictionary from the yaml file
         plot_dict = self.control_dict['plots']
-        # Calculate any items that do not need to recalculate each loop.
-        startdatename = str(datetime.datetime.strftime(self.start_time, '%Y-%m-%d_%H'))
-        enddatename = str(datetime.datetime.strftime(self.end_time, '%Y-%m-%d_%H'))
         # now we are going to loop through each plot_group (note we can have multiple plot groups)
         # a plot group can have
         #     1) a singular plot type
         #     2) multiple paired datasets or model datasets depending on the plot type
         #     3) kwargs for creating the figure ie size and marker (note the default for obs is 'x')
-
-        # Loop through the plot_dict items
+        tasks = []
         for grp, grp_dict in plot_dict.items():
-            
-            # Read the interquartile_style argument (for vertprofile plot type) if it exists
-            if grp_dict.get('type') == 'vertprofile':
-                interquartile_style = grp_dict.get('data_proc', {}).get('interquartile_style', 'shading')
-            else:
-                interquartile_style = None
-
             pair_labels = grp_dict['data']
-            # Get the plot type
-            plot_type = grp_dict['type']
-
-            #read-in special settings for multi-boxplot
-            if plot_type == 'multi_boxplot':
-                region_name = grp_dict['region_name'] 
-                region_list = grp_dict['region_list']
-                model_name_list = grp_dict['model_name_list']     
-
-            #read-in special settings for ozone sonde related plots
-            if plot_type in {'vertical_single_date', 'vertical_boxplot_os', 'density_scatter_plot_os'}:
-                altitude_range = grp_dict['altitude_range']
-                altitude_method = grp_dict['altitude_method']
-                station_name = grp_dict['station_name']
-                monet_logo_position = grp_dict['monet_logo_position']
-                cds = grp_dict['compare_date_single']
-                release_time= datetime.datetime(cds[0],cds[1],cds[2],cds[3],cds[4],cds[5])
-
-                if plot_type == 'vertical_boxplot_os':
-                    altitude_threshold_list = grp_dict['altitude_threshold_list']
-                elif plot_type == 'density_scatter_plot_os':
-                    cmap_method = grp_dict['cmap_method']
-                    model_name_list = grp_dict['model_name_list']
-                
-            #read-in special settings for scorecard
-            if plot_type == 'scorecard':
-                region_list = grp_dict['region_list']
-                region_name = grp_dict['region_name']
-                urban_rural_name = grp_dict['urban_rural_name']
-                urban_rural_differentiate_value = grp_dict['urban_rural_differentiate_value']
-                better_or_worse_method = grp_dict['better_or_worse_method']
-                model_name_list = grp_dict['model_name_list']
-
-            #read-in special settings for csi plot
-            if plot_type == 'csi':
-                threshold_list = grp_dict['threshold_list']
-                score_name = grp_dict['score_name']
-                model_name_list = grp_dict['model_name_list']
-                threshold_tick_style = grp_dict.get('threshold_tick_style',None)
 
             # first get the observational obs labels
-
             obs_vars = []
             for pair_label in pair_labels:
                 obs_vars.extend(self.paired[pair_label].obs_vars)
             # Guarantee uniqueness of obs_vars, without altering order
             obs_vars = list(dict.fromkeys(obs_vars))
 
-            # loop through obs variables
+            # Loop also over the domain types. So can easily create several overview and zoomed in plots.
+            domain_types = grp_dict.get('domain_type', [None])
             for obsvar in obs_vars:
-                # Loop also over the domain types. So can easily create several overview and zoomed in plots.
-                domain_types = grp_dict.get('domain_type', [None])
-                domain_names = grp_dict.get('domain_name', [None])
-                domain_infos = grp_dict.get('domain_info', {})
-                # Use only pair_labels containing obs_var
-                pair_labels_obsvar = [p for p in pair_labels if obsvar in self.paired[p].obs_vars]
                 for domain in range(len(domain_types)):
-                    domain_type = domain_types[domain]
-                    domain_name = domain_names[domain]
-                    domain_info = domain_infos.get(domain_name, None)
-                    for p_index, p_label in enumerate(pair_labels_obsvar):
-                        p = self.paired[p_label]
-                        obs_type = p.type
+                    tasks.append((grp, obsvar, domain))
+
+        n_workers = self.plotting_kwargs.get('n_workers', 1)
+        if n_workers is None:
+            n_workers = os.cpu_count()
+        n_workers = min(int(n_workers), len(tasks))
+        if n_workers > 1 and 'fork' not in multiprocessing.get_all_start_methods():
+            print('Warning: parallel plotting requires the fork start method, plotting serially.')
+            n_workers = 1
+        if n_workers > 1 and _numba_threads_started():
+            print('Warning: parallel plotting cannot fork after numba parallel kernels have run '
+                  '(e.g. TEMPO pairing), plotting serially.')
+            n_workers = 1
+
+        if n_workers > 1:
+            global _PLOT_ANALYSIS
+            print(f'Plotting {len(tasks)} tasks with {n_workers} workers')
+            # the workers must not inherit open (HDF5) file handles: load the paired data
+            # before forking, and close the model and obs files, which the workers reopen if needed
+            for p in self.paired.values():
+                if isinstance(p.obj, xr.Dataset):
+                    p.obj.load()
+                    p.obj.close()
+            for obj in [m.obj for m in self.models.values()] + [o.obj for o in self.obs.values()]:
+                if isinstance(obj, xr.Dataset):
+                    obj.close()
+            _PLOT_ANALYSIS = self
+            try:
+                with multiprocessing.get_context('fork').Pool(n_workers, initializer=_init_plot_worker) as pool:
+                    results = pool.map(_plot_task_worker, tasks, chunksize=1)
+            finally:
+                _PLOT_ANALYSIS = None
+        else:
+            results = []
+            for task in tasks:
+                t0 = time.perf_counter()
+                self._plot_task(*task)
+                results.append((task, time.perf_counter() - t0, None))
 
-                        # find the pair model label that matches the obs var
-                        index = p.obs_vars.index(obsvar)
-                        modvar = p.model_vars[index]
+        # Restore figure count warning
+        plt.rcParams["figure.max_open_warning"] = initial_max_fig
 
-                        # Adjust the modvar as done in pairing script, if the species name in obs and model are the same.
-                        if obsvar == modvar:
-                            modvar = modvar + '_new'
+        print('Plotting timing report (s):')
+        for (grp, obsvar, domain), elapsed, error in results:
+            domain_type = plot_dict[grp].get('domain_type', [None])[domain]
+            domain_name = plot_dict[grp].get('domain_name', [None])[domain]
+            status = 'ok' if error is None else 'FAILED'
+            print(f'  {grp}.{obsvar}.{domain_type}.{domain_name}: {elapsed:.2f} {status}')
+        failed = [(task, error) for task, _, error in results if error is not None]
+        if failed:
+            for task, error in failed:
+                print(f'Error in plotting task {task}:\n{error}')
+            raise RuntimeError(f'{len(failed)} of {len(tasks)} plotting tasks failed')
+
+    def _plot_task(self, grp, obsvar, domain):
+        """Create the plots of one plotting group for one obs variable and domain,
+        overlaying all the model/obs pairs of the group that contain the variable.
 
-                        # Adjust the modvar for satellite no2 trop. column paring. M.Li
-                        if obsvar == 'nitrogendioxide_tropospheric_column':
-                            modvar = modvar + 'trpcol'
-                            
-                        # for pt_sfc data, convert to pandas dataframe, format, and trim
-                        # Query selected points if applicable
-                        if domain_type != 'all':
-                            p_region = select_region(p.obj, domain_type, domain_name, domain_info)
-                        else:
-                            p_region = p.obj
+        Parameters
+        ----------
+        grp : str
+            Plotting group label (a key of ``.control_dict['plots']``).
+        obsvar : str
+            Observation variable name.
+        domain : int
+            Index into the ``domain_type`` / ``domain_name`` lists of the group.
 
-                        
-                        if obs_type in ["sat_swath_sfc", "sat_swath_clm", "sat_grid_sfc",
-                                        "sat_grid_clm", "sat_swath_prof"]:
-                             # convert index to time; setup for sat_swath_clm
-                            
-                            if 'time' not in p_region.dims and obs_type == 'sat_swath_clm':
-                                pairdf_all = p_region.swap_dims({'x':'time'})
+        Returns
+        -------
+        None
+        """
+        from .util.tools import resample_stratify
+        from .util.region_select import select_region_indexed
+        import matplotlib.pyplot as plt
+        pair_keys = list(self.paired.keys())
+        if self.paired[pair_keys[0]].type.lower() in ['sat_grid_clm','sat_swath_clm']:
+            from .plots import satplots as splots,savefig
+        else: 
+            from .plots import surfplots as splots, savefig
+            from .plots import aircraftplots as airplots
+            from .plots import sonde_plots as sondeplots
+        from .plots import xarray_plots as xrplots
 
-                            else:
-                                pairdf_all = p_region
-                            # Select only the analysis time window.
-                            pairdf_all = pairdf_all.sel(time=slice(self.start_time,self.end_time))
-                        else:
-                            # convert to dataframe
-                            pairdf_all = p_region.to_dataframe(dim_order=["time", "x"])
-                            # Select only the analysis time window.
-                            pairdf_all = pairdf_all.loc[self.start_time : self.end_time]
-                            
-                        # Determine the default plotting colors.
-                        if 'default_plot_kwargs' in grp_dict.keys():
-                            if self.models[p.model].plot_kwargs is not None:
-                                plot_dict = {**grp_dict['default_plot_kwargs'], **self.models[p.model].plot_kwargs}
-                            else:
-                                plot_dict = {**grp_dict['default_plot_kwargs'], **splots.calc_default_colors(p_index)}
-                            obs_dict = grp_dict['default_plot_kwargs']
-                        else:
-                            if self.models[p.model].plot_kwargs is not None:
-                                plot_dict = self.models[p.model].plot_kwargs.copy()
-                            else:
-                                plot_dict = splots.calc_default_colors(p_index).copy()
-                            obs_dict = None
+        grp_dict = self.control_dict['plots'][grp]
+        # Calculate any items that do not need to recalculate each loop.
+        startdatename = str(datetime.datetime.strftime(self.start_time, '%Y-%m-%d_%H'))
+        enddatename = str(datetime.datetime.strftime(self.end_time, '%Y-%m-%d_%H'))
 
-                        # Determine figure_kwargs and text_kwargs
-                        if 'fig_kwargs' in grp_dict.keys():
-                            fig_dict = grp_dict['fig_kwargs']
-                        else:
-                            fig_dict = None
-                        if 'text_kwargs' in grp_dict.keys():
-                            text_dict = grp_dict['text_kwargs']
-                        else:
-                            text_dict = None
+        # Read the interquartile_style argument (for vertprofile plot type) if it exists
+        if grp_dict.get('type') == 'vertprofile':
+            interquartile_style = grp_dict.get('data_proc', {}).get('interquartile_style', 'shading')
+        else:
+            interquartile_style = None
+
+        pair_labels = grp_dict['data']
+        # Get the plot type
+        plot_type = grp_dict['type']
+
+        #read-in special settings for multi-boxplot
+        if plot_type == 'multi_boxplot':
+            region_name = grp_dict['region_name'] 
+            region_list = grp_dict['region_list']
+            model_name_list = grp_dict['model_name_list']     
+
+        #read-in special settings for ozone sonde related plots
+        if plot_type in {'vertical_single_date', 'vertical_boxplot_os', 'density_scatter_plot_os'}:
+            altitude_range = grp_dict['altitude_range']
+            altitude_method = grp_dict['altitude_method']
+            station_name = grp_dict['station_name']
+            monet_logo_position = grp_dict['monet_logo_position']
+            cds = grp_dict['compare_date_single']
+            release_time= datetime.datetime(cds[0],cds[1],cds[2],cds[3],cds[4],cds[5])
+
+            if plot_type == 'vertical_boxplot_os':
+                altitude_threshold_list = grp_dict['altitude_threshold_list']
+            elif plot_type == 'density_scatter_plot_os':
+                cmap_method = grp_dict['cmap_method']
+                model_name_list = grp_dict['model_name_list']
 
-                        # Read in some plotting specifications stored with observations.
-                        if p.obs in self.obs and self.obs[p.obs].variable_dict is not None:
-                            if obsvar in self.obs[p.obs].variable_dict.keys():
-                                obs_plot_dict = self.obs[p.obs].variable_dict[obsvar].copy()
-                            else:
-                                obs_plot_dict = {}
-                        else:
-                            obs_plot_dict = {}
+        #read-in special settings for scorecard
+        if plot_type == 'scorecard':
+            region_list = grp_dict['region_list']
+            region_name = grp_dict['region_name']
+            urban_rural_name = grp_dict['urban_rural_name']
+            urban_rural_differentiate_value = grp_dict['urban_rural_differentiate_value']
+            better_or_worse_method = grp_dict['better_or_worse_method']
+            model_name_list = grp_dict['model_name_list']
+
+        #read-in special settings for csi plot
+        if plot_type == 'csi':
+            threshold_list = grp_dict['threshold_list']
+            score_name = grp_dict['score_name']
+            model_name_list = grp_dict['model_name_list']
+            threshold_tick_style = grp_dict.get('threshold_tick_style',None)
+
+        domain_types = grp_dict.get('domain_type', [None])
+        domain_names = grp_dict.get('domain_name', [None])
+        domain_infos = grp_dict.get('domain_info', {})
+        # Use only pair_labels containing obs_var
+        pair_labels_obsvar = [p for p in pair_labels if obsvar in self.paired[p].obs_vars]
+        domain_type = domain_types[domain]
+        domain_name = domain_names[domain]
+        domain_info = domain_infos.get(domain_name, None)
+        for p_index, p_label in enumerate(pair_labels_obsvar):
+            p = self.paired[p_label]
+            obs_type = p.type
+
+            # find the pair model label that matches the obs var
+            index = p.obs_vars.index(obsvar)
+            modvar = p.model_vars[index]
+
+            # Adjust the modvar as done in pairing script, if the species name in obs and model are the same.
+            if obsvar == modvar:
+                modvar = modvar + '_new'
+
+            # Adjust the modvar for satellite no2 trop. column paring. M.Li
+            if obsvar == 'nitrogendioxide_tropospheric_column':
+                modvar = modvar + 'trpcol'
+
+            # for pt_sfc data, convert to pandas dataframe, format, and trim
+            # Query selected points if applicable
+            if domain_type != 'all':
+                p_region = select_region_indexed(p.obj, domain_type, domain_name, domain_info,
+                                                 cache_dir=self.region_mask_cache_dir)
+            else:
+                p_region = p.obj
 
-                        # Specify ylabel if noted in yaml file.
-                        if 'ylabel_plot' in obs_plot_dict.keys():
-                            use_ylabel = obs_plot_dict['ylabel_plot']
-                        else:
-                            use_ylabel = None
 
-                        # Determine if set axis values or use defaults
-                        if grp_dict['data_proc'].get('set_axis', False):
-                            if obs_plot_dict:  # Is not null
-                                set_yaxis = True
-                            else:
-                                print('Warning: variables dict for ' + obsvar + ' not provided, so defaults used')
-                                set_yaxis = False
-                        else:
-                            set_yaxis = False
+            if obs_type in ["sat_swath_sfc", "sat_swath_clm", "sat_grid_sfc",
+                            "sat_grid_clm", "sat_swath_prof"]:
+                 # convert index to time; setup for sat_swath_clm
 
-                        # Determine to calculate mean values or percentile
-                        if 'percentile_opt' in obs_plot_dict.keys():
-                            use_percentile = obs_plot_dict['percentile_opt']
-                        else:
-                            use_percentile = None
+                if 'time' not in p_region.dims and obs_type == 'sat_swath_clm':
+                    pairdf_all = p_region.swap_dims({'x':'time'})
 
-                        
+                else:
+                    pairdf_all = p_region
+                # Select only the analysis time window.
+                pairdf_all = pairdf_all.sel(time=slice(self.start_time,self.end_time))
+            else:
+                # convert to dataframe
+                pairdf_all = p_region.to_dataframe(dim_order=["time", "x"])
+                # Select only the analysis time window.
+                pairdf_all = pairdf_all.loc[self.start_time : self.end_time]
+
+            # Determine the default plotting colors.
+            if 'default_plot_kwargs' in grp_dict.keys():
+                if self.models[p.model].plot_kwargs is not None:
+                    plot_dict = {**grp_dict['default_plot_kwargs'], **self.models[p.model].plot_kwargs}
+                else:
+                    plot_dict = {**grp_dict['default_plot_kwargs'], **splots.calc_default_colors(p_index)}
+                obs_dict = grp_dict['default_plot_kwargs']
+            else:
+                if self.models[p.model].plot_kwargs is not None:
+                    plot_dict = self.models[p.model].plot_kwargs.copy()
+                else:
+                    plot_dict = splots.calc_default_colors(p_index).copy()
+                obs_dict = None
 
-                        # Determine outname
-                        outname = "{}.{}.{}.{}.{}.{}.{}".format(grp, plot_type, obsvar, startdatename, enddatename, domain_type, domain_name)
+            # Determine figure_kwargs and text_kwargs
+            if 'fig_kwargs' in grp_dict.keys():
+                fig_dict = grp_dict['fig_kwargs']
+            else:
+                fig_dict = None
+            if 'text_kwargs' in grp_dict.keys():
+                text_dict = grp_dict['text_kwargs']
+            else:
+                text_dict = None
 
-                        # Query with filter options
-                        if 'filter_dict' in grp_dict['data_proc'] and 'filter_string' in grp_dict['data_proc']:
-                            raise Exception("""For plot group: {}, only one of filter_dict and filter_string can be specified.""".format(grp))
-                        elif 'filter_dict' in grp_dict['data_proc']:
-                            filter_dict = grp_dict['data_proc']['filter_dict']
-                            for column in filter_dict.keys():
-                                filter_vals = filter_dict[column]['value']
-                                filter_op = filter_dict[column]['oper']
-                                if filter_op == 'isin':
-                                    pairdf_all.query(f'{column} == {filter_vals}', inplace=True)
-                                elif filter_op == 'isnotin':
-                                    pairdf_all.query(f'{column} != {filter_vals}', inplace=True)
-                                else:
-                                    pairdf_all.query(f'{column} {filter_op} {filter_vals}', inplace=True) 
-                        elif 'filter_string' in grp_dict['data_proc']:
-                            pairdf_all.query(grp_dict['data_proc']['filter_string'], inplace=True)
+            # Read in some plotting specifications stored with observations.
+            if p.obs in self.obs and self.obs[p.obs].variable_dict is not None:
+                if obsvar in self.obs[p.obs].variable_dict.keys():
+                    obs_plot_dict = self.obs[p.obs].variable_dict[obsvar].copy()
+                else:
+                    obs_plot_dict = {}
+            else:
+                obs_plot_dict = {}
 
-                        # Drop sites with greater than X percent NAN values
-                        if 'rem_obs_by_nan_pct' in grp_dict['data_proc']:
-                            grp_var = grp_dict['data_proc']['rem_obs_by_nan_pct']['group_var']
-                            pct_cutoff = grp_dict['data_proc']['rem_obs_by_nan_pct']['pct_cutoff']
-                            
-                            if grp_dict['data_proc']['rem_obs_by_nan_pct']['times'] == 'hourly':
-                                # Select only hours at the hour
-                                hourly_pairdf_all = pairdf_all.reset_index().loc[pairdf_all.reset_index()['time'].dt.minute==0,:]
-                                
-                                # calculate total obs count, obs count with nan removed, and nan percent for each group
-                                grp_fullcount = hourly_pairdf_all[[grp_var,obsvar]].groupby(grp_var).size().rename({0:obsvar})
-                                grp_nonan_count = hourly_pairdf_all[[grp_var,obsvar]].groupby(grp_var).count() # counts only non NA values    
-                            else: 
-                                # calculate total obs count, obs count with nan removed, and nan percent for each group
-                                grp_fullcount = pairdf_all[[grp_var,obsvar]].groupby(grp_var).size().rename({0:obsvar})
-                                grp_nonan_count = pairdf_all[[grp_var,obsvar]].groupby(grp_var).count() # counts only non NA values  
-                                
-                            grp_pct_nan = 100 - grp_nonan_count.div(grp_fullcount,axis=0)*100
-
-                            # make list of sites meeting condition and select paired data by this by this
-                            grp_select = grp_pct_nan.query(obsvar + ' < ' + str(pct_cutoff)).reset_index()
-                            pairdf_all = pairdf_all.loc[pairdf_all[grp_var].isin(grp_select[grp_var].values)]
-
-                        # Drop NaNs if using pandas 
-                        if obs_type in ['pt_sfc','aircraft','mobile','ground','sonde', 'pandora']: 
-                            if grp_dict['data_proc']['rem_obs_nan'] is True:
-                                # I removed drop=True in reset_index in order to keep 'time' as a column.
-                                pairdf = pairdf_all.reset_index().dropna(subset=[modvar, obsvar])
-                            else:
-                                pairdf = pairdf_all.reset_index().dropna(subset=[modvar])
-                        elif obs_type in ["sat_swath_sfc", "sat_swath_clm", 
-                                          "sat_grid_sfc", "sat_grid_clm", 
-                                          "sat_swath_prof"]: 
-                            # xarray doesn't need nan drop because its math operations seem to ignore nans
-                            # MEB (10/9/24): Add statement to ensure model and obs variables have nans at the same place
-                            pairdf = pairdf_all.where(pairdf_all[obsvar].notnull() & pairdf_all[modvar].notnull())
+            # Specify ylabel if noted in yaml file.
+            if 'ylabel_plot' in obs_plot_dict.keys():
+                use_ylabel = obs_plot_dict['ylabel_plot']
+            else:
+                use_ylabel = None
 
-                        else:
-                            print('Warning: set rem_obs_nan = True for regulatory metrics') 
-                            pairdf = pairdf_all.reset_index().dropna(subset=[modvar])
+            # Determine if set axis values or use defaults
+            if grp_dict['data_proc'].get('set_axis', False):
+                if obs_plot_dict:  # Is not null
+                    set_yaxis = True
+                else:
+                    print('Warning: variables dict for ' + obsvar + ' not provided, so defaults used')
+                    set_yaxis = False
+            else:
+                set_yaxis = False
 
-                        # JianHe: do we need provide a warning if pairdf is empty (no valid obsdata) for specific subdomain?
-                        # MEB: pairdf.empty fails for data left in xarray format. isnull format works.
-                        if pairdf[obsvar].isnull().all():
-                            print('Warning: no valid obs found for '+domain_name)
-                            continue
-                        
-                        # JianHe: Determine if calculate regulatory values
-                        cal_reg = obs_plot_dict.get('regulatory', False)
+            # Determine to calculate mean values or percentile
+            if 'percentile_opt' in obs_plot_dict.keys():
+                use_percentile = obs_plot_dict['percentile_opt']
+            else:
+                use_percentile = None
 
-                        if cal_reg:
-                            # Reset use_ylabel for regulatory calculations
-                            if 'ylabel_reg_plot' in obs_plot_dict.keys():
-                                use_ylabel = obs_plot_dict['ylabel_reg_plot']
-                            else:
-                                use_ylabel = None
 
-                            df2 = (
-                                pairdf.copy()
-                                .groupby("siteid")
-                                .resample('h', on='time_local')
-                                .mean(numeric_only=True)
-                                .reset_index()
-                            )
 
-                            if obsvar == 'PM2.5':  
-                                pairdf_reg = splots.make_24hr_regulatory(df2,[obsvar,modvar]).rename(index=str,columns={obsvar+'_y':obsvar+'_reg',modvar+'_y':modvar+'_reg'})
-                            elif obsvar == 'OZONE':
-                                pairdf_reg = splots.make_8hr_regulatory(df2,[obsvar,modvar]).rename(index=str,columns={obsvar+'_y':obsvar+'_reg',modvar+'_y':modvar+'_reg'})
-                            else:
-                                print('Warning: no regulatory calculations found for ' + obsvar + '. Skipping plot.')
-                                del df2
-                                continue
-                            del df2
-                            if len(pairdf_reg[obsvar+'_reg']) == 0:
-                                print('No valid data for '+obsvar+'_reg. Skipping plot.')
-                                continue
-                            else:
-                                # Reset outname for regulatory options
-                                outname = "{}.{}.{}.{}.{}.{}.{}".format(grp, plot_type, obsvar+'_reg', startdatename, enddatename, domain_type, domain_name)
-                        else:
-                            pairdf_reg = None
+            # Determine outname
+            outname = "{}.{}.{}.{}.{}.{}.{}".format(grp, plot_type, obsvar, startdatename, enddatename, domain_type, domain_name)
 
-                        if plot_type.lower() == 'spatial_bias': 
-                            if use_percentile is None:
-                                outname = outname+'.mean'
-                            else:
-                                outname = outname+'.p'+'{:02d}'.format(use_percentile) 
-
-                        if self.output_dir is not None:
-                            outname = self.output_dir + '/' + outname  # Extra / just in case.
-
-                        # Types of plots
-                        if plot_type.lower() == 'timeseries' or plot_type.lower() == 'diurnal':
-                            if set_yaxis is True:
-                                if all(k in obs_plot_dict for k in ('vmin_plot', 'vmax_plot')):
-                                    vmin = obs_plot_dict['vmin_plot']
-                                    vmax = obs_plot_dict['vmax_plot']
-                                else:
-                                    print('Warning: vmin_plot and vmax_plot not specified for ' + obsvar + ', so default used.')
-                                    vmin = None
-                                    vmax = None
-                            else:
-                                vmin = None
-                                vmax = None
-                            # Select time to use as index.
+            # Query with filter options
+            if 'filter_dict' in grp_dict['data_proc'] and 'filter_string' in grp_dict['data_proc']:
+                raise Exception("""For plot group: {}, only one of filter_dict and filter_string can be specified.""".format(grp))
+            elif 'filter_dict' in grp_dict['data_proc']:
+                filter_dict = grp_dict['data_proc']['filter_dict']
+                for column in filter_dict.keys():
+                    filter_vals = filter_dict[column]['value']
+                    filter_op = filter_dict[column]['oper']
+                    if filter_op == 'isin':
+                        pairdf_all.query(f'{column} == {filter_vals}', inplace=True)
+                    elif filter_op == 'isnotin':
+                        pairdf_all.query(f'{column} != {filter_vals}', inplace=True)
+                    else:
+                        pairdf_all.query(f'{column} {filter_op} {filter_vals}', inplace=True) 
+            elif 'filter_string' in grp_dict['data_proc']:
+                pairdf_all.query(grp_dict['data_proc']['filter_string'], inplace=True)
+
+            # Drop sites with greater than X percent NAN values
+            if 'rem_obs_by_nan_pct' in grp_dict['data_proc']:
+                grp_var = grp_dict['data_proc']['rem_obs_by_nan_pct']['group_var']
+                pct_cutoff = grp_dict['data_proc']['rem_obs_by_nan_pct']['pct_cutoff']
+
+                if grp_dict['data_proc']['rem_obs_by_nan_pct']['times'] == 'hourly':
+                    # Select only hours at the hour
+                    hourly_pairdf_all = pairdf_all.reset_index().loc[pairdf_all.reset_index()['time'].dt.minute==0,:]
+
+                    # calculate total obs count, obs count with nan removed, and nan percent for each group
+                    grp_fullcount = hourly_pairdf_all[[grp_var,obsvar]].groupby(grp_var).size().rename({0:obsvar})
+                    grp_nonan_count = hourly_pairdf_all[[grp_var,obsvar]].groupby(grp_var).count() # counts only non NA values    
+                else: 
+                    # calculate total obs count, obs count with nan removed, and nan percent for each group
+                    grp_fullcount = pairdf_all[[grp_var,obsvar]].groupby(grp_var).size().rename({0:obsvar})
+                    grp_nonan_count = pairdf_all[[grp_var,obsvar]].groupby(grp_var).count() # counts only non NA values  
+
+                grp_pct_nan = 100 - grp_nonan_count.div(grp_fullcount,axis=0)*100
+
+                # make list of sites meeting condition and select paired data by this by this
+                grp_select = grp_pct_nan.query(obsvar + ' < ' + str(pct_cutoff)).reset_index()
+                pairdf_all = pairdf_all.loc[pairdf_all[grp_var].isin(grp_select[grp_var].values)]
+
+            # Drop NaNs if using pandas 
+            if obs_type in ['pt_sfc','aircraft','mobile','ground','sonde', 'pandora']: 
+                if grp_dict['data_proc']['rem_obs_nan'] is True:
+                    # I removed drop=True in reset_index in order to keep 'time' as a column.
+                    pairdf = pairdf_all.reset_index().dropna(subset=[modvar, obsvar])
+                else:
+                    pairdf = pairdf_all.reset_index().dropna(subset=[modvar])
+            elif obs_type in ["sat_swath_sfc", "sat_swath_clm", 
+                              "sat_grid_sfc", "sat_grid_clm", 
+                              "sat_swath_prof"]: 
+                # xarray doesn't need nan drop because its math operations seem to ignore nans
+                # MEB (10/9/24): Add statement to ensure model and obs variables have nans at the same place
+                pairdf = pairdf_all.where(pairdf_all[obsvar].notnull() & pairdf_all[modvar].notnull())
 
-                            # 2024-03-01 MEB needs to only apply if pandas. fails for xarray
-                            if isinstance(pairdf,pd.core.frame.DataFrame):
-                                pairdf = pairdf.set_index(grp_dict['data_proc']['ts_select_time'])
-                            # Specify ts_avg_window if noted in yaml file. #qzr++
+            else:
+                print('Warning: set rem_obs_nan = True for regulatory metrics') 
+                pairdf = pairdf_all.reset_index().dropna(subset=[modvar])
+
+            # JianHe: do we need provide a warning if pairdf is empty (no valid obsdata) for specific subdomain?
+            # MEB: pairdf.empty fails for data left in xarray format. isnull format works.
+            if pairdf[obsvar].isnull().all():
+                print('Warning: no valid obs found for '+domain_name)
+                continue
+
+            # JianHe: Determine if calculate regulatory values
+            cal_reg = obs_plot_dict.get('regulatory', False)
+
+            if cal_reg:
+                # Reset use_ylabel for regulatory calculations
+                if 'ylabel_reg_plot' in obs_plot_dict.keys():
+                    use_ylabel = obs_plot_dict['ylabel_reg_plot']
+                else:
+                    use_ylabel = None
+
+                df2 = (
+                    pairdf.copy()
+                    .groupby("siteid")
+                    .resample('h', on='time_local')
+                    .mean(numeric_only=True)
+                    .reset_index()
+                )
+
+                if obsvar == 'PM2.5':  
+                    pairdf_reg = splots.make_24hr_regulatory(df2,[obsvar,modvar]).rename(index=str,columns={obsvar+'_y':obsvar+'_reg',modvar+'_y':modvar+'_reg'})
+                elif obsvar == 'OZONE':
+                    pairdf_reg = splots.make_8hr_regulatory(df2,[obsvar,modvar]).rename(index=str,columns={obsvar+'_y':obsvar+'_reg',modvar+'_y':modvar+'_reg'})
+                else:
+                    print('Warning: no regulatory calculations found for ' + obsvar + '. Skipping plot.')
+                    del df2
+                    continue
+                del df2
+                if len(pairdf_reg[obsvar+'_reg']) == 0:
+                    print('No valid data for '+obsvar+'_reg. Skipping plot.')
+                    continue
+                else:
+                    # Reset outname for regulatory options
+                    outname = "{}.{}.{}.{}.{}.{}.{}".format(grp, plot_type, obsvar+'_reg', startdatename, enddatename, domain_type, domain_name)
+            else:
+                pairdf_reg = None
 
-                            if 'ts_avg_window' in grp_dict['data_proc'].keys():
-                                a_w = grp_dict['data_proc']['ts_avg_window']
-                            else:
-                                a_w = None
-
-                            #Steps needed to subset paired df if secondary y-axis (altitude_variable) limits are provided, 
-                            #ELSE: make_timeseries from surfaceplots.py plots the whole df by default
-                            #Edit below to accommodate 'ground' or 'mobile' where altitude_yax2 is not needed for timeseries
-                            altitude_yax2 = grp_dict['data_proc'].get('altitude_yax2', {})
-
-                            # Extract vmin_y2 and vmax_y2 from filter_dict
-                            # Check if 'filter_dict' exists and 'altitude' is a key in filter_criteria
-                            # Extract vmin_y2 and vmax_y2 from filter_dict
-                            #Better structure for filter_dict (min and max secondary axis) to be optional below
-                            filter_criteria = (
-                                altitude_yax2.get('filter_dict', None)
-                                if isinstance(altitude_yax2, dict)
-                                else None
-                            )
-                            
-                            
-                            if filter_criteria and 'altitude' in filter_criteria:
-                                vmin_y2, vmax_y2 = filter_criteria['altitude']['value']
-                            elif filter_criteria is None:
-
-                                if 'altitude' in pairdf:
-                                    vmin_y2 = pairdf['altitude'].min()
-                                    vmax_y2 = pairdf['altitude'].max()
-                                else:
-                                    vmin_y2 = vmax_y2 = None
-                            else:
-                                vmin_y2 = vmax_y2 = None
-                            
+            if plot_type.lower() == 'spatial_bias': 
+                if use_percentile is None:
+                    outname = outname+'.mean'
+                else:
+                    outname = outname+'.p'+'{:02d}'.format(use_percentile) 
 
-                                
-                            # Check if filter_criteria exists and is not None (Subset the data based on filter criteria if provided)
-                            if filter_criteria:
-                                for column, condition in filter_criteria.items():
-                                    operation = condition['oper']
-                                    value = condition['value']
-                                    
-                                    if operation == "between" and isinstance(value, list) and len(value) == 2:
-                                        pairdf = pairdf[pairdf[column].between(vmin_y2, vmax_y2)]
-                            
-                            # Now proceed with plotting, call the make_timeseries function with the subsetted pairdf (if vmin2 and vmax2 are not nOne) otherwise whole df                                 
-                            if self.obs[p.obs].sat_type is not None and self.obs[p.obs].sat_type.startswith("tempo_l2"):
-                                if plot_type.lower() == 'timeseries':
-                                    make_timeseries = xrplots.make_timeseries
-                                else:
-                                    make_timeseries = xrplots.make_diurnal_cycle
-                                plot_kwargs = {'dset': pairdf, 'varname': obsvar}
-                            else:
-                                if plot_type.lower() == "timeseries":
-                                    make_timeseries = splots.make_timeseries
-                                else:
-                                    make_timeseries = splots.make_diurnal_cycle
-                                plot_kwargs = {
-                                    'df': pairdf, 'df_reg': pairdf_reg, 'column': obsvar
-                                }
-                            settings = grp_dict.get('settings', {})
-                            plot_kwargs = {
-                                **plot_kwargs,
-                                **{
-                                    'label':p.obs,
-                                    'avg_window': a_w,
-                                    'ylabel': use_ylabel,
-                                    'vmin':vmin,
-                                    'vmax':vmax,
-                                    'domain_type': domain_type,
-                                    'domain_name': domain_name,
-                                    'plot_dict': obs_dict,
-                                    'fig_dict': fig_dict,
-                                    'text_dict': text_dict,
-                                    'debug': self.debug,
-                                },
-                                **settings
-                            }
-                            if p_index == 0:
-                                # First plot the observations.
-                                ax = make_timeseries(**plot_kwargs)
-                            # For all p_index plot the model.
-                            if self.obs[p.obs].sat_type is not None and self.obs[p.obs].sat_type.startswith("tempo_l2"):
-                                plot_kwargs['varname']=modvar
-                            else:
-                                plot_kwargs['column']=modvar
-                            plot_kwargs['label'] = p.model
-                            plot_kwargs['plot_dict'] = plot_dict
-                            plot_kwargs['ax'] = ax
-                            ax = make_timeseries(**plot_kwargs)
-
-                            # Extract text_kwargs from the appropriate plot group
-                            text_kwargs = grp_dict.get('text_kwargs', {'fontsize': 20})  # Default to fontsize 20 if not defined                            
-
-                            # At the end save the plot.
-                            if p_index == len(pair_labels) - 1:
-                                # Adding Altitude variable as secondary y-axis to timeseries (for, model vs aircraft) qzr++
-                                if 'altitude_yax2' in grp_dict['data_proc'] and 'altitude_variable' in grp_dict['data_proc']['altitude_yax2']:
-                                    altitude_yax2 = grp_dict['data_proc']['altitude_yax2']
-                                    ax = airplots.add_yax2_altitude(ax, pairdf, altitude_yax2, text_kwargs, vmin_y2, vmax_y2)
-                                savefig(outname + '.png', logo_height=150)
-
-                                del (ax, fig_dict, plot_dict, text_dict, obs_dict, obs_plot_dict)  # Clear axis for next plot.
-                                
-
-
-                            # At the end save the plot.
-                            ##if p_index == len(pair_labels) - 1:
-                                #Adding Altitude variable as secondary y-axis to timeseries (for, model vs aircraft) qzr++
-                                
-                                #Older approach without 'altitude_yax2' control list in YAML now commented out
-                                ##if grp_dict['data_proc'].get('altitude_variable'):
-                                  ##  altitude_variable = grp_dict['data_proc']['altitude_variable']
-                                  ##  altitude_ticks = grp_dict['data_proc'].get('altitude_ticks', 1000)  # Get altitude tick interval from YAML or default to 1000
-                                  ##  ax = airplots.add_yax2_altitude(ax, pairdf, altitude_variable, altitude_ticks, text_kwargs)
-                                ##savefig(outname + '.png', logo_height=150)
-                                ##del (ax, fig_dict, plot_dict, text_dict, obs_dict, obs_plot_dict) #Clear axis for next plot.
-
-                        elif plot_type.lower() == 'curtain':
-                            # Set cmin and cmax from obs_plot_dict for colorbar limits
-                            if set_yaxis:
-                                if all(k in obs_plot_dict for k in ('vmin_plot', 'vmax_plot')):
-                                    cmin = obs_plot_dict['vmin_plot']
-                                    cmax = obs_plot_dict['vmax_plot']
-                                else:
-                                    print('Warning: vmin_plot and vmax_plot not specified for ' + obsvar + ', so default used.')
-                                    cmin = None
-                                    cmax = None
-                            else:
-                                cmin = None
-                                cmax = None
-                            
-                            # Set vmin and vmax from grp_dict for altitude limits
-                            if set_yaxis:
-                                vmin = grp_dict.get('vmin', None)
-                                vmax = grp_dict.get('vmax', None)
-                            else:
-                                vmin = None
-                                vmax = None
-
-                                
-                            curtain_config = grp_dict # Curtain plot grp YAML dict
-                            # Inside your loop for processing each pair
-                            obs_label = p.obs
-                            model_label = p.model
-                        
-                            
-                            #Ensure we use the correct observation and model objects from pairing
-                            obs = self.obs[p.obs]
-                            mod = self.models[p.model]
-                            model_obj = mod.obj
-                        
-                            # Fetch the observation configuration for colorbar labels
-                            obs_label_config = self.control_dict['obs'][obs_label]['variables']
-                        
-                            # Fetch the model and observation data from pairdf
-                            pairdf = pairdf_all.reset_index()
-                        
-                            #### For model_data_2d for curtain/contourfill plot #####                       
-                            # Convert to get something useful for MONET
-                            new_ds_obs = obs.obj.rename_axis('time_obs').reset_index().monet._df_to_da().set_coords(['time_obs', 'pressure_obs'])
-                        
-                            # Nearest neighbor approach to find closest grid cell to each point
-                            ds_model = m.util.combinetool.combine_da_to_da(model_obj, new_ds_obs, merge=False)
-                        
-                            # Interpolate based on time in the observations
-                            ds_model = ds_model.interp(time=ds_model.time_obs.squeeze())                 
-                        
-                            # Print ds_model and pressure_model values #Debugging
-                            ##print(f"ds_model: {ds_model}")
-                            ##print(f"pressure_model values: {ds_model['pressure_model'].values}")
-                        
-                            # Define target pressures for interpolation based on the range of pressure_model
-                            min_pressure = ds_model['pressure_model'].min().compute()
-                            max_pressure = ds_model['pressure_model'].max().compute()
-                            
-                            # Fetch the interval and num_levels from curtain_config
-                            interval = curtain_config.get('interval', 10000)  # Default to 10,000 Pa if not provided      # Y-axis tick interval
-                            num_levels = curtain_config.get('num_levels', 100)   # Default to 100 levels if not provided
-                        
-                            print(f"Pressure MIN:{min_pressure}, max: {max_pressure}, ytick_interval: {interval}, interpolation_levels: {num_levels}  ")
-                            
-                            # Use num_levels to define target_pressures interpolation levels 
-                            target_pressures = np.linspace(max_pressure, min_pressure, num_levels)
-                            
-                            # Debugging: print target pressures
-                            ##print(f"Generated target pressures: {target_pressures}, shape: {target_pressures.shape}")
-                        
-                            # Check for NaN values before interpolation
-                            ##print(f"NaNs in model data before interpolation: {np.isnan(ds_model[modvar]).sum().compute()}")
-                            ##print(f"NaNs in pressure_model before interpolation: {np.isnan(ds_model['pressure_model']).sum().compute()}")
+            if self.output_dir is not None:
+                outname = self.output_dir + '/' + outname  # Extra / just in case.
 
-                        
-                            # Resample model data to target pressures using stratify
-                            da_wrf_const = resample_stratify(ds_model[modvar], target_pressures, ds_model['pressure_model'], axis=1, interpolation='linear', extrapolation='nan')
-                            da_wrf_const.name = modvar
-                        
-                            # Create target_pressures DataArray
-                            da_target_pressures = xr.DataArray(target_pressures, dims=('z'))
-                            da_target_pressures.name = 'target_pressures'
-                        
-                            # Merge DataArrays into a single Dataset
-                            ds_wrf_const = xr.merge([da_wrf_const, da_target_pressures])
-                            ds_wrf_const = ds_wrf_const.set_coords('target_pressures')
-                        
-                            # Debugging: print merged dataset for model curtain
-                            ##print(ds_wrf_const)
-                        
-                            # Ensure model_data_2d is properly reshaped for the contourfill plot
-                            model_data_2d = ds_wrf_const[modvar].squeeze()
-                        
-                            # Debugging: print reshaped model data shape
-                            ##print(f"Reshaped model data shape: {model_data_2d.shape}")
-                            
-                            #### model_data_2d for curtain plot ready ####
+            # Types of plots
+            if plot_type.lower() == 'timeseries' or plot_type.lower() == 'diurnal':
+                if set_yaxis is True:
+                    if all(k in obs_plot_dict for k in ('vmin_plot', 'vmax_plot')):
+                        vmin = obs_plot_dict['vmin_plot']
+                        vmax = obs_plot_dict['vmax_plot']
+                    else:
+                        print('Warning: vmin_plot and vmax_plot not specified for ' + obsvar + ', so default used.')
+                        vmin = None
+                        vmax = None
+                else:
+                    vmin = None
+                    vmax = None
+                # Select time to use as index.
 
+                # 2024-03-01 MEB needs to only apply if pandas. fails for xarray
+                if isinstance(pairdf,pd.core.frame.DataFrame):
+                    pairdf = pairdf.set_index(grp_dict['data_proc']['ts_select_time'])
+                # Specify ts_avg_window if noted in yaml file. #qzr++
 
-                            # Fetch model pressure and other model and observation data from "pairdf" (for scatter plot overlay)
-                            time = pairdf['time']
-                            obs_pressure = pairdf['pressure_obs']  
-                            ##print(f"Length of time: {len(time)}") #Debugging
-                            ##print(f"Length of obs_pressure: {len(obs_pressure)}") #Debugging
-                        
-                            # Generate the curtain plot using airplots.make_curtain_plot
-                            try:
-                                outname_pair = f"{outname}_{obs_label}_vs_{model_label}.png"
+                if 'ts_avg_window' in grp_dict['data_proc'].keys():
+                    a_w = grp_dict['data_proc']['ts_avg_window']
+                else:
+                    a_w = None
+
+                #Steps needed to subset paired df if secondary y-axis (altitude_variable) limits are provided, 
+                #ELSE: make_timeseries from surfaceplots.py plots the whole df by default
+                #Edit below to accommodate 'ground' or 'mobile' where altitude_yax2 is not needed for timeseries
+                altitude_yax2 = grp_dict['data_proc'].get('altitude_yax2', {})
+
+                # Extract vmin_y2 and vmax_y2 from filter_dict
+                # Check if 'filter_dict' exists and 'altitude' is a key in filter_criteria
+                # Extract vmin_y2 and vmax_y2 from filter_dict
+                #Better structure for filter_dict (min and max secondary axis) to be optional below
+                filter_criteria = (
+                    altitude_yax2.get('filter_dict', None)
+                    if isinstance(altitude_yax2, dict)
+                    else None
+                )
+
+
+                if filter_criteria and 'altitude' in filter_criteria:
+                    vmin_y2, vmax_y2 = filter_criteria['altitude']['value']
+                elif filter_criteria is None:
+
+                    if 'altitude' in pairdf:
+                        vmin_y2 = pairdf['altitude'].min()
+                        vmax_y2 = pairdf['altitude'].max()
+                    else:
+                        vmin_y2 = vmax_y2 = None
+                else:
+                    vmin_y2 = vmax_y2 = None
 
-                                print(f"Saving curtain plot to {outname_pair}...")
-                        
-                                ax = airplots.make_curtain_plot(
-                                    time=pd.to_datetime(time),
-                                    altitude=target_pressures,  # Use target_pressures for interpolation
-                                    model_data_2d=model_data_2d,  # Already reshaped to match the expected shape
-                                    obs_pressure=obs_pressure,  # Pressure_obs for obs scatter plot
-                                    pairdf=pairdf,  #use pairdf for scatter overlay (model and obs)
-                                    mod_var=modvar,
-                                    obs_var=obsvar,
-                                    grp_dict=curtain_config,
-                                    vmin=vmin,
-                                    vmax=vmax,
-                                    cmin=cmin,
-                                    cmax=cmax,
-                                    plot_dict=plot_dict,
-                                    outname=outname_pair,
-                                    domain_type=domain_type,
-                                    domain_name=domain_name,
-                                    obs_label_config=obs_label_config,
-                                    text_dict=text_dict,
-                                    debug=self.debug  # Pass debug flag
-                                )
-                            
-                                
-                            except Exception as e:
-                                print(f"Error generating curtain plot for {modvar} vs {obsvar}: {e}")
-                            finally:
-                                plt.close('all')  # Clean up matplotlib resources
 
 
-                            
-                                
-                        #qzr++ Added vertprofile plotype for aircraft vs model comparisons         
-                        elif plot_type.lower() == 'vertprofile':
-                            if set_yaxis is True:
-                                if all(k in obs_plot_dict for k in ('vmin_plot', 'vmax_plot')):
-                                    vmin = obs_plot_dict['vmin_plot']
-                                    vmax = obs_plot_dict['vmax_plot']
-                                else:
-                                    print('Warning: vmin_plot and vmax_plot not specified for ' + obsvar + ', so default used.')
-                                    vmin = None
-                                    vmax = None
-                            else:
-                                vmin = None
-                                vmax = None
-                            # Select altitude variable from the .yaml file
-                            altitude_variable = grp_dict['altitude_variable']
-                            # Define the bins for binning the altitude
-                            bins = grp_dict['vertprofile_bins']
-                            if p_index == 0:
-                                # First plot the observations.
-                                ax = airplots.make_vertprofile(
-                                    pairdf,
-                                    column=obsvar,
-                                    label=p.obs,
-                                    bins=bins,
-                                    altitude_variable=altitude_variable,
-                                    ylabel=use_ylabel,
-                                    vmin=vmin,
-                                    vmax=vmax,
-                                    domain_type=domain_type,
-                                    domain_name=domain_name,
-                                    plot_dict=obs_dict,
-                                    fig_dict=fig_dict,
-                                    text_dict=text_dict,
-                                    debug=self.debug,
-                                    interquartile_style=interquartile_style 
-                            )
-                            
-                            # For all p_index plot the model.
-                            ax = airplots.make_vertprofile(
-                                pairdf,
-                                column=modvar,
-                                label=p.model,
-                                ax=ax,
-                                bins=bins,
-                                altitude_variable=altitude_variable,
-                                ylabel=use_ylabel,
-                                vmin=vmin,
-                                vmax=vmax,
-                                domain_type=domain_type,
-                                domain_name=domain_name,
-                                plot_dict=plot_dict,
-                                text_dict=text_dict,
-                                debug=self.debug,
-                                interquartile_style=interquartile_style 
-                            )
-                            
-                            
-                            # At the end save the plot.
-                            if p_index == len(pair_labels) - 1:
-                                savefig(outname + '.png', logo_height=250)
-                                del (ax, fig_dict, plot_dict, text_dict, obs_dict, obs_plot_dict) # Clear axis for next plot.
-
-                        elif plot_type.lower() == 'vertical_single_date':
-                            #to use vmin, vmax from obs in yaml
-                            if set_yaxis is True:
-                                if all(k in obs_plot_dict for k in ('vmin_plot','vmax_plot')):
-                                    vmin = obs_plot_dict['vmin_plot']
-                                    vmax = obs_plot_dict['vmax_plot']
-                                else:
-                                    print('warning: vmin_plot and vmax_plot not specified for '+obsvar+',so default used.')
-                                    vmin = None
-                                    vmax = None
-                            else:
-                                vmin = None
-                                vmax = None
-                            #begin plotting
-                            if p_index ==0:
-                                comb_bx, label_bx = splots.calculate_boxplot(pairdf, pairdf_reg, column=obsvar, label=p.obs, plot_dict=obs_dict)
-                            comb_bx, label_bx = splots.calculate_boxplot(pairdf, pairdf_reg, column=modvar, label=p.model, plot_dict=plot_dict, comb_bx = comb_bx, label_bx = label_bx)
-                            if p_index == len(pair_labels) - 1:
-                                sondeplots.make_vertical_single_date(pairdf,
-                                                                      comb_bx,
-                                                                      altitude_range=altitude_range,
-                                                                      altitude_method=altitude_method,
-                                                                      vmin=vmin,
-                                                                      vmax=vmax,
-                                                                      station_name=station_name,
-                                                                      release_time=release_time,
-                                                                      label_bx=label_bx,
-                                                                      fig_dict=fig_dict,
-                                                                      text_dict=text_dict
-                                                                      )
-                                #save plot
-                                plt.tight_layout()
-                                savefig(outname+".png", loc=monet_logo_position[0], logo_height=100, dpi=300)
-
-                                del (comb_bx,label_bx,fig_dict, plot_dict, text_dict, obs_dict,obs_plot_dict)
-
-                        elif plot_type.lower() == 'vertical_boxplot_os':
-                            #to use vmin, vmax from obs in yaml
-                            if set_yaxis is True:
-                                if all(k in obs_plot_dict for k in ('vmin_plot','vmax_plot')):
-                                    vmin = obs_plot_dict['vmin_plot']
-                                    vmax = obs_plot_dict['vmax_plot']
-                                else:
-                                    print('warning: vmin_plot and vmax_plot not specified for '+obsvar+',so default used.')
-                                    vmin=None
-                                    vmax=None
-                            else:
-                                vmin=None
-                                vmax=None
-                            #begin plotting
-                            if p_index ==0:
-                                comb_bx, label_bx = splots.calculate_boxplot(pairdf, pairdf_reg, column=obsvar, label=p.obs, plot_dict=obs_dict)
-                            comb_bx, label_bx = splots.calculate_boxplot(pairdf, pairdf_reg, column=modvar, label=p.model, plot_dict=plot_dict, comb_bx = comb_bx, label_bx = label_bx)
-
-                            if p_index == len(pair_labels) - 1:
-                                sondeplots.make_vertical_boxplot_os(pairdf,
-                                                                     comb_bx,
-                                                                     label_bx=label_bx,
-                                                                     altitude_range=altitude_range,
-                                                                     altitude_method=altitude_method,
-                                                                     vmin=vmin,
-                                                                     vmax=vmax,
-                                                                     altitude_threshold_list=altitude_threshold_list,
-                                                                     station_name=station_name,
-                                                                     release_time=release_time,
-                                                                     fig_dict=fig_dict,
-                                                                     text_dict=text_dict)
-                                #save plot
-                                plt.tight_layout()
-                                savefig(outname+".png", loc=monet_logo_position[0], logo_height=100, dpi=300)
-                                del (comb_bx,label_bx,fig_dict, plot_dict, text_dict, obs_dict,obs_plot_dict)
-
-                        elif plot_type.lower() == 'density_scatter_plot_os':
-                            #to use vmin, vmax from obs in yaml
-                            if set_yaxis is True:
-                                if all(k in obs_plot_dict for k in ('vmin_plot','vmax_plot')):
-                                    vmin = obs_plot_dict['vmin_plot']
-                                    vmax = obs_plot_dict['vmax_plot']
-                                else:
-                                    print('warning: vmin_plot and vmax_plot not specified for '+obsvar+',so default used.')
-                                    vmin=None
-                                    vmax=None
-                            else:
-                                vmin=None
-                                vmax=None
-
-                            #begin plotting
-                            plt.figure()
-                            sondeplots.density_scatter_plot_os(pairdf,altitude_range,vmin,vmax,station_name,altitude_method,cmap_method,modvar,obsvar)
-                            plt.title('Scatter plot for '+model_name_list[0]+' vs. '+model_name_list[p_index+1]+'\nat '+str(station_name[0])+' on '+str(release_time)+' UTC',fontsize=15)
-                            plt.tight_layout()
-                            savefig(outname+"."+p_label+"."+"-".join(altitude_method[0].split())+".png", loc=monet_logo_position[0], logo_height=100, dpi=300)
-                            del (pairdf)
-                            
-                        elif plot_type.lower() == 'violin':
-                            if set_yaxis:
-                                if all(k in obs_plot_dict for k in ('vmin_plot', 'vmax_plot')):
-                                    vmin = obs_plot_dict['vmin_plot']
-                                    vmax = obs_plot_dict['vmax_plot']
-                                else:
-                                    print('Warning: vmin_plot and vmax_plot not specified for ' + obsvar + ', so default used.')
-                                    vmin = None
-                                    vmax = None
-                            else:
-                                vmin = None
-                                vmax = None
-                            
-                            # Initialize the combined DataFrame for violin plots and labels/colors list
-                            if p_index == 0:
-                                comb_violin = pd.DataFrame()
-                                label_violin = []
-
-                                                       
-                            # Define a default color for observations
-                            default_obs_color = 'gray'  # Default color for observations
-                            
-                            # Inside your loop for processing each pair
-                            obs_label = p.obs
-                            model_label = p.model
-                            
-                            # Retrieve plot_kwargs for observation
-                            if hasattr(self.obs[p.obs], 'plot_kwargs') and self.obs[p.obs].plot_kwargs is not None:
-                                obs_dict = self.obs[p.obs].plot_kwargs
-                            else:
-                                obs_dict = {'color': default_obs_color}
-                            
-                            # Retrieve plot_kwargs for the model
-                            model_dict = self.models[p.model].plot_kwargs if self.models[p.model].plot_kwargs is not None else {'color': 'blue'} # Fallback color for models, in case it's missing
-                            
-                            # Call calculate_violin for observation data
-                            if p_index ==0:
-                                comb_violin, label_violin = airplots.calculate_violin(
-                                    df=pairdf,
-                                    column=obsvar,
-                                    label=obs_label,
-                                    plot_dict=obs_dict,
-                                    comb_violin=comb_violin,
-                                    label_violin=label_violin
-                                )
-                            
-                            # Call calculate_violin for model data
-                            comb_violin, label_violin = airplots.calculate_violin(
-                                df=pairdf,
-                                column=modvar,
-                                label=model_label,
-                                plot_dict=model_dict,
-                                comb_violin=comb_violin,
-                                label_violin=label_violin
-                            )
+                # Check if filter_criteria exists and is not None (Subset the data based on filter criteria if provided)
+                if filter_criteria:
+                    for column, condition in filter_criteria.items():
+                        operation = condition['oper']
+                        value = condition['value']
 
-                            
-                            # For the last pair, create the violin plot
-                            if p_index == len(pair_labels) - 1:
-                                airplots.make_violin_plot(
-                                    comb_violin=comb_violin,
-                                    label_violin=label_violin,
-                                    ylabel=use_ylabel,
-                                    vmin=vmin,
-                                    vmax=vmax,
-                                    outname=outname,
-                                    domain_type=domain_type,
-                                    domain_name=domain_name,
-                                    fig_dict=fig_dict,
-                                    text_dict=text_dict,
-                                    debug=self.debug
-                                )
-                            
-                            # Clear the variables for the next plot if needed
-                            if p_index == len(pair_labels) - 1:
-                                del (comb_violin, label_violin, fig_dict, plot_dict, text_dict, obs_dict, obs_plot_dict)
+                        if operation == "between" and isinstance(value, list) and len(value) == 2:
+                            pairdf = pairdf[pairdf[column].between(vmin_y2, vmax_y2)]
 
-                        
+                # Now proceed with plotting, call the make_timeseries function with the subsetted pairdf (if vmin2 and vmax2 are not nOne) otherwise whole df                                 
+                if self.obs[p.obs].sat_type is not None and self.obs[p.obs].sat_type.startswith("tempo_l2"):
+                    if plot_type.lower() == 'timeseries':
+                        make_timeseries = xrplots.make_timeseries
+                    else:
+                        make_timeseries = xrplots.make_diurnal_cycle
+                    plot_kwargs = {'dset': pairdf, 'varname': obsvar}
+                else:
+                    if plot_type.lower() == "timeseries":
+                        make_timeseries = splots.make_timeseries
+                    else:
+                        make_timeseries = splots.make_diurnal_cycle
+                    plot_kwargs = {
+                        'df': pairdf, 'df_reg': pairdf_reg, 'column': obsvar
+                    }
+                settings = grp_dict.get('settings', {})
+                plot_kwargs = {
+                    **plot_kwargs,
+                    **{
+                        'label':p.obs,
+                        'avg_window': a_w,
+                        'ylabel': use_ylabel,
+                        'vmin':vmin,
+                        'vmax':vmax,
+                        'domain_type': domain_type,
+                        'domain_name': domain_name,
+                        'plot_dict': obs_dict,
+                        'fig_dict': fig_dict,
+                        'text_dict': text_dict,
+                        'debug': self.debug,
+                    },
+                    **settings
+                }
+                if p_index == 0:
+                    # First plot the observations.
+                    ax = make_timeseries(**plot_kwargs)
+                # For all p_index plot the model.
+                if self.obs[p.obs].sat_type is not None and self.obs[p.obs].sat_type.startswith("tempo_l2"):
+                    plot_kwargs['varname']=modvar
+                else:
+                    plot_kwargs['column']=modvar
+                plot_kwargs['label'] = p.model
+                plot_kwargs['plot_dict'] = plot_dict
+                plot_kwargs['ax'] = ax
+                ax = make_timeseries(**plot_kwargs)
+
+                # Extract text_kwargs from the appropriate plot group
+                text_kwargs = grp_dict.get('text_kwargs', {'fontsize': 20})  # Default to fontsize 20 if not defined                            
+
+                # At the end save the plot.
+                if p_index == len(pair_labels) - 1:
+                    # Adding Altitude variable as secondary y-axis to timeseries (for, model vs aircraft) qzr++
+                    if 'altitude_yax2' in grp_dict['data_proc'] and 'altitude_variable' in grp_dict['data_proc']['altitude_yax2']:
+                        altitude_yax2 = grp_dict['data_proc']['altitude_yax2']
+                        ax = airplots.add_yax2_altitude(ax, pairdf, altitude_yax2, text_kwargs, vmin_y2, vmax_y2)
+                    savefig(outname + '.png', logo_height=150)
+
+                    del (ax, fig_dict, plot_dict, text_dict, obs_dict, obs_plot_dict)  # Clear axis for next plot.
+
+
+
+                # At the end save the plot.
+                ##if p_index == len(pair_labels) - 1:
+                    #Adding Altitude variable as secondary y-axis to timeseries (for, model vs aircraft) qzr++
+
+                    #Older approach without 'altitude_yax2' control list in YAML now commented out
+                    ##if grp_dict['data_proc'].get('altitude_variable'):
+                      ##  altitude_variable = grp_dict['data_proc']['altitude_variable']
+                      ##  altitude_ticks = grp_dict['data_proc'].get('altitude_ticks', 1000)  # Get altitude tick interval from YAML or default to 1000
+                      ##  ax = airplots.add_yax2_altitude(ax, pairdf, altitude_variable, altitude_ticks, text_kwargs)
+                    ##savefig(outname + '.png', logo_height=150)
+                    ##del (ax, fig_dict, plot_dict, text_dict, obs_dict, obs_plot_dict) #Clear axis for next plot.
+
+            elif plot_type.lower() == 'curtain':
+                # Set cmin and cmax from obs_plot_dict for colorbar limits
+                if set_yaxis:
+                    if all(k in obs_plot_dict for k in ('vmin_plot', 'vmax_plot')):
+                        cmin = obs_plot_dict['vmin_plot']
+                        cmax = obs_plot_dict['vmax_plot']
+                    else:
+                        print('Warning: vmin_plot and vmax_plot not specified for ' + obsvar + ', so default used.')
+                        cmin = None
+                        cmax = None
+                else:
+                    cmin = None
+                    cmax = None
 
-                        elif plot_type.lower() == 'scatter_density':
-                            scatter_density_config = grp_dict
+                # Set vmin and vmax from grp_dict for altitude limits
+                if set_yaxis:
+                    vmin = grp_dict.get('vmin', None)
+                    vmax = grp_dict.get('vmax', None)
+                else:
+                    vmin = None
+                    vmax = None
 
-                            
-                            # Extract relevant parameters from the configuration
-                            color_map = scatter_density_config.get('color_map', 'viridis')
-                            fill = scatter_density_config.get('fill', False)
-                            print(f"Value of fill after reading from scatter_density_config: {fill}") #Debugging
 
-                            
-                            vmin_x = scatter_density_config.get('vmin_x', None)
-                            vmax_x = scatter_density_config.get('vmax_x', None)
-                            vmin_y = scatter_density_config.get('vmin_y', None)
-                            vmax_y = scatter_density_config.get('vmax_y', None)
-                                                    
-                            # Accessing the correct model and observation configuration/labels/variables
-                            model_label = p.model
-                            obs_label = p.obs
-                            
-                            try:
-                                _ = self.control_dict['model'][model_label]['mapping'][obs_label]
-                            except KeyError:
-                                print(f"Error: Mapping not found for model label '{model_label}' with observation label '{obs_label}' in scatter_density plot")
-                                continue  # Skip this iteration if mapping is not found
-                            
-                            obs_config = self.control_dict['obs'][obs_label]['variables'] # Accessing the correct observation configuration
+                curtain_config = grp_dict # Curtain plot grp YAML dict
+                # Inside your loop for processing each pair
+                obs_label = p.obs
+                model_label = p.model
 
-                            
-                            # Extract ylabel_plot for units extraction
-                            ylabel_plot = obs_config.get(obsvar, {}).get('ylabel_plot', f"{obsvar} (units)")
-                            title = ylabel_plot
-                            units = ylabel_plot[ylabel_plot.find("(")+1 : ylabel_plot.find(")")]
-                            xlabel = f"Model {modvar} ({units})"
-                            ylabel = f"Observation {obsvar} ({units})"
 
-                            
+                #Ensure we use the correct observation and model objects from pairing
+                obs = self.obs[p.obs]
+                mod = self.models[p.model]
+                model_obj = mod.obj
 
-                            
-                            # Exclude keys from kwargs that are being passed explicitly
-                            excluded_keys = ['color_map', 'fill', 'vmin_x', 'vmax_x', 'vmin_y', 'vmax_y', 'xlabel', 'ylabel', 'title', 'data']
-                            kwargs = {key: value for key, value in scatter_density_config.items() if key not in excluded_keys}
-                            if 'shade_lowest' in kwargs:
-                                kwargs['thresh'] = 0
-                                del kwargs['shade_lowest']
+                # Fetch the observation configuration for colorbar labels
+                obs_label_config = self.control_dict['obs'][obs_label]['variables']
 
+                # Fetch the model and observation data from pairdf
+                pairdf = pairdf_all.reset_index()
 
-                            outname_pair = f"{outname}_{obs_label}_vs_{model_label}.png"
+                #### For model_data_2d for curtain/contourfill plot #####                       
+                # Convert to get something useful for MONET
+                new_ds_obs = obs.obj.rename_axis('time_obs').reset_index().monet._df_to_da().set_coords(['time_obs', 'pressure_obs'])
 
-                            print(f"Saving scatter density plot to {outname_pair}...")
-                            
-                            # Create the scatter density plot
-                            print(f"Processing scatter density plot for model '{model_label}' and observation '{obs_label}'...")
-                            ax = airplots.make_scatter_density_plot(
-                                pairdf,
-                                mod_var=modvar,
-                                obs_var=obsvar,
-                                color_map=color_map,
-                                xlabel=xlabel,
-                                ylabel=ylabel,
-                                title=title,
-                                fill=fill,
-                                vmin_x=vmin_x,
-                                vmax_x=vmax_x,
-                                vmin_y=vmin_y,
-                                vmax_y=vmax_y,
-                                outname=outname_pair,
-                                **kwargs                            
-                            )
+                # Nearest neighbor approach to find closest grid cell to each point
+                ds_model = self._combine_da_to_points(mod, model_obj, new_ds_obs)
 
-                            
-                            plt.close()  # Close the current figure
-                            
-                        elif plot_type.lower() == 'boxplot':
-                            # squeeze the xarray for boxplot, M.Li
-                            if obs_type in ["sat_swath_sfc", "sat_swath_clm",
-                                            "sat_grid_sfc", "sat_grid_clm",
-                                            "sat_swath_prof"]:
-                                pairdf_sel = pairdf.squeeze()
-                            else: 
-                                pairdf_sel = pairdf
-
-                            if set_yaxis is True:
-                                if all(k in obs_plot_dict for k in ('vmin_plot', 'vmax_plot')):
-                                    vmin = obs_plot_dict['vmin_plot']
-                                    vmax = obs_plot_dict['vmax_plot']
-                                else:
-                                    print('Warning: vmin_plot and vmax_plot not specified for ' + obsvar + ', so default used.')
-                                    vmin = None
-                                    vmax = None
-                            else:
-                                vmin = None
-                                vmax = None
-                            # First for p_index = 0 create the obs box plot data array.
-                            if p_index == 0:
-                                comb_bx, label_bx = splots.calculate_boxplot(pairdf_sel, pairdf_reg, column=obsvar,   
-                                                                                       label=p.obs, plot_dict=obs_dict)
-                            # Then add the models to this dataarray.
-                            comb_bx, label_bx = splots.calculate_boxplot(pairdf_sel, pairdf_reg, column=modvar, label=p.model,  
-                                                                                    plot_dict=plot_dict, comb_bx=comb_bx,
-                                                                                    label_bx=label_bx)
-                            # For the last p_index make the plot.
-                            if p_index == len(pair_labels) - 1:
-                                splots.make_boxplot(
-                                    comb_bx,
-                                    label_bx,
-                                    ylabel=use_ylabel,
-                                    vmin=vmin,
-                                    vmax=vmax,
-                                    outname=outname,
-                                    domain_type=domain_type,
-                                    domain_name=domain_name,
-                                    plot_dict=obs_dict,
-                                    fig_dict=fig_dict,
-                                    text_dict=text_dict,
-                                    debug=self.debug
-                                )
-                                #Clear info for next plot.
-                                del (comb_bx, label_bx, fig_dict, plot_dict, text_dict, obs_dict, obs_plot_dict)   
-                        
-                        elif plot_type.lower() == 'multi_boxplot':
-                            if set_yaxis is True:
-                                if all(k in obs_plot_dict for k in ('vmin_plot', 'vmax_plot')):
-                                    vmin = obs_plot_dict['vmin_plot']
-                                    vmax = obs_plot_dict['vmax_plot']
-                                else:
-                                    print('Warning: vmin_plot and vmax_plot not specified for ' + obsvar + ', so default used.')
-                                    vmin = None
-                                    vmax = None
-                            else:
-                                vmin = None
-                                vmax = None
-                            # First for p_index = 0 create the obs box plot data array.
-                            
-                            if p_index == 0:
-                                comb_bx, label_bx,region_bx = splots.calculate_multi_boxplot(pairdf, pairdf_reg,region_name=region_name, column=obsvar, 
-                                                                             label=p.obs, plot_dict=obs_dict)
-                                
-                            # Then add the models to this dataarray.
-                            comb_bx, label_bx,region_bx = splots.calculate_multi_boxplot(pairdf, pairdf_reg, region_name= region_name,column=modvar, label=p.model, 
-                                                                         plot_dict=plot_dict, comb_bx=comb_bx,
-                                                                         label_bx=label_bx)
-                            
-                            # For the last p_index make the plot.
-                            if p_index == len(pair_labels) - 1:                             
-                                splots.make_multi_boxplot(
-                                    comb_bx,
-                                    label_bx,
-                                    region_bx,  
-                                    region_list = region_list,
-                                    model_name_list=model_name_list,
-                                    ylabel=use_ylabel,
-                                    vmin=vmin,
-                                    vmax=vmax,
-                                    outname=outname,
-                                    domain_type=domain_type,
-                                    domain_name=domain_name,
-                                    plot_dict=obs_dict,
-                                    fig_dict=fig_dict,
-                                    text_dict=text_dict,
-                                    debug=self.debug)
-                                #Clear info for next plot.
-                                del (comb_bx, label_bx,region_bx, fig_dict, plot_dict, text_dict, obs_dict, obs_plot_dict)
-                                
-                        elif plot_type.lower() == 'scorecard':
-                            # First for p_index = 0 create the obs box plot data array.
-                            if p_index == 0:
-                                comb_bx, label_bx,region_bx,msa_bx,time_bx = splots.scorecard_step1_combine_df(pairdf, pairdf_reg,region_name=region_name,urban_rural_name=urban_rural_name,
-                                                                                                       column=obsvar, label=p.obs, plot_dict=obs_dict)
-                            # Then add the model to this dataarray.
-                            comb_bx, label_bx,region_bx, msa_bx,time_bx = splots.scorecard_step1_combine_df(pairdf, pairdf_reg, region_name= region_name,urban_rural_name=urban_rural_name, 
-                                                                                                   column=modvar, label=p.model, plot_dict=plot_dict, comb_bx=comb_bx, label_bx=label_bx)
-                            # For the last p_index make the plot.
-                            if p_index == len(pair_labels) - 1:
-                                output_obs, output_model1, output_model2 = splots.scorecard_step2_prepare_individual_df(comb_bx,region_bx,msa_bx,time_bx,model_name_list=model_name_list)
-      
-                                #split by region, data, and urban/rural
-                                datelist = splots.GetDateList(self.start_time,self.end_time)
-                                OBS_Region_Date_Urban_list, OBS_Region_Date_Rural_list = splots.scorecard_step4_GetRegionLUCDate(ds_name=output_obs,region_list=region_list,datelist=datelist,urban_rural_differentiate_value=urban_rural_differentiate_value)
-                                MODEL1_Region_Date_Urban_list, MODEL1_Region_Date_Rural_list= splots.scorecard_step4_GetRegionLUCDate(ds_name=output_model1,region_list=region_list,datelist=datelist,urban_rural_differentiate_value=urban_rural_differentiate_value)
-                                MODEL2_Region_Date_Urban_list, MODEL2_Region_Date_Rural_list= splots.scorecard_step4_GetRegionLUCDate(ds_name=output_model2,region_list=region_list,datelist=datelist,urban_rural_differentiate_value=urban_rural_differentiate_value)
-                                
-                                #Kick Nan values
-                                OBS_Region_Date_Urban_list_noNan,MODEL1_Region_Date_Urban_list_noNan,MODEL2_Region_Date_Urban_list_noNan = splots.scorecard_step5_KickNan(obs_input=OBS_Region_Date_Urban_list,
-                                                                                                                                                                          model_input_1=MODEL1_Region_Date_Urban_list,
-                                                                                                                                                                          model_input_2=MODEL2_Region_Date_Urban_list)
-                                OBS_Region_Date_Rural_list_noNan,MODEL1_Region_Date_Rural_list_noNan,MODEL2_Region_Date_Rural_list_noNan = splots.scorecard_step5_KickNan(obs_input=OBS_Region_Date_Rural_list,
-                                                                                                                                                                          model_input_1=MODEL1_Region_Date_Rural_list,
-                                                                                                                                                                          model_input_2=MODEL2_Region_Date_Rural_list)
-                                #Get final output Matrix
-                                Output_matrix = splots.scorecard_step8_OutputMatrix(obs_urban_input    = OBS_Region_Date_Urban_list_noNan, 
-                                                                                    model1_urban_input = MODEL1_Region_Date_Urban_list_noNan,
-                                                                                    model2_urban_input = MODEL2_Region_Date_Urban_list_noNan,
-                                                                                    obs_rural_input    = OBS_Region_Date_Rural_list_noNan, 
-                                                                                    model1_rural_input = MODEL1_Region_Date_Rural_list_noNan,
-                                                                                    model2_rural_input = MODEL2_Region_Date_Rural_list_noNan,
-                                                                                    better_or_worse_method = better_or_worse_method)
-                                #plot the scorecard
-                                splots.scorecard_step9_makeplot(output_matrix=Output_matrix,
-                                                         column=obsvar,
-                                                         region_list=region_list,
-                                                         model_name_list=model_name_list,
-                                                         outname=outname,
-                                                         domain_type=domain_type,
-                                                         domain_name=domain_name,
+                # Interpolate based on time in the observations
+                ds_model = ds_model.interp(time=ds_model.time_obs.squeeze())                 
+
+                # Print ds_model and pressure_model values #Debugging
+                ##print(f"ds_model: {ds_model}")
+                ##print(f"pressure_model values: {ds_model['pressure_model'].values}")
+
+                # Define target pressures for interpolation based on the range of pressure_model
+                min_pressure = ds_model['pressure_model'].min().compute()
+                max_pressure = ds_model['pressure_model'].max().compute()
+
+                # Fetch the interval and num_levels from curtain_config
+                interval = curtain_config.get('interval', 10000)  # Default to 10,000 Pa if not provided      # Y-axis tick interval
+                num_levels = curtain_config.get('num_levels', 100)   # Default to 100 levels if not provided
+
+                print(f"Pressure MIN:{min_pressure}, max: {max_pressure}, ytick_interval: {interval}, interpolation_levels: {num_levels}  ")
+
+                # Use num_levels to define target_pressures interpolation levels 
+                target_pressures = np.linspace(max_pressure, min_pressure, num_levels)
+
+                # Debugging: print target pressures
+                ##print(f"Generated target pressures: {target_pressures}, shape: {target_pressures.shape}")
+
+                # Check for NaN values before interpolation
+                ##print(f"NaNs in model data before interpolation: {np.isnan(ds_model[modvar]).sum().compute()}")
+                ##print(f"NaNs in pressure_model before interpolation: {np.isnan(ds_model['pressure_model']).sum().compute()}")
+
+
+                # Resample model data to target pressures using stratify
+                da_wrf_const = resample_stratify(ds_model[modvar], target_pressures, ds_model['pressure_model'], axis=1, interpolation='linear', extrapolation='nan')
+                da_wrf_const.name = modvar
+
+                # Create target_pressures DataArray
+                da_target_pressures = xr.DataArray(target_pressures, dims=('z'))
+                da_target_pressures.name = 'target_pressures'
+
+                # Merge DataArrays into a single Dataset
+                ds_wrf_const = xr.merge([da_wrf_const, da_target_pressures])
+                ds_wrf_const = ds_wrf_const.set_coords('target_pressures')
+
+                # Debugging: print merged dataset for model curtain
+                ##print(ds_wrf_const)
+
+                # Ensure model_data_2d is properly reshaped for the contourfill plot
+                model_data_2d = ds_wrf_const[modvar].squeeze()
+
+                # Debugging: print reshaped model data shape
+                ##print(f"Reshaped model data shape: {model_data_2d.shape}")
+
+                #### model_data_2d for curtain plot ready ####
+
+
+                # Fetch model pressure and other model and observation data from "pairdf" (for scatter plot overlay)
+                time = pairdf['time']
+                obs_pressure = pairdf['pressure_obs']  
+                ##print(f"Length of time: {len(time)}") #Debugging
+                ##print(f"Length of obs_pressure: {len(obs_pressure)}") #Debugging
+
+                # Generate the curtain plot using airplots.make_curtain_plot
+                try:
+                    outname_pair = f"{outname}_{obs_label}_vs_{model_label}.png"
+
+                    print(f"Saving curtain plot to {outname_pair}...")
+
+                    ax = airplots.make_curtain_plot(
+                        time=pd.to_datetime(time),
+                        altitude=target_pressures,  # Use target_pressures for interpolation
+                        model_data_2d=model_data_2d,  # Already reshaped to match the expected shape
+                        obs_pressure=obs_pressure,  # Pressure_obs for obs scatter plot
+                        pairdf=pairdf,  #use pairdf for scatter overlay (model and obs)
+                        mod_var=modvar,
+                        obs_var=obsvar,
+                        grp_dict=curtain_config,
+                        vmin=vmin,
+                        vmax=vmax,
+                        cmin=cmin,
+                        cmax=cmax,
+                        plot_dict=plot_dict,
+                        outname=outname_pair,
+                        domain_type=domain_type,
+                        domain_name=domain_name,
+                        obs_label_config=obs_label_config,
+                        text_dict=text_dict,
+                        debug=self.debug  # Pass debug flag
+                    )
+
+
+                except Exception as e:
+                    print(f"Error generating curtain plot for {modvar} vs {obsvar}: {e}")
+                finally:
+                    plt.close('all')  # Clean up matplotlib resources
+
+
+
+
+            #qzr++ Added vertprofile plotype for aircraft vs model comparisons         
+            elif plot_type.lower() == 'vertprofile':
+                if set_yaxis is True:
+                    if all(k in obs_plot_dict for k in ('vmin_plot', 'vmax_plot')):
+                        vmin = obs_plot_dict['vmin_plot']
+                        vmax = obs_plot_dict['vmax_plot']
+                    else:
+                        print('Warning: vmin_plot and vmax_plot not specified for ' + obsvar + ', so default used.')
+                        vmin = None
+                        vmax = None
+                else:
+                    vmin = None
+                    vmax = None
+                # Select altitude variable from the .yaml file
+                altitude_variable = grp_dict['altitude_variable']
+                # Define the bins for binning the altitude
+                bins = grp_dict['vertprofile_bins']
+                if p_index == 0:
+                    # First plot the observations.
+                    ax = airplots.make_vertprofile(
+                        pairdf,
+                        column=obsvar,
+                        label=p.obs,
+                        bins=bins,
+                        altitude_variable=altitude_variable,
+                        ylabel=use_ylabel,
+                        vmin=vmin,
+                        vmax=vmax,
+                        domain_type=domain_type,
+                        domain_name=domain_name,
+                        plot_dict=obs_dict,
+                        fig_dict=fig_dict,
+                        text_dict=text_dict,
+                        debug=self.debug,
+                        interquartile_style=interquartile_style 
+                )
+
+                # For all p_index plot the model.
+                ax = airplots.make_vertprofile(
+                    pairdf,
+                    column=modvar,
+                    label=p.model,
+                    ax=ax,
+                    bins=bins,
+                    altitude_variable=altitude_variable,
+                    ylabel=use_ylabel,
+                    vmin=vmin,
+                    vmax=vmax,
+                    domain_type=domain_type,
+                    domain_name=domain_name,
+                    plot_dict=plot_dict,
+                    text_dict=text_dict,
+                    debug=self.debug,
+                    interquartile_style=interquartile_style 
+                )
+
+
+                # At the end save the plot.
+                if p_index == len(pair_labels) - 1:
+                    savefig(outname + '.png', logo_height=250)
+                    del (ax, fig_dict, plot_dict, text_dict, obs_dict, obs_plot_dict) # Clear axis for next plot.
+
+            elif plot_type.lower() == 'vertical_single_date':
+                #to use vmin, vmax from obs in yaml
+                if set_yaxis is True:
+                    if all(k in obs_plot_dict for k in ('vmin_plot','vmax_plot')):
+                        vmin = obs_plot_dict['vmin_plot']
+                        vmax = obs_plot_dict['vmax_plot']
+                    else:
+                        print('warning: vmin_plot and vmax_plot not specified for '+obsvar+',so default used.')
+                        vmin = None
+                        vmax = None
+                else:
+                    vmin = None
+                    vmax = None
+                #begin plotting
+                if p_index ==0:
+                    comb_bx, label_bx = splots.calculate_boxplot(pairdf, pairdf_reg, column=obsvar, label=p.obs, plot_dict=obs_dict)
+                comb_bx, label_bx = splots.calculate_boxplot(pairdf, pairdf_reg, column=modvar, label=p.model, plot_dict=plot_dict, comb_bx = comb_bx, label_bx = label_bx)
+                if p_index == len(pair_labels) - 1:
+                    sondeplots.make_vertical_single_date(pairdf,
+                                                          comb_bx,
+                                                          altitude_range=altitude_range,
+                                                          altitude_method=altitude_method,
+                                                          vmin=vmin,
+                                                          vmax=vmax,
+                                                          station_name=station_name,
+                                                          release_time=release_time,
+                                                          label_bx=label_bx,
+                                                          fig_dict=fig_dict,
+                                                          text_dict=text_dict
+                                                          )
+                    #save plot
+                    plt.tight_layout()
+                    savefig(outname+".png", loc=monet_logo_position[0], logo_height=100, dpi=300)
+
+                    del (comb_bx,label_bx,fig_dict, plot_dict, text_dict, obs_dict,obs_plot_dict)
+
+            elif plot_type.lower() == 'vertical_boxplot_os':
+                #to use vmin, vmax from obs in yaml
+                if set_yaxis is True:
+                    if all(k in obs_plot_dict for k in ('vmin_plot','vmax_plot')):
+                        vmin = obs_plot_dict['vmin_plot']
+                        vmax = obs_plot_dict['vmax_plot']
+                    else:
+                        print('warning: vmin_plot and vmax_plot not specified for '+obsvar+',so default used.')
+                        vmin=None
+                        vmax=None
+                else:
+                    vmin=None
+                    vmax=None
+                #begin plotting
+                if p_index ==0:
+                    comb_bx, label_bx = splots.calculate_boxplot(pairdf, pairdf_reg, column=obsvar, label=p.obs, plot_dict=obs_dict)
+                comb_bx, label_bx = splots.calculate_boxplot(pairdf, pairdf_reg, column=modvar, label=p.model, plot_dict=plot_dict, comb_bx = comb_bx, label_bx = label_bx)
+
+                if p_index == len(pair_labels) - 1:
+                    sondeplots.make_vertical_boxplot_os(pairdf,
+                                                         comb_bx,
+                                                         label_bx=label_bx,
+                                                         altitude_range=altitude_range,
+                                                         altitude_method=altitude_method,
+                                                         vmin=vmin,
+                                                         vmax=vmax,
+                                                         altitude_threshold_list=altitude_threshold_list,
+                                                         station_name=station_name,
+                                                         release_time=release_time,
                                                          fig_dict=fig_dict,
-                                                         text_dict=text_dict,
-                                                         datelist=datelist,
-                                                         better_or_worse_method = better_or_worse_method)
-                                #Clear info for next plot.
-                                del (comb_bx, label_bx, region_bx, msa_bx, time_bx, fig_dict, plot_dict, text_dict, obs_dict, obs_plot_dict)
-
-                        elif plot_type.lower() == 'csi':
-                            # First for p_index = 0 create the obs box plot data array.
-                            if p_index == 0:
-                               
-                                comb_bx, label_bx = splots.calculate_boxplot(pairdf, pairdf_reg, column=obsvar,label=p.obs, plot_dict=obs_dict)
-                                print(p_index,np.shape(comb_bx))
-                            # Then add the models to this dataarray.
-                            comb_bx, label_bx = splots.calculate_boxplot(pairdf, pairdf_reg, column=modvar, label=p.model,plot_dict=plot_dict, comb_bx=comb_bx, label_bx=label_bx)
-                            print(p_index,np.shape(comb_bx))
-                            if p_index == len(pair_labels) - 1:
-                                print('final',p_index, len(pair_labels) - 1)
-                                splots.Plot_CSI(column=obsvar,
-                                                score_name_input=score_name,
-                                                threshold_list_input=threshold_list, 
-                                                comb_bx_input=comb_bx,
-                                                plot_dict=plot_dict,
-                                                fig_dict=fig_dict,
-                                                text_dict=text_dict,
-                                                domain_type=domain_type,
-                                                domain_name=domain_name,
-                                                model_name_list=model_name_list,
-                                                threshold_tick_style=threshold_tick_style)
-                                #save figure
-                                plt.tight_layout()
-                                savefig(outname +'.'+score_name+'.png', loc=1, logo_height=100) 
-
-                                #Clear info for next plot.
-                                del (comb_bx, label_bx, fig_dict, plot_dict, text_dict, obs_dict, obs_plot_dict)
-
-
-                        elif plot_type.lower() == 'taylor':
-                            if self.obs[p.obs].sat_type is not None and self.obs[p.obs].sat_type.startswith("tempo_l2"):
-                                make_taylor = xrplots.make_taylor
-                                plot_kwargs = {
-                                    'dset': pairdf,
-                                    'varname_o': obsvar,
-                                    'varname_m': modvar,
-                                    'normalize': True,
-                                }
-                            else:
-                                make_taylor = splots.make_taylor
-                                plot_kwargs = {
-                                    'df': pairdf,
-                                    'column_o': obsvar,
-                                    'column_m': modvar,
-                                }
-                            plot_kwargs = {
-                                **plot_kwargs,
-                                **{
-                                    'label_o': p.obs,
-                                    'label_m': p.model,
-                                    'ylabel': use_ylabel,
-                                    'domain_type': domain_type,
-                                    'domain_name': domain_name,
-                                    'plot_dict': plot_dict,
-                                    'fig_dict': fig_dict,
-                                    'text_dict': text_dict,
-                                    'debug': self.debug,
-                                }
-                            }
-
-                            if set_yaxis is True:
-                                if 'ty_scale' in obs_plot_dict.keys():
-                                    plot_kwargs["ty_scale"] = obs_plot_dict['ty_scale']
-                                else:
-                                    print('Warning: ty_scale not specified for ' + obsvar + ', so default used.')
-                                    plot_kwargs["ty_scale"] = 1.5  # Use default
-                            else:
-                                plot_kwargs["ty_scale"] = 1.5  # Use default
-                            try: 
-                                plot_kwargs["ty_scale"] = grp_dict["data_proc"].get("ty_scale", 1.5)
-                            except KeyError:
-                                plot_kwargs["ty_scale"]=2
-                            if p_index == 0:
-                                # Plot initial obs/model
-                                dia = make_taylor(**plot_kwargs)
-                            else:
-                                # For the rest, plot on top of dia
-                                dia = make_taylor(dia=dia, **plot_kwargs)
-                            # At the end save the plot.
-                            if p_index == len(pair_labels) - 1:
-                                savefig(outname + '.png', logo_height=70)
-                                del (dia, fig_dict, plot_dict, text_dict, obs_dict, obs_plot_dict) #Clear info for next plot.
-                       
+                                                         text_dict=text_dict)
+                    #save plot
+                    plt.tight_layout()
+                    savefig(outname+".png", loc=monet_logo_position[0], logo_height=100, dpi=300)
+                    del (comb_bx,label_bx,fig_dict, plot_dict, text_dict, obs_dict,obs_plot_dict)
+
+            elif plot_type.lower() == 'density_scatter_plot_os':
+                #to use vmin, vmax from obs in yaml
+                if set_yaxis is True:
+                    if all(k in obs_plot_dict for k in ('vmin_plot','vmax_plot')):
+                        vmin = obs_plot_dict['vmin_plot']
+                        vmax = obs_plot_dict['vmax_plot']
+                    else:
+                        print('warning: vmin_plot and vmax_plot not specified for '+obsvar+',so default used.')
+                        vmin=None
+                        vmax=None
+                else:
+                    vmin=None
+                    vmax=None
+
+                #begin plotting
+                plt.figure()
+                sondeplots.density_scatter_plot_os(pairdf,altitude_range,vmin,vmax,station_name,altitude_method,cmap_method,modvar,obsvar)
+                plt.title('Scatter plot for '+model_name_list[0]+' vs. '+model_name_list[p_index+1]+'\nat '+str(station_name[0])+' on '+str(release_time)+' UTC',fontsize=15)
+                plt.tight_layout()
+                savefig(outname+"."+p_label+"."+"-".join(altitude_method[0].split())+".png", loc=monet_logo_position[0], logo_height=100, dpi=300)
+                del (pairdf)
+
+            elif plot_type.lower() == 'violin':
+                if set_yaxis:
+                    if all(k in obs_plot_dict for k in ('vmin_plot', 'vmax_plot')):
+                        vmin = obs_plot_dict['vmin_plot']
+                        vmax = obs_plot_dict['vmax_plot']
+                    else:
+                        print('Warning: vmin_plot and vmax_plot not specified for ' + obsvar + ', so default used.')
+                        vmin = None
+                        vmax = None
+                else:
+                    vmin = None
+                    vmax = None
 
-                        
-                        
-                        elif plot_type.lower() == 'spatial_bias':
-                            if set_yaxis is True:
-                                if 'vdiff_plot' in obs_plot_dict.keys():
-                                    vdiff = obs_plot_dict['vdiff_plot']
-                                else:
-                                    print('Warning: vdiff_plot not specified for ' + obsvar + ', so default used.')
-                                    vdiff = None
-                            else:
-                                vdiff = None
-                            # p_label needs to be added to the outname for this plot
-                            outname = "{}.{}".format(outname, p_label)
-                            splots.make_spatial_bias(
-                                pairdf,
-                                pairdf_reg,
-                                column_o=obsvar,
-                                label_o=p.obs,
-                                column_m=modvar,
-                                label_m=p.model,
-                                ylabel=use_ylabel,
-                                ptile=use_percentile,
-                                vdiff=vdiff,
-                                outname=outname,
-                                domain_type=domain_type,
-                                domain_name=domain_name,
-                                domain_info=domain_info,
-                                fig_dict=fig_dict,
-                                text_dict=text_dict,
-                                debug=self.debug
-                            )
-                        elif plot_type.lower() == 'gridded_spatial_bias':
-                            outname = "{}.{}".format(outname, p_label)
-                            if self.obs[p.obs].sat_type is not None and self.obs[p.obs].sat_type.startswith("tempo_l2"):
-                                make_spatial_bias_gridded = xrplots.make_spatial_bias_gridded
-                                plot_kwargs = {
-                                    'dset': pairdf, 'varname_o': obsvar, 'varname_m': modvar,
-                                }
-                            else:
-                                make_spatial_bias_gridded = splots.make_spatial_bias_gridded
-                                plot_kwargs = {'df': pairdf, 'column_o': obsvar, 'column_m': modvar}
-
-                            plot_kwargs = {
-                                **plot_kwargs,
-                                **{
-                                    "label_o": p.obs,
-                                    "label_m": p.model,
-                                    "ylabel": use_ylabel,
-                                    "outname": outname,
-                                    "domain_type": domain_type,
-                                    "domain_name": domain_name,
-                                    "vdiff": grp_dict["data_proc"].get("vdiff", None),
-                                    "vmax": grp_dict["data_proc"].get("vmax", None),
-                                    "vmin": grp_dict["data_proc"].get("vmin", None),
-                                    "nlevels": grp_dict["data_proc"].get("nlevels", None),
-                                    "fig_dict": fig_dict,
-                                    "text_dict": text_dict,
-                                    "debug": self.debug
-                                }
-                            }
-                            make_spatial_bias_gridded(**plot_kwargs)
-                            del (fig_dict, plot_dict, text_dict, obs_dict, obs_plot_dict) #Clear info for next plot.
-                        elif plot_type.lower() == 'spatial_dist':
-                            outname = "{}.{}".format(outname, p.obs)
-                            plot_kwargs = {
-                                "dset": pairdf,
-                                "varname": obsvar,
-                                "outname": outname,
-                                "label": p.obs,
-                                "ylabel": use_ylabel,
-                                "domain_type": domain_type,
-                                "domain_name": domain_name,
-                                "vmax": grp_dict["data_proc"].get("vmax", None),
-                                "vmin": grp_dict["data_proc"].get("vmin", None),
-                                "fig_dict": fig_dict,
-                                "text_dict": text_dict,
-                                "debug": self.debug,
-                            }
-                            if isinstance(plot_kwargs["vmax"], str):
-                                plot_kwargs["vmax"] = float(plot_kwargs["vmax"])
-                            if isinstance(plot_kwargs["vmin"], str):
-                                plot_kwargs["vmin"] = float(plot_kwargs["vmin"])
-                            xrplots.make_spatial_dist(**plot_kwargs)
-                            plot_kwargs["varname"] = modvar
-                            plot_kwargs["label"] = p.model
-                            plot_kwargs["outname"] = outname.replace(p.obs, p.model)
-                            xrplots.make_spatial_dist(**plot_kwargs)
-                        elif plot_type.lower() == 'spatial_bias_exceedance':
-                            if cal_reg:
-                                if set_yaxis is True:
-                                    if 'vdiff_reg_plot' in obs_plot_dict.keys():
-                                        vdiff = obs_plot_dict['vdiff_reg_plot']
-                                    else:
-                                        print('Warning: vdiff_reg_plot not specified for ' + obsvar + ', so default used.')
-                                        vdiff = None
-                                else:
-                                    vdiff = None
-
-                                # p_label needs to be added to the outname for this plot
-                                outname = "{}.{}".format(outname, p_label)
-                                splots.make_spatial_bias_exceedance(
-                                    pairdf_reg,
-                                    column_o=obsvar+'_reg',
-                                    label_o=p.obs,
-                                    column_m=modvar+'_reg',
-                                    label_m=p.model,
-                                    ylabel=use_ylabel,
-                                    vdiff=vdiff,
-                                    outname=outname,
-                                    domain_type=domain_type,
-                                    domain_name=domain_name,
+                # Initialize the combined DataFrame for violin plots and labels/colors list
+                if p_index == 0:
+                    comb_violin = pd.DataFrame()
+                    label_violin = []
+
+
+                # Define a default color for observations
+                default_obs_color = 'gray'  # Default color for observations
+
+                # Inside your loop for processing each pair
+                obs_label = p.obs
+                model_label = p.model
+
+                # Retrieve plot_kwargs for observation
+                if hasattr(self.obs[p.obs], 'plot_kwargs') and self.obs[p.obs].plot_kwargs is not None:
+                    obs_dict = self.obs[p.obs].plot_kwargs
+                else:
+                    obs_dict = {'color': default_obs_color}
+
+                # Retrieve plot_kwargs for the model
+                model_dict = self.models[p.model].plot_kwargs if self.models[p.model].plot_kwargs is not None else {'color': 'blue'} # Fallback color for models, in case it's missing
+
+                # Call calculate_violin for observation data
+                if p_index ==0:
+                    comb_violin, label_violin = airplots.calculate_violin(
+                        df=pairdf,
+                        column=obsvar,
+                        label=obs_label,
+                        plot_dict=obs_dict,
+                        comb_violin=comb_violin,
+                        label_violin=label_violin
+                    )
+
+                # Call calculate_violin for model data
+                comb_violin, label_violin = airplots.calculate_violin(
+                    df=pairdf,
+                    column=modvar,
+                    label=model_label,
+                    plot_dict=model_dict,
+                    comb_violin=comb_violin,
+                    label_violin=label_violin
+                )
+
+
+                # For the last pair, create the violin plot
+                if p_index == len(pair_labels) - 1:
+                    airplots.make_violin_plot(
+                        comb_violin=comb_violin,
+                        label_violin=label_violin,
+                        ylabel=use_ylabel,
+                        vmin=vmin,
+                        vmax=vmax,
+                        outname=outname,
+                        domain_type=domain_type,
+                        domain_name=domain_name,
+                        fig_dict=fig_dict,
+                        text_dict=text_dict,
+                        debug=self.debug
+                    )
+
+                # Clear the variables for the next plot if needed
+                if p_index == len(pair_labels) - 1:
+                    del (comb_violin, label_violin, fig_dict, plot_dict, text_dict, obs_dict, obs_plot_dict)
+
+
+
+            elif plot_type.lower() == 'scatter_density':
+                scatter_density_config = grp_dict
+
+
+                # Extract relevant parameters from the configuration
+                color_map = scatter_density_config.get('color_map', 'viridis')
+                fill = scatter_density_config.get('fill', False)
+                print(f"Value of fill after reading from scatter_density_config: {fill}") #Debugging
+
+
+                vmin_x = scatter_density_config.get('vmin_x', None)
+                vmax_x = scatter_density_config.get('vmax_x', None)
+                vmin_y = scatter_density_config.get('vmin_y', None)
+                vmax_y = scatter_density_config.get('vmax_y', None)
+
+                # Accessing the correct model and observation configuration/labels/variables
+                model_label = p.model
+                obs_label = p.obs
+
+                try:
+                    _ = self.control_dict['model'][model_label]['mapping'][obs_label]
+                except KeyError:
+                    print(f"Error: Mapping not found for model label '{model_label}' with observation label '{obs_label}' in scatter_density plot")
+                    continue  # Skip this iteration if mapping is not found
+
+                obs_config = self.control_dict['obs'][obs_label]['variables'] # Accessing the correct observation configuration
+
+
+                # Extract ylabel_plot for units extraction
+                ylabel_plot = obs_config.get(obsvar, {}).get('ylabel_plot', f"{obsvar} (units)")
+                title = ylabel_plot
+                units = ylabel_plot[ylabel_plot.find("(")+1 : ylabel_plot.find(")")]
+                xlabel = f"Model {modvar} ({units})"
+                ylabel = f"Observation {obsvar} ({units})"
+
+
+
+
+                # Exclude keys from kwargs that are being passed explicitly
+                excluded_keys = ['color_map', 'fill', 'vmin_x', 'vmax_x', 'vmin_y', 'vmax_y', 'xlabel', 'ylabel', 'title', 'data']
+                kwargs = {key: value for key, value in scatter_density_config.items() if key not in excluded_keys}
+                if 'shade_lowest' in kwargs:
+                    kwargs['thresh'] = 0
+                    del kwargs['shade_lowest']
+
+
+                outname_pair = f"{outname}_{obs_label}_vs_{model_label}.png"
+
+                print(f"Saving scatter density plot to {outname_pair}...")
+
+                # Create the scatter density plot
+                print(f"Processing scatter density plot for model '{model_label}' and observation '{obs_label}'...")
+                ax = airplots.make_scatter_density_plot(
+                    pairdf,
+                    mod_var=modvar,
+                    obs_var=obsvar,
+                    color_map=color_map,
+                    xlabel=xlabel,
+                    ylabel=ylabel,
+                    title=title,
+                    fill=fill,
+                    vmin_x=vmin_x,
+                    vmax_x=vmax_x,
+                    vmin_y=vmin_y,
+                    vmax_y=vmax_y,
+                    outname=outname_pair,
+                    **kwargs                            
+                )
+
+
+                plt.close()  # Close the current figure
+
+            elif plot_type.lower() == 'boxplot':
+                # squeeze the xarray for boxplot, M.Li
+                if obs_type in ["sat_swath_sfc", "sat_swath_clm",
+                                "sat_grid_sfc", "sat_grid_clm",
+                                "sat_swath_prof"]:
+                    pairdf_sel = pairdf.squeeze()
+                else: 
+                    pairdf_sel = pairdf
+
+                if set_yaxis is True:
+                    if all(k in obs_plot_dict for k in ('vmin_plot', 'vmax_plot')):
+                        vmin = obs_plot_dict['vmin_plot']
+                        vmax = obs_plot_dict['vmax_plot']
+                    else:
+                        print('Warning: vmin_plot and vmax_plot not specified for ' + obsvar + ', so default used.')
+                        vmin = None
+                        vmax = None
+                else:
+                    vmin = None
+                    vmax = None
+                # First for p_index = 0 create the obs box plot data array.
+                if p_index == 0:
+                    comb_bx, label_bx = splots.calculate_boxplot(pairdf_sel, pairdf_reg, column=obsvar,   
+                                                                           label=p.obs, plot_dict=obs_dict)
+                # Then add the models to this dataarray.
+                comb_bx, label_bx = splots.calculate_boxplot(pairdf_sel, pairdf_reg, column=modvar, label=p.model,  
+                                                                        plot_dict=plot_dict, comb_bx=comb_bx,
+                                                                        label_bx=label_bx)
+                # For the last p_index make the plot.
+                if p_index == len(pair_labels) - 1:
+                    splots.make_boxplot(
+                        comb_bx,
+                        label_bx,
+                        ylabel=use_ylabel,
+                        vmin=vmin,
+                        vmax=vmax,
+                        outname=outname,
+                        domain_type=domain_type,
+                        domain_name=domain_name,
+                        plot_dict=obs_dict,
+                        fig_dict=fig_dict,
+                        text_dict=text_dict,
+                        debug=self.debug
+                    )
+                    #Clear info for next plot.
+                    del (comb_bx, label_bx, fig_dict, plot_dict, text_dict, obs_dict, obs_plot_dict)   
+
+            elif plot_type.lower() == 'multi_boxplot':
+                if set_yaxis is True:
+                    if all(k in obs_plot_dict for k in ('vmin_plot', 'vmax_plot')):
+                        vmin = obs_plot_dict['vmin_plot']
+                        vmax = obs_plot_dict['vmax_plot']
+                    else:
+                        print('Warning: vmin_plot and vmax_plot not specified for ' + obsvar + ', so default used.')
+                        vmin = None
+                        vmax = None
+                else:
+                    vmin = None
+                    vmax = None
+                # First for p_index = 0 create the obs box plot data array.
+
+                if p_index == 0:
+                    comb_bx, label_bx,region_bx = splots.calculate_multi_boxplot(pairdf, pairdf_reg,region_name=region_name, column=obsvar, 
+                                                                 label=p.obs, plot_dict=obs_dict)
+
+                # Then add the models to this dataarray.
+                comb_bx, label_bx,region_bx = splots.calculate_multi_boxplot(pairdf, pairdf_reg, region_name= region_name,column=modvar, label=p.model, 
+                                                             plot_dict=plot_dict, comb_bx=comb_bx,
+                                                             label_bx=label_bx)
+
+                # For the last p_index make the plot.
+                if p_index == len(pair_labels) - 1:                             
+                    splots.make_multi_boxplot(
+                        comb_bx,
+                        label_bx,
+                        region_bx,  
+                        region_list = region_list,
+                        model_name_list=model_name_list,
+                        ylabel=use_ylabel,
+                        vmin=vmin,
+                        vmax=vmax,
+                        outname=outname,
+                        domain_type=domain_type,
+                        domain_name=domain_name,
+                        plot_dict=obs_dict,
+                        fig_dict=fig_dict,
+                        text_dict=text_dict,
+                        debug=self.debug)
+                    #Clear info for next plot.
+                    del (comb_bx, label_bx,region_bx, fig_dict, plot_dict, text_dict, obs_dict, obs_plot_dict)
+
+            elif plot_type.lower() == 'scorecard':
+                # First for p_index = 0 create the obs box plot data array.
+                if p_index == 0:
+                    comb_bx, label_bx,region_bx,msa_bx,time_bx = splots.scorecard_step1_combine_df(pairdf, pairdf_reg,region_name=region_name,urban_rural_name=urban_rural_name,
+                                                                                           column=obsvar, label=p.obs, plot_dict=obs_dict)
+                # Then add the model to this dataarray.
+                comb_bx, label_bx,region_bx, msa_bx,time_bx = splots.scorecard_step1_combine_df(pairdf, pairdf_reg, region_name= region_name,urban_rural_name=urban_rural_name, 
+                                                                                       column=modvar, label=p.model, plot_dict=plot_dict, comb_bx=comb_bx, label_bx=label_bx)
+                # For the last p_index make the plot.
+                if p_index == len(pair_labels) - 1:
+                    output_obs, output_model1, output_model2 = splots.scorecard_step2_prepare_individual_df(comb_bx,region_bx,msa_bx,time_bx,model_name_list=model_name_list)
+
+                    #split by region, data, and urban/rural
+                    datelist = splots.GetDateList(self.start_time,self.end_time)
+                    OBS_Region_Date_Urban_list, OBS_Region_Date_Rural_list = splots.scorecard_step4_GetRegionLUCDate(ds_name=output_obs,region_list=region_list,datelist=datelist,urban_rural_differentiate_value=urban_rural_differentiate_value)
+                    MODEL1_Region_Date_Urban_list, MODEL1_Region_Date_Rural_list= splots.scorecard_step4_GetRegionLUCDate(ds_name=output_model1,region_list=region_list,datelist=datelist,urban_rural_differentiate_value=urban_rural_differentiate_value)
+                    MODEL2_Region_Date_Urban_list, MODEL2_Region_Date_Rural_list= splots.scorecard_step4_GetRegionLUCDate(ds_name=output_model2,region_list=region_list,datelist=datelist,urban_rural_differentiate_value=urban_rural_differentiate_value)
+
+                    #Kick Nan values
+                    OBS_Region_Date_Urban_list_noNan,MODEL1_Region_Date_Urban_list_noNan,MODEL2_Region_Date_Urban_list_noNan = splots.scorecard_step5_KickNan(obs_input=OBS_Region_Date_Urban_list,
+                                                                                                                                                              model_input_1=MODEL1_Region_Date_Urban_list,
+                                                                                                                                                              model_input_2=MODEL2_Region_Date_Urban_list)
+                    OBS_Region_Date_Rural_list_noNan,MODEL1_Region_Date_Rural_list_noNan,MODEL2_Region_Date_Rural_list_noNan = splots.scorecard_step5_KickNan(obs_input=OBS_Region_Date_Rural_list,
+                                                                                                                                                              model_input_1=MODEL1_Region_Date_Rural_list,
+                                                                                                                                                              model_input_2=MODEL2_Region_Date_Rural_list)
+                    #Get final output Matrix
+                    Output_matrix = splots.scorecard_step8_OutputMatrix(obs_urban_input    = OBS_Region_Date_Urban_list_noNan, 
+                                                                        model1_urban_input = MODEL1_Region_Date_Urban_list_noNan,
+                                                                        model2_urban_input = MODEL2_Region_Date_Urban_list_noNan,
+                                                                        obs_rural_input    = OBS_Region_Date_Rural_list_noNan, 
+                                                                        model1_rural_input = MODEL1_Region_Date_Rural_list_noNan,
+                                                                        model2_rural_input = MODEL2_Region_Date_Rural_list_noNan,
+                                                                        better_or_worse_method = better_or_worse_method)
+                    #plot the scorecard
+                    splots.scorecard_step9_makeplot(output_matrix=Output_matrix,
+                                             column=obsvar,
+                                             region_list=region_list,
+                                             model_name_list=model_name_list,
+                                             outname=outname,
+                                             domain_type=domain_type,
+                                             domain_name=domain_name,
+                                             fig_dict=fig_dict,
+                                             text_dict=text_dict,
+                                             datelist=datelist,
+                                             better_or_worse_method = better_or_worse_method)
+                    #Clear info for next plot.
+                    del (comb_bx, label_bx, region_bx, msa_bx, time_bx, fig_dict, plot_dict, text_dict, obs_dict, obs_plot_dict)
+
+            elif plot_type.lower() == 'csi':
+                # First for p_index = 0 create the obs box plot data array.
+                if p_index == 0:
+
+                    comb_bx, label_bx = splots.calculate_boxplot(pairdf, pairdf_reg, column=obsvar,label=p.obs, plot_dict=obs_dict)
+                    print(p_index,np.shape(comb_bx))
+                # Then add the models to this dataarray.
+                comb_bx, label_bx = splots.calculate_boxplot(pairdf, pairdf_reg, column=modvar, label=p.model,plot_dict=plot_dict, comb_bx=comb_bx, label_bx=label_bx)
+                print(p_index,np.shape(comb_bx))
+                if p_index == len(pair_labels) - 1:
+                    print('final',p_index, len(pair_labels) - 1)
+                    splots.Plot_CSI(column=obsvar,
+                                    score_name_input=score_name,
+                                    threshold_list_input=threshold_list, 
+                                    comb_bx_input=comb_bx,
+                                    plot_dict=plot_dict,
                                     fig_dict=fig_dict,
                                     text_dict=text_dict,
-                                    debug=self.debug
-                                )
-                                del (fig_dict, plot_dict, text_dict, obs_dict, obs_plot_dict) #Clear info for next plot.
-                            else:
-                                print('Warning: spatial_bias_exceedance plot only works when regulatory=True.')
-                        # JianHe: need updates to include regulatory option for overlay plots
-                        elif plot_type.lower() == 'spatial_overlay':
-                            if set_yaxis is True:
-                                if all(k in obs_plot_dict for k in ('vmin_plot', 'vmax_plot', 'nlevels_plot')):
-                                    vmin = obs_plot_dict['vmin_plot']
-                                    vmax = obs_plot_dict['vmax_plot']
-                                    nlevels = obs_plot_dict['nlevels_plot']
-                                elif all(k in obs_plot_dict for k in ('vmin_plot', 'vmax_plot')):
-                                    vmin = obs_plot_dict['vmin_plot']
-                                    vmax = obs_plot_dict['vmax_plot']
-                                    nlevels = None
-                                else:
-                                    print('Warning: vmin_plot and vmax_plot not specified for ' + obsvar + ', so default used.')
-                                    vmin = None
-                                    vmax = None
-                                    nlevels = None
-                            else:
-                                vmin = None
-                                vmax = None
-                                nlevels = None
-                            #Check if z dim is larger than 1. If so select, the first level as all models read through 
-                            #MONETIO will be reordered such that the first level is the level nearest to the surface.
-                            # Create model slice and select time window for spatial plots
-                            try:
-                                self.models[p.model].obj.sizes['z']
-                                if self.models[p.model].obj.sizes['z'] > 1: #Select only surface values.
-                                    vmodel = self.models[p.model].obj.isel(z=0).expand_dims('z',axis=1).loc[
-                                        dict(time=slice(self.start_time, self.end_time))] 
-                                else:
-                                    vmodel = self.models[p.model].obj.loc[dict(time=slice(self.start_time, self.end_time))]
-                            except KeyError as e:
-                                raise Exception("MONET requires an altitude dimension named 'z'") from e
-                            if grp_dict.get('data_proc', {}).get('crop_model', False) and domain_name != all:
-                                vmodel = select_region(vmodel, domain_type, domain_name, domain_info)
-
-                            # Determine proj to use for spatial plots
-                            proj = splots.map_projection(self.models[p.model])
-                            # p_label needs to be added to the outname for this plot
-                            outname = "{}.{}".format(outname, p_label)
-                            # For just the spatial overlay plot, you do not use the model data from the pair file
-                            # So get the variable name again since pairing one could be _new.
-                            # JianHe: only make overplay plots for non-regulatory variables for now
-                            if not cal_reg:
-                                splots.make_spatial_overlay(
-                                    pairdf,
-                                    vmodel,
-                                    column_o=obsvar,
-                                    label_o=p.obs,
-                                    column_m=p.model_vars[index],
-                                    label_m=p.model,
-                                    ylabel=use_ylabel,
-                                    vmin=vmin,
-                                    vmax=vmax,
-                                    nlevels=nlevels,
-                                    proj=proj,
-                                    outname=outname,
                                     domain_type=domain_type,
                                     domain_name=domain_name,
-                                    domain_info=domain_info,
-                                    fig_dict=fig_dict,
-                                    text_dict=text_dict,
-                                    debug=self.debug
-                                )
-                            else:
-                                print('Warning: Spatial overlay plots are not available yet for regulatory metrics.')
+                                    model_name_list=model_name_list,
+                                    threshold_tick_style=threshold_tick_style)
+                    #save figure
+                    plt.tight_layout()
+                    savefig(outname +'.'+score_name+'.png', loc=1, logo_height=100) 
+
+                    #Clear info for next plot.
+                    del (comb_bx, label_bx, fig_dict, plot_dict, text_dict, obs_dict, obs_plot_dict)
+
+
+            elif plot_type.lower() == 'taylor':
+                if self.obs[p.obs].sat_type is not None and self.obs[p.obs].sat_type.startswith("tempo_l2"):
+                    make_taylor = xrplots.make_taylor
+                    plot_kwargs = {
+                        'dset': pairdf,
+                        'varname_o': obsvar,
+                        'varname_m': modvar,
+                        'normalize': True,
+                    }
+                else:
+                    make_taylor = splots.make_taylor
+                    plot_kwargs = {
+                        'df': pairdf,
+                        'column_o': obsvar,
+                        'column_m': modvar,
+                    }
+                plot_kwargs = {
+                    **plot_kwargs,
+                    **{
+                        'label_o': p.obs,
+                        'label_m': p.model,
+                        'ylabel': use_ylabel,
+                        'domain_type': domain_type,
+                        'domain_name': domain_name,
+                        'plot_dict': plot_dict,
+                        'fig_dict': fig_dict,
+                        'text_dict': text_dict,
+                        'debug': self.debug,
+                    }
+                }
+
+                if set_yaxis is True:
+                    if 'ty_scale' in obs_plot_dict.keys():
+                        plot_kwargs["ty_scale"] = obs_plot_dict['ty_scale']
+                    else:
+                        print('Warning: ty_scale not specified for ' + obsvar + ', so default used.')
+                        plot_kwargs["ty_scale"] = 1.5  # Use default
+                else:
+                    plot_kwargs["ty_scale"] = 1.5  # Use default
+                try: 
+                    plot_kwargs["ty_scale"] = grp_dict["data_proc"].get("ty_scale", 1.5)
+                except KeyError:
+                    plot_kwargs["ty_scale"]=2
+                if p_index == 0:
+                    # Plot initial obs/model
+                    dia = make_taylor(**plot_kwargs)
+                else:
+                    # For the rest, plot on top of dia
+                    dia = make_taylor(dia=dia, **plot_kwargs)
+                # At the end save the plot.
+                if p_index == len(pair_labels) - 1:
+                    savefig(outname + '.png', logo_height=70)
+                    del (dia, fig_dict, plot_dict, text_dict, obs_dict, obs_plot_dict) #Clear info for next plot.
 
-                            del (fig_dict, plot_dict, text_dict, obs_dict, obs_plot_dict) #Clear info for next plot.
 
-        # Restore figure count warning
-        plt.rcParams["figure.max_open_warning"] = initial_max_fig
+
+
+            elif plot_type.lower() == 'spatial_bias':
+                if set_yaxis is True:
+                    if 'vdiff_plot' in obs_plot_dict.keys():
+                        vdiff = obs_plot_dict['vdiff_plot']
+                    else:
+                        print('Warning: vdiff_plot not specified for ' + obsvar + ', so default used.')
+                        vdiff = None
+                else:
+                    vdiff = None
+                # p_label needs to be added to the outname for this plot
+                outname = "{}.{}".format(outname, p_label)
+                splots.make_spatial_bias(
+                    pairdf,
+                    pairdf_reg,
+                    column_o=obsvar,
+                    label_o=p.obs,
+                    column_m=modvar,
+                    label_m=p.model,
+                    ylabel=use_ylabel,
+                    ptile=use_percentile,
+                    vdiff=vdiff,
+                    outname=outname,
+                    domain_type=domain_type,
+                    domain_name=domain_name,
+                    domain_info=domain_info,
+                    fig_dict=fig_dict,
+                    text_dict=text_dict,
+                    debug=self.debug
+                )
+            elif plot_type.lower() == 'gridded_spatial_bias':
+                outname = "{}.{}".format(outname, p_label)
+                if self.obs[p.obs].sat_type is not None and self.obs[p.obs].sat_type.startswith("tempo_l2"):
+                    make_spatial_bias_gridded = xrplots.make_spatial_bias_gridded
+                    plot_kwargs = {
+                        'dset': pairdf, 'varname_o': obsvar, 'varname_m': modvar,
+                    }
+                else:
+                    make_spatial_bias_gridded = splots.make_spatial_bias_gridded
+                    plot_kwargs = {'df': pairdf, 'column_o': obsvar, 'column_m': modvar}
+
+                plot_kwargs = {
+                    **plot_kwargs,
+                    **{
+                        "label_o": p.obs,
+                        "label_m": p.model,
+                        "ylabel": use_ylabel,
+                        "outname": outname,
+                        "domain_type": domain_type,
+                        "domain_name": domain_name,
+                        "vdiff": grp_dict["data_proc"].get("vdiff", None),
+                        "vmax": grp_dict["data_proc"].get("vmax", None),
+                        "vmin": grp_dict["data_proc"].get("vmin", None),
+                        "nlevels": grp_dict["data_proc"].get("nlevels", None),
+                        "fig_dict": fig_dict,
+                        "text_dict": text_dict,
+                        "debug": self.debug
+                    }
+                }
+                make_spatial_bias_gridded(**plot_kwargs)
+                del (fig_dict, plot_dict, text_dict, obs_dict, obs_plot_dict) #Clear info for next plot.
+            elif plot_type.lower() == 'spatial_dist':
+                outname = "{}.{}".format(outname, p.obs)
+                plot_kwargs = {
+                    "dset": pairdf,
+                    "varname": obsvar,
+                    "outname": outname,
+                    "label": p.obs,
+                    "ylabel": use_ylabel,
+                    "domain_type": domain_type,
+                    "domain_name": domain_name,
+                    "vmax": grp_dict["data_proc"].get("vmax", None),
+                    "vmin": grp_dict["data_proc"].get("vmin", None),
+                    "fig_dict": fig_dict,
+                    "text_dict": text_dict,
+                    "debug": self.debug,
+                }
+                if isinstance(plot_kwargs["vmax"], str):
+                    plot_kwargs["vmax"] = float(plot_kwargs["vmax"])
+                if isinstance(plot_kwargs["vmin"], str):
+                    plot_kwargs["vmin"] = float(plot_kwargs["vmin"])
+                xrplots.make_spatial_dist(**plot_kwargs)
+                plot_kwargs["varname"] = modvar
+                plot_kwargs["label"] = p.model
+                plot_kwargs["outname"] = outname.replace(p.obs, p.model)
+                xrplots.make_spatial_dist(**plot_kwargs)
+            elif plot_type.lower() == 'spatial_bias_exceedance':
+                if cal_reg:
+                    if set_yaxis is True:
+                        if 'vdiff_reg_plot' in obs_plot_dict.keys():
+                            vdiff = obs_plot_dict['vdiff_reg_plot']
+                        else:
+                            print('Warning: vdiff_reg_plot not specified for ' + obsvar + ', so default used.')
+                            vdiff = None
+                    else:
+                        vdiff = None
+
+                    # p_label needs to be added to the outname for this plot
+                    outname = "{}.{}".format(outname, p_label)
+                    splots.make_spatial_bias_exceedance(
+                        pairdf_reg,
+                        column_o=obsvar+'_reg',
+                        label_o=p.obs,
+                        column_m=modvar+'_reg',
+                        label_m=p.model,
+                        ylabel=use_ylabel,
+                        vdiff=vdiff,
+                        outname=outname,
+                        domain_type=domain_type,
+                        domain_name=domain_name,
+                        fig_dict=fig_dict,
+                        text_dict=text_dict,
+                        debug=self.debug
+                    )
+                    del (fig_dict, plot_dict, text_dict, obs_dict, obs_plot_dict) #Clear info for next plot.
+                else:
+                    print('Warning: spatial_bias_exceedance plot only works when regulatory=True.')
+            # JianHe: need updates to include regulatory option for overlay plots
+            elif plot_type.lower() == 'spatial_overlay':
+                if set_yaxis is True:
+                    if all(k in obs_plot_dict for k in ('vmin_plot', 'vmax_plot', 'nlevels_plot')):
+                        vmin = obs_plot_dict['vmin_plot']
+                        vmax = obs_plot_dict['vmax_plot']
+                        nlevels = obs_plot_dict['nlevels_plot']
+                    elif all(k in obs_plot_dict for k in ('vmin_plot', 'vmax_plot')):
+                        vmin = obs_plot_dict['vmin_plot']
+                        vmax = obs_plot_dict['vmax_plot']
+                        nlevels = None
+                    else:
+                        print('Warning: vmin_plot and vmax_plot not specified for ' + obsvar + ', so default used.')
+                        vmin = None
+                        vmax = None
+                        nlevels = None
+                else:
+                    vmin = None
+                    vmax = None
+                    nlevels = None
+                #Check if z dim is larger than 1. If so select, the first level as all models read through 
+                #MONETIO will be reordered such that the first level is the level nearest to the surface.
+                # Create model slice and select time window for spatial plots
+                try:
+                    self.models[p.model].obj.sizes['z']
+                    if self.models[p.model].obj.sizes['z'] > 1: #Select only surface values.
+                        vmodel = self.models[p.model].obj.isel(z=0).expand_dims('z',axis=1).loc[
+                            dict(time=slice(self.start_time, self.end_time))] 
+                    else:
+                        vmodel = self.models[p.model].obj.loc[dict(time=slice(self.start_time, self.end_time))]
+                except KeyError as e:
+                    raise Exception("MONET requires an altitude dimension named 'z'") from e
+                if grp_dict.get('data_proc', {}).get('crop_model', False) and domain_name != all:
+                    vmodel = select_region_indexed(vmodel, domain_type, domain_name, domain_info,
+                                                   cache_dir=self.region_mask_cache_dir)
+
+                # Determine proj to use for spatial plots
+                proj = splots.map_projection(self.models[p.model])
+                # p_label needs to be added to the outname for this plot
+                outname = "{}.{}".format(outname, p_label)
+                # For just the spatial overlay plot, you do not use the model data from the pair file
+                # So get the variable name again since pairing one could be _new.
+                # JianHe: only make overplay plots for non-regulatory variables for now
+                if not cal_reg:
+                    splots.make_spatial_overlay(
+                        pairdf,
+                        vmodel,
+                        column_o=obsvar,
+                        label_o=p.obs,
+                        column_m=p.model_vars[index],
+                        label_m=p.model,
+                        ylabel=use_ylabel,
+                        vmin=vmin,
+                        vmax=vmax,
+                        nlevels=nlevels,
+                        proj=proj,
+                        outname=outname,
+                        domain_type=domain_type,
+                        domain_name=domain_name,
+                        domain_info=domain_info,
+                        fig_dict=fig_dict,
+                        text_dict=text_dict,
+                        debug=self.debug
+                    )
+                else:
+                    print('Warning: Spatial overlay plots are not available yet for regulatory metrics.')
+
+                del (fig_dict, plot_dict, text_dict, obs_dict, obs_plot_dict) #Clear info for next plot.
 
     def stats(self):
         """Calculate statistics specified in the input yaml file.
@@ -2938,7 +3598,7 @@ class analysis:
         """
         from .stats import proc_stats as proc_stats
         from .plots import surfplots as splots
-        from .util.region_select import select_region
+        from .util.region_select import select_region_indexed
 
         for obs in self.obs:
             obs_data = {obs: self.obs[obs]}
@@ -3023,126 +3683,122 @@ class analysis:
                         else:
                             title = obsvar + ': ' + domain_type + ' ' + domain_name
 
-                    # Finally Loop through each of the pairs
+                    # Finally Loop through each of the pairs.
+                    # The paired data is selected, filtered and converted once per pair,
+                    # then all the statistics are calculated from it together.
                     for p_label in pair_labels:
                         p = self.paired[p_label]
-                        # Create an empty list to store the stat_var
-                        p_stat_list = []
-
-                        # Loop through each of the stats
-                        for stat_grp in stat_list:
-
-                            # find the pair model label that matches the obs var
-                            index = p.obs_vars.index(obsvar)
-                            modvar = p.model_vars[index]
-
-                            # Adjust the modvar as done in pairing script, if the species name in obs and model are the same.
-                            if obsvar == modvar:
-                                modvar = modvar + '_new'
-                            # for satellite no2 trop. columns paired data, M.Li
-                            if obsvar == 'nitrogendioxide_tropospheric_column':
-                                modvar = modvar + 'trpcol' 
-                            
-                            # Query selected points if applicable
-                            if domain_type != 'all':
-                                p_region = select_region(p.obj, domain_type, domain_name, domain_info)
-                            else:
-                                p_region = p.obj
-
-                            dim_order = [dim for dim in ["time", "y", "x"] if dim in p_region.dims]
-                            pairdf_all = p_region.to_dataframe(dim_order=dim_order)
-
-                            # Select only the analysis time window.
-                            pairdf_all = pairdf_all.loc[self.start_time : self.end_time]
-
-                            # Query with filter options
-                            if 'data_proc' in stat_dict:
-                                if 'filter_dict' in stat_dict['data_proc'] and 'filter_string' in stat_dict['data_proc']:
-                                    raise Exception("For statistics, only one of filter_dict and filter_string can be specified.")
-                                elif 'filter_dict' in stat_dict['data_proc']:
-                                    filter_dict = stat_dict['data_proc']['filter_dict']
-                                    for column in filter_dict.keys():
-                                        filter_vals = filter_dict[column]['value']
-                                        filter_op = filter_dict[column]['oper']
-                                        if filter_op == 'isin':
-                                            pairdf_all.query(f'{column} == {filter_vals}', inplace=True)
-                                        elif filter_op == 'isnotin':
-                                            pairdf_all.query(f'{column} != {filter_vals}', inplace=True)
-                                        else:
-                                            pairdf_all.query(f'{column} {filter_op} {filter_vals}', inplace=True)
-                                elif 'filter_string' in stat_dict['data_proc']:
-                                    pairdf_all.query(stat_dict['data_proc']['filter_string'], inplace=True)
-
-                            # Drop sites with greater than X percent NAN values
-                            if 'data_proc' in stat_dict:
-                                if 'rem_obs_by_nan_pct' in stat_dict['data_proc']:
-                                    grp_var = stat_dict['data_proc']['rem_obs_by_nan_pct']['group_var']
-                                    pct_cutoff = stat_dict['data_proc']['rem_obs_by_nan_pct']['pct_cutoff']
-
-                                    if stat_dict['data_proc']['rem_obs_by_nan_pct']['times'] == 'hourly':
-                                        # Select only hours at the hour
-                                        hourly_pairdf_all = pairdf_all.reset_index().loc[pairdf_all.reset_index()['time'].dt.minute==0,:]
-                                        
-                                        # calculate total obs count, obs count with nan removed, and nan percent for each group
-                                        grp_fullcount = hourly_pairdf_all[[grp_var,obsvar]].groupby(grp_var).size().rename({0:obsvar})
-                                        grp_nonan_count = hourly_pairdf_all[[grp_var,obsvar]].groupby(grp_var).count() # counts only non NA values    
-                                    else: 
-                                        # calculate total obs count, obs count with nan removed, and nan percent for each group
-                                        grp_fullcount = pairdf_all[[grp_var,obsvar]].groupby(grp_var).size().rename({0:obsvar})
-                                        grp_nonan_count = pairdf_all[[grp_var,obsvar]].groupby(grp_var).count() # counts only non NA values  
-                                    
-                                    grp_pct_nan = 100 - grp_nonan_count.div(grp_fullcount,axis=0)*100
-                                    
-                                    # make list of sites meeting condition and select paired data by this by this
-                                    grp_select = grp_pct_nan.query(obsvar + ' < ' + str(pct_cutoff)).reset_index()
-                                    pairdf_all = pairdf_all.loc[pairdf_all[grp_var].isin(grp_select[grp_var].values)]
-                            
-                            # Drop NaNs for model and observations in all cases.
-                            pairdf = pairdf_all.reset_index().dropna(subset=[modvar, obsvar])
+                        # find the pair model label that matches the obs var
+                        index = p.obs_vars.index(obsvar)
+                        modvar = p.model_vars[index]
+
+                        # Adjust the modvar as done in pairing script, if the species name in obs and model are the same.
+                        if obsvar == modvar:
+                            modvar = modvar + '_new'
+                        # for satellite no2 trop. columns paired data, M.Li
+                        if obsvar == 'nitrogendioxide_tropospheric_column':
+                            modvar = modvar + 'trpcol' 
+
+                        # Query selected points if applicable
+                        if domain_type != 'all':
+                            p_region = select_region_indexed(p.obj, domain_type, domain_name, domain_info,
+                                                             cache_dir=self.region_mask_cache_dir)
+                        else:
+                            p_region = p.obj
+
+                        dim_order = [dim for dim in ["time", "y", "x"] if dim in p_region.dims]
+                        pairdf_all = p_region.to_dataframe(dim_order=dim_order)
 
-                            # JianHe: do we need provide a warning if pairdf is empty (no valid obsdata) for specific subdomain?
-                            if pairdf[obsvar].isnull().all() or pairdf.empty:
-                                print('Warning: no valid obs found for '+domain_name)
-                                p_stat_list.append('NaN')
+                        # Select only the analysis time window.
+                        pairdf_all = pairdf_all.loc[self.start_time : self.end_time]
+
+                        # Query with filter options
+                        if 'data_proc' in stat_dict:
+                            if 'filter_dict' in stat_dict['data_proc'] and 'filter_string' in stat_dict['data_proc']:
+                                raise Exception("For statistics, only one of filter_dict and filter_string can be specified.")
+                            elif 'filter_dict' in stat_dict['data_proc']:
+                                filter_dict = stat_dict['data_proc']['filter_dict']
+                                for column in filter_dict.keys():
+                                    filter_vals = filter_dict[column]['value']
+                                    filter_op = filter_dict[column]['oper']
+                                    if filter_op == 'isin':
+                                        pairdf_all.query(f'{column} == {filter_vals}', inplace=True)
+                                    elif filter_op == 'isnotin':
+                                        pairdf_all.query(f'{column} != {filter_vals}', inplace=True)
+                                    else:
+                                        pairdf_all.query(f'{column} {filter_op} {filter_vals}', inplace=True)
+                            elif 'filter_string' in stat_dict['data_proc']:
+                                pairdf_all.query(stat_dict['data_proc']['filter_string'], inplace=True)
+
+                        # Drop sites with greater than X percent NAN values
+                        if 'data_proc' in stat_dict:
+                            if 'rem_obs_by_nan_pct' in stat_dict['data_proc']:
+                                grp_var = stat_dict['data_proc']['rem_obs_by_nan_pct']['group_var']
+                                pct_cutoff = stat_dict['data_proc']['rem_obs_by_nan_pct']['pct_cutoff']
+
+                                if stat_dict['data_proc']['rem_obs_by_nan_pct']['times'] == 'hourly':
+                                    # Select only hours at the hour
+                                    hourly_pairdf_all = pairdf_all.reset_index().loc[pairdf_all.reset_index()['time'].dt.minute==0,:]
+
+                                    # calculate total obs count, obs count with nan removed, and nan percent for each group
+                                    grp_fullcount = hourly_pairdf_all[[grp_var,obsvar]].groupby(grp_var).size().rename({0:obsvar})
+                                    grp_nonan_count = hourly_pairdf_all[[grp_var,obsvar]].groupby(grp_var).count() # counts only non NA values    
+                                else: 
+                                    # calculate total obs count, obs count with nan removed, and nan percent for each group
+                                    grp_fullcount = pairdf_all[[grp_var,obsvar]].groupby(grp_var).size().rename({0:obsvar})
+                                    grp_nonan_count = pairdf_all[[grp_var,obsvar]].groupby(grp_var).count() # counts only non NA values  
+
+                                grp_pct_nan = 100 - grp_nonan_count.div(grp_fullcount,axis=0)*100
+
+                                # make list of sites meeting condition and select paired data by this by this
+                                grp_select = grp_pct_nan.query(obsvar + ' < ' + str(pct_cutoff)).reset_index()
+                                pairdf_all = pairdf_all.loc[pairdf_all[grp_var].isin(grp_select[grp_var].values)]
+
+                        # Drop NaNs for model and observations in all cases.
+                        pairdf = pairdf_all.reset_index().dropna(subset=[modvar, obsvar])
+
+                        # JianHe: do we need provide a warning if pairdf is empty (no valid obsdata) for specific subdomain?
+                        if pairdf[obsvar].isnull().all() or pairdf.empty:
+                            print('Warning: no valid obs found for '+domain_name)
+                            df_o_d[p_label] = ['NaN'] * len(stat_list)
+                            continue
+
+                        if cal_reg:
+                            # Process regulatory values
+                            df2 = (
+                                pairdf.copy()
+                                .groupby("siteid")
+                                .resample('h', on='time_local')
+                                .mean(numeric_only=True)
+                                .reset_index()
+                            )
+
+                            if obsvar == 'PM2.5':
+                                pairdf_reg = splots.make_24hr_regulatory(df2,[obsvar,modvar]).rename(index=str,columns={obsvar+'_y':obsvar+'_reg',modvar+'_y':modvar+'_reg'})
+                            elif obsvar == 'OZONE':
+                                pairdf_reg = splots.make_8hr_regulatory(df2,[obsvar,modvar]).rename(index=str,columns={obsvar+'_y':obsvar+'_reg',modvar+'_y':modvar+'_reg'})
+                            else:
+                                print('Warning: no regulatory calculations found for ' + obsvar + '. Setting stat calculation to NaN.')
+                                del df2
+                                df_o_d[p_label] = ['NaN'] * len(stat_list)
                                 continue
+                            del df2
+                            if len(pairdf_reg[obsvar+'_reg']) == 0:
+                                print('No valid data for '+obsvar+'_reg. Setting stat calculation to NaN.')
+                                df_o_d[p_label] = ['NaN'] * len(stat_list)
+                                continue
+                            else:
+                                # Drop NaNs for model and observations in all cases.
+                                pairdf2 = pairdf_reg.reset_index().dropna(subset=[modvar+'_reg', obsvar+'_reg'])
 
+                        # Calculate all statistics in one pass over the paired data
+                        if obsvar == 'WD':  # Use separate calculations for WD
+                            p_stat_list = proc_stats.calc_all(pairdf, stat_list, obsvar=obsvar, modvar=modvar, wind=True)
+                        else:
                             if cal_reg:
-                                # Process regulatory values
-                                df2 = (
-                                    pairdf.copy()
-                                    .groupby("siteid")
-                                    .resample('h', on='time_local')
-                                    .mean(numeric_only=True)
-                                    .reset_index()
-                                )
-
-                                if obsvar == 'PM2.5':
-                                    pairdf_reg = splots.make_24hr_regulatory(df2,[obsvar,modvar]).rename(index=str,columns={obsvar+'_y':obsvar+'_reg',modvar+'_y':modvar+'_reg'})
-                                elif obsvar == 'OZONE':
-                                    pairdf_reg = splots.make_8hr_regulatory(df2,[obsvar,modvar]).rename(index=str,columns={obsvar+'_y':obsvar+'_reg',modvar+'_y':modvar+'_reg'})
-                                else:
-                                    print('Warning: no regulatory calculations found for ' + obsvar + '. Setting stat calculation to NaN.')
-                                    del df2
-                                    p_stat_list.append('NaN')
-                                    continue
-                                del df2
-                                if len(pairdf_reg[obsvar+'_reg']) == 0:
-                                    print('No valid data for '+obsvar+'_reg. Setting stat calculation to NaN.')
-                                    p_stat_list.append('NaN')
-                                    continue
-                                else:
-                                    # Drop NaNs for model and observations in all cases.
-                                    pairdf2 = pairdf_reg.reset_index().dropna(subset=[modvar+'_reg', obsvar+'_reg'])
-
-                            # Create empty list for all dom
-                            # Calculate statistic and append to list
-                            if obsvar == 'WD':  # Use separate calculations for WD
-                                p_stat_list.append(proc_stats.calc(pairdf, stat=stat_grp, obsvar=obsvar, modvar=modvar, wind=True))
+                                p_stat_list = proc_stats.calc_all(pairdf2, stat_list, obsvar=obsvar+'_reg', modvar=modvar+'_reg', wind=False)
                             else:
-                                if cal_reg:
-                                    p_stat_list.append(proc_stats.calc(pairdf2, stat=stat_grp, obsvar=obsvar+'_reg', modvar=modvar+'_reg', wind=False))
-                                else:
-                                    p_stat_list.append(proc_stats.calc(pairdf, stat=stat_grp, obsvar=obsvar, modvar=modvar, wind=False))
+                                p_stat_list = proc_stats.calc_all(pairdf, stat_list, obsvar=obsvar, modvar=modvar, wind=False)
 
                         # Save the stat to a dataarray
                         df_o_d[p_label] = p_stat_list
@@ -198,9 +198,118 @@ def calc(df,stat=None,obsvar=None,modvar=None,wind=False):
     else:
         print('Stat not found: ' + stat)
         value = np.nan
-            
+
     return value
 
+#Statistics that calc_all derives from sums and sorted arrays shared between them.
+#The remaining ones (element-wise ratios, which need MONET's masking of invalid
+#values, and the wind direction variants) are passed on to calc.
+_SHARED_STATS = {'STDO', 'STDP', 'NO', 'NOP', 'NP', 'MO', 'MP', 'MdnO', 'MdnP',
+                 'MB', 'MdnB', 'NMB', 'NMdnB', 'ME', 'MdnE', 'NME', 'NMdnE',
+                 'R2', 'RMSE', 'd1', 'E1', 'IOA', 'AC'}
+_WIND_STATS = {'MB', 'MdnB', 'NMB', 'ME', 'MdnE', 'RMSE', 'IOA', 'AC'}
+
+def _median_sorted(a):
+    """Median of an already sorted 1D array."""
+    n = a.size
+    if n == 0:
+        return np.nan
+    if n % 2:
+        return a[n // 2]
+    return 0.5 * (a[n // 2 - 1] + a[n // 2])
+
+def calc_all(df,stat_list,obsvar=None,modvar=None,wind=False):
+    """Calculate several statistics in a single pass over the paired data.
+
+    Sums, sums of squares and sorted arrays are computed once and shared
+    between all the statistics in ``stat_list``. The values are the same
+    as calling :func:`calc` for each statistic.
+
+    Parameters
+    ----------
+    df : dataframe
+        model/obs pair data, with NaNs already removed
+    stat_list : list of strings
+        List of statistic abbreviations (see :func:`produce_stat_dict`)
+    obsvar : str
+        Column label of observation variable
+    modvar : str
+        Column label of model variable
+    wind : bool
+        If variable is wind MONET applies a special calculation to handle
+        negative and positive values. If wind (True) if not wind (False).
+
+    Returns
+    -------
+    list
+        statistical values, in the order of ``stat_list``
+
+    """
+    obs = np.asarray(df[obsvar].values, dtype=np.float64)
+    mod = np.asarray(df[modvar].values, dtype=np.float64)
+    stats = set(stat_list)
+    shared = {}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if stats & _SHARED_STATS:
+            n = obs.size
+            shared['NO'] = np.count_nonzero(np.isfinite(obs))
+            shared['NP'] = np.count_nonzero(np.isfinite(mod))
+            shared['NOP'] = np.count_nonzero(np.isfinite(obs) & np.isfinite(mod))
+
+            # sums
+            sum_o = obs.sum()
+            mo = sum_o / n
+            mp = mod.sum() / n
+            diff = mod - obs
+            absdiff = np.abs(diff)
+            sum_d = diff.sum()
+            sum_ad = absdiff.sum()
+            sum_dd = np.dot(diff, diff)
+            shared['MO'] = mo
+            shared['MP'] = mp
+            shared['MB'] = sum_d / n
+            shared['NMB'] = sum_d / sum_o * 100.
+            shared['ME'] = sum_ad / n
+            shared['NME'] = sum_ad / sum_o * 100.
+            shared['RMSE'] = np.sqrt(sum_dd / n)
+
+            # sums of squares of the anomalies
+            obs_anom = obs - mo
+            mod_anom = mod - mp
+            mod_anom_o = mod - mo  # model relative to the obs mean
+            ss_o = np.dot(obs_anom, obs_anom)
+            ss_p = np.dot(mod_anom, mod_anom)
+            shared['STDO'] = np.sqrt(ss_o / n)
+            shared['STDP'] = np.sqrt(ss_p / n)
+            shared['R2'] = np.dot(obs_anom, mod_anom) ** 2 / (ss_o * ss_p)
+            shared['AC'] = np.dot(mod_anom_o, obs_anom) / np.sqrt(np.dot(mod_anom_o, mod_anom_o) * ss_o)
+            abs_obs_anom = np.abs(obs_anom)
+            pot = np.abs(mod_anom_o) + abs_obs_anom
+            shared['E1'] = 1. - sum_ad / abs_obs_anom.sum()
+            shared['d1'] = 1. - sum_ad / pot.sum()
+            shared['IOA'] = 1. - sum_dd / np.dot(pot, pot)
+
+            # sorted arrays for the medians
+            if stats & {'MdnO', 'MdnP', 'MdnB', 'MdnE', 'NMdnB', 'NMdnE'}:
+                mdn_o = _median_sorted(np.sort(obs))
+                mdn_b = _median_sorted(np.sort(diff))
+                mdn_e = _median_sorted(np.sort(absdiff))
+                shared['MdnO'] = mdn_o
+                shared['MdnP'] = _median_sorted(np.sort(mod))
+                shared['MdnB'] = mdn_b
+                shared['MdnE'] = mdn_e
+                shared['NMdnB'] = mdn_b / mdn_o * 100.
+                shared['NMdnE'] = mdn_e / mdn_o * 100.
+
+    values = []
+    for stat in stat_list:
+        if stat in shared and not (wind is True and stat in _WIND_STATS):
+            values.append(shared[stat])
+        else:
+            values.append(calc(df, stat=stat, obsvar=obsvar, modvar=modvar, wind=wind))
+    return values
+
 def create_table(df,outname='plot',title='stats',out_table_kwargs=None,debug=False):
     """Calculates all of the specified statistics, save to csv file, and
     optionally save to a figure visualizing the table. 
@@ -0,0 +1,66 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+import numpy as np
+import pytest
+import xarray as xr
+
+from melodies_monet.util import column_physics, tools
+
+
+def _model(nz=6, nx=3, ny=4):
+    rng = np.random.default_rng(0)
+    shape = (nz, nx, ny)
+    dims = ("z", "x", "y")
+    return xr.Dataset(
+        {
+            "NO2": (dims, rng.uniform(0, 5, shape)),
+            "O3": (dims, rng.uniform(20, 60, shape)),
+            "pres_pa_mid": (dims, np.sort(rng.uniform(5e4, 1e5, shape), axis=0)[::-1]),
+            "temperature_k": (dims, rng.uniform(220, 300, shape)),
+            "dz_m": (dims, rng.uniform(10, 500, shape)),
+            "surfpres_pa": (("x", "y"), rng.uniform(9e4, 1e5, (nx, ny))),
+        },
+        coords={"z": np.arange(nz)},
+    )
+
+
+def test_altitude_thickness_roundtrip():
+    ds = _model()
+    altitude = column_physics.altitude_from_thickness(ds["dz_m"])
+    np.testing.assert_allclose(altitude.values, np.cumsum(ds["dz_m"].values, axis=0))
+    assert altitude.attrs["units"] == "m"
+
+    dz_m = column_physics.thickness_from_altitude(altitude)
+    np.testing.assert_allclose(dz_m.values, ds["dz_m"].values)
+
+    # stays lazy with dask
+    lazy = column_physics.thickness_from_altitude(
+        column_physics.altitude_from_thickness(ds["dz_m"].chunk({"x": 1}))
+    )
+    assert lazy.chunks is not None
+    np.testing.assert_allclose(lazy.values, ds["dz_m"].values)
+
+
+def test_column_physics():
+    ds = _model()
+    out = column_physics.column_physics(ds, ["NO2", "O3"], altitude=True, total=True)
+    assert set(out.data_vars) == {"altitude", "NO2_col", "O3_col", "NO2_total_col", "O3_total_col"}
+
+    fac = 1e-9 * tools.N_A / 1e4
+    for var in ["NO2", "O3"]:
+        partial = ds[var] * ds["pres_pa_mid"] * ds["dz_m"] * fac / (tools.R * ds["temperature_k"])
+        np.testing.assert_allclose(out[f"{var}_col"].values, partial.values, rtol=1e-12)
+        total = partial.where(ds["pres_pa_mid"] <= ds["surfpres_pa"]).sum("z")
+        np.testing.assert_allclose(out[f"{var}_total_col"].values, total.values, rtol=1e-12)
+
+    np.testing.assert_allclose(tools.calc_partialcolumn(ds, "NO2").values, out["NO2_col"].values)
+    np.testing.assert_allclose(tools.calc_totalcolumn(ds, "NO2").values, out["NO2_total_col"].values)
+
+    # the layer thickness can also come from the altitude
+    from_altitude = ds.drop_vars("dz_m").assign(altitude=out["altitude"])
+    out_alt = column_physics.column_physics(from_altitude, "NO2", dz=True)
+    np.testing.assert_allclose(out_alt["dz_m"].values, ds["dz_m"].values)
+    np.testing.assert_allclose(out_alt["NO2_col"].values, out["NO2_col"].values, rtol=1e-12)
+
+    with pytest.raises(KeyError):
+        column_physics.column_physics(ds.drop_vars("dz_m"), "NO2")
@@ -0,0 +1,74 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+pytest.importorskip("monet")
+pytest.importorskip("monetio")
+from melodies_monet import driver  # noqa: E402
+
+SPECIES = ["OZONE", "PM2.5", "NO2", "NO", "CO", "SO2", "PM10"]
+
+
+def _write_pt_sfc(fn):
+    # AirNow-like file, with more species than the analysis uses
+    rng = np.random.default_rng(0)
+    nt, nx = 24, 3
+    dims = ("time", "y", "x")
+    time = pd.date_range("2019-09-01", periods=nt, freq="h")
+    ds = xr.Dataset(
+        {sp: (dims, rng.uniform(0, 50, (nt, 1, nx))) for sp in SPECIES},
+        coords={
+            "time": time,
+            "latitude": (("y", "x"), [[35.0, 36.0, 37.0]]),
+            "longitude": (("y", "x"), [[-100.0, -99.0, -98.0]]),
+        },
+    )
+    ds["qc"] = (dims, rng.integers(0, 2, (nt, 1, nx)))
+    time_local = (time - pd.Timedelta("6h")).values[:, None, None]
+    ds["time_local"] = (dims, np.broadcast_to(time_local, (nt, 1, nx)))
+    ds["siteid"] = (("y", "x"), [["a", "b", "c"]])
+    ds.to_netcdf(fn)
+
+
+def _control(fn, **obs_kws):
+    return {
+        "model": {
+            "cmaq": {"mapping": {"airnow": {"O3": "OZONE", "PM25_TOT": "PM2.5"}}},
+            "wrfchem": {"mapping": {"aqs": {"co": "CO"}}},
+        },
+        "obs": {
+            "airnow": dict(
+                obs_type="pt_sfc",
+                filename=fn,
+                variables={"NO2": {"unit_scale": 1000, "unit_scale_method": "*"}},
+                variable_summing={"NOx": {"vars": ["NO2", "NO"]}},
+                data_proc={"filter_dict": {"qc": {"oper": "==", "value": 0}}},
+                **obs_kws,
+            ),
+        },
+    }
+
+
+def test_open_obs_prune_variables(tmp_path):
+    pytest.importorskip("netCDF4")
+    fn = str(tmp_path / "airnow.nc")
+    _write_pt_sfc(fn)
+
+    an = driver.analysis()
+    an.control_dict = _control(fn)
+    an.open_obs()
+    obs = an.obs["airnow"]
+    # mapping, variables, variable_summing and filter columns, and the site variables
+    required = {"OZONE", "PM2.5", "NO2", "NO", "NOx", "qc"}
+    assert obs.required_variables(an.control_dict) == required
+    assert set(obs.obj.data_vars) == required | {"time_local", "siteid"}
+    assert set(obs.obj.coords) == {"time", "latitude", "longitude"}
+
+    an = driver.analysis()
+    an.control_dict = _control(fn, prune_variables=False)
+    an.open_obs()
+    everything = set(SPECIES) | {"NOx", "qc", "time_local", "siteid"}
+    assert set(an.obs["airnow"].obj.data_vars) == everything
@@ -0,0 +1,51 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+import numpy as np
+
+from melodies_monet.util import grid_util
+
+
+def _curvilinear_grid(ny=5, nx=6):
+    j, i = np.meshgrid(np.arange(ny), np.arange(nx), indexing="ij")
+    # rotated and sheared grid, ~0.1 degree cells
+    lon = -100 + 0.1 * i + 0.02 * j
+    lat = 40 + 0.1 * j + 0.01 * i
+    return lon, lat
+
+
+def test_swath_cell_index():
+    lon, lat = _curvilinear_grid()
+    # pixels at the cell centers (slightly shifted) and outside the grid
+    swath_lon = np.array([lon[2, 3] + 0.01, lon[0, 0], lon[4, 5] - 0.01, -90.0, np.nan])
+    swath_lat = np.array([lat[2, 3] - 0.01, lat[0, 0], lat[4, 5], 40.0, 40.0])
+    cell = grid_util.swath_cell_index(lon, lat, swath_lon, swath_lat)
+    expected = [np.ravel_multi_index(ij, lon.shape) for ij in [(2, 3), (0, 0), (4, 5)]]
+    np.testing.assert_array_equal(cell, expected + [-1, -1])
+
+
+def test_bin_swaths_to_grid():
+    lon, lat = _curvilinear_grid()
+    rng = np.random.default_rng(0)
+    swaths = []
+    expected_sum = np.zeros((2,) + lon.shape)
+    expected_count = np.zeros((2,) + lon.shape, dtype=int)
+    for _ in range(3):
+        j = rng.integers(0, lon.shape[0], 40)
+        i = rng.integers(0, lon.shape[1], 40)
+        swath_lon = lon[j, i] + rng.uniform(-0.03, 0.03, 40)
+        swath_lat = lat[j, i] + rng.uniform(-0.03, 0.03, 40)
+        data = rng.uniform(0, 1, (2, 40))
+        data[1, :5] = np.nan
+        cell = grid_util.swath_cell_index(lon, lat, swath_lon, swath_lat)
+        np.testing.assert_array_equal(cell, np.ravel_multi_index((j, i), lon.shape))
+        swaths.append((cell, data))
+        for v in range(2):
+            ok = ~np.isnan(data[v])
+            np.add.at(expected_sum[v], (j[ok], i[ok]), data[v, ok])
+            np.add.at(expected_count[v], (j[ok], i[ok]), 1)
+
+    count, mean = grid_util.bin_swaths_to_grid(lon, lat, swaths)
+    assert mean.shape == (2,) + lon.shape
+    np.testing.assert_array_equal(count, expected_count)
+    with np.errstate(invalid="ignore"):
+        np.testing.assert_allclose(mean, expected_sum / expected_count)
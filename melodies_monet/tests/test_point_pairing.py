@@ -0,0 +1,103 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from melodies_monet.util import point_pairing
+
+
+def _model():
+    rng = np.random.default_rng(0)
+    time = pd.date_range("2023-07-01", periods=6, freq="h")
+    lat, lon = np.meshgrid(np.linspace(30, 40, 11), np.linspace(-100, -90, 21), indexing="ij")
+    return xr.Dataset(
+        {
+            "OZONE": (("time", "z", "y", "x"), rng.uniform(0, 80, (6, 2, 11, 21))),
+            "PM25": (("time", "z", "y", "x"), rng.uniform(0, 20, (6, 2, 11, 21))),
+        },
+        coords={"time": time, "latitude": (("y", "x"), lat), "longitude": (("y", "x"), lon)},
+    )
+
+
+def _obs():
+    rng = np.random.default_rng(1)
+    time = pd.date_range("2023-07-01 02:00", periods=6, freq="h")
+    lat = np.array([[31.02, 35.49, 39.0, 50.0]])
+    lon = np.array([[-99.0, -95.26, -90.0, -95.0]])
+    ds = xr.Dataset(
+        {
+            "OZONE": (("time", "y", "x"), rng.uniform(0, 80, (6, 1, 4))),
+            "siteid": (("y", "x"), [["a", "b", "c", "d"]]),
+        },
+        coords={"time": time, "latitude": (("y", "x"), lat), "longitude": (("y", "x"), lon)},
+    )
+    return ds.assign_coords(x=range(4))
+
+
+def test_pair_point_xarray():
+    model, obs = _model(), _obs()
+    paired = point_pairing.pair_point_xarray(model, obs, radius_of_influence=1e5)
+
+    assert paired.OZONE_new.dims == ("time", "x")
+    assert paired.PM25.dims == ("time", "x")
+    np.testing.assert_array_equal(paired.time, obs.time)
+    np.testing.assert_array_equal(paired.OZONE, obs.OZONE.squeeze("y"))
+    # site b is nearest to the cell at 35N 95.5W, the first four obs times are in the model
+    np.testing.assert_array_equal(paired.OZONE_new[:4, 1], model.OZONE[2:, 0, 5, 9])
+    np.testing.assert_array_equal(paired.PM25[:4, 0], model.PM25[2:, 0, 1, 2])
+    # obs times after the model times
+    assert paired.OZONE_new[4:].isnull().all()
+    # site d is outside of the radius of influence
+    assert paired.OZONE_new[:, 3].isnull().all()
+
+
+def test_site_index(tmpdir):
+    lat, lon = np.meshgrid(np.linspace(-80, 80, 17), np.linspace(-180, 170, 36), indexing="ij")
+    index = point_pairing.SiteIndex(lon, lat)
+    (iy, ix), valid = index.query(np.array([179.0, np.nan]), np.array([0.4, 0.0]))
+    # across the dateline
+    assert (iy[0], ix[0]) == (8, 0)
+    np.testing.assert_array_equal(valid, [True, False])
+
+    # shared by grids with the same coordinates, and saved to the cache directory
+    point_pairing._SITE_INDEXES.clear()
+    index = point_pairing.SiteIndex.from_grid(lon, lat, cache_dir=str(tmpdir))
+    assert point_pairing.SiteIndex.from_grid(lon.copy(), lat.copy()) is index
+    assert len(tmpdir.listdir()) == 1
+    point_pairing._SITE_INDEXES.clear()
+    index2 = point_pairing.SiteIndex.from_grid(lon, lat, cache_dir=str(tmpdir))
+    assert index2 is not index and index2.key == index.key
+    assert index2.query([179.0], [0.4])[0] == index.query([179.0], [0.4])[0]
+
+
+def test_combine_da_to_points():
+    model = _model()
+    points = xr.Dataset(
+        {"O3": (("y", "x"), [[1.0, 2.0, 3.0]])},
+        coords={
+            "latitude": (("y", "x"), [[31.0, 35.0, 60.0]]),
+            "longitude": (("y", "x"), [[-99.0, -95.0, -95.0]]),
+            "time_obs": (("y", "x"), pd.to_datetime(["2023-07-01 01:10"] * 3).values[None]),
+        },
+    )
+    out = point_pairing.combine_da_to_points(model, points, radius_of_influence=1e5)
+    assert out.OZONE.dims == ("time", "z", "y", "x")
+    assert set(out.coords) == {"time", "latitude", "longitude", "time_obs"}
+    np.testing.assert_array_equal(out.OZONE[:, :, 0, 1], model.OZONE[:, :, 5, 10])
+    assert out.OZONE[:, :, 0, 2].isnull().all()
+
+
+def test_combine_point():
+    model, obs = _model(), _obs()
+    obs_df = obs.to_dataframe().reset_index().drop(["x", "y"], axis=1)
+    paired = point_pairing.combine_point(model, obs_df, radius_of_influence=1e5, suffix="_cmaq")
+
+    # same rows and values as the xarray pairing
+    expected = point_pairing.pair_point_xarray(model, obs, radius_of_influence=1e5, suffix="_cmaq")
+    expected = expected.to_dataframe().reset_index().drop(["x"], axis=1)
+    assert len(paired) == len(obs_df)
+    pd.testing.assert_frame_equal(paired[obs_df.columns], obs_df)
+    for v in ["OZONE_cmaq", "PM25"]:
+        np.testing.assert_array_equal(paired[v], expected[v])
+    assert paired["OZONE_cmaq"].notnull().sum() == 12
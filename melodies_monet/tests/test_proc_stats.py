@@ -0,0 +1,28 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+import numpy as np
+import pandas as pd
+import pytest
+
+from melodies_monet.stats import proc_stats
+
+STAT_LIST = ['STDO', 'STDP', 'MNB', 'MNE', 'MdnNB', 'MdnNE', 'NMdnGE', 'NO', 'NOP', 'NP',
+             'MO', 'MP', 'MdnO', 'MdnP', 'RM', 'RMdn', 'MB', 'MdnB', 'NMB', 'NMdnB', 'FB',
+             'ME', 'MdnE', 'NME', 'NMdnE', 'FE', 'R2', 'RMSE', 'd1', 'E1', 'IOA', 'AC']
+
+
+@pytest.mark.parametrize("n", [101, 1000])
+@pytest.mark.parametrize("wind", [False, True])
+def test_calc_all(n, wind):
+    rng = np.random.default_rng(42)
+    obs = rng.uniform(1, 50, n)
+    mod = obs + rng.normal(0, 5, n)
+    df = pd.DataFrame({'OZONE': obs, 'OZONE_new': mod})
+
+    values = proc_stats.calc_all(df, STAT_LIST, obsvar='OZONE', modvar='OZONE_new', wind=wind)
+    expected = [proc_stats.calc(df, stat=stat, obsvar='OZONE', modvar='OZONE_new', wind=wind)
+                for stat in STAT_LIST]
+
+    assert len(values) == len(STAT_LIST)
+    for stat, value, value_expected in zip(STAT_LIST, values, expected):
+        assert np.isclose(float(value), float(value_expected), rtol=1e-8), stat
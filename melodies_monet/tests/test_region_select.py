@@ -0,0 +1,68 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+import os
+
+import numpy as np
+import xarray as xr
+
+from melodies_monet.util import region_select
+
+
+def _site_data():
+    rng = np.random.default_rng(0)
+    nx = 50
+    lon = rng.uniform(-125, -65, nx)
+    lat = rng.uniform(25, 50, nx)
+    return xr.Dataset(
+        {
+            "OZONE": (("time", "x"), rng.uniform(0, 80, (4, nx))),
+            "epa_region": (("x",), np.where(lon > -95, "R5", "R9")),
+        },
+        coords={
+            "time": np.arange(4),
+            "latitude": ("x", lat),
+            "longitude": ("x", lon),
+        },
+    )
+
+
+def test_select_region_indexed_box(tmpdir):
+    data = _site_data()
+    domain_info = {"bounds": [-110, -80, 30, 45]}
+    expected = region_select.select_region(data, "auto-region:box", "box", domain_info)
+    expected = expected.dropna("x", how="all", subset=["OZONE"])
+
+    region_select._REGION_MASKS.clear()
+    selected = region_select.select_region_indexed(
+        data, "auto-region:box", "box", domain_info, cache_dir=str(tmpdir)
+    )
+    xr.testing.assert_identical(selected.OZONE, expected.OZONE)
+    assert len(os.listdir(tmpdir)) == 1
+
+    # read back from the disk cache
+    region_select._REGION_MASKS.clear()
+    selected = region_select.select_region_indexed(
+        data, "auto-region:box", "box", domain_info, cache_dir=str(tmpdir)
+    )
+    xr.testing.assert_identical(selected.OZONE, expected.OZONE)
+
+
+def test_select_region_indexed_variable():
+    data = _site_data()
+    selected = region_select.select_region_indexed(data, "epa_region", "R5")
+    assert (selected.epa_region == "R5").all()
+    assert selected.sizes["x"] == int((data.epa_region == "R5").sum())
+
+
+def test_get_region_mask_grid():
+    lat, lon = np.meshgrid(np.linspace(20, 50, 7), np.linspace(-130, -60, 8), indexing="ij")
+    data = xr.Dataset(
+        {"NO2": (("y", "x"), np.ones(lat.shape))},
+        coords={"latitude": (("y", "x"), lat), "longitude": (("y", "x"), lon)},
+    )
+    domain_info = {"bounds": [-100, -70, 30, 45]}
+    mask = region_select.get_region_mask(data, "auto-region:box", "box", domain_info)
+    assert mask.dims == ("y", "x")
+    selected = region_select.select_region_indexed(data, "auto-region:box", "box", domain_info)
+    expected = region_select.select_region(data, "auto-region:box", "box", domain_info)
+    xr.testing.assert_identical(selected, expected)
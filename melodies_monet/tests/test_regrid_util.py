@@ -0,0 +1,59 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+import hashlib
+import os
+import time
+
+import numpy as np
+import xarray as xr
+
+from melodies_monet.util import regrid_util
+
+
+def _grid_hash(grid):
+    h = hashlib.sha1()
+    regrid_util._hash_grid(h, grid)
+    return h.hexdigest()
+
+
+def test_hash_grid():
+    lat, lon = np.meshgrid(np.linspace(20, 50, 4), np.linspace(-130, -60, 5), indexing="ij")
+    grid = xr.Dataset(
+        {"NO2": (("y", "x"), np.random.rand(*lat.shape))},
+        coords={"lat": (("y", "x"), lat), "lon": (("y", "x"), lon)},
+    )
+    # only the coordinates determine the weights
+    other = grid.copy()
+    other["NO2"] = other.NO2 * 2
+    assert _grid_hash(grid) == _grid_hash(other)
+    assert _grid_hash(grid) == _grid_hash({"lat": lat, "lon": lon})
+    assert _grid_hash(grid) != _grid_hash({"lat": lat, "lon": lon + 0.1})
+
+
+def test_hash_grid_cf_bounds():
+    lat = np.linspace(20, 50, 4)
+    lon = np.linspace(-130, -60, 5)
+    grid = xr.Dataset(
+        coords={
+            "lat": ("lat", lat, {"bounds": "lat_bounds"}),
+            "lon": ("lon", lon, {"bounds": "lon_bounds"}),
+            "lat_bounds": (("lat", "nv"), np.stack([lat - 5, lat + 5], axis=1)),
+            "lon_bounds": (("lon", "nv"), np.stack([lon - 8.75, lon + 8.75], axis=1)),
+        }
+    )
+    assert regrid_util._bounds_variables(grid) == ["lat_bounds", "lon_bounds"]
+    assert regrid_util._bounds_variables(grid[["lat", "lon"]]) == []
+    # same cell centers, different bounds
+    other = grid.assign_coords(lat_bounds=grid.lat_bounds * 1.01)
+    assert _grid_hash(grid) != _grid_hash(other)
+
+
+def test_evict_weights(tmpdir):
+    now = time.time()
+    for i in range(4):
+        fn = os.path.join(tmpdir, "weights_{}.nc".format(i))
+        with open(fn, "wb") as f:
+            f.write(b"0" * 1024**2)
+        os.utime(fn, (now + i, now + i))
+    regrid_util._evict_weights(str(tmpdir), max_size_mb=2.5)
+    assert sorted(os.listdir(tmpdir)) == ["weights_2.nc", "weights_3.nc"]
@@ -0,0 +1,35 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+import numpy as np
+import pytest
+from scipy import interpolate
+
+from melodies_monet.util import sat_l2_swath_utility
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_interp_extrapolate(dtype):
+    rng = np.random.default_rng(0)
+    npix, nsatz, nz = 200, 34, 20
+    pres = np.sort(rng.uniform(1e2, 1e5, (npix, nsatz)), axis=1)[:, ::-1].astype(dtype)
+    avk = rng.uniform(0, 3, (npix, nsatz)).astype(dtype)
+    # model layers beyond the satellite levels are extrapolated
+    mod_pres = np.sort(rng.uniform(50, 1.1e5, (npix, nz)), axis=1)[:, ::-1].astype(dtype)
+    mod_pres[0, 3] = np.nan
+    pres[1, 5] = np.nan
+
+    x = np.log10(pres)
+    isort = np.argsort(x, axis=1, kind="mergesort")
+    out = np.empty((npix, nz), dtype=np.float32)
+    sat_l2_swath_utility._interp_extrapolate(
+        np.take_along_axis(x, isort, axis=1),
+        np.take_along_axis(avk, isort, axis=1),
+        np.log10(mod_pres),
+        out,
+    )
+
+    expected = np.empty((npix, nz), dtype=np.float32)
+    for i in range(npix):
+        f = interpolate.interp1d(np.log10(pres[i]), avk[i], fill_value="extrapolate")
+        expected[i] = f(np.log10(mod_pres[i]))
+    np.testing.assert_array_equal(out, expected)
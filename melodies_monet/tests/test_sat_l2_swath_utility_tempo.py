@@ -0,0 +1,305 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+import numpy as np
+import pytest
+import xarray as xr
+
+from melodies_monet.util import sat_l2_swath_utility_tempo as tempo
+
+
+def _interp_vert_flip(orig, target, data):
+    # previous _interp_vert, one np.interp on the flipped arrays per column
+    nz, nx, ny = target.shape
+    interp = np.zeros((nz, nx, ny))
+    for x in range(nx):
+        for y in range(ny):
+            interp[:, x, y] = np.flip(
+                np.interp(
+                    np.flip(target[:, x, y]),
+                    np.flip(orig[:, x, y]),
+                    np.flip(data[:, x, y]),
+                )
+            )
+    return interp
+
+
+def _columns(dtype, nzo=20, nzt=30, nx=6, ny=7):
+    rng = np.random.default_rng(0)
+    orig = np.sort(rng.uniform(1e3, 1e5, (nzo, nx, ny)), axis=0)[::-1]
+    # duplicate levels, and target levels equal to model levels or out of range
+    orig[5, 0, 0] = orig[4, 0, 0]
+    target = np.sort(rng.uniform(5e2, 1.1e5, (nzt, nx, ny)), axis=0)[::-1]
+    target[3, 1, 1] = orig[7, 1, 1]
+    target[4, 0, 0] = orig[5, 0, 0]
+    target[:, 2, 2] = np.nan
+    target[10, 3, 3] = np.nan
+    data = rng.uniform(0, 10, (2, nzo, nx, ny))
+    return orig.astype(dtype), target.astype(dtype), data.astype(dtype)
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_interp_vert_columns(dtype):
+    orig, target, data = _columns(dtype)
+    out = np.empty((2,) + target.shape, dtype=dtype)
+    tempo._interp_vert_columns(orig, target, data, out)
+    for v in range(2):
+        expected = _interp_vert_flip(orig, target, data[v]).astype(dtype)
+        np.testing.assert_array_equal(out[v], expected)
+
+
+def _granule(dtype, seed):
+    orig, target, data = _columns(dtype)
+    nx, ny = orig.shape[1:]
+    # pressure at the satellite level interfaces, with mid levels equal to target
+    pressure = np.concatenate([target, target[-1:] * 0.9])
+    pressure[1:-1] = (target[:-1] + target[1:]) / 2
+    lon, lat = np.meshgrid(np.arange(ny, dtype=float), np.arange(nx, dtype=float))
+    coords = {"lon": (("x", "y"), lon), "lat": (("x", "y"), lat)}
+    obs = xr.Dataset({"pressure": (("swt_level_stagg", "x", "y"), pressure)}, coords=coords)
+    mod = xr.Dataset(
+        {
+            "pres_pa_mid": (("z", "x", "y"), orig),
+            "NO2": (("z", "x", "y"), data[0] * seed),
+            "temperature_k": (("z", "x", "y"), data[1] * seed),
+        },
+        coords=coords,
+    )
+    return obs, mod
+
+
+def test_interp_vertical_mod2swath_workspace():
+    workspace = tempo.VerticalInterpWorkspace()
+    variables = ["NO2", "temperature_k"]
+    obs1, mod1 = _granule(np.float32, 1)
+    out1 = tempo.interp_vertical_mod2swath(obs1, mod1, variables, workspace=workspace)
+    expected1 = tempo.interp_vertical_mod2swath(obs1, mod1, variables)
+    buffers = {key: flat.__array_interface__["data"][0] for key, flat in workspace._buffers.items()}
+
+    obs2, mod2 = _granule(np.float32, 2)
+    out2 = tempo.interp_vertical_mod2swath(obs2, mod2, variables, workspace=workspace)
+    # the buffers are reused for the next granule
+    assert {
+        key: flat.__array_interface__["data"][0] for key, flat in workspace._buffers.items()
+    } == buffers
+    # and the results do not refer to them
+    xr.testing.assert_identical(out1, expected1)
+    for var in variables:
+        assert out2[var].dtype == np.float32
+        for flat in workspace._buffers.values():
+            assert not np.shares_memory(out2[var].values, flat)
+        expected = _interp_vert_flip(
+            mod2["pres_pa_mid"].values, out2["pres_pa_mid"].values, mod2[var].values
+        )
+        np.testing.assert_array_equal(out2[var].values, expected.astype(np.float32))
+    # the plotting workers are not forked after the parallel kernel has run
+    assert tempo._NUMBA_THREADS_STARTED
+
+
+def _tempo_granules(n=4):
+    granules = {}
+    for i in range(n):
+        lon, lat = np.meshgrid(np.linspace(-100, -99, 3), np.linspace(30, 31, 4))
+        ref_time = f"2023-08-01T{i:02d}:00:00"
+        granules[ref_time] = xr.Dataset(
+            {
+                "vertical_column_troposphere": (("x", "y"), np.full((4, 3), float(i))),
+                "time": ("x", np.full(4, np.datetime64(ref_time, "ns"))),
+            },
+            coords={"lon": (("x", "y"), lon), "lat": (("x", "y"), lat)},
+            attrs={"scan_num": 1, "granule_number": i, "reference_time_string": ref_time},
+        )
+    return granules
+
+
+def _tempo_model():
+    lon, lat = np.meshgrid(np.linspace(-101, -98, 5), np.linspace(29, 32, 6))
+    return xr.Dataset(
+        {"NO2": (("time", "z", "y", "x"), np.ones((2, 3, 6, 5)))},
+        coords={"longitude": (("y", "x"), lon), "latitude": (("y", "x"), lat)},
+    )
+
+
+def _stub_regrid_and_apply_weights(obsobj, modobj, workspace=None, **kwargs):
+    # model (shared with the workers) total, times the granule number
+    number = obsobj.attrs["granule_number"]
+    if number == 1:
+        raise ValueError("bad granule")
+    if number == -1:
+        raise TypeError("programming error")
+    return xr.DataArray(
+        np.full((4, 3), float(modobj["NO2"].sum()) * number),
+        dims=("x", "y"),
+        coords={"lon": obsobj["lon"], "lat": obsobj["lat"]},
+    )
+
+
+_PAIR_GRANULE = tempo._pair_granule
+
+
+def _stub_pair_granule(*args, **kwargs):
+    # also run in the (spawned) worker processes, which do not see the monkeypatch
+    tempo._regrid_and_apply_weights = _stub_regrid_and_apply_weights
+    return _PAIR_GRANULE(*args, **kwargs)
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_regrid_and_apply_weights_granules(monkeypatch, n_workers):
+    from multiprocessing import shared_memory
+
+    monkeypatch.setattr(tempo, "_regrid_and_apply_weights", _stub_regrid_and_apply_weights)
+    monkeypatch.setattr(tempo, "_pair_granule", _stub_pair_granule)
+    shared = []
+
+    def share_dataset(ds):
+        spec, blocks = tempo._share_dataset.__wrapped__(ds)
+        shared.extend(shm.name for shm in blocks)
+        return spec, blocks
+
+    share_dataset.__wrapped__ = tempo._share_dataset
+    monkeypatch.setattr(tempo, "_share_dataset", share_dataset)
+
+    granules = _tempo_granules()
+    with pytest.warns(UserWarning, match="could not be paired"):
+        out = tempo.regrid_and_apply_weights(
+            granules, _tempo_model(), verbose=False, method="bilinear", n_workers=n_workers
+        )
+    # in granule order, without the failed granule
+    assert list(out) == [k for i, k in enumerate(granules) if i != 1]
+    for ref_time, ds in out.items():
+        number = granules[ref_time].attrs["granule_number"]
+        np.testing.assert_array_equal(ds["NO2"], 180.0 * number)
+        np.testing.assert_array_equal(ds["vertical_column_troposphere"], float(number))
+        assert ds.attrs["granule_number"] == number
+        assert ds.attrs["reference_time_string"] == ref_time
+
+    # the shared memory blocks are unlinked
+    assert bool(shared) == (n_workers > 1)
+    for name in shared:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+    # all granules failing
+    failing = {k: v for k, v in granules.items() if v.attrs["granule_number"] == 1}
+    failing["2023-08-01T05:00:00"] = granules[list(granules)[1]]
+    with pytest.warns(UserWarning), pytest.raises(RuntimeError, match="None of the granules"):
+        tempo.regrid_and_apply_weights(
+            failing, _tempo_model(), verbose=False, method="bilinear", n_workers=n_workers
+        )
+
+    # programming errors are not hidden
+    granules[list(granules)[2]].attrs["granule_number"] = -1
+    with pytest.raises(TypeError, match="programming error"):
+        tempo.regrid_and_apply_weights(
+            granules, _tempo_model(), verbose=False, method="bilinear", n_workers=n_workers
+        )
+
+
+class _FakeRegridder:
+    # swath mean plus the mean latitude of the swath it was built for, on the model grid
+    def __init__(self, ds_in, ds_out, method=None, **kwargs):
+        self.offset = float(ds_in["lat"].mean())
+        self.ds_out = ds_out
+
+    def __call__(self, ds):
+        out = xr.Dataset(coords={"latitude": self.ds_out["latitude"], "longitude": self.ds_out["longitude"]})
+        for v in ds.data_vars:
+            out[v] = (("y", "x"), np.full(self.ds_out["latitude"].shape, float(ds[v].mean()) + self.offset))
+        return out
+
+
+def _scans(days=(1, 2), scans=(1, 2, 3), granules=(1, 2)):
+    paired = {}
+    for day in days:
+        for s in scans:
+            for g in granules:
+                hour = 10 + s
+                ref_time = f"2023-08-{day:02d}T{hour:02d}:{g:02d}:00Z"
+                # the swath grid of a scan and granule is the same every day
+                lon, lat = np.meshgrid(np.linspace(-100, -99, 3) + g, np.linspace(30, 31, 2) + s)
+                paired[ref_time] = xr.Dataset(
+                    {
+                        "NO2": (("x", "y"), np.full((2, 3), 10.0 * day + s + g)),
+                        "vertical_column_troposphere": (("x", "y"), np.full((2, 3), float(g))),
+                    },
+                    coords={"lon": (("x", "y"), lon), "lat": (("x", "y"), lat)},
+                    attrs={
+                        "scan_num": s,
+                        "granule_number": g,
+                        "reference_time_string": ref_time,
+                        "final_time_string": ref_time[:-3] + "59",
+                    },
+                )
+    return paired
+
+
+def _back_to_modgrid_multiscan_merge(paireddict, modobj, method="bilinear"):
+    # previous back_to_modgrid_multiscan, merging the scans one at a time
+    out_regridded = xr.Dataset()
+    ordered_keys = sorted(list(paireddict.keys()))
+    scan_num = paireddict[ordered_keys[0]].attrs["scan_num"]
+    keys_in_scan = [ordered_keys[0]]
+    for k in ordered_keys[1:]:
+        if paireddict[k].attrs["scan_num"] == scan_num:
+            keys_in_scan.append(k)
+        else:
+            regridded_scan = tempo.back_to_modgrid(paireddict, modobj, keys_in_scan, method=method)
+            out_regridded = xr.merge([out_regridded, regridded_scan])
+            scan_num = paireddict[k].attrs["scan_num"]
+            keys_in_scan = [k]
+    regridded_scan = tempo.back_to_modgrid(paireddict, modobj, keys_in_scan, method=method)
+    return xr.merge([out_regridded, regridded_scan])
+
+
+def test_back_to_modgrid_multiscan(monkeypatch):
+    built = []
+
+    def get_regridder(ds_in, ds_out, method=None, **kwargs):
+        built.append(method)
+        return _FakeRegridder(ds_in, ds_out, method, **kwargs)
+
+    monkeypatch.setattr(tempo, "get_regridder", get_regridder)
+    modobj = _tempo_model()
+    paired = _scans()
+
+    out = tempo.back_to_modgrid_multiscan(paired, modobj)
+    # one regridder per scan, reused on the second day
+    assert len(built) == 3
+    expected = _back_to_modgrid_multiscan_merge(paired, modobj)
+    assert len(built) == 3 + 6
+    xr.testing.assert_identical(out, expected)
+    assert out.sizes["time"] == 6
+
+    # a scan on another swath grid gets its own regridder
+    built.clear()
+    key = "2023-08-02T12:01:00Z"
+    paired[key] = paired[key].assign_coords(lat=paired[key]["lat"] + 0.5)
+    out = tempo.back_to_modgrid_multiscan(paired, modobj)
+    assert len(built) == 4
+    xr.testing.assert_identical(out, _back_to_modgrid_multiscan_merge(paired, modobj))
+
+
+def test_back_to_modgrid_grid_path(tmp_path, monkeypatch):
+    pytest.importorskip("netCDF4")
+    monkeypatch.setattr(tempo, "get_regridder", _FakeRegridder)
+    grid_file = tmp_path / "grid.nc"
+    _tempo_model()[["latitude", "longitude"]].to_netcdf(grid_file)
+    opened = []
+    open_dataset = xr.open_dataset
+
+    def counting_open_dataset(*args, **kwargs):
+        opened.append(args[0])
+        return open_dataset(*args, **kwargs)
+
+    monkeypatch.setattr(xr, "open_dataset", counting_open_dataset)
+    paired = _scans()
+    out = tempo.back_to_modgrid_multiscan(paired, _tempo_model(), grid_path=str(grid_file))
+    # read once for all the scans
+    assert len(opened) == 1
+    xr.testing.assert_identical(out, tempo.back_to_modgrid_multiscan(paired, _tempo_model()))
+
+    # not read when the regridder is cached
+    regridders = {}
+    keys = sorted(paired)[:2]
+    tempo.back_to_modgrid(paired, _tempo_model(), keys, grid_path=str(grid_file), regridders=regridders)
+    tempo.back_to_modgrid(paired, _tempo_model(), keys, grid_path=str(grid_file), regridders=regridders)
+    assert len(opened) == 2
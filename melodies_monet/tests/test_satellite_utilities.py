@@ -0,0 +1,52 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+import numpy as np
+import pandas as pd
+import xarray as xr
+from scipy import interpolate
+
+from melodies_monet.util import satellite_utilities
+
+
+def test_vertical_regrid():
+    rng = np.random.default_rng(0)
+    nt, nlon, nlat, nz, nalt = 3, 6, 5, 30, 10
+    # model levels from the surface up, satellite levels partly above the model top
+    press = np.sort(rng.uniform(5, 1000, (nt, nlon, nlat, nz)), axis=-1)[..., ::-1]
+    values = rng.uniform(50, 200, (nt, nlon, nlat, nz))
+    output_press = np.sort(rng.uniform(1, 1050, (nt, nlon, nlat, nalt)), axis=-1)[..., ::-1]
+
+    out = satellite_utilities.vertical_regrid(press, values, output_press)
+
+    expected = np.full_like(output_press, np.nan)
+    for t in range(nt):
+        for y in range(nlon):
+            for x in range(nlat):
+                f = interpolate.interp1d(press[t, y, x], values[t, y, x], fill_value="extrapolate")
+                expected[t, y, x] = f(output_press[t, y, x])
+    np.testing.assert_array_equal(out, expected)
+
+
+def test_mod_to_overpasstime():
+    nt, nz = 48, 3
+    time = pd.date_range("2023-07-01", periods=nt, freq="h")
+    lon = np.array([[0.0, -90.0]])
+    rng = np.random.default_rng(0)
+    no2 = rng.uniform(0, 10, (nt, nz, 1, 2))
+    modobj = xr.Dataset(
+        {"no2": (("time", "z", "y", "x"), no2)},
+        coords={"time": time, "longitude": (("y", "x"), lon), "latitude": (("y", "x"), [[40.0, 40.0]])},
+    ).chunk({"time": 12})
+    opass_tms = pd.date_range("2023-07-01 13:30", periods=2, freq="D")
+
+    outmod = satellite_utilities.mod_to_overpasstime(modobj, opass_tms)
+    assert outmod.no2.chunks is not None
+    assert outmod.no2.dims == ("time", "y", "x", "z")
+    np.testing.assert_array_equal(outmod.time, opass_tms)
+    # local time is UTC-6 at 90W
+    np.testing.assert_allclose(outmod.no2[0, 0, 0], 0.5 * (no2[13, :, 0, 0] + no2[14, :, 0, 0]))
+    np.testing.assert_allclose(outmod.no2[1, 0, 1], 0.5 * (no2[43, :, 0, 1] + no2[44, :, 0, 1]))
+
+    # overpass at a model time step is not interpolated, nor outside of the model times
+    outmod = satellite_utilities.mod_to_overpasstime(modobj, pd.DatetimeIndex(["2023-07-01 13:00", "2023-07-02 23:30"]))
+    assert outmod.no2.isnull().all()
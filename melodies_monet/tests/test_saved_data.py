@@ -0,0 +1,185 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+import xarray as xr
+
+from melodies_monet.util import read_util, write_util
+
+
+class _Pair:
+    def __init__(self, obj):
+        self.type = "pt_sfc"
+        self.obs = "airnow"
+        self.obj = obj
+
+
+def _paired(start="2023-07-01", nt=48):
+    rng = np.random.default_rng(0)
+    nx = 5
+    ds = xr.Dataset(
+        {
+            "OZONE": (("time", "x"), rng.uniform(0, 80, (nt, nx))),
+            "cmaq_ozone": (("time", "x"), rng.uniform(0, 80, (nt, nx))),
+            "siteid": ("x", [f"site{i}" for i in range(nx)]),
+        },
+        coords={
+            "time": pd.date_range(start, periods=nt, freq="h"),
+            "latitude": ("x", rng.uniform(25, 50, nx)),
+            "longitude": ("x", rng.uniform(-120, -70, nx)),
+        },
+    )
+    ds["OZONE"][3, 2] = np.nan
+    ds["OZONE"].attrs["units"] = "ppbv"
+    return ds
+
+
+@pytest.mark.parametrize("method", ["zarr", "parquet"])
+def test_write_read_analysis(tmp_path, method):
+    if method == "zarr":
+        pytest.importorskip("zarr")
+        write, read = write_util.write_analysis_zarr, read_util.read_analysis_zarr
+    else:
+        pytest.importorskip("pyarrow")
+        write, read = write_util.write_analysis_parquet, read_util.read_analysis_parquet
+    ds = _paired()
+    write({"airnow_cmaq": _Pair(ds.copy())}, output_dir=str(tmp_path), fn_prefix="test")
+    fn = [str(tmp_path / f"test_airnow_cmaq.{method}")]
+
+    out = read(fn)
+    assert out.attrs["group_name"] == "airnow_cmaq"
+    assert json.loads(out.attrs["dict_json"]) == {"type": "pt_sfc", "obs": "airnow"}
+    xr.testing.assert_equal(out, ds)
+    assert out["OZONE"].attrs["units"] == "ppbv"
+
+    # partial read
+    out = read(fn, variables=["OZONE"], time_range=["2023-07-01 06:00", "2023-07-01 12:00"])
+    assert list(out.data_vars) == ["OZONE"]
+    xr.testing.assert_equal(
+        out, ds[["OZONE"]].sel(time=slice("2023-07-01 06:00", "2023-07-01 12:00"))
+    )
+
+
+def test_write_analysis_zarr_append(tmp_path):
+    pytest.importorskip("zarr")
+    first, second = _paired(), _paired(start="2023-07-03")
+    for ds in (first, second):
+        write_util.write_analysis_zarr(
+            {"airnow_cmaq": _Pair(ds.copy())}, output_dir=str(tmp_path), append_dim="time"
+        )
+    out = read_util.read_analysis_zarr([str(tmp_path / "airnow_cmaq.zarr")])
+    xr.testing.assert_equal(out, xr.concat([first, second], dim="time", data_vars="minimal"))
+
+
+@pytest.mark.parametrize("parallel", [False, 2])
+def test_read_analysis_ncf(tmp_path, parallel):
+    pytest.importorskip("netCDF4")
+    days = [_paired(start=f"2023-07-0{day}", nt=24) for day in range(1, 5)]
+    files = []
+    for day, ds in enumerate(days):
+        ds.attrs["group_name"] = "airnow_cmaq"
+        files.append(str(tmp_path / f"day{day}.nc4"))
+        ds.to_netcdf(files[-1])
+
+    out = read_util.read_analysis_ncf(files, parallel=parallel)
+    expected = days[0]
+    for ds in days[1:]:
+        expected = xr.merge([expected, ds])
+    xr.testing.assert_identical(out, expected)
+
+    xr.Dataset(attrs={"group_name": "other"}).to_netcdf(tmp_path / "other.nc4")
+    with pytest.raises(Exception, match="group names are not consistent"):
+        read_util.read_analysis_ncf(files + [str(tmp_path / "other.nc4")])
+
+
+@pytest.mark.parametrize("codec", ["zlib", "zstd"])
+def test_write_analysis_ncf(tmp_path, codec):
+    netCDF4 = pytest.importorskip("netCDF4")
+    if codec == "zstd" and not getattr(netCDF4, "__has_zstandard_support__", False):
+        pytest.skip("netCDF4 without zstd")
+    groups = {f"airnow_m{i}": _Pair(_paired().chunk({"time": 12})) for i in range(3)}
+    groups["airnow_m0"].obj = groups["airnow_m0"].obj.rename({"OZONE": "OZONE (ppb)"})
+    write_util.write_analysis_ncf(
+        groups, output_dir=str(tmp_path), codec=codec, complevel=1, n_workers=3,
+        chunks={"time": 6},
+    )
+    for group in groups:
+        out = xr.open_dataset(tmp_path / f"{group}.nc4")
+        assert out.attrs["group_name"] == group
+        assert out["cmaq_ozone"].encoding[codec] is True
+        assert out["cmaq_ozone"].encoding["chunksizes"] == (6, 5)
+    assert out["OZONE"].attrs["long_name"] == "OZONE"
+    out = xr.open_dataset(tmp_path / "airnow_m0.nc4")
+    assert out["OZONEppb"].attrs["long_name"] == "OZONE (ppb)"
+
+
+def test_write_analysis_ncf_workers(tmp_path):
+    # the netCDF writes themselves are serialized by the HDF5 lock,
+    # the workers overlap the computation of lazy sources
+    pytest.importorskip("netCDF4")
+    import time
+
+    def slow(block):
+        time.sleep(0.5)
+        return block
+
+    groups = {
+        f"airnow_m{i}": _Pair(_paired().chunk({"time": -1}).map_blocks(slow)) for i in range(4)
+    }
+    elapsed = {}
+    for n_workers in (1, 4):
+        (tmp_path / str(n_workers)).mkdir()
+        t0 = time.perf_counter()
+        write_util.write_analysis_ncf(
+            groups, output_dir=str(tmp_path / str(n_workers)), n_workers=n_workers
+        )
+        elapsed[n_workers] = time.perf_counter() - t0
+    assert elapsed[1] > 2
+    assert elapsed[4] < elapsed[1] - 1
+    for group in groups:
+        xr.testing.assert_identical(
+            xr.open_dataset(tmp_path / "4" / f"{group}.nc4"),
+            xr.open_dataset(tmp_path / "1" / f"{group}.nc4"),
+        )
+
+
+def test_write_ncf(tmp_path):
+    pytest.importorskip("netCDF4")
+    ds = _paired().chunk({"time": 12})
+    write_util.write_ncf(ds.copy(), str(tmp_path / "out.nc"), verbose=False)
+
+    # same packing as compressing the variables one at a time
+    out = xr.open_dataset(tmp_path / "out.nc", mask_and_scale=False)
+    for v in ["OZONE", "cmaq_ozone"]:
+        expected = write_util.compress_variable(ds[v].copy())
+        np.testing.assert_array_equal(out[v].values, expected.values)
+        assert out[v].attrs["scale_factor"] == expected.attrs["scale_factor"]
+        assert out[v].attrs["add_offset"] == expected.attrs["add_offset"]
+        # the dask chunks are not used as netCDF chunks unless requested
+        assert out[v].encoding.get("chunksizes") != (12, 5)
+
+
+def test_combine_saved():
+    # overlapping times, with variables missing from some files: pairwise merges
+    full = _paired(nt=72)
+    days = [
+        full.isel(time=slice(0, 24)),
+        full.isel(time=slice(12, 36)).assign(NO2=full["OZONE"][12:36] * 0.5),
+        full.isel(time=slice(48, 72)).drop_vars("cmaq_ozone"),
+    ]
+    expected = days[0]
+    for ds in days[1:]:
+        expected = xr.merge([expected, ds], join="outer", compat="no_conflicts")
+    xr.testing.assert_identical(read_util.combine_saved(days), expected)
+
+    # daily files: one concatenation along time
+    days = [full.isel(time=slice(i, i + 24)) for i in (48, 0, 24)]
+    xr.testing.assert_identical(read_util.combine_saved(days), full)
+
+    # conflicting site variables are an error, not a silent fallback to merging
+    days[1] = days[1].assign(siteid=("x", [f"other{i}" for i in range(5)]))
+    with pytest.raises(ValueError):
+        read_util.combine_saved(days)
@@ -0,0 +1,47 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+import json
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from melodies_monet.util import time_interval_subset as tsub
+
+
+def test_subset_files_by_time(tmp_path):
+    files = []
+    for day in range(1, 6):
+        time = pd.date_range(f"2023-07-0{day}", periods=24, freq="h")
+        fn = str(tmp_path / f"model_{day}.nc")
+        xr.Dataset({"O3": ("time", np.ones(24))}, coords={"time": time}).to_netcdf(fn)
+        files.append(fn)
+    # WRF-style times and IOAPI-style attributes
+    times = np.array([list("2023-07-06_00:00:00"), list("2023-07-06_01:00:00")], dtype="S1")
+    fn = str(tmp_path / "wrfout_d01.nc")
+    xr.Dataset({"Times": (("Time", "DateStrLen"), times)}).to_netcdf(fn)
+    files.append(fn)
+    fn = str(tmp_path / "CCTM_CONC.nc")
+    xr.Dataset(
+        {"O3": (("TSTEP", "LAY"), np.ones((24, 1)))},
+        attrs={"SDATE": 2023188, "STIME": 0, "TSTEP": 10000},
+    ).to_netcdf(fn)
+    files.append(fn)
+    fn = str(tmp_path / "no_time.nc")
+    xr.Dataset({"O3": ("x", np.ones(2))}).to_netcdf(fn)
+    files.append(fn)
+
+    assert tsub.read_file_times(files[5]) == (pd.Timestamp("2023-07-06 00:00"), pd.Timestamp("2023-07-06 01:00"))
+    assert tsub.read_file_times(files[6]) == (pd.Timestamp("2023-07-07 00:00"), pd.Timestamp("2023-07-07 23:00"))
+
+    interval = [pd.Timestamp("2023-07-03 06:00"), pd.Timestamp("2023-07-03 12:00")]
+    kept = tsub.subset_files_by_time(files, interval)
+    assert kept == [files[1], files[2], files[3], files[-1]]
+
+    # the coverage is cached next to the files and used by later calls
+    index = json.loads((tmp_path / tsub.FILE_TIME_INDEX).read_text())
+    assert index["model_3.nc"]["times"] == ["2023-07-03T00:00:00", "2023-07-03T23:00:00"]
+    assert index["no_time.nc"]["times"] is None
+    index["model_3.nc"]["times"] = ["2023-08-01T00:00:00", "2023-08-01T23:00:00"]
+    (tmp_path / tsub.FILE_TIME_INDEX).write_text(json.dumps(index))
+    assert tsub.subset_files_by_time(files, interval) == [files[1], files[3], files[-1]]
@@ -0,0 +1,183 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+import sys
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+import pytest
+
+from melodies_monet.util import tools
+
+
+def test_vert_interp(capsys):
+    rng = np.random.default_rng(0)
+    npts, nz = 500, 20
+    time = pd.date_range("2023-07-01 12:00", periods=npts, freq="s")
+    p_mod = rng.uniform(950, 1010, npts)[:, None] * np.linspace(1, 0.1, nz)[None]
+    p_obs = rng.uniform(50, 1050, npts)
+    lat = rng.uniform(30, 40, (1, npts))
+    lon = rng.uniform(-100, -90, (1, npts))
+    ds_model = xr.Dataset(
+        {
+            "pressure_model": (("x", "z", "y"), p_mod[..., None]),
+            "O3": (("x", "z", "y"), rng.uniform(10, 90, (npts, nz, 1))),
+        },
+        coords={
+            "pressure_obs": (("y", "x"), p_obs[None]),
+            "time": ("x", time),
+            "latitude": (("y", "x"), lat),
+            "longitude": (("y", "x"), lon),
+        },
+    )
+    df_obs = pd.DataFrame(
+        {"time": time, "latitude": lat[0], "longitude": lon[0], "pressure_obs": p_obs, "O3": 1.0}
+    ).set_index("time")
+
+    paired = tools.vert_interp(ds_model, df_obs, ["O3", "pressure_model"])
+
+    # nearest level beyond the model column
+    expected = [np.interp(p_obs[i], p_mod[i, ::-1], ds_model.O3.values[i, ::-1, 0]) for i in range(npts)]
+    np.testing.assert_allclose(paired["O3_y"], expected, rtol=1e-12)
+    assert (paired["O3_x"] == 1).all()
+    assert (paired["time"] == time).all()
+    assert "pressure_model" not in paired.columns
+    out = capsys.readouterr().out
+    assert out.count("Note:") == (p_obs > p_mod.max(axis=1)).sum()
+    assert out.count("Warning:") == (p_obs < p_mod.min(axis=1)).sum()
+
+
+def test_loop_pairing_summary(tmp_path, monkeypatch, capsys):
+    control = tmp_path / "control.yaml"
+    control.write_text("analysis: {}\nmodel: {}\nobs: {}\n")
+
+    def pair_file(task):
+        _, control_dict, label, file_pair, save_types = task
+        assert control_dict == {"analysis": {}, "model": {}, "obs": {}}
+        return label, 1.0, None, "boom" if file_pair == "bad" else None
+
+    monkeypatch.setattr(tools, "_pair_file", pair_file)
+    with pytest.raises(RuntimeError, match="Pairing failed for: b$"):
+        tools.loop_pairing(str(control), file_pairs={"a": "good", "b": "bad"})
+    out = capsys.readouterr().out
+    # the current process runs all the pairings
+    assert "a: 1.0 s, process peak memory so far n/a, ok" in out
+    assert "b: 1.0 s, process peak memory so far n/a, FAILED" in out
+
+    assert tools._peak_memory_mb() > 0
+
+
+def _filter_sequential(ds, filter_dict):
+    # previous observation.filter_obs, one where(drop=True) per clause
+    for column, clause in filter_dict.items():
+        cond = tools._filter_condition(ds[column], clause["oper"], clause["value"]).compute()
+        ds = ds.where(cond, drop=True)
+    return ds
+
+
+@pytest.mark.parametrize("chunk", [False, True])
+def test_filter_dataset(chunk):
+    rng = np.random.default_rng(0)
+    nt, nx = 48, 30
+    ds = xr.Dataset(
+        {
+            "OZONE": (("time", "x"), rng.uniform(0, 80, (nt, nx))),
+            "qc": (("time", "x"), rng.integers(0, 4, (nt, nx))),
+            "site_type": ("x", rng.choice(["urban", "rural", "suburban"], nx)),
+            "elevation": ("x", rng.uniform(0, 3000, nx)),
+        },
+        coords={
+            "time": pd.date_range("2023-07-01", periods=nt, freq="h"),
+            "latitude": ("x", rng.uniform(25, 50, nx)),
+        },
+    )
+    ds["OZONE"][:, 3] = np.nan
+    ds["OZONE"][5] = np.nan
+    if chunk:
+        ds = ds.chunk({"time": 12})
+
+    filter_dict = {
+        "latitude": {"oper": ">=", "value": 30},
+        "OZONE": {"oper": "<", "value": 70},
+        "site_type": {"oper": "isnotin", "value": ["suburban"]},
+        "qc": {"oper": "!=", "value": 3},
+        "elevation": {"oper": "<=", "value": 2500},
+    }
+    out = tools.filter_dataset(ds, filter_dict)
+    if chunk:
+        assert out["OZONE"].chunks is not None
+    xr.testing.assert_identical(out, _filter_sequential(ds, filter_dict))
+
+    with pytest.raises(ValueError, match="not supported"):
+        tools.filter_dataset(ds, {"qc": {"oper": "~", "value": 1}})
+
+
+def _mask_and_scale_where(da, d):
+    # previous observation.mask_and_scale, one where per rule
+    if "obs_min" in d:
+        da = da.where(da >= d["obs_min"])
+    if "obs_max" in d:
+        da = da.where(da <= d["obs_max"])
+    if "nan_value" in d:
+        da = da.where(da != d["nan_value"])
+    scale = d.get("unit_scale", 1)
+    method = d.get("unit_scale_method")
+    if method == "*":
+        da = da * scale
+    elif method == "/":
+        da = da / scale
+    elif method == "+":
+        da = da + scale
+    elif method == "-":
+        da = da + -1 * scale
+    if "LLOD_value" in d:
+        da = da.where(da != d["LLOD_value"], d["LLOD_setvalue"])
+    return da
+
+
+@pytest.mark.parametrize("kernel", ["numba", "numpy"])
+@pytest.mark.parametrize("dtype", ["float64", "float32"])
+@pytest.mark.parametrize("chunk", [False, True])
+@pytest.mark.parametrize(
+    "rules",
+    [
+        {"obs_min": 0.1, "obs_max": 80, "nan_value": -1, "unit_scale": 1000, "unit_scale_method": "*"},
+        {"nan_value": -1, "unit_scale": 273.15, "unit_scale_method": "-", "LLOD_value": 0, "LLOD_setvalue": 0.05},
+        {"obs_min": 0, "unit_scale": 3, "unit_scale_method": "/"},
+        {"unit_scale": 1.5, "unit_scale_method": "+"},
+    ],
+)
+def test_mask_and_scale(rules, chunk, dtype, kernel, monkeypatch):
+    if kernel == "numpy":
+        # as if numba was not installed
+        monkeypatch.setitem(sys.modules, "numba", None)
+        monkeypatch.setattr(tools, "_MASK_AND_SCALE_KERNEL", None)
+    rng = np.random.default_rng(0)
+    values = rng.uniform(-1, 90, (40, 25)).round(1).astype(dtype)
+    values[values < 0] = -1
+    values[rng.random(values.shape) < 0.05] = np.nan
+    values[0, :5] = [0, 0.1, 80, 273.15, 0]
+    da = xr.DataArray(values, dims=("time", "x"), attrs={"units": "ppb"}, name="O3")
+    if chunk:
+        da = da.chunk({"time": 10})
+
+    out = tools.mask_and_scale(da, rules)
+    if chunk:
+        assert out.chunks is not None
+    xr.testing.assert_identical(out, _mask_and_scale_where(da, rules).astype(dtype))
+    assert (tools._MASK_AND_SCALE_KERNEL is tools._mask_and_scale_numpy) == (kernel == "numpy")
+
+
+def test_mask_and_scale_int():
+    da = xr.DataArray(np.array([-999, 1, 2, 50]), dims="x")
+    out = tools.mask_and_scale(da, {"nan_value": -999, "unit_scale": 2, "unit_scale_method": "*"})
+    np.testing.assert_array_equal(out, [np.nan, 2, 4, 100])
+    assert tools.mask_and_scale(da, {"rename": "foo"}) is da
+
+
+def test_tools_import_without_numba():
+    # numba is an optional dependency, only imported when mask_and_scale runs
+    import subprocess
+
+    code = "import sys, melodies_monet.util.tools; assert 'numba' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True)
@@ -0,0 +1,171 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+"""
+Vertical column quantities of model data: layer altitude and thickness,
+and partial and total columns of species.
+
+All the functions work on xarray objects and stay lazy if the data is backed by dask.
+"""
+
+import xarray as xr
+
+from .tools import N_A, R
+
+
+def altitude_from_thickness(dz_m, dim="z"):
+    """Calculate the altitude above ground at the layer interfaces
+    as the cumulative sum of the layer thickness.
+
+    Parameters
+    ----------
+    dz_m : xr.DataArray
+        Layer thickness in m, with the first layer at the surface.
+    dim : str
+        Vertical dimension.
+
+    Returns
+    -------
+    xr.DataArray
+        Altitude AGL in m at the top interface of each layer.
+    """
+    altitude = dz_m.cumsum(dim)
+    altitude.attrs = {
+        "description": "Altitude AGL in m at layer interface",
+        "units": "m",
+        "long_name": "altitude_agl",
+    }
+    return altitude
+
+
+def thickness_from_altitude(altitude, dim="z"):
+    """Calculate the layer thickness from the altitude above ground
+    at the layer interfaces. Inverse of :func:`altitude_from_thickness`.
+
+    Parameters
+    ----------
+    altitude : xr.DataArray
+        Altitude AGL in m at the top interface of each layer.
+    dim : str
+        Vertical dimension.
+
+    Returns
+    -------
+    xr.DataArray
+        Layer thickness in m.
+    """
+    # the surface (0 m) is the bottom interface of the first layer
+    dz_m = altitude - altitude.shift({dim: 1}, fill_value=0)
+    dz_m.attrs = {
+        "description": "Layer thickness in m",
+        "units": "m",
+        "long_name": "layer_thickness",
+    }
+    return dz_m
+
+
+def air_partialcolumn(modobj, dz_m=None, r_gas=R, n_avogadro=N_A):
+    """Calculate the number of molecules per cm2 in each layer for a mixing
+    ratio of 1 ppbv, which converts concentrations to partial columns.
+
+    Parameters
+    ----------
+    modobj : xr.Dataset
+        Model data, with pres_pa_mid, temperature_k and (unless given) dz_m.
+    dz_m : xr.DataArray | None
+        Layer thickness in m. If None, modobj["dz_m"] is used.
+    r_gas : float
+        Gas constant, in m3 * Pa / K / mol.
+    n_avogadro : float
+        Avogadro number.
+
+    Returns
+    -------
+    xr.DataArray
+        Partial column of air (molecules/cm2) times 1e-9.
+    """
+    if dz_m is None:
+        dz_m = modobj["dz_m"]
+    ppbv2molmol = 1e-9
+    m2_to_cm2 = 1e4
+    fac_units = ppbv2molmol * n_avogadro / m2_to_cm2
+    return modobj["pres_pa_mid"] * dz_m * fac_units / (r_gas * modobj["temperature_k"])
+
+
+def column_physics(
+    modobj,
+    variables=(),
+    altitude=False,
+    dz=False,
+    partial=True,
+    total=False,
+    dim="z",
+    r_gas=R,
+    n_avogadro=N_A,
+):
+    """Calculate altitude, layer thickness, partial and total columns together,
+    with the intermediates (layer thickness and air partial column) computed once
+    and shared by all the variables.
+
+    Parameters
+    ----------
+    modobj : xr.Dataset
+        Model data, with pres_pa_mid, temperature_k, and either dz_m or altitude
+        (AGL, at the layer interfaces). For the total columns, levels below the
+        surface are left out if surfpres_pa is present.
+    variables : str | list[str]
+        Species (in ppbv) to calculate the columns of.
+    altitude : bool
+        If True, include altitude (calculated from dz_m if not in modobj).
+    dz : bool
+        If True, include dz_m (calculated from altitude if not in modobj).
+    partial : bool
+        If True, include the partial columns, as ``{var}_col``.
+    total : bool
+        If True, include the total columns, as ``{var}_total_col``.
+    dim : str
+        Vertical dimension.
+    r_gas : float
+        Gas constant, in m3 * Pa / K / mol.
+    n_avogadro : float
+        Avogadro number.
+
+    Returns
+    -------
+    xr.Dataset
+        Requested quantities.
+    """
+    if isinstance(variables, str):
+        variables = [variables]
+    out = xr.Dataset()
+    if "dz_m" in modobj.variables:
+        dz_m = modobj["dz_m"]
+    elif "altitude" in modobj.variables:
+        dz_m = thickness_from_altitude(modobj["altitude"], dim=dim)
+    else:
+        raise KeyError("Either dz_m or altitude is needed for the column calculations.")
+    if altitude:
+        out["altitude"] = (
+            modobj["altitude"] if "altitude" in modobj.variables else altitude_from_thickness(dz_m, dim=dim)
+        )
+    if dz:
+        out["dz_m"] = dz_m
+    if not variables or not (partial or total):
+        return out
+
+    air_col = air_partialcolumn(modobj, dz_m=dz_m, r_gas=r_gas, n_avogadro=n_avogadro)
+    if total and "surfpres_pa" in modobj.variables:
+        above_surface = modobj["pres_pa_mid"] <= modobj["surfpres_pa"]
+    else:
+        above_surface = None
+    for var in variables:
+        partial_col = modobj[var] * air_col
+        partial_col.attrs = {"units": "molecules/cm2", "long_name": f"{var} partial column"}
+        if partial:
+            out[f"{var}_col"] = partial_col
+        if total:
+            if above_surface is not None:
+                partial_col = partial_col.where(above_surface)
+            total_col = partial_col.sum(dim=dim)
+            total_col.attrs = {"units": "molecules/cm2", "long_name": f"{var} total column"}
+            out[f"{var}_total_col"] = total_col
+    return out
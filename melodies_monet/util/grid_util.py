@@ -188,3 +188,111 @@ def generate_uniform_grid(start, end, ntime, nlat, nlon):
     edges = {'time_edges':time_edges,'lon_edges':lon_edges,'lat_edges':lat_edges}
 
     return grid, edges
+
+
+@numba.jit(nopython=True)
+def update_data_grid_indexed(cell_obs, data_obs, count_grid, data_grid):
+    """
+    Accumulate obs data on any (e.g. curvilinear) grid, the grid cell of each obs
+    having been looked up beforehand (see swath_cell_index)
+    Store running counts and sums in numpy arrays with the grid cells flattened
+
+    Parameters
+        cell_obs (np.array): flat grid cell index of each obs, negative if outside the grid
+        data_obs (np.array): obs data values, with dimensions (variable, obs)
+        count_grid (np.array): number of obs points in grid cell, with dimensions (variable, cell)
+        data_grid (np.array): sum of data values in grid cell, with dimensions (variable, cell)
+
+    Returns
+        None
+    """
+    nvar = data_obs.shape[0]
+    for i in range(len(cell_obs)):
+        i_cell = cell_obs[i]
+        if i_cell < 0:
+            continue
+        for v in range(nvar):
+            if not np.isnan(data_obs[v, i]):
+                count_grid[v, i_cell] += 1
+                data_grid[v, i_cell] += data_obs[v, i]
+
+
+def grid_cell_radius(lon, lat):
+    """
+    Half diagonal (m) of the largest cell of a 2-D (e.g. curvilinear) grid,
+    estimated from the distance between neighbouring cell centers
+
+    Parameters
+        lon (np.array): grid cell center longitudes
+        lat (np.array): grid cell center latitudes
+
+    Returns
+        radius (float): half diagonal of the largest cell
+    """
+    from .point_pairing import EARTH_RADIUS, lonlat_to_xyz
+
+    xyz = lonlat_to_xyz(lon, lat)
+    dist = []
+    for axis in range(2):
+        if xyz.shape[axis] > 1:
+            dist.append(np.nanmax(np.linalg.norm(np.diff(xyz, axis=axis), axis=-1)))
+    if not dist:
+        raise ValueError('The grid needs more than one cell to estimate its cell size.')
+    return 0.5 * np.hypot(dist[0], dist[-1]) * EARTH_RADIUS
+
+
+def swath_cell_index(grid_lon, grid_lat, swath_lon, swath_lat, radius_of_influence=None):
+    """
+    Look up the grid cell (nearest cell center) of each swath pixel, through
+    the KD-tree index of the grid (shared by all the swaths on the same grid)
+
+    Parameters
+        grid_lon (np.array): grid cell center longitudes (2-D)
+        grid_lat (np.array): grid cell center latitudes (2-D)
+        swath_lon (np.array): swath pixel longitudes
+        swath_lat (np.array): swath pixel latitudes
+        radius_of_influence (float, default=None): maximum distance (m) between a pixel
+            and its grid cell center. If None, the half diagonal of the largest grid cell
+
+    Returns
+        cell_obs (np.array): flat grid cell index of each pixel (flattened), -1 if outside the grid
+    """
+    from .point_pairing import SiteIndex
+
+    site_index = SiteIndex.from_grid(grid_lon, grid_lat)
+    if radius_of_influence is None:
+        radius_of_influence = grid_cell_radius(grid_lon, grid_lat)
+    index, valid = site_index.query(swath_lon, swath_lat, radius_of_influence=radius_of_influence)
+    cell_obs = np.ravel_multi_index(index, site_index.shape).ravel()
+    cell_obs[~valid.ravel()] = -1
+    return cell_obs
+
+
+def bin_swaths_to_grid(grid_lon, grid_lat, swaths):
+    """
+    Average swath pixels into the cells of a 2-D (e.g. curvilinear) grid,
+    accumulating all the swaths in one pass. Unlike regridding, no interpolation
+    weights are generated: every pixel goes to the cell with the nearest center
+
+    Parameters
+        grid_lon (np.array): grid cell center longitudes (2-D)
+        grid_lat (np.array): grid cell center latitudes (2-D)
+        swaths (list[tuple]): (cell_obs, data_obs) of each swath, with cell_obs as
+            returned by swath_cell_index, and data_obs with dimensions (variable, pixel)
+            or (pixel) (pixels flattened as in cell_obs)
+
+    Returns
+        count_grid_array (np.array): number of pixels in grid cell, (variable,) + grid shape
+        data_grid_array (np.array): mean of pixel values in grid cell, NaN if no pixel
+    """
+    cell_obs = np.concatenate([np.asarray(cell, dtype=np.int64) for cell, _ in swaths])
+    data_obs = np.concatenate(
+        [np.atleast_2d(np.asarray(data, dtype=np.float64)) for _, data in swaths], axis=1
+    )
+    nvar = data_obs.shape[0]
+    count_grid = np.zeros((nvar, grid_lon.size), dtype=np.int64)
+    data_grid = np.zeros((nvar, grid_lon.size), dtype=np.float64)
+    update_data_grid_indexed(cell_obs, data_obs, count_grid, data_grid)
+    normalize_data_grid(count_grid, data_grid)
+    shape = (nvar,) + np.shape(grid_lon)
+    return count_grid.reshape(shape), data_grid.reshape(shape)
@@ -0,0 +1,304 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+"""
+Pairing of point observations with the nearest model grid cells
+
+A :class:`SiteIndex` (KD-tree of the model grid cells) is built once per
+unique model grid and shared by all the point pairings on that grid.
+The surface point observations are paired by sampling the model at all
+the sites at once, either merged into the observation DataFrame
+(:func:`combine_point`) or kept in their (time, x) site layout
+(:func:`pair_point_xarray`), without the DataFrame round trips of ``monet.combine_point``.
+"""
+import hashlib
+import os
+import pickle
+
+import numpy as np
+import xarray as xr
+
+EARTH_RADIUS = 6370997.0
+"""float : Earth radius (m) used for the distances to the sites, as in pyresample."""
+
+_SITE_INDEXES = {}
+"""dict : Site indexes already built in this session, by grid key."""
+
+
+def lonlat_to_xyz(lon, lat):
+    """Convert longitude and latitude to 3-D cartesian coordinates on the unit sphere
+
+    Parameters
+    ----------
+    lon : array-like
+        Longitude (degrees).
+    lat : array-like
+        Latitude (degrees).
+
+    Returns
+    -------
+    numpy.ndarray
+        Coordinates with shape ``lon.shape + (3,)``.
+    """
+    lon = np.deg2rad(np.asarray(lon, dtype=np.float64))
+    lat = np.deg2rad(np.asarray(lat, dtype=np.float64))
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+class SiteIndex:
+    """Nearest-neighbour index of the cells of a model grid.
+
+    A KD-tree on the 3-D unit-sphere coordinates of the model ``latitude`` and
+    ``longitude``, so that the nearest grid cell of any number of points
+    can be found in bulk. Use :meth:`from_grid` to share the index between
+    the models and pairings using the same grid.
+    """
+
+    def __init__(self, lon, lat):
+        """Build the index.
+
+        Parameters
+        ----------
+        lon, lat : array-like
+            Longitude and latitude of the model grid cells (any shape).
+        """
+        from scipy.spatial import cKDTree
+
+        lon = np.asarray(lon)
+        self.key = self.grid_key(lon, np.asarray(lat))
+        self.shape = lon.shape
+        cells = lonlat_to_xyz(lon, lat).reshape(-1, 3)
+        cell_ok = np.isfinite(cells).all(axis=1)
+        self.cell_index = np.flatnonzero(cell_ok)
+        self.tree = cKDTree(cells[cell_ok])
+
+    @staticmethod
+    def grid_key(lon, lat):
+        """Hash identifying a model grid.
+
+        Parameters
+        ----------
+        lon, lat : array-like
+            Longitude and latitude of the model grid cells.
+
+        Returns
+        -------
+        str
+        """
+        h = hashlib.sha1()
+        for values in (lon, lat):
+            values = np.ascontiguousarray(np.asarray(values, dtype=np.float64))
+            h.update(repr(values.shape).encode())
+            h.update(values.tobytes())
+        return h.hexdigest()
+
+    @classmethod
+    def from_grid(cls, lon, lat, cache_dir=None):
+        """Get the index of a grid, building it only if it was not built before.
+
+        Parameters
+        ----------
+        lon, lat : array-like
+            Longitude and latitude of the model grid cells.
+        cache_dir : str, optional
+            Directory where the index is also saved to, and read from by later runs.
+
+        Returns
+        -------
+        SiteIndex
+        """
+        lon = np.asarray(lon)
+        lat = np.asarray(lat)
+        key = cls.grid_key(lon, lat)
+        if key in _SITE_INDEXES:
+            return _SITE_INDEXES[key]
+
+        fn = None if cache_dir is None else os.path.join(cache_dir, f"site_index_{key}.pkl")
+        if fn is not None and os.path.isfile(fn):
+            with open(fn, "rb") as f:
+                index = pickle.load(f)
+        else:
+            index = cls(lon, lat)
+            if fn is not None:
+                os.makedirs(cache_dir, exist_ok=True)
+                fn_tmp = f"{fn}.{os.getpid()}.tmp"
+                with open(fn_tmp, "wb") as f:
+                    pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(fn_tmp, fn)
+        _SITE_INDEXES[key] = index
+        return index
+
+    def query(self, lon, lat, radius_of_influence=None):
+        """Find the nearest grid cell of each point.
+
+        Parameters
+        ----------
+        lon, lat : array-like
+            Longitude and latitude of the points (any shape).
+        radius_of_influence : float, optional
+            Maximum distance (m) between a point and its grid cell.
+
+        Returns
+        -------
+        index : tuple of numpy.ndarray
+            Grid index (one array per grid dimension) of the nearest cell of
+            each point, with the shape of the points.
+        valid : numpy.ndarray
+            Whether a grid cell was found within the radius of influence.
+        """
+        points = lonlat_to_xyz(lon, lat)
+        shape = points.shape[:-1]
+        points = points.reshape(-1, 3)
+        point_ok = np.isfinite(points).all(axis=1)
+        # chord length on the unit sphere
+        upper = np.inf if radius_of_influence is None else radius_of_influence / EARTH_RADIUS
+        dist = np.full(len(points), np.inf)
+        nearest = np.zeros(len(points), dtype=np.intp)
+        dist[point_ok], nearest[point_ok] = self.tree.query(points[point_ok], distance_upper_bound=upper)
+
+        valid = np.isfinite(dist)
+        flat = np.where(valid, self.cell_index[np.minimum(nearest, len(self.cell_index) - 1)], 0)
+        index = tuple(i.reshape(shape) for i in np.unravel_index(flat, self.shape))
+        return index, valid.reshape(shape)
+
+
+def combine_da_to_points(model_obj, target, site_index=None, radius_of_influence=None):
+    """Sample the model at the nearest grid cell of each point of target,
+    in place of ``monet.util.combinetool.combine_da_to_da(model_obj, target, merge=False)``.
+
+    Parameters
+    ----------
+    model_obj : xarray.Dataset
+        Model data with ``latitude`` and ``longitude`` coordinates.
+    target : xarray.Dataset
+        Points with ``latitude`` and ``longitude`` coordinates.
+    site_index : SiteIndex, optional
+        Index of the model grid, built if not provided.
+    radius_of_influence : float, optional
+        Maximum distance (m) between a point and its grid cell,
+        points further away get missing model values.
+
+    Returns
+    -------
+    xarray.Dataset
+        Model data with the grid dimensions replaced by the dimensions of
+        the points, and the coordinates of target.
+    """
+    if site_index is None:
+        site_index = SiteIndex(model_obj['longitude'].values, model_obj['latitude'].values)
+    cell_dims = model_obj['longitude'].dims
+    point_dims = target['longitude'].dims
+    index, valid = site_index.query(
+        target['longitude'].values, target['latitude'].values, radius_of_influence=radius_of_influence
+    )
+    indexers = {dim: xr.DataArray(i, dims=point_dims) for dim, i in zip(cell_dims, index)}
+
+    out = (
+        model_obj
+        .reset_coords(drop=True)
+        .drop_vars(cell_dims, errors='ignore')
+        .isel(indexers)
+    )
+    if not valid.all():
+        out = out.where(xr.DataArray(valid, dims=point_dims))
+    coords = {k: v.variable for k, v in target.coords.items() if set(v.dims) <= set(point_dims)}
+    return out.assign_coords(coords)
+
+
+def combine_point(model_obj, obs_df, radius_of_influence=None, suffix='_new', site_index=None):
+    """Pair surface point observations in a DataFrame with the model at the nearest grid cell,
+    in place of ``model_obj.monet.combine_point(obs_df)``.
+
+    The model is sampled at all the unique sites at once, with the site index of its grid,
+    and the model values are merged into the observation rows.
+
+    Parameters
+    ----------
+    model_obj : xarray.Dataset
+        Model data with ``latitude`` and ``longitude`` coordinates, and dimension ``time``.
+        Only the first level of ``z`` (nearest to the surface) is paired.
+    obs_df : pandas.DataFrame
+        Observations with ``time``, ``latitude`` and ``longitude`` columns.
+    radius_of_influence : float, optional
+        Maximum distance (m) between a site and its grid cell,
+        sites further away get missing model values.
+    suffix : str
+        Suffix added to model variables with the same name as an observation column.
+    site_index : SiteIndex, optional
+        Index of the model grid, built if not provided.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The observation rows, with the model variables at their time and site
+        (missing where the model has no data).
+    """
+    if 'z' in model_obj.dims:
+        model_obj = model_obj.isel(z=0, drop=True)
+    mod_vars = [v for v in model_obj.data_vars if 'time' in model_obj[v].dims]
+    sites = obs_df[['latitude', 'longitude']].drop_duplicates()
+    target = xr.Dataset(coords={'latitude': ('site', sites['latitude'].values),
+                                'longitude': ('site', sites['longitude'].values)})
+    model_sites = combine_da_to_points(
+        model_obj[mod_vars], target, site_index=site_index, radius_of_influence=radius_of_influence
+    )
+    model_df = (
+        model_sites
+        .rename({v: v + suffix for v in mod_vars if v in obs_df.columns})
+        .reset_coords()
+        .to_dataframe()
+        .reset_index()
+        .drop(columns='site')
+    )
+    return obs_df.merge(model_df, on=['time', 'latitude', 'longitude'], how='left')
+
+
+def pair_point_xarray(model_obj, obs_obj, radius_of_influence=None, suffix='_new', site_index=None):
+    """Pair surface point observations with the model at the nearest grid cell
+
+    Parameters
+    ----------
+    model_obj : xarray.Dataset
+        Model data with ``latitude`` and ``longitude`` coordinates, and dimension ``time``.
+        Only the first level of ``z`` (nearest to the surface) is paired.
+    obs_obj : xarray.Dataset
+        Observations with dimensions ``(time, x)`` (or ``(time, y, x)`` with ``y`` of size 1)
+        and site ``latitude`` and ``longitude``.
+    radius_of_influence : float, optional
+        Maximum distance (m) between a site and its grid cell,
+        sites further away get missing model values.
+    suffix : str
+        Suffix added to model variables with the same name as an observation variable.
+    site_index : SiteIndex, optional
+        Index of the model grid, built if not provided.
+
+    Returns
+    -------
+    xarray.Dataset
+        Paired dataset with the observation times and sites (``x``),
+        the observation variables and the model variables.
+    """
+    obs = obs_obj
+    if 'y' in obs.dims:
+        obs = obs.squeeze('y', drop=True)
+    if 'x' not in obs.coords:
+        obs = obs.assign_coords(x=range(obs.sizes['x']))
+    if 'z' in model_obj.dims:
+        model_obj = model_obj.isel(z=0, drop=True)
+
+    # sample the model at the sites and observation times only
+    mod_vars = [v for v in model_obj.data_vars if 'time' in model_obj[v].dims]
+    sites = xr.Dataset(coords={'latitude': obs['latitude'], 'longitude': obs['longitude']})
+    model_sites = combine_da_to_points(
+        model_obj[mod_vars], sites, site_index=site_index, radius_of_influence=radius_of_influence
+    )
+    model_sites = (
+        model_sites
+        .reset_coords(drop=True)
+        .reindex(time=obs.time)
+        .rename({v: v + suffix for v in mod_vars if v in obs.variables})
+    )
+
+    out = obs.copy()
+    for v in model_sites.data_vars:
+        out[v] = model_sites[v].transpose('time', 'x', ...)
+    return out
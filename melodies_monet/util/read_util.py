@@ -7,22 +7,29 @@ import xarray as xr
 import glob
 
 
-def read_saved_data(analysis, filenames, method, attr, xr_kws={}):
+def read_saved_data(analysis, filenames, method, attr, xr_kws={}, variables=None, time_range=None, parallel=False):
     """Read previously saved dict containing melodies-monet data (:attr:`paired`, :attr:`models`, or :attr:`obs`)
-    from pickle file or netcdf file, populating the :attr:`paired`, :attr:`models`, or :attr:`obs` dict.
+    from pickle file, netcdf file, zarr store or parquet file,
+    populating the :attr:`paired`, :attr:`models`, or :attr:`obs` dict.
 
     Parameters
     ----------
     analysis : melodies_monet.driver.analysis
         Instance of the analysis class from driver script.
     filenames : str or iterable
-        str or list for reading in pkl. For netCDF, must be dict with format {group1:str or iterable of filenames, group2:...}
+        str or list for reading in pkl. For netCDF, zarr and parquet, must be dict with format {group1:str or iterable of filenames, group2:...}
     method : str
-        One of either 'pkl' or 'netcdf'.
+        One of 'pkl', 'netcdf', 'zarr' or 'parquet'.
     attr : str
         The analysis attribute that will be populated with the saved data. One of either 'paired' or 'models' or 'obs'.
     **kwargs : optional
         Additional keyword arguments for xr.open_dataset()
+    variables : list, optional
+        For zarr and parquet, only read these variables (and the coordinates).
+    time_range : [str or pandas.Timestamp, str or pandas.Timestamp], optional
+        For zarr and parquet, only read the data in this time range [start, end].
+    parallel : bool or int, optional
+        For netCDF, open the files of each group in parallel threads (int for the number of threads).
 
     Returns
     -------
@@ -45,7 +52,7 @@ def read_saved_data(analysis, filenames, method, attr, xr_kws={}):
             files = sorted([file for sublist in [glob(os.path.join(read_dir,file)) for file in filenames] for file in sublist])
         if not files:
             raise FileNotFoundError('No such file: ',filenames)
-    elif method=='netcdf':
+    elif method in ('netcdf', 'zarr', 'parquet'):
         if isinstance(filenames,dict): 
             files = {}
             for group in filenames.keys():
@@ -60,7 +67,7 @@ def read_saved_data(analysis, filenames, method, attr, xr_kws={}):
                 if not files[group]:
                     raise FileNotFoundError('No such file: ', filenames[group])
         else:
-            raise TypeError('NetCDF format filenames need to be specified as a dict, with format {group1:str or iterable of filenames, group2:...}')
+            raise TypeError('NetCDF, zarr and parquet format filenames need to be specified as a dict, with format {group1:str or iterable of filenames, group2:...}')
     
     # Set analysis.read such that it now contains expanded filenames so user has list of read files
     expanded_filenames = getattr(analysis,'read')
@@ -74,13 +81,11 @@ def read_saved_data(analysis, filenames, method, attr, xr_kws={}):
         if len(files)==1:
             setattr(analysis, attr, read_pkl(files[0]))
         elif len(files)>1:
-            for count, file in enumerate(files):
-                if count==0:
-                    attr_out = read_pkl(file)
-                else:
-                    attr_append = read_pkl(file)
-                    for group in attr_out.keys():
-                        attr_out[group].obj = xr.merge([attr_out[group].obj,attr_append[group].obj])
+            attrs = [read_pkl(file) for file in files]
+            attr_out = attrs[0]
+            # combine each group at once
+            for group in attr_out.keys():
+                attr_out[group].obj = combine_saved([attr_append[group].obj for attr_append in attrs])
             setattr(analysis, attr,  attr_out)
 
     elif method=='netcdf':
@@ -90,7 +95,20 @@ def read_saved_data(analysis, filenames, method, attr, xr_kws={}):
                 group_files = [files[group]]
             else:
                 group_files = files[group]
-            xr_dict[group] = read_analysis_ncf(group_files,xr_kws)
+            xr_dict[group] = read_analysis_ncf(group_files,xr_kws,parallel=parallel)
+        setattr(analysis, attr,  xarray_to_class(class_type=class_names[attr],group_ds=xr_dict))
+
+    elif method in ('zarr', 'parquet'):
+        xr_dict = {}
+        for group in files.keys():
+            if isinstance(files[group],str):
+                group_files = [files[group]]
+            else:
+                group_files = files[group]
+            if method == 'zarr':
+                xr_dict[group] = read_analysis_zarr(group_files, variables=variables, time_range=time_range, xr_kws=xr_kws)
+            else:
+                xr_dict[group] = read_analysis_parquet(group_files, variables=variables, time_range=time_range)
         setattr(analysis, attr,  xarray_to_class(class_type=class_names[attr],group_ds=xr_dict))
 
 def read_pkl(filename):
@@ -115,10 +133,44 @@ def read_pkl(filename):
         
     return obj
 
-def read_analysis_ncf(filenames,xr_kws={}):
+def combine_saved(dsets):
+    """Combine the datasets of a group saved in several files, as merging them
+    one after another with ``xr.merge`` would, but without its quadratic cost.
+
+    Datasets covering separate time ranges (e.g. daily files) are concatenated along time
+    in a single step. Otherwise, they are merged pairwise in a tree, so that each
+    dataset is copied only a logarithmic number of times. Conflicting values of a
+    variable raise a ``ValueError`` in both cases.
+
+    Parameters
+    ----------
+    dsets : list of xarray.Dataset
+
+    Returns
+    -------
+    xarray.Dataset
+    """
+    if len(dsets) == 1:
+        return dsets[0]
+
+    if all('time' in ds.indexes and ds.sizes['time'] > 0 for ds in dsets):
+        ordered = sorted(dsets, key=lambda ds: ds.indexes['time'].min())
+        disjoint = all(prev.indexes['time'].max() < ds.indexes['time'].min()
+                       for prev, ds in zip(ordered[:-1], ordered[1:]))
+        if disjoint:
+            return xr.concat(ordered, dim='time', data_vars='minimal', coords='minimal',
+                             compat='no_conflicts', join='outer', combine_attrs='override')
+
+    while len(dsets) > 1:
+        dsets = [xr.merge(dsets[i:i+2], join='outer', compat='no_conflicts') for i in range(0, len(dsets), 2)]
+    return dsets[0]
+
+def read_analysis_ncf(filenames,xr_kws={},parallel=False):
     """Function to read netcdf4 files containing an object within an attribute of a part of the
     analysis class (models, obs, paired). For example, a single model/obs pairing or a single model. 
     If the object is saved in multiple files, the function will merge the files.
+    All the files are opened first (lazily, unless xr_kws says otherwise), their group names
+    checked, and then combined at once (see :func:`combine_saved`).
 
     Parameters
     ----------
@@ -126,6 +178,8 @@ def read_analysis_ncf(filenames,xr_kws={}):
         Description of parameter `filename`.
     xr_kws : optional
         Additional keyword arguments for xr.open_dataset()
+    parallel : bool or int, optional
+        Open the files in parallel threads (int for the number of threads).
         
     Returns
     -------
@@ -133,26 +187,124 @@ def read_analysis_ncf(filenames,xr_kws={}):
         Xarray dataset containing merged files.
 
     """
-    if len(filenames)==1:
-        print('Reading:', filenames[0])
-        ds_out = xr.open_dataset(filenames[0],**xr_kws)
-        
-    elif len(filenames)>1:
-        for count, file in enumerate(filenames):
-            print('Reading:', file)
+    def open_file(file):
+        print('Reading:', file)
+        return xr.open_dataset(file,**xr_kws)
+
+    if parallel and len(filenames) > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        max_workers = None if parallel is True else parallel
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            dsets = list(executor.map(open_file, filenames))
+    else:
+        dsets = [open_file(file) for file in filenames]
+
+    if len(dsets)==1:
+        return dsets[0]
+
+    # Test if all the files have the same group to prevent merge issues
+    group_names = {ds.attrs['group_name'] for ds in dsets}
+    if len(group_names) > 1:
+        raise Exception('The group names are not consistent between the netcdf files being read.') 
+    return combine_saved(dsets)
+
+def _subset_saved(ds, variables=None, time_range=None):
+    """Select variables (keeping the coordinates) and a time range [start, end] of a saved dataset."""
+    if variables is not None:
+        ds = ds[[v for v in variables if v in ds.data_vars]]
+    if time_range is not None and 'time' in ds.dims:
+        ds = ds.sel(time=slice(pd.Timestamp(time_range[0]), pd.Timestamp(time_range[-1])))
+    return ds
 
-            if count==0:
-                ds_out = xr.open_dataset(file,**xr_kws)
-                group_name1 =  ds_out.attrs['group_name']
+def read_analysis_zarr(filenames, variables=None, time_range=None, xr_kws={}):
+    """Function to read zarr stores written by :func:`melodies_monet.util.write_util.write_analysis_zarr`.
+    The data are read lazily, so only the variables and time range selected are loaded when used.
+    If the object is saved in multiple stores, the function will merge them.
 
-            else:
-                ds_append = xr.open_dataset(file,**xr_kws)
-                # Test if all the files have the same group to prevent merge issues
-                if group_name1 != ds_append.attrs['group_name']:
-                    raise Exception('The group names are not consistent between the netcdf files being read.') 
-                else:
-                    ds_out = xr.merge([ds_out,ds_append])
-            
+    Parameters
+    ----------
+    filenames : iterable
+        Zarr store paths.
+    variables : list, optional
+        Only read these variables (and the coordinates).
+    time_range : [str or pandas.Timestamp, str or pandas.Timestamp], optional
+        Only read the data in this time range [start, end].
+    xr_kws : optional
+        Additional keyword arguments for xr.open_zarr()
+
+    Returns
+    -------
+    ds_out : xarray.Dataset
+
+    """
+    dsets = []
+    for file in filenames:
+        print('Reading:', file)
+        dsets.append(_subset_saved(xr.open_zarr(file, **xr_kws), variables, time_range))
+    if len({ds.attrs['group_name'] for ds in dsets}) > 1:
+        raise Exception('The group names are not consistent between the zarr stores being read.')
+    return combine_saved(dsets)
+
+def read_analysis_parquet(filenames, variables=None, time_range=None):
+    """Function to read Parquet files written by :func:`melodies_monet.util.write_util.write_analysis_parquet`.
+    Only the columns of the variables and the row groups of the time range selected are read.
+    If the object is saved in multiple files, the function will concatenate them.
+
+    Parameters
+    ----------
+    filenames : iterable
+        Parquet file paths.
+    variables : list, optional
+        Only read these variables (and the coordinates).
+    time_range : [str or pandas.Timestamp, str or pandas.Timestamp], optional
+        Only read the data in this time range [start, end].
+
+    Returns
+    -------
+    ds_out : xarray.Dataset
+
+    """
+    import json
+    import pyarrow.parquet as pq
+
+    metas = [json.loads(pq.read_schema(file).metadata[b'melodies_monet']) for file in filenames]
+    if len({meta['attrs']['group_name'] for meta in metas}) > 1:
+        raise Exception('The group names are not consistent between the parquet files being read.')
+    meta = metas[0]
+    dims = meta['dims']
+
+    columns = None
+    if variables is not None:
+        columns = list(dims) + [v for v in meta['variables']
+                                if v not in dims and (v in meta['coords'] or v in variables)]
+    filters = None
+    if time_range is not None and 'time' in meta['variables']:
+        filters = [('time', '>=', pd.Timestamp(time_range[0])), ('time', '<=', pd.Timestamp(time_range[-1]))]
+    tables = []
+    for file in filenames:
+        print('Reading:', file)
+        tables.append(pq.read_table(file, columns=columns, filters=filters).to_pandas())
+    df = pd.concat(tables, ignore_index=True)
+
+    # rebuild the dataset, with the variables on their own dimensions
+    by_dims = {}
+    for v in df.columns:
+        if v not in dims:
+            by_dims.setdefault(tuple(meta['variables'][v]), []).append(v)
+    ds_out = xr.Dataset()
+    for var_dims, names in by_dims.items():
+        if var_dims:
+            ds_out = ds_out.merge(df.groupby(list(var_dims))[names].first().to_xarray())
+        else:
+            ds_out = ds_out.assign({v: df[v].iloc[0] for v in names})
+    # dimensions without coordinates
+    ds_out = ds_out.drop_vars([dim for dim in dims if dim not in meta['variables'] and dim in ds_out.variables])
+    ds_out = ds_out.set_coords([c for c in meta['coords'] if c in ds_out.data_vars])
+    for v in ds_out.variables:
+        if v in meta['variables'] and v not in dims:
+            ds_out[v] = ds_out[v].transpose(*meta['variables'][v])
+        ds_out[v].attrs = meta['var_attrs'].get(v, {})
+    ds_out.attrs = meta['attrs']
     return ds_out
 
 def xarray_to_class(class_type,group_ds):
@@ -5,10 +5,15 @@
 Masking arbitrary regions with regionmask
 """
 
+import hashlib
+import json
+import os
 import warnings
 from functools import lru_cache
 
+import numpy as np
 import pandas as pd
+import xarray as xr
 
 from melodies_monet.util.tools import get_epa_region_bounds, get_giorgi_region_bounds
 
@@ -293,3 +298,156 @@ def select_region(data, domain_type, domain_name, domain_info=None, **kwargs):
         else:
             data_masked = data.where(data[domain_type] == domain_name)
     return data_masked
+
+
+_REGION_MASKS = {}
+"""dict : In-memory cache of region masks, see :func:`get_region_mask`."""
+
+
+def _region_probe(data, domain_type):
+    """Creates a light Dataset with only the coordinates needed to select a region.
+
+    Parameters
+    ----------
+    data : xr.Dataset
+        data to be masked
+    domain_type : str
+        type of domain.
+
+    Returns
+    -------
+    xr.Dataset
+        Dataset with a variable of ones and, as coordinates, either
+        "latitude" and "longitude" or the variable the domain is selected from.
+    """
+    if domain_type.startswith("auto-region") or domain_type.startswith("custom"):
+        probe = xr.Dataset({"_region_probe": xr.ones_like(data["latitude"], dtype=float)})
+        probe = probe.assign_coords(latitude=data["latitude"], longitude=data["longitude"])
+    else:
+        probe = xr.Dataset({"_region_probe": xr.ones_like(data[domain_type], dtype=float)})
+        probe = probe.assign_coords({domain_type: data[domain_type]})
+    return probe
+
+
+def _region_key(probe, domain_type, domain_name, domain_info=None):
+    """Creates the cache key of a region mask.
+
+    Parameters
+    ----------
+    probe : xr.Dataset
+        Output of :func:`_region_probe`.
+    domain_type : str
+        type of domain.
+    domain_name : str
+        domain name.
+    domain_info : dict
+        domain information.
+
+    Returns
+    -------
+    str
+        sha1 hex digest of the coordinates and the domain definition.
+    """
+    h = hashlib.sha1()
+    for name in probe.coords:
+        coord = probe[name]
+        h.update(repr((name, coord.dims, coord.shape)).encode())
+        values = coord.values
+        if values.dtype.kind == "O":
+            values = values.astype(str)
+        h.update(np.ascontiguousarray(values).tobytes())
+    domain = json.dumps([domain_type, domain_name, domain_info], sort_keys=True, default=str)
+    h.update(domain.encode())
+    return h.hexdigest()
+
+
+def get_region_mask(data, domain_type, domain_name, domain_info=None, cache_dir=None, **kwargs):
+    """Gets the boolean mask of a region, computing it only once for each
+    set of coordinates and domain definition.
+
+    The mask is cached in memory and, if ``cache_dir`` is provided, on disk,
+    keyed by a hash of the coordinates plus the domain definition.
+
+    Parameters
+    ----------
+    data : xr.Dataset
+        data to be masked
+    domain_type : str
+        type of data. Used to decide which function to apply.
+    domain_name : str
+        This is used as the region name, or to read the info.
+    domain_info : dict
+        Dict containing the domain_name and other relevant information, e. g.,
+        lonlat box, mask_url, mask_file, etc.
+    cache_dir : str | pathobject
+        Directory to store the masks in. If None, masks are only kept in memory.
+    **kwargs:
+        extra kwargs to pass to the selector.
+
+    Returns
+    -------
+    xr.DataArray
+        Boolean mask, True inside the region.
+    """
+    probe = _region_probe(data, domain_type)
+    key = _region_key(probe, domain_type, domain_name, domain_info)
+    if key in _REGION_MASKS:
+        return _REGION_MASKS[key]
+
+    fn = None
+    if cache_dir is not None:
+        fn = os.path.join(cache_dir, f"region_mask_{key}.npz")
+    if fn is not None and os.path.isfile(fn):
+        with np.load(fn) as f:
+            mask = xr.DataArray(f["mask"], dims=tuple(f["dims"]))
+    else:
+        if isinstance(domain_info, dict):
+            # control_custom_mask adds defaults to domain_info
+            domain_info = dict(domain_info)
+        selected = select_region(probe, domain_type, domain_name, domain_info, **kwargs)
+        mask = selected["_region_probe"].notnull()
+        mask = xr.DataArray(mask.values, dims=mask.dims)
+        if fn is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            np.savez(fn, mask=mask.values, dims=np.array(mask.dims))
+    _REGION_MASKS[key] = mask
+    return mask
+
+
+def select_region_indexed(data, domain_type, domain_name, domain_info=None, cache_dir=None, **kwargs):
+    """Selects a region using a cached mask (see :func:`get_region_mask`).
+
+    If the mask only depends on the site dimension (e.g., surface networks),
+    the sites in the region are selected by integer index, dropping the others.
+    Otherwise, data outside the region is set to NaN, as :func:`select_region` does.
+
+    Parameters
+    ----------
+    data : xr.Dataset | pd.DataFrame
+        data to be masked
+    domain_type : str
+        type of data. Used to decide which function to apply.
+    domain_name : str
+        This is used as the region name, or to read the info.
+    domain_info : dict
+        Dict containing the domain_name and other relevant information, e. g.,
+        lonlat box, mask_url, mask_file, etc.
+    cache_dir : str | pathobject
+        Directory to store the masks in. If None, masks are only kept in memory.
+    **kwargs:
+        extra kwargs to pass to the selector.
+
+    Returns
+    -------
+    xr.Dataset | pd.DataFrame
+        Region selected. The type will be the same as the input data.
+    """
+    if domain_type == "all":
+        return data
+    if isinstance(data, pd.DataFrame):
+        return select_region(data, domain_type, domain_name, domain_info, **kwargs)
+
+    mask = get_region_mask(data, domain_type, domain_name, domain_info, cache_dir=cache_dir, **kwargs)
+    if mask.ndim == 1:
+        return data.isel({mask.dims[0]: np.flatnonzero(mask.values)})
+    return data.where(mask)
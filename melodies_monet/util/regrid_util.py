@@ -3,9 +3,20 @@
 """
 file: regrid_util.py
 """
+import hashlib
 import os
+import numpy as np
 import xarray as xr
 
+_WEIGHTS_CACHE = {'dir': None, 'max_size_mb': 2048}
+"""dict : Settings of the regridding weights cache, see :func:`set_weights_cache`."""
+
+# variables of a grid that determine the regridding weights, in addition to
+# the cell bounds named by a CF bounds attribute (see _bounds_variables)
+_GRID_VARIABLES = ('lat', 'lon', 'latitude', 'longitude', 'lat_b', 'lon_b',
+                   'lat_bnds', 'lon_bnds', 'latitude_bnds', 'longitude_bnds', 'mask')
+_BOUNDS_VARIABLES = ('lat_b', 'lon_b', 'lat_bnds', 'lon_bnds', 'latitude_bnds', 'longitude_bnds')
+
 
 def setup_regridder(config, config_group='obs', target_grid=None):
     """
@@ -17,12 +28,6 @@ def setup_regridder(config, config_group='obs', target_grid=None):
     Returns
         regridder (dict of xe.Regridder): dictionary of regridder instances
     """
-    try:
-        import xesmf as xe
-    except ImportError:
-        print('regrid_util: xesmf module not found')
-        raise
-
     print('setup_regridder.target_grid')
     print(target_grid)
 
@@ -38,7 +43,7 @@ def setup_regridder(config, config_group='obs', target_grid=None):
         base_file = os.path.expandvars(config[config_group][name]['regrid']['base_grid'])
         ds_base = xr.open_dataset(base_file)
         method = config[config_group][name]['regrid']['method']
-        regridder = xe.Regridder(ds_base, ds_target, method)
+        regridder = get_regridder(ds_base, ds_target, method)
         regridder_dict[name] = regridder
 
     return regridder_dict
@@ -59,3 +64,147 @@ def filename_regrid(filename, regridder):
 
     return filename_regrid
 
+
+
+def set_weights_cache(cache_dir=None, max_size_mb=2048):
+    """
+    Configure the cache of regridding weights used by :func:`get_regridder`
+
+    Parameters
+        cache_dir (str): directory to store the weight files in, None disables the cache
+        max_size_mb (float): maximum total size of the cache, least recently used
+            weight files are removed beyond it
+
+    Returns
+        None
+    """
+    _WEIGHTS_CACHE['dir'] = cache_dir
+    _WEIGHTS_CACHE['max_size_mb'] = max_size_mb
+
+
+def _bounds_variables(grid):
+    """
+    Names of the cell bounds variables of a grid: the usual names, and those
+    named by the CF bounds attribute of a variable (as found by xesmf through cf_xarray)
+
+    Parameters
+        grid (xr.Dataset, xr.DataArray or dict): grid as passed to xe.Regridder
+
+    Returns
+        names (list of str): sorted names
+    """
+    if isinstance(grid, xr.DataArray):
+        grid = grid.coords
+    names = {name for name in _BOUNDS_VARIABLES if name in grid}
+    variables = grid.variables if isinstance(grid, xr.Dataset) else grid
+    for name in variables:
+        bounds = getattr(variables[name], 'attrs', {}).get('bounds')
+        if bounds is not None and bounds in grid:
+            names.add(bounds)
+    return sorted(names)
+
+
+def _hash_grid(h, grid):
+    """
+    Update hash with the variables of a grid that determine the regridding weights
+
+    Parameters
+        h (hashlib hash): hash to update
+        grid (xr.Dataset, xr.DataArray or dict): grid as passed to xe.Regridder
+
+    Returns
+        None
+    """
+    if isinstance(grid, xr.DataArray):
+        grid = grid.coords
+    names = list(_GRID_VARIABLES)
+    names += [name for name in _bounds_variables(grid) if name not in names]
+    for name in names:
+        if name in grid:
+            values = np.ascontiguousarray(np.asarray(grid[name], dtype=np.float64))
+            h.update(repr((name, values.shape)).encode())
+            h.update(values.tobytes())
+
+
+def _evict_weights(cache_dir, max_size_mb):
+    """
+    Remove the least recently used weight files until the cache fits in max_size_mb
+
+    Parameters
+        cache_dir (str): cache directory
+        max_size_mb (float): maximum total size of the cache
+
+    Returns
+        None
+    """
+    entries = []
+    for fn in os.listdir(cache_dir):
+        if fn.startswith('weights_') and fn.endswith('.nc'):
+            st = os.stat(os.path.join(cache_dir, fn))
+            entries.append((st.st_mtime, st.st_size, fn))
+    total = sum(size for _, size, _ in entries)
+    for _, size, fn in sorted(entries):
+        if total <= max_size_mb * 1024**2:
+            break
+        try:
+            os.remove(os.path.join(cache_dir, fn))
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def get_regridder(ds_in, ds_out, method, **kwargs):
+    """
+    Create a xe.Regridder, reusing the weights from the cache directory if
+    the same grids and method were used before (see :func:`set_weights_cache`)
+
+    Weight files are named after a hash of the source grid, the target grid,
+    the method and the keyword arguments, and the least recently used files
+    are removed when the cache grows beyond its maximum size. Conservative
+    weights are not cached if a grid has no cell bounds that can be hashed.
+
+    Parameters
+        ds_in (xr.Dataset, xr.DataArray or dict): source grid
+        ds_out (xr.Dataset, xr.DataArray or dict): target grid
+        method (str): regridding method
+        **kwargs: other arguments for xe.Regridder
+
+    Returns
+        regridder (xe.Regridder): regridder instance
+    """
+    try:
+        import xesmf as xe
+    except ImportError:
+        print('regrid_util: xesmf module not found')
+        raise
+
+    # weights are either cached or built from scratch
+    kwargs.pop('reuse_weights', None)
+    kwargs.pop('filename', None)
+
+    cache_dir = _WEIGHTS_CACHE['dir']
+    if cache_dir is None or (method.startswith('conservative')
+                             and not (_bounds_variables(ds_in) and _bounds_variables(ds_out))):
+        return xe.Regridder(ds_in, ds_out, method, **kwargs)
+
+    h = hashlib.sha1()
+    _hash_grid(h, ds_in)
+    h.update(b'->')
+    _hash_grid(h, ds_out)
+    h.update(repr((method, sorted(kwargs.items()))).encode())
+    fn = os.path.join(cache_dir, 'weights_{}.nc'.format(h.hexdigest()))
+
+    if os.path.isfile(fn):
+        regridder = xe.Regridder(ds_in, ds_out, method, weights=fn, **kwargs)
+        # mark as recently used
+        os.utime(fn)
+    else:
+        regridder = xe.Regridder(ds_in, ds_out, method, **kwargs)
+        os.makedirs(cache_dir, exist_ok=True)
+        # write to a temporary file first, so concurrent readers never see a partial file
+        fn_tmp = '{}.{}.tmp'.format(fn, os.getpid())
+        regridder.to_netcdf(fn_tmp)
+        os.replace(fn_tmp, fn)
+        _evict_weights(cache_dir, _WEIGHTS_CACHE['max_size_mb'])
+
+    return regridder
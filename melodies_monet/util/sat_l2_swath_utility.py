@@ -8,13 +8,14 @@
 import numpy as np
 import xarray as xr
 from datetime import datetime
-import xesmf as xe
+from .regrid_util import get_regridder
+from .satellite_utilities import _interp_extrapolate
 
 import logging
 numba_logger = logging.getLogger('numba')
 numba_logger.setLevel(logging.WARNING)
 
-def trp_interp_swatogrd(obsobj, modobj,no2varname='no2'):
+def trp_interp_swatogrd(obsobj, modobj,no2varname='no2',method='bilinear'):
 
     """
     interpolate sat swath to model grid
@@ -23,6 +24,8 @@ def trp_interp_swatogrd(obsobj, modobj,no2varname='no2'):
     ------
     obsobj  : satellite swath data
     modobj  : model data (with no2 col calculated)
+    method  : xESMF regridding method from the swaths to the model grid, or 'binning'
+              to average the pixels of all the swaths of a day in each model grid cell
     
     Output
     ------
@@ -48,6 +51,12 @@ def trp_interp_swatogrd(obsobj, modobj,no2varname='no2'):
             latitude=(["x", "y"], modobj.coords['latitude'].values)),
         attrs=dict(description="daily tropomi data at model grids"),)
 
+    if method == 'binning':
+        from .grid_util import bin_swaths_to_grid, grid_cell_radius, swath_cell_index
+        modlon = modobj.coords['longitude'].values
+        modlat = modobj.coords['latitude'].values
+        radius = grid_cell_radius(modlon, modlat)
+
     for nd in range(nobstime):
         days = list(obsobj.keys())[nd]
         # --- model
@@ -71,16 +80,23 @@ def trp_interp_swatogrd(obsobj, modobj,no2varname='no2'):
 
         # intermediate array for all swaths
         no2_modgrid_all = np.zeros([ny, nx, nswath], dtype=np.float64)
+        swaths = []
 
         for ns in range(nswath):
             satlon = obsobj[days][ns]['lon']
             satlat = obsobj[days][ns]['lat']
             satno2 = obsobj[days][ns]['nitrogendioxide_tropospheric_column']
 
+            if method == 'binning':
+                cell = swath_cell_index(modlon, modlat, satlon.values, satlat.values, radius_of_influence=radius)
+                satno2 = satno2.values.ravel()
+                swaths.append((cell, np.where(satno2 > 0.0, satno2, np.nan)))
+                continue
+
             # regridding from swath grid to model grids
             grid_in = {'lon':satlon.values, 'lat':satlat.values}
 
-            regridder = xe.Regridder(grid_in, no2_modgrid_avg[['lat','lon']],'bilinear',ignore_degenerate=True,reuse_weights=False)
+            regridder = get_regridder(grid_in, no2_modgrid_avg[['lat','lon']],method,ignore_degenerate=True)
             
             # regridded no2 trop. columns
             no2_modgrid = regridder(satno2) # , keep_attrs=True
@@ -93,7 +109,11 @@ def trp_interp_swatogrd(obsobj, modobj,no2varname='no2'):
             print(' no2 satellite:', np.nanmin(no2_modgrid), np.nanmax(no2_modgrid))
 
         # daily averaged no2 trop. columns at model grids
-        no2_modgrid_avg['nitrogendioxide_tropospheric_column'][nd,:,:] = np.nanmean(np.where(no2_modgrid_all > 0.0, no2_modgrid_all, np.nan), axis=2)
+        if method == 'binning':
+            if swaths:
+                no2_modgrid_avg['nitrogendioxide_tropospheric_column'][nd,:,:] = bin_swaths_to_grid(modlon, modlat, swaths)[1][0]
+        else:
+            no2_modgrid_avg['nitrogendioxide_tropospheric_column'][nd,:,:] = np.nanmean(np.where(no2_modgrid_all > 0.0, no2_modgrid_all, np.nan), axis=2)
 
     del(modobj)
     del(obsobj)
@@ -101,7 +121,7 @@ def trp_interp_swatogrd(obsobj, modobj,no2varname='no2'):
     return no2_modgrid_avg
 
 
-def trp_interp_swatogrd_ak(obsobj, modobj,no2varname='no2'):
+def trp_interp_swatogrd_ak(obsobj, modobj,no2varname='no2',method='bilinear'):
 
     """
     interpolate sat swath to model grid applied with averaging kernel
@@ -110,6 +130,9 @@ def trp_interp_swatogrd_ak(obsobj, modobj,no2varname='no2'):
     ------
     obsobj  : satellite swath data
     modobj  : model data (with no2 col calculated)
+    method  : xESMF regridding method from the swaths to the model grid, or 'binning'
+              to average the pixels of all the swaths of a day in each model grid cell
+              (the model is still interpolated to the swaths bilinearly for the averaging kernel)
     
     Output
     ------
@@ -137,6 +160,12 @@ def trp_interp_swatogrd_ak(obsobj, modobj,no2varname='no2'):
 
     # tmpvalue = np.zeros([ny, nx], dtype = np.float64)
 
+    if method == 'binning':
+        from .grid_util import bin_swaths_to_grid, grid_cell_radius, swath_cell_index
+        modlon = modobj.coords['longitude'].values
+        modlat = modobj.coords['latitude'].values
+        radius = grid_cell_radius(modlon, modlat)
+
     # loop over all days
     for nd in range(nobstime):
 
@@ -165,6 +194,7 @@ def trp_interp_swatogrd_ak(obsobj, modobj,no2varname='no2'):
 
         # array for all swaths
         no2_modgrid_all = np.zeros([ny, nx, nswath], dtype=np.float32)
+        swaths = []
 
         for ns in range(nswath):
             working_swath = obsobj[days][ns]     
@@ -176,7 +206,7 @@ def trp_interp_swatogrd_ak(obsobj, modobj,no2varname='no2'):
             nysat, nxsat, nzsat = working_swath['averaging_kernel'].shape
 
             # regridding from model grid to sat grid
-            regridder_ms = xe.Regridder(grid_mod, grid_sat,'bilinear',ignore_degenerate=True,reuse_weights=False)
+            regridder_ms = get_regridder(grid_mod, grid_sat,'bilinear',ignore_degenerate=True)
             
             # force model data to put z dimension last for pressure and no2 partial columns
             mod_pres_no2 = modobj_tm[['pres_pa_mid',f'{no2varname}_col']].mean(dim='time')#.transpose('y','x','z')
@@ -193,21 +223,30 @@ def trp_interp_swatogrd_ak(obsobj, modobj,no2varname='no2'):
             # averaing kernel applied done
             satno2 = working_swath['nitrogendioxide_tropospheric_column'] * ratio 
 
+            if method == 'binning':
+                cell = swath_cell_index(modlon, modlat, grid_sat['lon'], grid_sat['lat'], radius_of_influence=radius)
+                satno2 = satno2.values.ravel()
+                swaths.append((cell, np.where(satno2 > 0.0, satno2, np.nan)))
+                continue
+
             # regridding from swath grid to model grids
-            regridder = xe.Regridder(grid_sat, grid_mod,'bilinear',ignore_degenerate=True,reuse_weights=False)
+            regridder = get_regridder(grid_sat, grid_mod,method,ignore_degenerate=True)
 
             # regridded no2 trop. columns
             no2_modgrid = regridder(satno2, keep_attrs=True)
             no2_modgrid_all[:,:,ns] = no2_modgrid[:,:]
 
         # daily averaged no2 trop. columns at model grids
-        no2_modgrid_avg['nitrogendioxide_tropospheric_column'][nd,:,:] = np.nanmean(np.where(no2_modgrid_all > 0.0, no2_modgrid_all, np.nan), axis=2)
+        if method == 'binning':
+            if swaths:
+                no2_modgrid_avg['nitrogendioxide_tropospheric_column'][nd,:,:] = bin_swaths_to_grid(modlon, modlat, swaths)[1][0]
+        else:
+            no2_modgrid_avg['nitrogendioxide_tropospheric_column'][nd,:,:] = np.nanmean(np.where(no2_modgrid_all > 0.0, no2_modgrid_all, np.nan), axis=2)
 
     return no2_modgrid_avg
 
 
 def cal_amf_wrfchem(scatw, wrfpreslayer, tpreslev, troppres, wrfno2layer_molec, tamf_org, satlon, satlat, modlon, modlat):
-    from scipy import interpolate
 
     nsaty, nsatx, nz    = wrfpreslayer.shape
     nsatz, nsaty, nsatx = tpreslev.shape # mli, update to new dimension
@@ -238,20 +277,18 @@ def cal_amf_wrfchem(scatw, wrfpreslayer, tpreslev, troppres, wrfno2layer_molec,
     lb = np.where( (satlon >= np.nanmin(modlon)) & (satlon <= np.nanmax(modlon)) 
         & (satlat >= np.nanmin(modlat)) & (satlat <= np.nanmax(modlat)))
 
-    vertical_pres = []
-    vertical_scatw = []
-    vertical_wrfp = []
-    
     if len(lb[0]) == 0:
         print('Caution: There are no observations within the model domain')
-    for llb in range(len(lb[0])):
-        yy = lb[0][llb]
-        xx = lb[1][llb]
-        vertical_pres = tpreslev[:,yy,xx] # mli, update to new dimension
-        vertical_scatw = scatw[yy,xx,:]
-        vertical_wrfp = wrfpreslayer[yy,xx,:]
-        f = interpolate.interp1d(np.log10(vertical_pres[:]),vertical_scatw[:], fill_value="extrapolate")# relationship between pressure to avk
-        wrfavk[yy,xx,:] = f(np.log10(vertical_wrfp[:])) #wrf-chem averaging kernel
+    else:
+        # relationship between log pressure and avk, for all pixels at once
+        vertical_pres = np.log10(tpreslev[:,lb[0],lb[1]].T) # mli, update to new dimension
+        isort = np.argsort(vertical_pres, axis=1, kind='mergesort')
+        vertical_pres = np.take_along_axis(vertical_pres, isort, axis=1)
+        vertical_scatw = np.take_along_axis(scatw[lb[0],lb[1],:], isort, axis=1)
+        vertical_wrfp = np.log10(wrfpreslayer[lb[0],lb[1],:])
+        wrfavk_lb = np.empty(vertical_wrfp.shape, dtype=np.float32)
+        _interp_extrapolate(vertical_pres, vertical_scatw, vertical_wrfp, wrfavk_lb)
+        wrfavk[lb] = wrfavk_lb #wrf-chem averaging kernel
 
     for l in range(nz-1):  # noqa: E741
         # check if it's within tropopause
@@ -15,11 +15,21 @@ import warnings
 import numba
 import numpy as np
 import xarray as xr
-import xesmf as xe
+
+from .column_physics import altitude_from_thickness, column_physics, thickness_from_altitude
+from .regrid_util import get_regridder
 
 numba_logger = logging.getLogger("numba")
 numba_logger.setLevel(logging.WARNING)
 
+# constants of the TEMPO partial columns
+_R = 8.314  # m3 * Pa / K / mol
+_NA = 6.022e23
+
+_NUMBA_THREADS_STARTED = False
+"""bool : Whether the parallel vertical interpolation (:func:`_interp_vert_columns`) has run
+in this process, starting numba's threads, after which forking the process can hang it at exit."""
+
 
 def calc_grid_corners(ds, lat="latitude", lon="longitude"):
     """Adds latitude and longitude bounds inplace.
@@ -95,7 +105,7 @@ def tempo_interp_mod2swath(obsobj, modobj, method="conservative", weights=None):
 
     mod_at_swathtime = modobj.interp(time=obsobj.time.mean())
     if weights is None:
-        regridder = xe.Regridder(
+        regridder = get_regridder(
             mod_at_swathtime,
             obsobj,
             method,
@@ -104,6 +114,8 @@ def tempo_interp_mod2swath(obsobj, modobj, method="conservative", weights=None):
         )
         modswath = regridder(mod_at_swathtime)
     else:
+        import xesmf as xe
+
         regridder = xe.Regridder(
             mod_at_swathtime,
             obsobj,
@@ -154,10 +166,12 @@ def _calc_dp(obsobj):
     return dp
 
 
-@numba.jit(nopython=True)
-def _interp_vert(orig, target, data):
-    """Performs the numpy interpolation. It is separated from other functions
-    for the sake of using the numba jit.
+@numba.jit(nopython=True, parallel=True)
+def _interp_vert_columns(orig, target, data, out):
+    """Interpolates several variables column by column, in parallel over the
+    columns. For each column the position of the target levels in the original
+    grid is found once and used for all the variables. The result is the same as
+    that of np.interp on the flipped (increasing) columns, without flipping them.
 
     Parameters:
     -----------
@@ -169,27 +183,92 @@ def _interp_vert(orig, target, data):
         Target data with vertical grid information. The expected dimensions are (z, x, y),
         in that order. The target pressure layers should be in decreasing order.
     data : np.ndarray
-        Data to be interpolated. It should have the same grid (including vertical) and dimensions
-        as orig.
-
-    Returns
-    -------
-    np.ndarray
-        Interpolated data
+        Data to be interpolated, with dimensions (variable, z, x, y). The grid
+        (z, x, y) should be the same as orig.
+    out : np.ndarray
+        Output buffer, with dimensions (variable, z, x, y) and the grid of target.
+        The interpolation is done in float64 and stored with the dtype of out.
     """
-    assert orig.shape == data.shape, "Grid shape does not match data"
-    nz, nx, ny = target.shape
-    interp = np.zeros((nz, nx, ny))
-    for x in range(nx):
-        for y in range(ny):
-            interp[:, x, y] = np.flip(
-                np.interp(
-                    np.flip(target[:, x, y]),
-                    np.flip(orig[:, x, y]),
-                    np.flip(data[:, x, y]),
-                )
-            )
-    return interp
+    nvar, nzo, nx, ny = data.shape
+    nzt = target.shape[0]
+    for col in numba.prange(nx * ny):
+        x = col // ny
+        y = col % ny
+        top = np.float64(orig[nzo - 1, x, y])
+        bottom = np.float64(orig[0, x, y])
+        for k in range(nzt):
+            p = np.float64(target[k, x, y])
+            if np.isnan(p):
+                for v in range(nvar):
+                    out[v, k, x, y] = np.nan
+            elif p < top:
+                for v in range(nvar):
+                    out[v, k, x, y] = data[v, nzo - 1, x, y]
+            elif p >= bottom:
+                for v in range(nvar):
+                    out[v, k, x, y] = data[v, 0, x, y]
+            else:
+                # orig is decreasing: search the increasing column orig[nzo - 1 - j]
+                lo = 0
+                hi = nzo - 1
+                while hi - lo > 1:
+                    mid = (lo + hi) // 2
+                    if orig[nzo - 1 - mid, x, y] <= p:
+                        lo = mid
+                    else:
+                        hi = mid
+                i0 = nzo - 1 - lo
+                i1 = i0 - 1
+                p0 = np.float64(orig[i0, x, y])
+                p1 = np.float64(orig[i1, x, y])
+                for v in range(nvar):
+                    f0 = np.float64(data[v, i0, x, y])
+                    f1 = np.float64(data[v, i1, x, y])
+                    if p == p0:
+                        res = f0
+                    else:
+                        slope = (f1 - f0) / (p1 - p0)
+                        res = slope * (p - p0) + f0
+                        if np.isnan(res):
+                            res = slope * (p - p1) + f1
+                            if np.isnan(res) and f0 == f1:
+                                res = f0
+                    out[v, k, x, y] = res
+
+
+class VerticalInterpWorkspace:
+    """Buffers for :func:`interp_vertical_mod2swath`, reused across granules.
+
+    The buffers only grow, so granules of different sizes share the same memory.
+    They only hold intermediate arrays: the variables returned by
+    :func:`interp_vertical_mod2swath` never refer to them.
+    """
+
+    def __init__(self):
+        self._buffers = {}
+
+    def buffer(self, name, shape, dtype):
+        """Buffer of a given shape and dtype
+
+        Parameters
+        ----------
+        name : str
+            Buffer name
+        shape : tuple[int]
+        dtype : np.dtype
+
+        Returns
+        -------
+        np.ndarray
+            C-contiguous array, with undefined values
+        """
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape))
+        flat = self._buffers.get((name, dtype))
+        if flat is None or flat.size < size:
+            flat = np.empty(size, dtype=dtype)
+            self._buffers[(name, dtype)] = flat
+        return flat[:size].reshape(shape)
 
 
 def calc_altitude_from_thickness(dz_m):
@@ -204,16 +283,7 @@ def calc_altitude_from_thickness(dz_m):
     -------
     Model altitude in satellite space
     """
-    altitude_interface = xr.zeros_like(dz_m)
-    altitude_interface[{"z": 0}] = dz_m[{"z": 0}]
-    for lev in altitude_interface["z"][1:]:
-        altitude_interface[{"z": lev}] = altitude_interface[{"z": lev - 1}] + dz_m[{"z": lev}]
-    altitude_interface.attrs = {
-        "description": "Altitude AGL in m at layer interface",
-        "units": "m",
-        "long_name": "altitude_agl",
-    }
-    return altitude_interface
+    return altitude_from_thickness(dz_m, dim="z")
 
 
 def calc_dz_m_from_altitude(altitude):
@@ -230,20 +300,10 @@ def calc_dz_m_from_altitude(altitude):
     xr.DataArray
         DataArray containing the layer thickness (dz_m) in m.
     """
-    dz_m = xr.zeros_like(altitude)
-    dz_m[{"z": 0}] = altitude[{"z": 0}]
-    dz_m[{"z": slice(1, None)}] = (
-        altitude[{"z": slice(1, None)}].values - altitude[{"z": slice(0, -1)}].values
-    )
-    dz_m.attrs = {
-        "description": "Layer thickness in m",
-        "units": "m",
-        "long_name": "layer_thickness",
-    }
-    return dz_m
+    return thickness_from_altitude(altitude, dim="z")
 
 
-def interp_vertical_mod2swath(obsobj, modobj, variables="NO2_col"):
+def interp_vertical_mod2swath(obsobj, modobj, variables="NO2_col", workspace=None):
     """Interpolates model vertical layers to TEMPO vertical layers
 
     Parameters
@@ -254,12 +314,18 @@ def interp_vertical_mod2swath(obsobj, modobj, variables="NO2_col"):
         TEMPO data (as provided by MONETIO). Must include pressure.
     variables : str | list[str]
         Variables to interpolate.
+    workspace : VerticalInterpWorkspace | None
+        If present, the model variables are stacked in its buffers instead of
+        newly allocated arrays.
 
     Returns
     -------
     xr.Dataset
-        Model data (interpolated to TEMPO vertical layers
+        Model data interpolated to TEMPO vertical layers. Variables keep
+        their dtype (integers are interpolated to float64).
     """
+    global _NUMBA_THREADS_STARTED
+
     assert np.all(modobj["lon"].fillna(0).values == obsobj["lon"].fillna(0).values)
     assert np.all(modobj["lat"].fillna(0).values == obsobj["lat"].fillna(0).values)
 
@@ -274,10 +340,30 @@ def interp_vertical_mod2swath(obsobj, modobj, variables="NO2_col"):
         "lon": (("x", "y"), modobj["lon"].values),
         "lat": (("x", "y"), modobj["lat"].values),
     }
-    for var in list(variables):
-        interpolated = _interp_vert(p_orig, p_mid_tempo, modobj[var].values)
+    if isinstance(variables, str):
+        variables = [variables]
+    if workspace is None:
+        workspace = VerticalInterpWorkspace()
+    assert p_orig.shape[1:] == p_mid_tempo.shape[1:], "Grid shape does not match data"
+    # variables sharing a dtype are interpolated in the same sweep
+    by_dtype = {}
+    for var in variables:
+        assert modobj[var].shape == p_orig.shape, "Grid shape does not match data"
+        dtype = modobj[var].dtype if np.issubdtype(modobj[var].dtype, np.floating) else np.float64
+        by_dtype.setdefault(np.dtype(dtype), []).append(var)
+    interpolated = {}
+    for dtype, group in by_dtype.items():
+        data = workspace.buffer("data", (len(group),) + p_orig.shape, dtype)
+        for i, var in enumerate(group):
+            data[i] = modobj[var].values
+        out = np.empty((len(group),) + p_mid_tempo.shape, dtype=dtype)
+        _NUMBA_THREADS_STARTED = True
+        _interp_vert_columns(p_orig, p_mid_tempo, data, out)
+        for i, var in enumerate(group):
+            interpolated[var] = out[i]
+    for var in variables:
         modsatlayers[var] = xr.DataArray(
-            data=interpolated, dims=dimensions, coords=coords, attrs=modobj[var].attrs
+            data=interpolated[var], dims=dimensions, coords=coords, attrs=modobj[var].attrs
         )
     modsatlayers["pres_pa_mid"] = xr.DataArray(
         data=p_mid_tempo,
@@ -305,19 +391,7 @@ def calc_partialcolumn(modobj, var="NO2"):
     xr.DataArray
         DataArray containing the partial column of the species.
     """
-    R = 8.314  # m3 * Pa / K / mol
-    NA = 6.022e23
-    ppbv2molmol = 1e-9
-    m2_to_cm2 = 1e4
-    fac_units = ppbv2molmol * NA / m2_to_cm2
-    partial_col = (
-        modobj[var]
-        * modobj["pres_pa_mid"]
-        * modobj["dz_m"]
-        * fac_units
-        / (R * modobj["temperature_k"])
-    )
-    return partial_col
+    return column_physics(modobj, var, r_gas=_R, n_avogadro=_NA)[f"{var}_col"]
 
 
 def apply_weights_mod2tempo_no2_hydrostatic(obsobj, modobj, species="NO2"):
@@ -492,7 +566,13 @@ def is_nonpairable(obsobj, k, modobj):
 
 
 def _regrid_and_apply_weights(
-    obsobj, modobj, method="conservative", weights=None, species=["NO2"], tempo_sp="NO2"
+    obsobj,
+    modobj,
+    method="conservative",
+    weights=None,
+    species=["NO2"],
+    tempo_sp="NO2",
+    workspace=None,
 ):
     """Does the complete process of regridding and
     applying scattering weights. Assumes that obsobj is a Dataset
@@ -510,6 +590,8 @@ def _regrid_and_apply_weights(
         Path to the weightfile. If present, the weights won't be calculated again.
     tempo_sp: str
         NO2 or HCHO, to apply the correct Air Mass Factors and scattering weights.
+    workspace : VerticalInterpWorkspace | None
+        Buffers for the vertical interpolation, reused across granules.
 
     Returns
     -------
@@ -533,21 +615,149 @@ def _regrid_and_apply_weights(
     if "dz_m" in modobj.keys():
         modobj_hs["altitude"] = calc_altitude_from_thickness(modobj_hs["dz_m"])
         modobj_swath = interp_vertical_mod2swath(
-            obsobj, modobj_hs, [f"{species[0]}", "altitude", "temperature_k"]
+            obsobj,
+            modobj_hs,
+            [f"{species[0]}", "altitude", "temperature_k"],
+            workspace=workspace,
+        )
+        modobj_swath.update(
+            column_physics(modobj_swath, species[0], dz=True, r_gas=_R, n_avogadro=_NA)
         )
-        modobj_swath["dz_m"] = calc_dz_m_from_altitude(modobj_swath["altitude"])
-        modobj_swath[f"{species[0]}_col"] = calc_partialcolumn(modobj_swath, var=species[0])
         da_out = apply_weights(obsobj, modobj_swath, species=f"{species[0]}")
     else:
         warnings.warn(
             "There is no dz_m variable, and the partial column"
             + "cannot be directly calculated. Assuming hydrostatic equation."
         )
-        modobj_swath = interp_vertical_mod2swath(obsobj, modobj_hs, species)
+        modobj_swath = interp_vertical_mod2swath(obsobj, modobj_hs, species, workspace=workspace)
         da_out = apply_weights_hydrostatic(obsobj, modobj_swath, species=species[0])
     return da_out.where(np.isfinite(da_out))
 
 
+_GRANULE_ERRORS = (ValueError, KeyError, IndexError, AssertionError, ArithmeticError)
+"""tuple : Errors of a granule that is left out (see :func:`regrid_and_apply_weights`).
+Other errors, such as programming errors, are raised."""
+
+_SHARED_MODEL = {}
+"""dict : Model shared with the granule worker processes (see :func:`regrid_and_apply_weights`)."""
+
+
+def _share_dataset(ds):
+    """Copy the arrays of a dataset to shared memory blocks.
+
+    Parameters
+    ----------
+    ds : xr.Dataset
+
+    Returns
+    -------
+    spec : dict
+        Description of the dataset, to rebuild it with :func:`_attach_dataset`.
+    blocks : list[multiprocessing.shared_memory.SharedMemory]
+        Shared memory blocks, to close and unlink when done.
+    """
+    from multiprocessing import shared_memory
+
+    spec = {"variables": {}, "coords": list(ds.coords), "attrs": ds.attrs}
+    blocks = []
+    for name, var in ds.variables.items():
+        values = np.ascontiguousarray(var.values)
+        if name in ds.indexes or values.dtype.hasobject or values.nbytes == 0:
+            # small or not shareable, pickled
+            spec["variables"][name] = var
+            continue
+        shm = shared_memory.SharedMemory(create=True, size=values.nbytes)
+        blocks.append(shm)
+        np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[...] = values
+        spec["variables"][name] = (var.dims, values.shape, values.dtype.str, var.attrs, shm.name)
+    return spec, blocks
+
+
+def _attach_dataset(spec):
+    """Rebuild a dataset shared by :func:`_share_dataset`, with read-only arrays.
+
+    Returns
+    -------
+    ds : xr.Dataset
+    blocks : list[multiprocessing.shared_memory.SharedMemory]
+        Shared memory blocks, to keep open while ds is used.
+    """
+    from multiprocessing import shared_memory
+
+    variables = {}
+    blocks = []
+    for name, item in spec["variables"].items():
+        if isinstance(item, xr.Variable):
+            variables[name] = item
+            continue
+        dims, shape, dtype, attrs, shm_name = item
+        try:
+            # the parent process owns (and unlinks) the block
+            shm = shared_memory.SharedMemory(name=shm_name, track=False)
+        except TypeError:  # Python < 3.13
+            shm = shared_memory.SharedMemory(name=shm_name)
+        blocks.append(shm)
+        values = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        values.flags.writeable = False
+        variables[name] = xr.Variable(dims, values, attrs)
+    ds = xr.Dataset(
+        {k: v for k, v in variables.items() if k not in spec["coords"]},
+        coords={k: v for k, v in variables.items() if k in spec["coords"]},
+        attrs=spec["attrs"],
+    )
+    return ds, blocks
+
+
+def _init_granule_worker(model_spec, weights_cache):
+    """Initializer of the granule worker processes: attach the shared model."""
+    from .regrid_util import set_weights_cache
+
+    set_weights_cache(**weights_cache)
+    _SHARED_MODEL["obj"], _SHARED_MODEL["blocks"] = _attach_dataset(model_spec)
+    _SHARED_MODEL["workspace"] = VerticalInterpWorkspace()
+
+
+def _pair_granule(
+    ref_time, granule, modobj, pair, method, weights, species, tempo_sp, sat_species_name, workspace=None
+):
+    """Regrid the model to a granule and apply the scattering weights
+    (see :func:`regrid_and_apply_weights`).
+
+    Parameters
+    ----------
+    modobj : xr.Dataset | None
+        Model output, or None to use the model (and workspace) shared with the
+        worker process.
+    workspace : VerticalInterpWorkspace | None
+        Buffers for the vertical interpolation, reused across granules.
+
+    Returns
+    -------
+    xr.Dataset
+    """
+    if modobj is None:
+        modobj = _SHARED_MODEL["obj"]
+        workspace = _SHARED_MODEL["workspace"]
+    output = _regrid_and_apply_weights(
+        granule,
+        modobj,
+        method=method,
+        weights=weights,
+        species=species,
+        tempo_sp=tempo_sp,
+        workspace=workspace,
+    ).to_dataset(name=species[0])
+    output.attrs["reference_time_string"] = ref_time
+    output.attrs["scan_num"] = granule.attrs["scan_num"]
+    output.attrs["granule_number"] = granule.attrs["granule_number"]
+    output.attrs["final_time_string"] = granule["time"][-1].values.astype(str)
+    if pair:
+        output = xr.merge([output, granule[sat_species_name]])
+    if "lat" in output.variables:
+        output = output.rename({"lat": "latitude", "lon": "longitude"})
+    return output
+
+
 def regrid_and_apply_weights(
     obsobj,
     modobj,
@@ -557,6 +767,7 @@ def regrid_and_apply_weights(
     weights=None,
     species=["NO2"],
     tempo_sp="NO2",
+    n_workers=1,
 ):
     """Does the complete process of regridding
     and applying scattering weights.
@@ -581,12 +792,18 @@ def regrid_and_apply_weights(
         If True, satellite granules that don't match the model domain are not used.
     tempo_sp: str
         NO2 for the NO2 product, HCHO for the HCHO product
+    n_workers : int
+        Number of granules processed concurrently, in worker processes sharing
+        the (loaded) model arrays read-only through shared memory.
+        Only has an effect if the input is an OrderedDict. The workers are
+        spawned, so scripts calling this need an ``if __name__ == "__main__":`` guard.
 
     Returns
     -------
     xr.Dataset | collections.OrderedDict
         Model with regridded data. If obsobj is of type collections.OrderedDict,
-        an OrderedDict is returned.
+        an OrderedDict is returned. Granules that fail with a data error
+        (see ``_GRANULE_ERRORS``) are reported and left out, other errors are raised.
     """
 
     if tempo_sp == "NO2":
@@ -610,44 +827,166 @@ def regrid_and_apply_weights(
             output = output.rename({"lat": "latitude", "lon": "longitude"})
         return output
     if isinstance(obsobj, dict):
-        output_multiple = {}
+        import traceback
+
+        ref_times = []
         for ref_time in obsobj.keys():
             if is_nonpairable(obsobj, ref_time, modobj):
                 warnings.warn(f"{ref_time} granule domain has no overlap with model. Discarding.")
                 continue
-            if verbose:
-                print(f"Regridding {ref_time} and applying AMF and weights")
-            output_multiple[ref_time] = _regrid_and_apply_weights(
-                obsobj[ref_time],
-                modobj,
-                method=method,
-                weights=weights,
-                species=species,
-                tempo_sp=tempo_sp,
-            ).to_dataset(name=species[0])
-            output_multiple[ref_time].attrs["reference_time_string"] = ref_time
-            output_multiple[ref_time].attrs["scan_num"] = obsobj[ref_time].attrs["scan_num"]
-            output_multiple[ref_time].attrs["granule_number"] = obsobj[ref_time].attrs[
-                "granule_number"
-            ]
-            output_multiple[ref_time].attrs["final_time_string"] = obsobj[ref_time]["time"][
-                -1
-            ].values.astype(str)
-            if pair:
-                output_multiple[ref_time] = xr.merge(
-                    [
-                        output_multiple[ref_time],
-                        obsobj[ref_time][sat_species_name],
-                    ]
-                )
-            if "lat" in output_multiple[ref_time].variables:
-                output_multiple[ref_time] = output_multiple[ref_time].rename(
-                    {"lat": "latitude", "lon": "longitude"}
-                )
+            ref_times.append(ref_time)
+        kwargs = dict(
+            pair=pair,
+            method=method,
+            weights=weights,
+            species=species,
+            tempo_sp=tempo_sp,
+            sat_species_name=sat_species_name,
+        )
+
+        results = {}
+        if n_workers > 1 and len(ref_times) > 1:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            from .regrid_util import _WEIGHTS_CACHE
+
+            # corners computed once here rather than in each worker
+            if method == "conservative" and "lat_b" not in modobj:
+                calc_grid_corners(modobj)
+            model_spec, blocks = _share_dataset(modobj)
+            try:
+                # spawned: forking a process whose numba threads are running
+                # (e.g. after a parallel kernel) can hang it at exit
+                with ProcessPoolExecutor(
+                    max_workers=n_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_granule_worker,
+                    initargs=(
+                        model_spec,
+                        dict(cache_dir=_WEIGHTS_CACHE["dir"], max_size_mb=_WEIGHTS_CACHE["max_size_mb"]),
+                    ),
+                ) as executor:
+                    futures = {
+                        ref_time: executor.submit(
+                            _pair_granule, ref_time, obsobj[ref_time], None, **kwargs
+                        )
+                        for ref_time in ref_times
+                    }
+                    # collected in granule order
+                    for ref_time, future in futures.items():
+                        if verbose:
+                            print(f"Regridding {ref_time} and applying AMF and weights")
+                        try:
+                            results[ref_time] = future.result()
+                        except _GRANULE_ERRORS:
+                            results[ref_time] = traceback.format_exc()
+                        except BaseException:
+                            executor.shutdown(cancel_futures=True)
+                            raise
+            finally:
+                for shm in blocks:
+                    shm.close()
+                    shm.unlink()
+        else:
+            workspace = VerticalInterpWorkspace()
+            for ref_time in ref_times:
+                if verbose:
+                    print(f"Regridding {ref_time} and applying AMF and weights")
+                try:
+                    results[ref_time] = _pair_granule(
+                        ref_time, obsobj[ref_time], modobj, workspace=workspace, **kwargs
+                    )
+                except _GRANULE_ERRORS:
+                    results[ref_time] = traceback.format_exc()
+
+        output_multiple = {}
+        failed = []
+        for ref_time, result in results.items():
+            if isinstance(result, str):
+                failed.append(ref_time)
+                warnings.warn(f"{ref_time} granule could not be paired. Discarding.\n{result}")
+            else:
+                output_multiple[ref_time] = result
+        if failed:
+            print(f"{len(failed)} of {len(results)} granules could not be paired: {', '.join(failed)}")
+            if not output_multiple:
+                raise RuntimeError("None of the granules could be paired.")
         return output_multiple
     raise TypeError("Obsobj must be xr.Dataset or dict")
 
 
+class _CachedRegridder:
+    """Regridder (or binning cell index) with the swath grid it was built for
+    (see :func:`back_to_modgrid`)."""
+
+    def __init__(self, regridder, source):
+        self.regridder = regridder
+        self.source = source[["lat", "lon"]] if "lat" in source.variables else source[["latitude", "longitude"]]
+
+
+def _same_swath_grid(cached_source, swath):
+    """Whether swath is on the grid cached_source (lat and lon) was built for."""
+    for v in cached_source.variables:
+        if v not in swath.variables or not np.array_equal(
+            cached_source[v].values, swath[v].values, equal_nan=True
+        ):
+            return False
+    return True
+
+
+def _open_grid(grid_path):
+    """Grid file read in memory, with the file closed (see :func:`back_to_modgrid`)."""
+    with xr.open_dataset(grid_path) as grid:
+        return grid.load()
+
+
+def _lat_lon_names(ds):
+    """Names of the latitude and longitude variables of ds."""
+    return ("latitude", "longitude") if "latitude" in ds.variables else ("lat", "lon")
+
+
+def _bin_to_grid(swath, grid, cell_obs):
+    """Average the swath pixels in the grid cells they fall in (see :func:`back_to_modgrid`).
+
+    Parameters
+    ----------
+    swath : xr.Dataset
+        Swath data. Numeric variables on the swath horizontal grid are binned.
+    grid : xr.Dataset
+        Target grid, with cell center latitude and longitude.
+    cell_obs : np.ndarray
+        Flat grid cell index of each swath pixel, as given by
+        :func:`melodies_monet.util.grid_util.swath_cell_index`.
+
+    Returns
+    -------
+    xr.Dataset
+        Swath data averaged on the grid, NaN where there are no pixels.
+    """
+    from .grid_util import bin_swaths_to_grid
+
+    lat, lon = _lat_lon_names(grid)
+    swath_dims = swath[_lat_lon_names(swath)[0]].dims
+    grid_dims = grid[lat].dims
+    names = [
+        v
+        for v in swath.data_vars
+        if swath[v].dims[-len(swath_dims):] == swath_dims and swath[v].dtype.kind in "fiu"
+    ]
+    rows = [swath[v].values.reshape(-1, cell_obs.size) for v in names]
+    _, binned = bin_swaths_to_grid(grid[lon].values, grid[lat].values, [(cell_obs, np.concatenate(rows))])
+    out = xr.Dataset(coords={lat: grid[lat], lon: grid[lon]})
+    start = 0
+    for v, r in zip(names, rows):
+        da = swath[v]
+        values = binned[start:start + len(r)].reshape(da.shape[: -len(swath_dims)] + grid[lat].shape)
+        if da.dtype.kind == "f":
+            values = values.astype(da.dtype)
+        out[v] = (da.dims[: -len(swath_dims)] + grid_dims, values)
+        start += len(r)
+    return out
+
+
 def back_to_modgrid(
     paireddict,
     modobj,
@@ -657,6 +996,7 @@ def back_to_modgrid(
     path="Regridded_object_XYZ.nc",
     method="bilinear",
     grid_path=None,
+    regridders=None,
 ):
     """Grids object in sat-space to modgrid. Designed to grid back to modgrid after applying
     the scattering weights and air mass factors. It is designed for a single scan.
@@ -680,10 +1020,16 @@ def back_to_modgrid(
         with the scan number and the reference time. If to_netcdf is False, this will
         be ignored.
     method : str
-        Method of regridding used by xESMF
-    grid_path : str
-        If None, defaults to the model grid. Otherwise, the grid in path is used.
-        If the method is conservative, lat_b and lon_b are required.
+        Method of regridding used by xESMF, or "binning" to average the swath pixels
+        in the grid cells with the nearest center, without generating ESMF weights.
+    grid_path : str | xr.Dataset
+        If None, defaults to the model grid. Otherwise, the grid in path (or the
+        dataset given) is used. The file is only read if the regridder is not
+        cached, or for binning. If the method is conservative, lat_b and lon_b are required.
+    regridders : dict, optional
+        Cache of regridders (or binning cell indexes) by (scan number, granules, method),
+        to reuse the regridder of a scan with the same swath grid (e.g. on another day).
+        Updated in place.
 
     Returns
     -------
@@ -694,32 +1040,54 @@ def back_to_modgrid(
         ordered_keys = sorted(list(paireddict.keys()))
     else:
         ordered_keys = sorted(list(keys_to_merge))
-    concatenated = paireddict[ordered_keys[0]]
-    scan_num = concatenated.attrs["scan_num"]
-    granules = [concatenated.attrs["granule_number"]]
-    ref_times = [concatenated.attrs["reference_time_string"][:-1]]  # Remove unneeded Z
-    if len(paireddict) > 1:
-        for k in ordered_keys[1:]:
-            ds_to_add = paireddict[k]
-            if ds_to_add.attrs["scan_num"] != scan_num:
-                raise ValueError(
-                    "back_to_modgrid is prepared to work with data of a single scan. "
-                    + f"However, {ordered_keys[0]} is from scan {scan_num} and "
-                    + f"{k} if from scan {ds_to_add.attrs['scan_num']}."
-                )
-            concatenated = xr.concat([concatenated, paireddict[k]], dim="x")
-            granules.append(paireddict[k].attrs["granule_number"])
-            ref_times.append(paireddict[k].attrs["reference_time_string"][:-1])
+    scan_num = paireddict[ordered_keys[0]].attrs["scan_num"]
+    for k in ordered_keys[1:]:
+        if paireddict[k].attrs["scan_num"] != scan_num:
+            raise ValueError(
+                "back_to_modgrid is prepared to work with data of a single scan. "
+                + f"However, {ordered_keys[0]} is from scan {scan_num} and "
+                + f"{k} if from scan {paireddict[k].attrs['scan_num']}."
+            )
+    granules = [paireddict[k].attrs["granule_number"] for k in ordered_keys]
+    # Remove unneeded Z
+    ref_times = [paireddict[k].attrs["reference_time_string"][:-1] for k in ordered_keys]
+    if len(ordered_keys) > 1:
+        concatenated = xr.concat([paireddict[k] for k in ordered_keys], dim="x")
+    else:
+        concatenated = paireddict[ordered_keys[0]]
 
     end_time = np.array(
         paireddict[ordered_keys[-1]].attrs["final_time_string"], dtype="datetime64[ns]"
     )
-    if grid_path is not None:
-        grid = xr.open_dataset(grid_path)
-        regridder = xe.Regridder(concatenated, grid, method=method, unmapped_to_nan=True)
+    key = (scan_num, tuple(granules), method)
+    regridder = None if regridders is None else regridders.get(key)
+    if regridder is not None and not _same_swath_grid(regridder.source, concatenated):
+        regridder = None
+    grid = modobj
+    if grid_path is not None and (regridder is None or method == "binning"):
+        grid = grid_path if isinstance(grid_path, xr.Dataset) else _open_grid(grid_path)
+    if regridder is None:
+        if method == "binning":
+            from .grid_util import swath_cell_index
+
+            lat, lon = _lat_lon_names(grid)
+            swath_lat, swath_lon = _lat_lon_names(concatenated)
+            regridder = swath_cell_index(
+                grid[lon].values,
+                grid[lat].values,
+                concatenated[swath_lon].values,
+                concatenated[swath_lat].values,
+            )
+        else:
+            regridder = get_regridder(concatenated, grid, method=method, unmapped_to_nan=True)
+        if regridders is not None:
+            regridders[key] = _CachedRegridder(regridder, concatenated)
+    else:
+        regridder = regridder.regridder
+    if method == "binning":
+        out_regridded = _bin_to_grid(concatenated, grid, regridder)
     else:
-        regridder = xe.Regridder(concatenated, modobj, method=method, unmapped_to_nan=True)
-    out_regridded = regridder(concatenated)
+        out_regridded = regridder(concatenated)
     for v in out_regridded.variables:
         if v in concatenated.variables:
             out_regridded[v].attrs = concatenated[v].attrs
@@ -785,32 +1153,58 @@ def back_to_modgrid_multiscan(
         with the first and list times. If to_netcdf is False, this will
         be ignored.
     method : str
-        Method of regridding used by xESMF
+        Method of regridding used by xESMF, or "binning" (see :func:`back_to_modgrid`).
+    grid_path : str | xr.Dataset
+        If None, defaults to the model grid. Otherwise, the grid in path is used
+        (read once for all the scans).
 
     Returns
     -------
     xr.Dataset
         Dataset with obj2grid regridded to modobj.
     """
-    out_regridded = xr.Dataset()
+    if grid_path is not None and not isinstance(grid_path, xr.Dataset):
+        grid_path = _open_grid(grid_path)
     ordered_keys = sorted(list(paireddict.keys()))
-    scan_num = paireddict[ordered_keys[0]].attrs["scan_num"]
-    keys_in_scan = [ordered_keys[0]]
-    if len(ordered_keys) > 1:
-        for k in ordered_keys[1:]:
-            if paireddict[k].attrs["scan_num"] == scan_num:
-                keys_in_scan.append(k)
-            else:
-                regridded_scan = back_to_modgrid(
-                    paireddict, modobj, keys_in_scan, method=method, grid_path=grid_path
-                )
-                out_regridded = xr.merge([out_regridded, regridded_scan])
-                scan_num = paireddict[k].attrs["scan_num"]
-                keys_in_scan = [k]
-    regridded_scan = back_to_modgrid(
-        paireddict, modobj, keys_in_scan, add_time=True, method=method, grid_path=grid_path
-    )
-    out_regridded = xr.merge([out_regridded, regridded_scan])
+    # keys of each scan, in order
+    scans = []
+    for k in ordered_keys:
+        if scans and paireddict[k].attrs["scan_num"] == paireddict[scans[-1][-1]].attrs["scan_num"]:
+            scans[-1].append(k)
+        else:
+            scans.append([k])
+
+    # each scan is regridded into its time slot of the preallocated output
+    regridders = {}
+    data = {}
+    dims_attrs = {}
+    times = []
+    for i, keys_in_scan in enumerate(scans):
+        regridded_scan = back_to_modgrid(
+            paireddict,
+            modobj,
+            keys_in_scan,
+            add_time=True,
+            method=method,
+            grid_path=grid_path,
+            regridders=regridders,
+        )
+        if i == 0:
+            template = regridded_scan
+        for v in regridded_scan.data_vars:
+            if v not in data:
+                da = regridded_scan[v]
+                fill = np.datetime64("NaT") if da.dtype.kind == "M" else np.nan
+                data[v] = np.full((len(scans),) + da.shape[1:], fill, dtype=da.dtype)
+                dims_attrs[v] = (da.dims, da.attrs)
+            data[v][i] = regridded_scan[v].values[0]
+        times.append(regridded_scan["time"].values[0])
+
+    time = xr.DataArray(times, dims="time", attrs=template["time"].attrs)
+    out_regridded = xr.Dataset(
+        {v: (dims_attrs[v][0], data[v], dims_attrs[v][1]) for v in data},
+        coords={k: c for k, c in template.coords.items() if "time" not in c.dims},
+    ).assign_coords(time=time)
 
     if to_netcdf:
         if "XYZ" in path:
@@ -2,41 +2,94 @@
 #
 # File started by Maggie Bruckner. 
 # Contains satellite specific pairing operators
+import numba
 import numpy as np
 import pandas as pd
 import xarray as xr
 
+from .regrid_util import get_regridder
+
+
+@numba.jit(nopython=True, error_model='numpy')
+def _interp_extrapolate(x, y, x_new, out):
+    """Linear interpolation with linear extrapolation for each column,
+    following the arithmetic of ``scipy.interpolate.interp1d(x, y, fill_value="extrapolate")``
+    so that the results are identical.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        Sorted (ascending, NaN last) coordinates, dimensions (column, level).
+    y : np.ndarray
+        Values at x, dimensions (column, level).
+    x_new : np.ndarray
+        Coordinates to interpolate to, dimensions (column, new level).
+    out : np.ndarray
+        Output array with the dimensions of x_new, filled in place.
+
+    Returns
+    -------
+    None
+    """
+    ncol, n = x.shape
+    for p in range(ncol):
+        for k in range(x_new.shape[1]):
+            xk = x_new[p, k]
+            # np.searchsorted(side='left'), NaN sorting last
+            lo = 0
+            hi = n
+            while lo < hi:
+                mid = (lo + hi) // 2
+                xm = x[p, mid]
+                if xm < xk or (xk != xk and xm == xm):
+                    lo = mid + 1
+                else:
+                    hi = mid
+            i = min(max(lo, 1), n - 1)
+            slope = (y[p, i] - y[p, i - 1]) / (x[p, i] - x[p, i - 1])
+            out[p, k] = slope * (xk - x[p, i - 1]) + y[p, i - 1]
+
+
 def vertical_regrid(input_press, input_values, output_press):
     '''
-    This function uses interp1d to regrid vertical layers in a 3D array
+    This function regrids vertical layers of a block of columns, with the linear
+    interpolation (and extrapolation) of interp1d(fill_value="extrapolate")
+    applied to all columns at once
     
     Function requires:
-        input_press = input pressure levels in hPa and same dimensions as input_values (lon, lat, alt)
-        input_values = Dataarray of input values to be regridded (lon, lat, alt)
-        output_press = output pressure levels in hPa, dimensions are the same as input values, except for the altitude (lon, lat, newalt)
+        input_press = input pressure levels in hPa and same dimensions as input_values (..., alt), e.g. (lon, lat, alt) or (time, lon, lat, alt)
+        input_values = Dataarray of input values to be regridded (..., alt)
+        output_press = output pressure levels in hPa, dimensions are the same as input values, except for the altitude (..., newalt)
         
     Function Returns:
         regrid_array = the data regridded to the new pressure levels
 
     '''
-    from scipy import interpolate
+    input_press = np.asarray(input_press)
+    input_values = np.asarray(input_values)
+    output_press = np.asarray(output_press)
     
-    out_array = np.full_like(output_press,np.nan)
-    for y in range (input_press.shape[0]):
-        # Longitude values
-        for x in range (input_press.shape[1]):
-            xx = input_press[y,x,:]
-            yy = input_values[y,x,:]
-            xnew = output_press[y,x,:]
-            f = interpolate.interp1d(xx, yy, fill_value="extrapolate")
-
-            out_array[y,x,:] = f(xnew)
+    # one row per column, sorted by pressure as interp1d does
+    nz = input_press.shape[-1]
+    xx = input_press.reshape(-1, nz)
+    isort = np.argsort(xx, axis=1, kind='mergesort')
+    xx = np.take_along_axis(xx, isort, axis=1)
+    yy = np.take_along_axis(input_values.reshape(-1, nz), isort, axis=1)
+    xnew = output_press.reshape(-1, output_press.shape[-1])
+
+    out_array = np.empty(output_press.shape, dtype=output_press.dtype)
+    _interp_extrapolate(xx, yy, xnew, out_array.reshape(xnew.shape))
     return out_array
 
 def mod_to_overpasstime(modobj,opass_tms,partial_col=None):
     '''
     Interpolate model to satellite overpass time.
 
+    For each overpass and grid column, the two model time steps bracketing the
+    local overpass time are found and linearly weighted, and only those slices
+    are gathered (lazily if the model data is a dask array). The model time
+    step is taken from the first two model times.
+
     Parameters
     ----------
 
@@ -53,29 +106,47 @@ def mod_to_overpasstime(modobj,opass_tms,partial_col=None):
     '''
 
     nst, = opass_tms.shape
-    # nmt, = modobj.time.shape
-    # ny,nx = modobj.longitude.shape
+    times = modobj.time.values
+    dt = times[1] - times[0]
     
     # Determine local time offset
     local_utc_offset = (modobj['longitude']/15).round().astype('timedelta64[h]')
-    # initialize local time as variable
-    modobj['localtime'] = modobj['time'] + local_utc_offset
+    col_dims = local_utc_offset.dims
+    offset = local_utc_offset.values.astype('timedelta64[ns]')
+    opass = np.asarray(opass_tms, dtype='datetime64[ns]').reshape((nst,) + (1,)*offset.ndim)
 
-    # initialize new model object with satellite datetimes
-    outmod = []
+    # bracketing model time steps for each overpass and column
+    i1 = np.searchsorted(times, (opass - offset).ravel(), side='right').reshape((nst,) + offset.shape)
+    i0 = i1 - 1
+    i0 = np.clip(i0, 0, times.size - 1)
+    i1 = np.clip(i1, 0, times.size - 1)
 
-    for ti in np.arange(nst):
-        # Apply filter to select model data within +/- 1 output time step of the overpass time
-        tempmod = modobj.where(np.abs(modobj['localtime'] - opass_tms[ti].to_datetime64()) < (modobj.time[1] - modobj.time[0]))
-        
-        # determine factors for linear interpolation in time
-        tfac = 1 - (np.abs(tempmod['localtime'] - opass_tms[ti].to_datetime64())/(modobj.time[1] - modobj.time[0]))
-        tempmod = tempmod.drop_vars('localtime')
-        # Carry out time interpolation
-        ## Note regarding current behavior: will only carry out time interpolation if at least 2 model timesteps
-        outmod.append((tfac*tempmod).sum(dim='time', min_count=2,keep_attrs=True))
-    #print(outmod)
-    outmod = xr.concat(outmod,dim='time')
+    # determine factors for linear interpolation in time
+    ## Note regarding current behavior: will only carry out time interpolation if both model
+    ## timesteps are within one output time step of the overpass time
+    dist0 = np.abs((times[i0] + offset) - opass)
+    dist1 = np.abs((times[i1] + offset) - opass)
+    valid = (i0 != i1) & (dist0 < dt) & (dist1 < dt)
+    out_dims = ('time',) + col_dims
+    tfac0 = xr.DataArray(np.where(valid, 1 - dist0/dt, np.nan), dims=out_dims)
+    tfac1 = xr.DataArray(np.where(valid, 1 - dist1/dt, np.nan), dims=out_dims)
+
+    # gather the bracketing slices only
+    indexers0 = {'time': xr.DataArray(i0, dims=out_dims)}
+    indexers1 = {'time': xr.DataArray(i1, dims=out_dims)}
+    for dim in col_dims:
+        indexers0[dim] = indexers1[dim] = xr.DataArray(np.arange(modobj.sizes[dim]), dims=dim)
+
+    outmod = xr.Dataset(attrs=modobj.attrs)
+    for var in modobj.data_vars:
+        da = modobj[var].drop_vars('time', errors='ignore')
+        if 'time' in da.dims:
+            dims0 = {d: indexers0[d] for d in indexers0 if d in da.dims}
+            dims1 = {d: indexers1[d] for d in indexers1 if d in da.dims}
+            outmod[var] = tfac0*da.isel(dims0) + tfac1*da.isel(dims1)
+        else:
+            outmod[var] = tfac0*da + tfac1*da
+        outmod[var].attrs = modobj[var].attrs
     outmod['time'] = (['time'],opass_tms)
     
     if partial_col:
@@ -106,12 +177,6 @@ def check_timestep(model_data,obs_data):
 def mopitt_l3_pairing(model_data,obs_data,co_ppbv_varname,global_model=True):
     ''' Calculate model CO column, with MOPITT averaging kernel applied.
     '''
-    try:
-        import xesmf as xe
-    except ImportError:
-        print('satellite_utilities: xesmf module not found')
-        raise
-    
     ## Check if obs are monthly or daily
     if obs_data.attrs['monthly']:
         # if obs_data is monthly, take monthly mean of model data
@@ -134,7 +199,7 @@ def mopitt_l3_pairing(model_data,obs_data,co_ppbv_varname,global_model=True):
         
     # initialize regridder for horizontal interpolation 
     # from model grid to MOPITT grid
-    grid_adjust = xe.Regridder(model_obstime[['latitude','longitude']],obs_data[['lat','lon']],
+    grid_adjust = get_regridder(model_obstime[['latitude','longitude']],obs_data[['lat','lon']],
                                'bilinear',periodic=global_model,unmapped_to_nan=True)
     co_model_regrid = grid_adjust(model_obstime[co_ppbv_varname])
     pressure_model_regrid = grid_adjust(model_obstime['pres_pa_mid']/100.)
@@ -143,14 +208,16 @@ def mopitt_l3_pairing(model_data,obs_data,co_ppbv_varname,global_model=True):
     co_model_regrid = co_model_regrid.transpose('time','lon','lat','z')
     pressure_model_regrid = pressure_model_regrid.transpose('time','lon','lat','z')
     
-    # vertical regrid of model to satellite
+    # vertical regrid of model to satellite, for all time steps in one call
+    model_times = pd.Index(pressure_model_regrid.time.dt.strftime(filtstr).values)
+    tindex = model_times.get_indexer(obs_data.time.dt.strftime(filtstr).values)
+    if (tindex < 0).any():
+        raise KeyError('Model data missing for MOPITT time steps: {}'.format(
+            obs_data.time.values[tindex < 0]))
     co_regrid = xr.full_like(obs_data['pressure'], np.nan)
-    # MEB: loop over time outside of regrid lowers memory usage
-    for t in range(obs_data.time.size):
-        obs_day = obs_data.time[t].dt.strftime(filtstr)
-        co_regrid[t] = vertical_regrid(pressure_model_regrid.sel(time=obs_day).values.squeeze(), 
-                                       co_model_regrid.sel(time=obs_day).values.squeeze(), 
-                                       obs_data['pressure'][t].values)
+    co_regrid[:] = vertical_regrid(pressure_model_regrid.values[tindex],
+                                   co_model_regrid.values[tindex],
+                                   obs_data['pressure'].values)
     
     # apply AK
     ## log apriori and model data
@@ -184,19 +251,13 @@ def omps_l3_daily_o3_pairing(model_data,obs_data,ozone_ppbv_varname):
     '''Calculate model ozone column from model ozone profile in ppbv. Move data from model grid 
         to 1x1 degree OMPS L3 data grid. Following data grid matching, take daily mean for model data.
     '''
-    try:
-        import xesmf as xe
-    except ImportError:
-        print('satellite_utilities: xesmf module not found')
-        raise
-    
     # factor for converting ppbv profiles to DU column
     # also requires conversion of dp from Pa to hPa
     du_fac = 1.0e-5*6.023e23/28.97/9.8/2.687e19
     column = (du_fac*(model_data['dp_pa']/100.)*model_data[ozone_ppbv_varname]).sum('z')
     
     # initialize regrid and apply to column data
-    grid_adjust = xe.Regridder(model_data[['latitude','longitude']],obs_data[['latitude','longitude']],'bilinear',periodic=True)
+    grid_adjust = get_regridder(model_data[['latitude','longitude']],obs_data[['latitude','longitude']],'bilinear',periodic=True)
     mod_col_obsgrid = grid_adjust(column)
     # Aggregate time-step to daily means
     daily_mean = mod_col_obsgrid.resample(time='1D').mean()
@@ -213,11 +274,6 @@ def space_and_time_pairing(model_data,obs_data,pair_variables):
     
     *** need to make setup work for surface/1z fields, as some pairing requires surface pressure field *** 
     '''
-    try:
-        import xesmf as xe
-    except ImportError:
-        print('satellite_utilities: xesmf module not found')
-        raise
     mod_nf,mod_nz,mod_nx,mod_ny = model_data[pair_variables[0]].shape # assumes model data is structured (time,z,lon,lat). lon/lat dimension order likely unimportant
     # obs_nz = obs_data['pressure'].shape # assumes 1d pressure field in observation set
     obs_nx,obs_ny = obs_data['longitude'].shape # assumes 2d lat/lon fields in observation set
@@ -234,7 +290,7 @@ def space_and_time_pairing(model_data,obs_data,pair_variables):
         if len(tindex):
             # initialize spatial regridder (model lat/lon to satellite swath lat/lon)
             # dimensions of new variables will be (time, z, satellite_x, satellite_y)
-            regridr = xe.Regridder(model_data.isel(time=f),obs_data[['latitude','longitude']].sel(x=tindex),'bilinear') # standard bilinear spatial regrid. 
+            regridr = get_regridder(model_data.isel(time=f),obs_data[['latitude','longitude']].sel(x=tindex),'bilinear') # standard bilinear spatial regrid. 
             
             # regrid for each variable in pair_variables
             for j in pair_variables:
@@ -301,12 +357,6 @@ def omps_nm_pairing(model_data,obs_data,ozone_ppbv_varname):
 
 def omps_nm_pairing_apriori(model_data,obs_data,ozone_ppbv_varname):
     'Pairs model ozone mixing ratio data with OMPS nm. Applies satellite apriori column to model observations.'
-    try:
-        import xesmf as xe
-    except ImportError:
-        print('satellite_utilities: xesmf module not found')
-        raise
-
     du_fac = 1.0e-5*6.023e23/28.97/9.8/2.687e19 # conversion factor; moves model from ppbv to dobson
     
     print('pairing with averaging kernel application')
@@ -324,7 +374,7 @@ def omps_nm_pairing_apriori(model_data,obs_data,ozone_ppbv_varname):
         tindex = np.where(np.abs(obs_data.time - model_data.time[f]) <= (model_data.time[1]-model_data.time[0]))[0]
         if len(tindex):
             # regrid spatially (model lat/lon to satellite swath lat/lon)
-            regridr = xe.Regridder(model_data.isel(time=f),obs_data[['latitude','longitude']].sel(x=tindex),'bilinear')
+            regridr = get_regridder(model_data.isel(time=f),obs_data[['latitude','longitude']].sel(x=tindex),'bilinear')
             regrid_oz = regridr(model_data[ozone_ppbv_varname[0]][f])
             regrid_p = regridr(model_data['pres_pa_mid'][f]) # this one should be pressure variable (for the interpolation).
             sfp = regridr(model_data['surfpres_pa'][f])
@@ -77,3 +77,150 @@ def subset_MODIS_l2(file_path,timeinterval):
             interval_files.append(j)
     return interval_files
 
+
+FILE_TIME_INDEX = '.melodies_monet_file_times.json'
+"""str : Name of the sidecar file caching the time coverage of the files of a directory."""
+
+
+def read_file_times(fn):
+    '''Read the time coverage of a model file from its metadata.
+
+    IOAPI (CMAQ, CAMx) ``SDATE``/``STIME``/``TSTEP`` attributes,
+    WRF ``Times`` and CF ``time`` variables are supported.
+
+    Parameters
+    ----------
+    fn : str
+        File path.
+
+    Returns
+    -------
+    tuple of pandas.Timestamp
+        First and last time in the file, or None if not found.
+    '''
+    import numpy as np
+    import pandas as pd
+    import xarray as xr
+
+    try:
+        with xr.open_dataset(fn, decode_times=False, mask_and_scale=False) as ds:
+            if {'SDATE', 'STIME', 'TSTEP'} <= set(ds.attrs) and 'TSTEP' in ds.dims:
+                start = pd.to_datetime('{:07d}{:06d}'.format(int(ds.attrs['SDATE']), int(ds.attrs['STIME'])),
+                                       format='%Y%j%H%M%S')
+                tstep = '{:06d}'.format(int(ds.attrs['TSTEP']))
+                step = pd.Timedelta(hours=int(tstep[:-4]), minutes=int(tstep[-4:-2]), seconds=int(tstep[-2:]))
+                return start, start + (ds.sizes['TSTEP'] - 1) * step
+            if 'Times' in ds.variables:
+                times = np.asarray(ds['Times'].values)
+                if times.ndim == 2:
+                    times = [b''.join(t).decode() for t in times]
+                else:
+                    times = [t.decode() if isinstance(t, bytes) else t for t in times.ravel()]
+                times = pd.to_datetime(times, format='%Y-%m-%d_%H:%M:%S')
+            elif 'time' in ds.variables:
+                times = xr.decode_cf(ds[['time']])['time'].values.ravel()
+                if times.dtype == object:
+                    # cftime dates (e.g. noleap calendar)
+                    times = [t.isoformat() for t in times]
+                times = pd.to_datetime(times)
+            else:
+                return None
+    except Exception:
+        return None
+    if len(times) == 0:
+        return None
+    return times.min(), times.max()
+
+
+def file_time_index(files):
+    '''Time coverage of model files, read once and cached.
+
+    The coverage of the files of each directory is cached in a sidecar file
+    (:data:`FILE_TIME_INDEX`) in that directory, and only read again from the
+    files that are new or were modified. Directories that are not writable
+    are not cached.
+
+    Parameters
+    ----------
+    files : list of str
+        File paths.
+
+    Returns
+    -------
+    dict
+        (first time, last time) of each file, or None if unknown.
+    '''
+    import json
+    import os
+    import pandas as pd
+
+    by_dir = {}
+    for fn in files:
+        by_dir.setdefault(os.path.dirname(os.path.abspath(fn)), []).append(fn)
+
+    coverage = {}
+    for directory, dir_files in by_dir.items():
+        index_fn = os.path.join(directory, FILE_TIME_INDEX)
+        try:
+            with open(index_fn, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+
+        updated = False
+        for fn in dir_files:
+            stat = os.stat(fn)
+            entry = index.get(os.path.basename(fn))
+            if entry is None or entry['mtime'] != stat.st_mtime or entry['size'] != stat.st_size:
+                times = read_file_times(fn)
+                entry = {'mtime': stat.st_mtime, 'size': stat.st_size,
+                         'times': None if times is None else [t.isoformat() for t in times]}
+                index[os.path.basename(fn)] = entry
+                updated = True
+            coverage[fn] = None if entry['times'] is None else tuple(pd.Timestamp(t) for t in entry['times'])
+
+        if updated:
+            index_tmp = '{}.{}.tmp'.format(index_fn, os.getpid())
+            try:
+                with open(index_tmp, 'w') as f:
+                    json.dump(index, f)
+                os.replace(index_tmp, index_fn)
+            except OSError:
+                pass
+    return coverage
+
+
+def subset_files_by_time(files, time_interval):
+    '''Subset model files to the ones needed for a given time interval.
+
+    Files overlapping the time interval are kept, together with the last file
+    before and the first file after it (for interpolation in time).
+    Files with unknown time coverage are always kept.
+
+    Parameters
+    ----------
+    files : list of str
+        File paths.
+    time_interval : [pandas.Timestamp, pandas.Timestamp]
+        Start and end of the time interval.
+
+    Returns
+    -------
+    list of str
+        Files kept, in the order of ``files``.
+    '''
+    import pandas as pd
+
+    start, end = pd.Timestamp(time_interval[0]), pd.Timestamp(time_interval[-1])
+    coverage = file_time_index(files)
+    known = {fn: times for fn, times in coverage.items() if times is not None}
+    keep = {fn for fn, times in known.items() if times[0] <= end and times[1] >= start}
+    before = [fn for fn, times in known.items() if times[1] < start]
+    if before:
+        last = max(known[fn][1] for fn in before)
+        keep.update(fn for fn in before if known[fn][1] == last)
+    after = [fn for fn, times in known.items() if times[0] > end]
+    if after:
+        first = min(known[fn][0] for fn in after)
+        keep.update(fn for fn in after if known[fn][0] == first)
+    return [fn for fn in files if fn not in known or fn in keep]
@@ -295,45 +295,90 @@ def resample_stratify(da, levels, vertical, axis=1,interpolation='linear',extrap
                 out.coords[i] = da.coords[i]
     return out
 
+def _interp_columns(p_mod, p_obs):
+    """Bracketing levels and linear weights to interpolate each model column
+    at its own observation pressure.
+
+    Parameters
+    ----------
+    p_mod : np.ndarray
+        Model pressure, dimensions (point, z), monotonic along z.
+    p_obs : np.ndarray
+        Observation pressure, dimension (point).
+
+    Returns
+    -------
+    tuple
+        Lower and upper level index, weight of the upper level, and the masks of
+        the points below the lowest and above the highest model level (where the
+        upper and lower level are the nearest level, respectively).
+    """
+    npts, nz = p_mod.shape
+    rows = np.arange(npts)
+    # work with increasing pressure in every column
+    flip = p_mod[:, 0] > p_mod[:, -1]
+    order = np.where(flip[:, None], np.arange(nz)[::-1], np.arange(nz))
+    p_inc = p_mod[rows[:, None], order]
+
+    k1 = np.clip((p_inc < p_obs[:, None]).sum(axis=1), 1, nz - 1)
+    k0 = k1 - 1
+    p0 = p_inc[rows, k0]
+    p1 = p_inc[rows, k1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w = (p_obs - p0) / (p1 - p0)
+    below = p_obs > p_inc[:, -1]
+    above = p_obs < p_inc[:, 0]
+    return order[rows, k0], order[rows, k1], w, below, above
+
+
 def vert_interp(ds_model,df_obs,var_name_list):
-    from pandas import merge_asof
+    """Interpolate the model columns at the pressure of the observation points.
 
-    ds_model['pressure_model_nan'] = ds_model['pressure_model'].copy()
-    var_name_list.append('pressure_model_nan')
+    Each point of the flight (``x`` of ds_model, in the order of the rows of df_obs)
+    is interpolated linearly in pressure at its own observation pressure only,
+    with the nearest model level used beyond the model column.
 
-    var_out_list = []
+    Parameters
+    ----------
+    ds_model : xr.Dataset
+        Model data at the observation points and times, dimensions (x, z, ...),
+        with the ``pressure_model`` variable and the ``pressure_obs`` coordinate.
+    df_obs : pd.DataFrame
+        Observations.
+    var_name_list : list of str
+        Model variables to pair.
+
+    Returns
+    -------
+    pd.DataFrame
+        Observations with the paired model variables.
+    """
+    npts = ds_model.sizes['x']
+    p_mod = ds_model['pressure_model'].transpose('x', 'z', ...).values.reshape(npts, -1)
+    p_obs = ds_model['pressure_obs'].transpose('x', ...).values.reshape(npts)
+
+    k0, k1, w, below, above = _interp_columns(p_mod, p_obs)
+    rows = np.arange(npts)
+    for x in rows[below]:
+        print(f"Note: Point {x!r}, is below the mid-point of the lowest model level and nearest neighbor extrapolation",
+             "occurs for vertical pairing.")
+    for x in rows[above]:
+        print(f"Warning: Point {x!r}, is above the mid-point of the highest model level and nearest neighbor extrapolation", 
+        "occurs for vertical pairing. Extrapolating beyond the model top is not recommended. Proceed with caution.")
+
+    final_df_model = df_obs.reset_index()
     for var_name in var_name_list:
         if var_name == 'pressure_model':
-            out = resample_stratify(ds_model[var_name],sorted(ds_model.pressure_obs.squeeze().values,reverse=True),
-                                      ds_model['pressure_model'],axis=1,
-                                      interpolation='linear',extrapolation='linear')
-            #Use linear extrapolation for the pressure_model so that later these will pair correctly with pressure_obs.
-        elif var_name == 'pressure_model_nan':
-            out = resample_stratify(ds_model[var_name],sorted(ds_model.pressure_obs.squeeze().values,reverse=True),
-                                      ds_model['pressure_model'],axis=1,
-                                      interpolation='linear',extrapolation='nan')
-            #Keep track of the extrapolation points with a NaN so that can print out notes and warnings for users.
-        else:
-            out = resample_stratify(ds_model[var_name],sorted(ds_model.pressure_obs.squeeze().values,reverse=True),
-                                  ds_model['pressure_model'],axis=1,
-                                  interpolation='linear',extrapolation='nearest')
-        out.name = var_name
-        var_out_list.append(out)
-
-    df_model = xr.merge(var_out_list).to_dataframe().reset_index()
-    for x in df_model.x.unique():
-        if df_model[df_model.x == x].pressure_obs.unique() > df_model[df_model.x == x].pressure_model_nan.max():
-            print(f"Note: Point {x!r}, is below the mid-point of the lowest model level and nearest neighbor extrapolation",
-                 "occurs for vertical pairing.")
-        elif df_model[df_model.x == x].pressure_obs.unique() < df_model[df_model.x == x].pressure_model_nan.min():
-            print(f"Warning: Point {x!r}, is above the mid-point of the highest model level and nearest neighbor extrapolation", 
-            "occurs for vertical pairing. Extrapolating beyond the model top is not recommended. Proceed with caution.")
-    df_model.drop(labels=['x','y','z','pressure_obs','pressure_model_nan','time_obs'], axis=1, inplace=True)
-    df_model.rename(columns={'pressure_model':'pressure_obs'}, inplace=True)
-
-    final_df_model = merge_asof(df_obs, df_model, 
-                            by=['latitude', 'longitude', 'pressure_obs'], 
-                            on='time', direction='nearest')
+            # the model pressure interpolated at the obs pressure is the obs pressure
+            continue
+        values = ds_model[var_name].transpose('x', 'z', ...).values.reshape(npts, -1)
+        v0 = values[rows, k0]
+        v1 = values[rows, k1]
+        out = np.where(below, v1, np.where(above, v0, (1 - w) * v0 + w * v1))
+        if var_name in final_df_model.columns:
+            final_df_model = final_df_model.rename(columns={var_name: var_name + '_x'})
+            var_name = var_name + '_y'
+        final_df_model[var_name] = out
 
     return final_df_model
 
@@ -364,6 +409,194 @@ def mobile_and_ground_pair(ds_model,df_obs, var_name_list):
 
     return final_df_model
 
+_SCALE_METHODS = {'*': 1, '/': 2, '+': 3, '-': 4}
+
+
+def _mask_and_scale_loop(x, out, has_min, vmin, has_max, vmax, has_nan, nan_value,
+                           method, scale, has_llod, llod_value, llod_setvalue):
+    """Single pass of the mask and scale rules over the flat array x (see :func:`mask_and_scale`)."""
+    for i in range(x.size):
+        v = x[i]
+        if has_min and not v >= vmin:
+            v = np.nan
+        if has_max and not v <= vmax:
+            v = np.nan
+        if has_nan and v == nan_value:
+            v = np.nan
+        if method == 1:
+            v = v * scale
+        elif method == 2:
+            v = v / scale
+        elif method == 3:
+            v = v + scale
+        elif method == 4:
+            v = v - scale
+        if has_llod and v == llod_value:
+            v = llod_setvalue
+        out[i] = v
+
+
+def _mask_and_scale_numpy(x, out, has_min, vmin, has_max, vmax, has_nan, nan_value,
+                          method, scale, has_llod, llod_value, llod_setvalue):
+    """NumPy version of :func:`_mask_and_scale_loop`, used when numba is not installed."""
+    masked = np.zeros(x.shape, dtype=bool)
+    if has_min:
+        masked |= ~(x >= vmin)
+    if has_max:
+        masked |= ~(x <= vmax)
+    if has_nan:
+        masked |= x == nan_value
+    np.copyto(out, x)
+    out[masked] = np.nan
+    if method == 1:
+        np.multiply(out, scale, out=out)
+    elif method == 2:
+        np.divide(out, scale, out=out)
+    elif method == 3:
+        np.add(out, scale, out=out)
+    elif method == 4:
+        np.subtract(out, scale, out=out)
+    if has_llod:
+        out[out == llod_value] = llod_setvalue
+
+
+_MASK_AND_SCALE_KERNEL = None
+
+
+def _mask_and_scale_kernel():
+    """:func:`_mask_and_scale_loop` compiled with numba, imported and compiled on first use,
+    or :func:`_mask_and_scale_numpy` if numba is not installed."""
+    global _MASK_AND_SCALE_KERNEL
+    if _MASK_AND_SCALE_KERNEL is None:
+        try:
+            import numba
+        except ImportError:
+            _MASK_AND_SCALE_KERNEL = _mask_and_scale_numpy
+        else:
+            _MASK_AND_SCALE_KERNEL = numba.jit(nopython=True)(_mask_and_scale_loop)
+    return _MASK_AND_SCALE_KERNEL
+
+
+def _mask_and_scale_block(x, params):
+    dtype = params[1].dtype
+    x = np.ascontiguousarray(x, dtype=dtype)
+    out = np.empty_like(x)
+    _mask_and_scale_kernel()(x.reshape(-1), out.reshape(-1), *params)
+    return out
+
+
+def mask_and_scale(da, rules):
+    """Apply the mask and scale rules of a variable in a single pass.
+
+    In order: values below ``obs_min``, above ``obs_max`` or equal to
+    ``nan_value`` are set to NaN, ``unit_scale`` is applied with
+    ``unit_scale_method`` (``*``, ``/``, ``+`` or ``-``), and values equal to
+    ``LLOD_value`` are replaced by ``LLOD_setvalue``. The rules are fused in
+    one compiled elementwise function, so only the output array is allocated,
+    and dask arrays stay lazy. Without numba, the rules are applied
+    in place on the output array with NumPy.
+
+    Parameters
+    ----------
+    da : xarray.DataArray
+    rules : dict
+        Entry of the variable in the control ``variables``.
+
+    Returns
+    -------
+    xarray.DataArray
+        Masked and scaled data (float, with the precision of da if float).
+    """
+    method = _SCALE_METHODS.get(rules.get('unit_scale_method'), 0)
+    if not (method or {'obs_min', 'obs_max', 'nan_value', 'LLOD_value'} & set(rules)):
+        return da
+
+    dtype = da.dtype if np.issubdtype(da.dtype, np.floating) else np.dtype(np.float64)
+    params = (
+        'obs_min' in rules, dtype.type(rules.get('obs_min', 0)),
+        'obs_max' in rules, dtype.type(rules.get('obs_max', 0)),
+        'nan_value' in rules, dtype.type(rules.get('nan_value', 0)),
+        method, dtype.type(rules.get('unit_scale', 1)),
+        'LLOD_value' in rules, dtype.type(rules.get('LLOD_value', 0)),
+        dtype.type(rules.get('LLOD_setvalue', np.nan)),
+    )
+    out = xr.apply_ufunc(
+        _mask_and_scale_block, da, kwargs={'params': params},
+        dask='parallelized', output_dtypes=[dtype], keep_attrs=True,
+    )
+    out.encoding = da.encoding
+    return out
+
+
+def _filter_condition(values, filter_op, filter_vals):
+    """Boolean condition of one filter_dict clause (see :func:`filter_dataset`)."""
+    if filter_op == 'isin':
+        return values.isin(filter_vals)
+    elif filter_op == 'isnotin':
+        return ~values.isin(filter_vals)
+    elif filter_op == '==':
+        return values == filter_vals
+    elif filter_op == '>':
+        return values > filter_vals
+    elif filter_op == '<':
+        return values < filter_vals
+    elif filter_op == '>=':
+        return values >= filter_vals
+    elif filter_op == '<=':
+        return values <= filter_vals
+    elif filter_op == '!=':
+        return values != filter_vals
+    else:
+        raise ValueError(f'Filter operation {filter_op!r} is not supported')
+
+
+def filter_dataset(ds, filter_dict):
+    """Filter a dataset with all the clauses of a filter_dict at once.
+
+    Gives the same result as applying ``ds.where(cond, drop=True)`` for each
+    clause in turn, but the data variables are masked (and the labels dropped)
+    only once, and stay lazy for dask arrays. Only the filter columns are
+    computed to find the labels to drop.
+
+    Parameters
+    ----------
+    ds : xarray.Dataset
+    filter_dict : dict
+        Filter clauses by column, each with keys ``oper`` (``isin``, ``isnotin``,
+        ``==``, ``>``, ``<``, ``>=``, ``<=`` or ``!=``) and ``value``.
+
+    Returns
+    -------
+    xarray.Dataset
+    """
+    mask = None
+    positions = {}
+    for column, clause in filter_dict.items():
+        values = ds[column]
+        values = values.isel({dim: pos for dim, pos in positions.items() if dim in values.dims})
+        # the data variables (not the coordinates) are masked by the previous clauses
+        if mask is not None and column in ds.data_vars:
+            values = values.where(mask)
+        cond = _filter_condition(values, clause['oper'], clause['value']).compute()
+
+        # labels dropped by this clause, as in where(drop=True)
+        keep = {
+            dim: cond.any(dim=[d for d in cond.dims if d != dim]).values
+            for dim in cond.dims
+        }
+        for dim, kept in keep.items():
+            positions[dim] = positions.get(dim, np.arange(ds.sizes[dim]))[kept]
+        cond = cond.isel(keep)
+        if mask is None:
+            mask = cond
+        else:
+            mask = mask.isel({dim: kept for dim, kept in keep.items() if dim in mask.dims}) & cond
+
+    if mask is None:
+        return ds
+    return ds.isel(positions).where(mask)
+
+
 def find_obs_time_bounds(files=[],time_var=None):
     """Function to read a series of ict files and print a list of min and max times for each.
 
@@ -414,8 +647,69 @@ def find_obs_time_bounds(files=[],time_var=None):
         
     return bounds
 
-def loop_pairing(control,file_pairs_yaml='',file_pairs={},save_types=['paired']):
+def _peak_memory_mb():
+    """Peak resident memory of the current process in MB (None if unknown)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    import sys
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak / 1024**2 if sys.platform == 'darwin' else peak / 1024
+
+
+def _pair_file(task):
+    """Pair and save one entry of the file pairs (see :func:`loop_pairing`).
+
+    Parameters
+    ----------
+    task : tuple
+        (control, control_dict, label, file_pair, save_types)
+
+    Returns
+    -------
+    tuple
+        (label, elapsed seconds, peak memory in MB, traceback or None)
+    """
+    import copy
+    import time
+    import traceback
+    from melodies_monet import driver
+
+    control, control_dict, label, file_pair, save_types = task
+    start = time.perf_counter()
+    try:
+        control_dict = copy.deepcopy(control_dict)
+        for model in control_dict['model']:
+            control_dict['model'][model]['files'] = file_pair['model'][model]
+        for obs in control_dict['obs']:
+            control_dict['obs'][obs]['filename'] = file_pair['obs'][obs]
+        control_dict['analysis']['save'] = {
+            t: {'method':'netcdf','prefix':label,'data':'all'} for t in save_types}
+
+        an = driver.analysis()
+        an.control = control
+        an.read_control(control_dict=control_dict)
+        an.open_models()
+        an.open_obs()
+        an.pair_data()
+        an.save_analysis()
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    return label, time.perf_counter() - start, _peak_memory_mb(), error
+
+
+def loop_pairing(control,file_pairs_yaml='',file_pairs={},save_types=['paired'],n_workers=1):
     """Function to loop over sets of pairings and save them out as multiple netcdf files.
+
+    The control file is read once. Each set of files is paired in its own
+    worker process (``n_workers`` at a time) and saved as soon as it is done,
+    and a summary of the time and peak memory of each pairing is printed at the end.
+    In serial mode (``n_workers=1``), the peak memory is that of the current process
+    so far, which includes the previous pairings.
     
     Parameters
     ----------
@@ -438,40 +732,58 @@ def loop_pairing(control,file_pairs_yaml='',file_pairs={},save_types=['paired'])
         
     save_types : list (optional)
         List containing the types of data to save to netcdf. Can include any of 'paired', 'models', and 'obs'
+
+    n_workers : int (optional)
+        Number of pairings run concurrently, each in a new worker process.
+        With 1 (default), the pairings are run one after another in the current process.
+        Set to None to use the number of CPUs.
     
     Returns
     -------
     None
 
     """
-    from melodies_monet import driver
-    
+    import yaml
+
     if file_pairs_yaml:
-        import yaml
         with open(file_pairs_yaml, 'r') as stream:
             file_pairs = yaml.safe_load(stream)
-    
-    for file in file_pairs.keys():
-    
-        an = driver.analysis()
-        an.control=control
-        an.read_control()
-    
-        for model in an.control_dict['model']:
-            an.control_dict['model'][model]['files'] = file_pairs[file]['model'][model]
-        for obs in an.control_dict['obs']:
-            an.control_dict['obs'][obs]['filename'] = file_pairs[file]['obs'][obs]
-        
-        an.control_dict['analysis']['save']={}
-        an.save={}
-        for t in save_types:
-            an.control_dict['analysis']['save'][t]={'method':'netcdf','prefix':file,'data':'all'}
-            an.save[t]={'method':'netcdf','prefix':file,'data':'all'}
-        
-        an.open_models()
-        an.open_obs()
-        an.pair_data()
-        an.save_analysis()
+
+    with open(control, 'r') as stream:
+        control_dict = yaml.safe_load(stream)
+
+    tasks = [(control, control_dict, file, file_pairs[file], save_types) for file in file_pairs]
+
+    results = []
+    if n_workers == 1:
+        for task in tasks:
+            results.append(_pair_file(task))
+            print('Pairing {} done in {:.1f} s'.format(results[-1][0], results[-1][1]))
+    else:
+        import multiprocessing
+
+        # a new process for each pairing, so that its memory is released when done
+        with multiprocessing.Pool(n_workers, maxtasksperchild=1) as pool:
+            for result in pool.imap_unordered(_pair_file, tasks):
+                results.append(result)
+                print('Pairing {} done in {:.1f} s'.format(result[0], result[1]))
+
+    # summary in the order of the file pairs
+    results = {result[0]: result for result in results}
+    print('Pairing summary:')
+    # each worker process runs a single pairing, unlike the current process
+    peak_label = 'process peak memory so far' if n_workers == 1 else 'peak memory'
+    failed = []
+    for file in file_pairs:
+        label, elapsed, peak, error = results[file]
+        peak = 'n/a' if peak is None else '{:.0f} MB'.format(peak)
+        print('  {}: {:.1f} s, {} {}, {}'.format(label, elapsed, peak_label, peak,
+                                                 'ok' if error is None else 'FAILED'))
+        if error is not None:
+            failed.append(label)
+            print(error)
+    if failed:
+        raise RuntimeError('Pairing failed for: {}'.format(', '.join(failed)))
 
 def convert_std_to_amb_ams(ds,convert_vars=[],temp_var=None,pres_var=None):
     
@@ -531,18 +843,9 @@ def calc_partialcolumn(modobj, var="NO2"):
     xr.DataArray
         DataArray containing the partial column of the species.
     """
-    ppbv2molmol = 1e-9
-    m2_to_cm2 = 1e4
-    fac_units = ppbv2molmol * N_A / m2_to_cm2
-    partial_col = (
-        modobj[var]
-        * modobj["pres_pa_mid"]
-        * modobj["dz_m"]
-        * fac_units
-        / (R * modobj["temperature_k"])
-    )
-    partial_col.attrs = {"units": "molecules/cm2", "long_name": f"{var} partial column"}
-    return partial_col
+    from .column_physics import column_physics
+
+    return column_physics(modobj, var)[f"{var}_col"]
 
 
 def calc_totalcolumn(modobj, var="NO2"):
@@ -560,14 +863,9 @@ def calc_totalcolumn(modobj, var="NO2"):
     xr.DataArray
         DataArray containing the total column of the species.
     """
-    data = calc_partialcolumn(modobj, var)
-    try:
-        data = data.where(modobj['pres_pa_mid'] <= modobj['surfpres_pa'])
-    except KeyError:
-        pass
-    total_col = data.sum(dim='z', keep_attrs=True)
-    total_col.attrs = {"units": "molecules/cm2", "long_name": f"{var} total column"}
-    return total_col
+    from .column_physics import column_physics
+
+    return column_physics(modobj, var, partial=False, total=True)[f"{var}_total_col"]
 
 
 def calc_geolocaltime(modobj):
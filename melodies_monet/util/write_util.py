@@ -1,9 +1,93 @@
 # SPDX-License-Identifier: Apache-2.0
 #
+import re
+
 import numpy as np
 from pandas.api.types import is_float_dtype
 
-def write_analysis_ncf(obj, output_dir='', fn_prefix=None, keep_groups=None, title=''):
+_ILLEGAL_CHARS = re.compile(r'[^a-zA-Z0-9_.@+\-]')
+"""Characters not allowed in netcdf4 variable names (as written by MELODIES MONET)."""
+
+def _analysis_groups(obj, keep_groups=None):
+    """Groups of an analysis attribute to write (all or keep_groups)."""
+    if keep_groups is not None:
+        return [elem for elem in obj.keys() if elem in keep_groups]
+    return list(obj.keys())
+
+
+def _analysis_dataset(obj, group, title='', file_format='NetCDF-4'):
+    """Dataset of a group of an analysis attribute, ready to be written.
+
+    Any characters in variable names that are not allowed in netcdf4 variables names are dropped,
+    with the full variable names saved in the variable attribute `long_name`, and the attributes
+    of the class instance are stored as json in the global attribute `dict_json`.
+    """
+    import pandas as pd
+    import json
+
+    dset=obj[group].obj
+            
+    # Write long_name and remove any illegal characters from variable names 
+    rename_dict={}
+    for i in dset.variables:
+        dset[i].attrs['long_name']=i
+        legal_name = _ILLEGAL_CHARS.sub('', i)
+        if legal_name != i:
+            rename_dict[i] = legal_name
+    if rename_dict:
+        dset = dset.rename(rename_dict)
+        print('WARNING: The following variables have been renamed due to illegal characters in the variable name for netcdf4 format. ')
+        print('The original variable names can be found in the `long_name` variable attribute. ')
+        print(list(rename_dict.keys()))
+
+    dset.attrs['title'] = title
+    dset.attrs['format'] = file_format
+    dset.attrs['date_created'] = pd.to_datetime('today').strftime('%Y-%m-%d')
+    dict_json = obj[group].__dict__.copy()
+    dict_json.pop('obj')
+    dset.attrs['dict_json'] = json.dumps(dict_json, indent = 4) 
+    dset.attrs['group_name'] = group
+    return dset
+
+
+def netcdf_compression(codec='zlib', complevel=7, shuffle=True):
+    """Encoding of the compression of a variable for the netCDF4 engine.
+
+    Parameters
+    ----------
+    codec : str
+        'zlib' or 'zstd' (requires netCDF4 built with Zstandard support).
+    complevel : int
+        Compression level (1 is usually much faster than the default
+        for only slightly larger files).
+    shuffle : bool
+        Apply the HDF5 shuffle filter before compressing.
+
+    Returns
+    -------
+    dict
+    """
+    if codec == 'zlib':
+        return dict(zlib=True, complevel=complevel, shuffle=shuffle)
+    elif codec == 'zstd':
+        return dict(compression='zstd', complevel=complevel, shuffle=shuffle)
+    else:
+        raise ValueError(f'Compression codec {codec!r} is not supported')
+
+
+def _chunk_encoding(da, chunks=None):
+    """netCDF chunk sizes of da from the chunk sizes by dimension requested by the user
+    (dimensions not listed are not split). Empty, for the netCDF4 default chunking,
+    if chunks is None.
+    """
+    if chunks is None or da.ndim == 0:
+        return {}
+    return {'chunksizes': tuple(max(min(chunks.get(dim, size), size), 1)
+                                for dim, size in zip(da.dims, da.shape))}
+
+
+def write_analysis_ncf(obj, output_dir='', fn_prefix=None, keep_groups=None, title='',
+                       codec='zlib', complevel=7, shuffle=True, n_workers=1, chunks=None):
     """Function to write netcdf4 files with some compression for floats from an attribute of the
     analysis class (models, obs, paired). Writes the objects within the attribute as separate files.
     Any characters in variable names that are not allowed in netcdf4 variables names will be dropped.
@@ -19,96 +103,221 @@ def write_analysis_ncf(obj, output_dir='', fn_prefix=None, keep_groups=None, tit
         Prefix to add to the group name when saving.
     keep_groups : list
         List of groups that should be saved. Other groups will not be saved.
+    codec, complevel, shuffle
+        Compression of the floats (see :func:`netcdf_compression`).
+    n_workers : int
+        Number of files written concurrently, in threads. The netCDF writes
+        themselves are serialized by the HDF5 lock of xarray, so this only helps
+        with lazy (dask) data, whose computation overlaps the writing of other files.
+    chunks : dict
+        netCDF chunk sizes by dimension of the floats (e.g. {'time': 24}), dimensions
+        not listed being not split. By default, the netCDF4 default chunking is used.
 
     Returns
     -------
     None
 
     """
-    import pandas as pd
-    import json
     import os.path
     
     if fn_prefix is not None:
         base_name = os.path.join(output_dir,'{prefix}_{groupname}.nc4')
     else:
         base_name = os.path.join(output_dir,'{groupname}.nc4')
-    
-    if keep_groups is not None:
-        groups=[elem for elem in obj.keys() if elem in keep_groups]
-    else:
-        groups=obj.keys()
-    
-    for group in groups:
+    comp = netcdf_compression(codec, complevel, shuffle)
+
+    def write_group(group):
         output_name = base_name.format(prefix=fn_prefix, groupname=group)
         print('Writing:', output_name)
         
-        dset=obj[group].obj
-                
-        # Write long_name and remove any illegal characters from variable names 
-        rename_dict={}
-        allowed_chars = ['a','b','c','d','e','f','g','h','i','j','k','l','m',
-                            'n','o','p','q','r','s','t','u','v','w','x','y','z',
-                            'A','B','C','D','E','F','G','H','I','J','K','L','M',
-                            'N','O','P','Q','R','S','T','U','V','W','X','Y','Z'
-                            '0','1','2','3','4','5','6','7','8','9',
-                            '_','.','@','+','-']
-        for i in dset.variables:
-            dset[i].attrs['long_name']=i
-            illegal_chars = i.translate(str.maketrans('','',"".join(allowed_chars)))
-            if illegal_chars:
-                rename_dict[i]= i.translate(str.maketrans('','',"".join(illegal_chars)))
-        if rename_dict:
-            dset = dset.rename(rename_dict)
-            print('WARNING: The following variables have been renamed due to illegal characters in the variable name for netcdf4 format. ')
-            print('The original variable names can be found in the `long_name` variable attribute. ')
-            print(list(rename_dict.keys()))
+        dset = _analysis_dataset(obj, group, title=title)
         
-        comp = dict(zlib=True, complevel=7)
         encoding = {}
         for i in dset.data_vars.keys():
             if is_float_dtype(dset[i]):  # (dset[i].dtype != 'object') & (i != 'time') & (i != 'time_local') :
-            #     print("Compressing: {}, original_dtype: {}".format(i, dset[i].dtype))
-            #     dset[i] = compress_variable(dset[i])
-                encoding[i] = comp
+                encoding[i] = dict(comp, **_chunk_encoding(dset[i], chunks))
         
-        dset.attrs['title'] = title
-        dset.attrs['format'] = 'NetCDF-4'
-        dset.attrs['date_created'] = pd.to_datetime('today').strftime('%Y-%m-%d')
-        dict_json = obj[group].__dict__.copy()
-        dict_json.pop('obj')
-        dset.attrs['dict_json'] = json.dumps(dict_json, indent = 4) 
-        dset.attrs['group_name'] = group
         dset.to_netcdf(output_name, encoding=encoding)
 
-def write_ncf(dset, output_name, title='', *, verbose=True):
-    """Function to write netcdf4 files with some compression for floats
+    groups = _analysis_groups(obj, keep_groups)
+    if n_workers > 1 and len(groups) > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            # list to re-raise any exception
+            list(executor.map(write_group, groups))
+    else:
+        for group in groups:
+            write_group(group)
+
+
+def _zarr_compression(clevel=5):
+    """Blosc/Zstd compression encoding for zarr (v2 or v3)."""
+    import zarr
+
+    if int(zarr.__version__.split('.')[0]) >= 3:
+        from zarr.codecs import BloscCodec
+        return {'compressors': (BloscCodec(cname='zstd', clevel=clevel, shuffle='bitshuffle'),)}
+    from numcodecs import Blosc
+    return {'compressor': Blosc(cname='zstd', clevel=clevel, shuffle=Blosc.BITSHUFFLE)}
+
+
+def write_analysis_zarr(obj, output_dir='', fn_prefix=None, keep_groups=None, title='',
+                        append_dim=None, chunks=None, clevel=5):
+    """Function to write zarr stores from an attribute of the analysis class (models, obs, paired),
+    with Blosc/Zstd compression. Writes the objects within the attribute as separate stores,
+    which can be read partially (by variable and time) with :func:`melodies_monet.util.read_util.read_analysis_zarr`.
 
     Parameters
     ----------
-    dset : type
-        Description of parameter `dset`.
-    output_name : type
-        Description of parameter `output_name`.
+    obj : dict
+        Dict containing attribute of the driver analysis class (model, observation or paired).
+    output_dir : str
+        Directory to save stores in.
+    fn_prefix : str
+        Prefix to add to the group name when saving.
+    keep_groups : list
+        List of groups that should be saved. Other groups will not be saved.
+    append_dim : str
+        If provided (e.g. 'time'), the data are appended along this dimension to existing stores.
+        Otherwise, existing stores are overwritten.
+    chunks : dict
+        Chunk sizes by dimension (e.g. {'time': 744}). By default, the dask chunks or
+        the zarr default chunks are used.
+    clevel : int
+        Compression level.
 
     Returns
     -------
-    type
-        Description of returned object.
+    None
+
+    """
+    import os.path
+    
+    if fn_prefix is not None:
+        base_name = os.path.join(output_dir,'{prefix}_{groupname}.zarr')
+    else:
+        base_name = os.path.join(output_dir,'{groupname}.zarr')
+    
+    for group in _analysis_groups(obj, keep_groups):
+        output_name = base_name.format(prefix=fn_prefix, groupname=group)
+        dset = _analysis_dataset(obj, group, title=title, file_format='Zarr')
+        if chunks is not None:
+            dset = dset.chunk({dim: size for dim, size in chunks.items() if dim in dset.dims})
+        for i in dset.variables:
+            # chunks of the source files do not apply
+            dset[i].encoding.pop('chunks', None)
+            dset[i].encoding.pop('preferred_chunks', None)
+
+        if append_dim is not None and os.path.exists(output_name):
+            print('Appending:', output_name)
+            dset.to_zarr(output_name, append_dim=append_dim)
+        else:
+            print('Writing:', output_name)
+            encoding = {i: _zarr_compression(clevel) for i in dset.data_vars
+                        if dset[i].dtype.kind in 'biuf'}
+            dset.to_zarr(output_name, mode='w', encoding=encoding)
+
+
+def write_analysis_parquet(obj, output_dir='', fn_prefix=None, keep_groups=None, title='',
+                           row_group_size=100000):
+    """Function to write Parquet files from an attribute of the analysis class (paired or obs),
+    for point-type data (e.g. surface sites, aircraft). Writes the objects within the attribute
+    as separate files, in long table format sorted by time with Zstd compression, which can be
+    read partially (by variable and time) with :func:`melodies_monet.util.read_util.read_analysis_parquet`.
+
+    Parameters
+    ----------
+    obj : dict
+        Dict containing attribute of the driver analysis class (observation or paired).
+    output_dir : str
+        Directory to save files in.
+    fn_prefix : str
+        Prefix to add to the group name when saving.
+    keep_groups : list
+        List of groups that should be saved. Other groups will not be saved.
+    row_group_size : int
+        Number of rows of the row groups, the unit of the time range reads.
+
+    Returns
+    -------
+    None
+
+    """
+    import json
+    import os.path
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    if fn_prefix is not None:
+        base_name = os.path.join(output_dir,'{prefix}_{groupname}.parquet')
+    else:
+        base_name = os.path.join(output_dir,'{groupname}.parquet')
+    
+    for group in _analysis_groups(obj, keep_groups):
+        output_name = base_name.format(prefix=fn_prefix, groupname=group)
+        print('Writing:', output_name)
+        dset = _analysis_dataset(obj, group, title=title, file_format='Parquet')
+
+        # structure of the dataset, to rebuild it when reading
+        meta = {
+            'dims': list(dset.dims),
+            'variables': {i: list(dset[i].dims) for i in dset.variables},
+            'coords': list(dset.coords),
+            'attrs': dset.attrs,
+            'var_attrs': {i: dset[i].attrs for i in dset.variables},
+        }
+        df = dset.to_dataframe().reset_index()
+        if 'time' in df.columns:
+            df = df.sort_values('time', kind='stable')
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            b'melodies_monet': json.dumps(meta, default=str).encode(),
+        })
+        pq.write_table(table, output_name, row_group_size=row_group_size, compression='zstd')
+
+
+def write_ncf(dset, output_name, title='', *, verbose=True, codec='zlib', complevel=7, shuffle=True,
+              chunks=None):
+    """Function to write netcdf4 files with some compression for floats.
+    The floats are packed to int32 (see :func:`compress_variable`), with the
+    ranges of all the variables computed together.
+
+    Parameters
+    ----------
+    dset : xarray.Dataset
+        Dataset to write.
+    output_name : str
+        Output file path.
+    title : str
+        Global attribute title.
+    verbose : bool
+        Print the variables compressed.
+    codec, complevel, shuffle
+        Compression (see :func:`netcdf_compression`).
+    chunks : dict
+        netCDF chunk sizes by dimension (see :func:`write_analysis_ncf`).
+
+    Returns
+    -------
+    None
 
     """
+    import dask
     import pandas as pd
 
     if verbose:
         print('Writing:', output_name)
-    comp = dict(zlib=True, complevel=7)
+    comp = netcdf_compression(codec, complevel, shuffle)
+    float_vars = [i for i in dset.data_vars.keys() if is_float_dtype(dset[i])]
+    # ranges of all the variables in one pass
+    ranges = dask.compute(*[get_min_max(dset[i].fillna(-1), compute=False) for i in float_vars])
     encoding = {}
-    for i in dset.data_vars.keys():
-        if is_float_dtype(dset[i]):  # (dset[i].dtype != 'object') & (i != 'time') & (i != 'time_local') :
-            if verbose:
-                print("Compressing: {}, original dtype: {}".format(i, dset[i].dtype))
-            dset[i] = compress_variable(dset[i])
-            encoding[i] = comp
+    for i, (mn, mx) in zip(float_vars, ranges):
+        if verbose:
+            print("Compressing: {}, original dtype: {}".format(i, dset[i].dtype))
+        dset[i] = compress_variable(dset[i], mn=mn, mx=mx)
+        encoding[i] = dict(comp, **_chunk_encoding(dset[i], chunks))
     dset.attrs['title'] = title
     dset.attrs['format'] = 'NetCDF-4'
     dset.attrs['date_created'] = pd.to_datetime('today').strftime('%Y-%m-%d')
@@ -170,13 +379,16 @@ def pack_value(values, scale_factor, offset, dtype):
     return ((values - offset) / scale_factor).astype(dtype)
 
 
-def get_min_max(da):
+def get_min_max(da, compute=True):
     """Function to return the maximum and minimum value
 
     Parameters
     ----------
     da : type
         Description of parameter `da`.
+    compute : bool
+        If False, return the (lazy) min and max without computing them,
+        to compute several ranges together with ``dask.compute``.
 
     Returns
     -------
@@ -184,16 +396,20 @@ def get_min_max(da):
         Description of returned object.
 
     """
+    if not compute:
+        return (da.min(), da.max())
     return (da.min().compute(), da.max().compute())
 
 
-def compress_variable(da):
+def compress_variable(da, mn=None, mx=None):
     """Function to compress a variable from a float to integer and adds netcdf attributes for CF convention.
 
     Parameters
     ----------
     da : type
         Description of parameter `da`.
+    mn, mx : xarray.DataArray, optional
+        Minimum and maximum of da (with missing values as -1), if already computed.
 
     Returns
     -------
@@ -202,7 +418,8 @@ def compress_variable(da):
 
     """
     da = da.fillna(-1)
-    mn, mx = get_min_max(da)
+    if mn is None or mx is None:
+        mn, mx = get_min_max(da)
     scale_factor, offset = compute_scale_and_offset(mn, mx, 32, dtype=da.dtype)
     da.data = pack_value(da, scale_factor, offset, dtype=np.int32).data
     da.attrs['scale_factor'] = scale_factor.values
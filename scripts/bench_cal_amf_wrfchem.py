@@ -0,0 +1,164 @@
+# SPDX-License-Identifier: Apache-2.0
+#
+"""
+Benchmark of the averaging kernel AMF recalculation (cal_amf_wrfchem)
+on a synthetic TROPOMI swath, against the former per-pixel interp1d loop.
+
+    python scripts/bench_cal_amf_wrfchem.py --ny 500 --nx 450
+"""
+import argparse
+import time
+
+import numpy as np
+import xarray as xr
+
+from melodies_monet.util.sat_l2_swath_utility import cal_amf_wrfchem
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--ny', type=int, default=400,
+    help='number of scanlines')
+parser.add_argument('--nx', type=int, default=450,
+    help='number of ground pixels per scanline')
+parser.add_argument('--nz', type=int, default=35,
+    help='number of model layers')
+parser.add_argument('--nsatz', type=int, default=34,
+    help='number of satellite pressure levels')
+parser.add_argument('--skip_reference', action='store_true',
+    help='only time the current implementation')
+args = parser.parse_args()
+
+
+def cal_amf_wrfchem_loop(scatw, wrfpreslayer, tpreslev, troppres, wrfno2layer_molec, tamf_org, satlon, satlat, modlon, modlat):
+    from scipy import interpolate
+
+    nsaty, nsatx, nz    = wrfpreslayer.shape
+    nsatz, nsaty, nsatx = tpreslev.shape # mli, update to new dimension
+
+
+    nume             = np.zeros([nsaty, nsatx], dtype=np.float32)
+    deno             = np.zeros([nsaty, nsatx], dtype=np.float32)
+    amf_wrfchem      = np.zeros([nsaty, nsatx], dtype=np.float32)
+    amf_wrfchem[:,:] = np.nan
+    wrfavk           = np.zeros([nsaty, nsatx, nz], dtype = np.float32)
+    wrfavk[:,:,:]    = np.nan
+    wrfavk_scl       = np.zeros([nsaty, nsatx], dtype=np.float32)
+    preminus         = np.zeros([nsaty, nsatx], dtype=np.float32)
+    wrfpreslayer_slc = np.zeros([nsaty, nsatx], dtype=np.float32)
+    tmpvalue_sat     = np.zeros([nsaty, nsatx], dtype=np.float32)
+    tmpvalue_mod     = np.zeros([nsaty, nsatx], dtype=np.float32)
+
+
+    # set the surface pressure to wrf one
+    tpreslev[0,:,:] = wrfpreslayer[:,:,0]
+
+    # relationship between pressure to avk
+    tpreslev = tpreslev.values
+    scatw    = scatw.values
+    wrfpreslayer = np.where((wrfpreslayer <=0.0), np.nan, wrfpreslayer)
+
+    # shrink the satellite domain to WRF
+    lb = np.where( (satlon >= np.nanmin(modlon)) & (satlon <= np.nanmax(modlon))
+        & (satlat >= np.nanmin(modlat)) & (satlat <= np.nanmax(modlat)))
+
+    vertical_pres = []
+    vertical_scatw = []
+    vertical_wrfp = []
+
+    if len(lb[0]) == 0:
+        print('Caution: There are no observations within the model domain')
+    for llb in range(len(lb[0])):
+        yy = lb[0][llb]
+        xx = lb[1][llb]
+        vertical_pres = tpreslev[:,yy,xx] # mli, update to new dimension
+        vertical_scatw = scatw[yy,xx,:]
+        vertical_wrfp = wrfpreslayer[yy,xx,:]
+        f = interpolate.interp1d(np.log10(vertical_pres[:]),vertical_scatw[:], fill_value="extrapolate")# relationship between pressure to avk
+        wrfavk[yy,xx,:] = f(np.log10(vertical_wrfp[:])) #wrf-chem averaging kernel
+
+    for l in range(nz-1):  # noqa: E741
+        # check if it's within tropopause
+        preminus[:,:]         = wrfpreslayer[:,:,l] - troppres[:,:]
+
+        # wrfpressure and wrfavk
+        wrfpreslayer_slc[:,:] = wrfpreslayer[:,:,l]
+        wrfavk_scl[:,:]       = wrfavk[:,:,l]
+
+        ind_ak = np.where(np.isinf(wrfavk_scl) | (wrfavk_scl <= 0.0))
+        # use the upper level ak
+        if (ind_ak[0].size >= 1):
+            tmpvalue_sat[:,:]  = wrfavk[:,:,l+1]
+            wrfavk_scl[ind_ak] = tmpvalue_sat[ind_ak]
+
+        ind = np.where(preminus >= 0.0)
+        # within tropopause
+        if (ind[0].size >= 1):
+            # select grids that this level is within tropopause
+            tmpvalue_mod[:,:]  = wrfno2layer_molec[:,:,l]
+            nume[ind] += wrfavk_scl[ind]*tmpvalue_mod[ind]
+            deno[ind] += tmpvalue_mod[ind]
+        else:
+            break
+
+    # tropospheric amf calculated based on model profile and TROPOMI averaging kernel
+    amf_wrfchem = nume / deno * tamf_org
+
+    # ratio
+    ratio = tamf_org / amf_wrfchem
+
+    # exclude nan
+    ratio = np.where(np.isnan(ratio), 1.0, ratio)
+
+    print('Done with Averaging Kernel revision,', 'factor min:',np.nanmin(ratio), 'max:',np.nanmax(ratio))
+
+    return ratio
+
+
+
+def synthetic_swath(ny, nx, nz, nsatz, seed=0):
+    """Synthetic swath with model profiles already at the satellite pixels"""
+    rng = np.random.default_rng(seed)
+    psfc = rng.uniform(7e4, 1.02e5, (ny, nx)).astype(np.float32)
+    # satellite levels from the surface to the top (TM5 hybrid levels)
+    sigma = np.linspace(1, 0.001, nsatz, dtype=np.float32)
+    preslev = sigma[:, None, None] * psfc[None]
+    # model layers, the top ones above the satellite levels are extrapolated
+    eta = np.linspace(0.998, 0.0005, nz, dtype=np.float32)
+    pres_mid = eta[None, None, :] * psfc[..., None]
+    avk = (1 + np.linspace(0, 2, nsatz, dtype=np.float32)[None, None, :]
+           + rng.normal(0, 0.1, (ny, nx, nsatz)).astype(np.float32))
+    no2 = rng.uniform(1e12, 1e15, (ny, nx, nz)).astype(np.float32)
+    troppres = rng.uniform(1e4, 2.5e4, (ny, nx)).astype(np.float32)
+    tamf = rng.uniform(0.5, 2, (ny, nx)).astype(np.float32)
+    lat, lon = np.meshgrid(np.linspace(25, 50, ny), np.linspace(-125, -65, nx), indexing='ij')
+    # a strip of the swath is outside the model domain
+    return dict(
+        scatw=xr.DataArray(avk, dims=('y', 'x', 'layer')),
+        wrfpreslayer=pres_mid,
+        tpreslev=xr.DataArray(preslev, dims=('level', 'y', 'x')),
+        troppres=troppres,
+        wrfno2layer_molec=no2,
+        tamf_org=tamf,
+        satlon=lon, satlat=lat,
+        modlon=np.array([-120., -70.]), modlat=np.array([25., 50.]),
+    )
+
+
+def run(func):
+    kwargs = synthetic_swath(args.ny, args.nx, args.nz, args.nsatz)
+    start = time.perf_counter()
+    ratio = func(**kwargs)
+    return ratio, time.perf_counter() - start
+
+
+# first call compiles the numba kernel
+cal_amf_wrfchem(**synthetic_swath(8, 8, args.nz, args.nsatz))
+
+ratio, elapsed = run(cal_amf_wrfchem)
+print('{} pixels, {} model layers'.format(args.ny * args.nx, args.nz))
+print('cal_amf_wrfchem:      {:8.3f} s'.format(elapsed))
+if not args.skip_reference:
+    ratio_loop, elapsed_loop = run(cal_amf_wrfchem_loop)
+    print('interp1d loop:        {:8.3f} s'.format(elapsed_loop))
+    print('speedup:              {:8.1f}x'.format(elapsed_loop / elapsed))
+    np.testing.assert_array_equal(ratio, ratio_loop)
+    print('ratios are identical')